@@ -0,0 +1,285 @@
+#!/usr/bin/python2.5
+#
+# Copyright 2009, Robert M. Pufky (robert.pufky@gmail.com)
+#
+# GPLv2 License:
+# --------------
+# Copyright (C) 2009 Robert M. Pufky (robert.pufky@gmail.com)
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more 
+# details.
+#
+# You should have received a copy of the GNU General Public License along with 
+# this program; if not, write to the Free Software Foundation, Inc., 59 Temple
+# Place, Suite 330, Boston, MA 02111-1307 USA
+#
+# You can also read the license at:
+#
+#  http://www.opensource.org/licenses/gpl-2.0.php
+#
+# Please contact me if you wish to use this in another product that you are 
+# building (robert.pufky@gmail.com); or building to sell.
+#
+"""Transactional store of DVD title encodes.
+
+Each encoded title is recorded with its state, the fingerprint of the encoding
+options used, its output file and how long it took.  A DVD source is complete
+once every one of its titles has been recorded, so a title that fails is
+retried on the next run instead of its whole DVD being skipped.
+
+The store is a SQLite database in write ahead logging mode.  Nothing is read
+until a source is looked up, so startup does not depend on the amount of
+history.  Sources listed in a legacy full encodes log are imported as complete
+when the database is created.
+
+Title records are buffered, and each batch is written in a single short
+transaction, so no write lock is held between batches and the job queue can
+share the database.
+"""
+
+__author__ = 'Robert M. Pufky (robert.pufky@gmail.com)'
+__version__ = '1.0'
+
+import os
+import time
+
+try:
+  import sqlite3
+except ImportError:
+  from pysqlite2 import dbapi2 as sqlite3
+
+STATE_DONE = 'done'
+STATE_SKIPPED = 'skipped'
+STATE_FAILED = 'failed'
+# Number of title records buffered before they are written.
+BATCH_SIZE = 50
+SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS titles ('
+    '  source TEXT NOT NULL,'
+    '  title TEXT NOT NULL,'
+    '  chapters TEXT NOT NULL,'
+    '  state TEXT NOT NULL,'
+    '  options TEXT,'
+    '  output TEXT,'
+    '  seconds REAL,'
+    '  updated REAL NOT NULL,'
+    '  PRIMARY KEY (source, title, chapters))',
+    'CREATE TABLE IF NOT EXISTS sources ('
+    '  source TEXT PRIMARY KEY,'
+    '  state TEXT NOT NULL,'
+    '  updated REAL NOT NULL)']
+
+
+class Error(Exception):
+  """General completion store error."""
+
+
+class CompletionStore(object):
+  """Records the state of DVD title encodes in a SQLite database.
+
+  Attributes:
+    filename: String full path to the database.
+    legacy_log: String full path to a legacy full encodes log to import, or
+      None.
+    batch_size: Integer number of title records buffered before writing.
+    _connection: sqlite3.Connection to the database, or None until opened.
+    _pending: List of title record tuples not yet written, in the order
+      recorded.
+  """
+
+  def __init__(self, filename, legacy_log=None, batch_size=BATCH_SIZE):
+    """Initializes CompletionStore.  The database is not opened until used.
+
+    Args:
+      filename: String full path to the database.
+      legacy_log: String full path to a legacy full encodes log, imported
+        when the database is created.  Default None.
+      batch_size: Integer number of title records buffered before writing.
+        Default BATCH_SIZE.
+    """
+    self.filename = filename
+    self.legacy_log = legacy_log
+    self.batch_size = batch_size
+    self._connection = None
+    self._pending = []
+
+  def Open(self):
+    """Opens the database, creating it if needed.
+
+    Raises:
+      Error: If the database could not be opened.
+
+    Returns:
+      sqlite3.Connection to the database.
+    """
+    if self._connection is not None:
+      return self._connection
+    created = not os.path.exists(self.filename)
+    connection = None
+    try:
+      connection = sqlite3.connect(self.filename)
+      connection.execute('PRAGMA journal_mode=WAL')
+      connection.execute('PRAGMA synchronous=FULL')
+      for statement in SCHEMA:
+        connection.execute(statement)
+      if created and self.legacy_log:
+        self._ImportLegacyLog(connection)
+      connection.commit()
+    except sqlite3.Error, error:
+      if connection is not None:
+        connection.close()
+      raise Error('Could not open %s! %s' % (self.filename, error))
+    self._connection = connection
+    return connection
+
+  def _ImportLegacyLog(self, connection):
+    """Imports the sources in a legacy full encodes log as complete.
+
+    Args:
+      connection: sqlite3.Connection to import into.
+    """
+    try:
+      legacy_log = open(self.legacy_log, 'r')
+      try:
+        sources = [line.strip() for line in legacy_log if line.strip()]
+      finally:
+        legacy_log.close()
+    except IOError:
+      return
+    now = time.time()
+    connection.executemany(
+        'INSERT OR REPLACE INTO sources (source, state, updated) '
+        'VALUES (?, ?, ?)',
+        [(source, STATE_DONE, now) for source in sources])
+
+  def _Execute(self, statement, parameters=()):
+    """Executes a statement on the database.
+
+    Args:
+      statement: String SQL statement.
+      parameters: Tuple of statement parameters.
+
+    Raises:
+      Error: If the statement failed.
+
+    Returns:
+      sqlite3.Cursor for the statement.
+    """
+    try:
+      return self.Open().execute(statement, parameters)
+    except sqlite3.Error, error:
+      raise Error('Completion store failed: %s' % error)
+
+  def RecordTitle(self, source, title, state, chapters='', options=None,
+                  output=None, seconds=None):
+    """Records the state of a title encode.
+
+    Records are written in batches of batch_size; call Commit to write them
+    immediately.
+
+    Args:
+      source: String full path to the DVD source.
+      title: Integer/String title number.
+      state: String state of the encode, one of STATE_DONE, STATE_SKIPPED or
+        STATE_FAILED.
+      chapters: String chapter range encoded, 'start-end'.  Default '' (all
+        chapters).
+      options: String fingerprint of the encoding options.  Default None.
+      output: String full path to the output file.  Default None.
+      seconds: Float number of seconds the encode took.  Default None.
+
+    Raises:
+      Error: If the title could not be recorded.
+    """
+    self._pending.append((source, str(title), chapters, state, options,
+                          output, seconds, time.time()))
+    if len(self._pending) >= self.batch_size:
+      self.Commit()
+
+  def GetTitle(self, source, title, chapters=''):
+    """Looks up the recorded state of a title encode.
+
+    Args:
+      source: String full path to the DVD source.
+      title: Integer/String title number.
+      chapters: String chapter range encoded.  Default '' (all chapters).
+
+    Raises:
+      Error: If the store could not be read.
+
+    Returns:
+      Tuple (<String state>, <String options>, <String output>,
+      <Float seconds>), or None if the title has not been recorded.
+    """
+    for record in reversed(self._pending):
+      if record[:3] == (source, str(title), chapters):
+        return record[3:7]
+    return self._Execute(
+        'SELECT state, options, output, seconds FROM titles '
+        'WHERE source = ? AND title = ? AND chapters = ?',
+        (source, str(title), chapters)).fetchone()
+
+  def MarkComplete(self, source):
+    """Marks a DVD source as complete, and commits all records.
+
+    Args:
+      source: String full path to the DVD source.
+
+    Raises:
+      Error: If the source could not be recorded.
+    """
+    self._Execute(
+        'INSERT OR REPLACE INTO sources (source, state, updated) '
+        'VALUES (?, ?, ?)', (source, STATE_DONE, time.time()))
+    self.Commit()
+
+  def IsComplete(self, source):
+    """Determines if a DVD source has been completely encoded.
+
+    Args:
+      source: String full path to the DVD source.
+
+    Raises:
+      Error: If the store could not be read.
+
+    Returns:
+      Boolean True if the source is complete.
+    """
+    row = self._Execute('SELECT state FROM sources WHERE source = ?',
+                        (source,)).fetchone()
+    return row is not None and row[0] == STATE_DONE
+
+  def Commit(self):
+    """Writes and commits all buffered title records.
+
+    Raises:
+      Error: If the records could not be committed.
+    """
+    if self._connection is None and not self._pending:
+      return
+    try:
+      connection = self.Open()
+      if self._pending:
+        connection.executemany(
+            'INSERT OR REPLACE INTO titles (source, title, chapters, state, '
+            'options, output, seconds, updated) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)', self._pending)
+      connection.commit()
+    except sqlite3.Error, error:
+      connection.rollback()
+      raise Error('Completion store failed: %s' % error)
+    self._pending = []
+
+  def Close(self):
+    """Commits all records written, and closes the database."""
+    try:
+      self.Commit()
+    finally:
+      if self._connection is not None:
+        self._connection.close()
+        self._connection = None
@@ -0,0 +1,157 @@
+#!/usr/bin/python2.5
+#
+# Copyright 2009, Robert M. Pufky (robert.pufky@gmail.com)
+#
+# GPLv2 License:
+# --------------
+# Copyright (C) 2009 Robert M. Pufky (robert.pufky@gmail.com)
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more 
+# details.
+#
+# You should have received a copy of the GNU General Public License along with 
+# this program; if not, write to the Free Software Foundation, Inc., 59 Temple
+# Place, Suite 330, Boston, MA 02111-1307 USA
+#
+# You can also read the license at:
+#
+#  http://www.opensource.org/licenses/gpl-2.0.php
+#
+# Please contact me if you wish to use this in another product that you are 
+# building (robert.pufky@gmail.com); or building to sell.
+#
+"""Test suite for completion_store."""
+
+__author__ = 'Robert M. Pufky (robert.pufky@gmail.com)'
+
+import os
+import shutil
+import tempfile
+import unittest
+import completion_store
+import job_queue
+
+
+class TestCompletionStore(unittest.TestCase):
+  """Verifies CompletionStore records title encodes properly."""
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.filename = os.path.join(self.directory, 'full_encodes.db')
+    self.store = completion_store.CompletionStore(self.filename)
+
+  def tearDown(self):
+    self.store.Close()
+    shutil.rmtree(self.directory)
+
+  def testLazyOpen(self):
+    """Verifies the database is not created until used."""
+    self.assertFalse(os.path.exists(self.filename))
+    self.assertFalse(self.store.IsComplete('/dvd'))
+    self.assertTrue(os.path.exists(self.filename))
+
+  def testRecordTitle(self):
+    """Verifies title records are stored and replaced."""
+    self.assertEqual(self.store.GetTitle('/dvd', 1), None)
+    self.store.RecordTitle('/dvd', 1, completion_store.STATE_FAILED)
+    self.store.RecordTitle('/dvd', 1, completion_store.STATE_DONE,
+                           options='abc', output='/out/1.mp4', seconds=2.5)
+    self.store.RecordTitle('/dvd', 1, completion_store.STATE_DONE, '1-3')
+    self.assertEqual(self.store.GetTitle('/dvd', '1'),
+                     ('done', 'abc', '/out/1.mp4', 2.5))
+    self.assertEqual(self.store.GetTitle('/dvd', 1, '1-3'),
+                     ('done', None, None, None))
+    self.assertFalse(self.store.IsComplete('/dvd'))
+
+  def testMarkComplete(self):
+    """Verifies completed sources persist between opens."""
+    self.store.RecordTitle('/dvd', 1, completion_store.STATE_DONE)
+    self.store.MarkComplete('/dvd')
+    self.assertTrue(self.store.IsComplete('/dvd'))
+    self.store.Close()
+    store = completion_store.CompletionStore(self.filename)
+    try:
+      self.assertTrue(store.IsComplete('/dvd'))
+      self.assertFalse(store.IsComplete('/other'))
+      self.assertEqual(store.GetTitle('/dvd', 1)[0], 'done')
+    finally:
+      store.Close()
+
+  def testBatchCommit(self):
+    """Verifies title records are committed in batches."""
+    self.store.batch_size = 2
+    reader = completion_store.CompletionStore(self.filename)
+    try:
+      self.store.RecordTitle('/dvd', 1, completion_store.STATE_DONE)
+      self.assertEqual(reader.GetTitle('/dvd', 1), None)
+      self.store.RecordTitle('/dvd', 2, completion_store.STATE_DONE)
+      self.assertEqual(reader.GetTitle('/dvd', 1)[0], 'done')
+      self.assertEqual(reader.GetTitle('/dvd', 2)[0], 'done')
+    finally:
+      reader.Close()
+
+  def testBatchSharedDatabase(self):
+    """Verifies a batch being recorded does not lock out the job queue."""
+    jobs = job_queue.JobQueue(self.filename)
+    try:
+      self.assertFalse(self.store.IsComplete('/dvd'))
+      self.store.RecordTitle('/dvd', 1, completion_store.STATE_DONE)
+      self.assertEqual(self.store.GetTitle('/dvd', 1)[0], 'done')
+      jobs.Add(job_queue.KIND_ENCODE, '/dvd', 2)
+      jobs.Start(job_queue.KIND_ENCODE, '/dvd', 2)
+      jobs.Finish(job_queue.KIND_ENCODE, '/dvd', 2)
+      self.store.RecordTitle('/dvd', 2, completion_store.STATE_DONE)
+      self.store.MarkComplete('/dvd')
+    finally:
+      jobs.Close()
+    self.assertEqual(self.store.GetTitle('/dvd', 2)[0], 'done')
+
+  def testImportLegacyLog(self):
+    """Verifies a legacy full encodes log is imported on creation only."""
+    legacy = os.path.join(self.directory, 'full_encodes.log')
+    legacy_log = open(legacy, 'w')
+    legacy_log.write('/dvd/a\n\n/dvd/b\n')
+    legacy_log.close()
+    self.store.legacy_log = legacy
+    self.assertTrue(self.store.IsComplete('/dvd/a'))
+    self.assertTrue(self.store.IsComplete('/dvd/b'))
+    self.store.Close()
+    legacy_log = open(legacy, 'a')
+    legacy_log.write('/dvd/c\n')
+    legacy_log.close()
+    self.assertFalse(self.store.IsComplete('/dvd/c'))
+
+  def testMissingLegacyLog(self):
+    """Verifies a missing legacy full encodes log is ignored."""
+    self.store.legacy_log = os.path.join(self.directory, 'missing.log')
+    self.assertFalse(self.store.IsComplete('/dvd'))
+
+  def testOpenError(self):
+    """Verifies a database that cannot be opened raises an Error."""
+    self.store.filename = os.path.join(self.directory, 'missing', 'a.db')
+    self.assertRaises(completion_store.Error, self.store.IsComplete, '/dvd')
+
+  def testOpenErrorCloses(self):
+    """Verifies the connection is closed if the database cannot be set up."""
+    closed = []
+    class FailingConnection(object):
+      def execute(self, statement):
+        raise completion_store.sqlite3.OperationalError('disk I/O error')
+      def close(self):
+        closed.append(True)
+    real_connect = completion_store.sqlite3.connect
+    completion_store.sqlite3.connect = lambda filename: FailingConnection()
+    try:
+      self.assertRaises(completion_store.Error, self.store.Open)
+    finally:
+      completion_store.sqlite3.connect = real_connect
+    self.assertEqual(closed, [True])
+
+
+if __name__ == '__main__':
+  unittest.main()
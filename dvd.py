@@ -27,8 +27,14 @@
 #
 """DVD Python module that holds DVD information in an object."""
 
+import bisect
 import datetime
 import os
+import re
+
+# Chapters of this many DVD blocks or fewer are treated as spacer cells (black
+# frames, menu links) rather than content when comparing titles.
+SPACER_BLOCKS = 16
 
 
 class Error(Exception):
@@ -51,41 +57,250 @@ class TitleNotFoundError(Error):
   """If a given title number is not within a DVD object."""
 
 
+# HandBrake scan line formats, as (<str kind>, <str pattern>) tuples.  Every
+# line is classified and its values extracted by a single match of the combined
+# pattern, _SCAN_LINE, in which each kind is the group 'kind_<kind>'.  Named
+# groups of a kind are the Title values its lines report.  A title value line
+# that does not match its own pattern is of kind 'title_invalid'.
+_SCAN_LINE_KINDS = (
+    ('section', r'    \+'),
+    ('title', r'\+ title (?P<number>\d+):'),
+    ('vts', r'  \+ vts (?P<video_tile_set>\d+),\s*ttn \d+,\s*cells\s*'
+     r'(?P<cell_start>\d+)->(?P<cell_end>\d+)\s*'
+     r'\((?P<cell_blocks>-?\d+) blocks'),
+    ('duration', r'  \+ duration:\s*(?P<duration>\d+:\d+:\d+)'),
+    ('size', r'  \+ size:\s*(?P<horizontal_size>\d+)x(?P<vertical_size>\d+),.*?'
+     r'aspect:\s*(?P<aspect_ratio>[\d.]+),\s*(?P<frame_rate>[\d.]+) fps'),
+    ('autocrop', r'  \+ autocrop:\s*(?P<autocrop_top>\d+)/'
+     r'(?P<autocrop_bottom>\d+)/(?P<autocrop_left>\d+)/'
+     r'(?P<autocrop_right>\d+)'),
+    ('title_invalid', r'  \+ (?:vts |duration:|size:|autocrop:)'),
+    ('chapters', r'  \+ chapters:'),
+    ('audio', r'  \+ audio tracks:'),
+    ('subtitles', r'  \+ subtitle tracks:'),
+    ('combing', r'  \+ combing detected'),
+    ('title_other', r'  \+'),
+    ('opening', r'Opening '),
+    ('library', r'libdvd\w*: '),
+    ('other', r'(?! )'))
+_SCAN_LINE = re.compile('|'.join(['(?P<kind_%s>%s)' % kind
+                                  for kind in _SCAN_LINE_KINDS]))
+
+# Types of the Title values reported by scan lines.
+_SCAN_VALUE_TYPES = {
+    'number': int, 'video_tile_set': int, 'cell_start': int, 'cell_end': int,
+    'cell_blocks': int, 'duration': str, 'horizontal_size': int,
+    'vertical_size': int, 'aspect_ratio': float, 'frame_rate': float,
+    'autocrop_top': int, 'autocrop_bottom': int, 'autocrop_left': int,
+    'autocrop_right': int}
+_SCAN_LINE_VALUES = dict([(kind, tuple(re.compile(pattern).groupindex))
+                          for kind, pattern in _SCAN_LINE_KINDS])
+
+# HandBrake section line formats, see the _ProcessLine methods.
+_CHAPTER_LINE = re.compile(
+    r'\s*\+\s*(?P<number>\d+):\s*cells\s*(?P<start>\d+)->(?P<end>\d+),\s*'
+    r'(?P<blocks>-?\d+) blocks,\s*duration\s*(?P<duration>\d+:\d+:\d+)\s*$')
+_AUDIO_LINE = re.compile(
+    r'\s*\+\s*(?P<number>\d+),\s*(?P<language>[^(,]*?)\s*'
+    r'\((?P<encoder>[^()]*)\)(?:.*\((?P<format>[^()]*)\))?,\s*'
+    r'(?P<sample_rate>\d+)\s*Hz,\s*(?P<bit_rate>\d+)\s*bps\s*$')
+_SUBTITLE_LINE = re.compile(
+    r'\s*\+\s*(?P<number>\d+),\s*(?P<language>[^(]*?)\s*(?:\(.*\)\s*)?'
+    r'\((?P<iso_code>[^():]*):\s*(?P<iso_language>[^()]*?)\s*\)\s*$')
+
+# Title values used when a HandBrake scan does not report them, matching the
+# defaults of Title.
+_SCAN_TITLE_DEFAULTS = {
+    'video_tile_set': 1, 'cell_start': 0, 'cell_end': 0, 'cell_blocks': 0,
+    'duration': 0, 'horizontal_size': 720, 'vertical_size': 480,
+    'aspect_ratio': 1.33, 'frame_rate': 29.970, 'autocrop_top': 0,
+    'autocrop_bottom': 0, 'autocrop_left': 0, 'autocrop_right': 0,
+    'combining': False}
+
+
+def FormatDuration(seconds):
+  """Formats a duration for display.
+
+  Args:
+    seconds: Integer duration in seconds.
+
+  Returns:
+    String duration in HH:MM:SS format.  Hours are not limited to 24.
+  """
+  minutes, seconds = divmod(int(seconds), 60)
+  hours, minutes = divmod(minutes, 60)
+  return '%02d:%02d:%02d' % (hours, minutes, seconds)
+
+
+def _NewFromHandbrakeLine(section, line, strict):
+  """Creates a Chapter, Audio or Subtitle object from a HandBrake line.
+
+  The object's constructor is not run, so the object is not created with
+  default values and validated before the line is parsed into it.
+
+  Args:
+    section: Class (Chapter, Audio, Subtitle) of the object to create.
+    line: String section line from HandBrake.
+    strict: Boolean True to enforce strict value checking.
+
+  Raises:
+    InvalidHandbrakeLogLine: If log line is not in the expected format.
+
+  Returns:
+    Chapter, Audio or Subtitle object parsed from the line.
+  """
+  section_object = section.__new__(section)
+  section_object.strict = strict
+  section_object.ParseHandbrakeLine(line)
+  return section_object
+
+
+def _NewScannedTitle(values, strict):
+  """Creates a Title from the values parsed from a HandBrake title section.
+
+  The parser produces values of the expected types, so the type checks of
+  the Title constructor are skipped, and the values are validated once.
+
+  Args:
+    values: Dictionary mapping Title attribute names to values parsed from
+      HandBrake.  Missing values are set to the Title defaults.
+    strict: Boolean True to enforce strict value checking.
+
+  Raises:
+    InvalidHandbrakeLogLine: If a title value is not valid.
+
+  Returns:
+    Title object for the title section.
+  """
+  title = Title.__new__(Title)
+  title.strict = strict
+  title.number = values['number']
+  for name, default in _SCAN_TITLE_DEFAULTS.iteritems():
+    setattr(title, name, values.get(name, default))
+  try:
+    title.duration = title.CreateDuration(title.duration)
+    title._ValidateValues()
+  except (ValueError, InvalidDuration), error:
+    raise InvalidHandbrakeLogLine('Title %s not parsed correctly: %s' %
+                                  (title.number, error))
+  title._sections = None
+  title.chapters = []
+  title.audio = []
+  title.subtitles = []
+  return title
+
+
+def _AddSorted(objects, added):
+  """Adds DVD objects to a List of DVD objects sorted by number.
+
+  A single object is inserted after any objects of the same number, without
+  sorting the List.  Multiple objects are added and the List is sorted once.
+
+  Args:
+    objects: List of DVD objects, sorted by number.
+    added: List of DVD objects to add to objects.
+  """
+  if len(added) == 1:
+    if not objects or objects[-1] <= added[0]:
+      objects.append(added[0])
+    else:
+      bisect.insort_right(objects, added[0])
+  elif added:
+    objects.extend(added)
+    objects.sort()
+
+
+def _IndexByNumber(objects, index=None):
+  """Indexes DVD objects by number.
+
+  Args:
+    objects: List of DVD objects to index.  The first object of a number in
+      the List is indexed.
+    index: Dictionary to add the objects to.  Default None (a new index).
+
+  Returns:
+    Dictionary mapping Integer numbers to DVD objects.
+  """
+  if index is None:
+    index = {}
+  for dvd_object in objects:
+    index.setdefault(dvd_object.number, dvd_object)
+  return index
+
+
 class BaseDvdObject(object):
-  """Base object used for DVD objects."""
+  """Base object used for DVD objects.
+
+  DVD objects define __slots__ instead of a per-instance __dict__, as a catalog
+  of a DVD library holds hundreds of thousands of them.  Repeated String values
+  (languages, encoders, formats) are interned, so each is only stored once.
+
+  Values parsed from HandBrake lines already have the expected types, so
+  ParseHandbrakeLine checks them with _ValidateValues, without the type checks
+  of _ValidateOptions.
+
+  Attributes:
+    duration: Integer playback duration of the object in seconds, if it has one.
+    number: Integer index number for this particular type of DVD object.
+  """
+
+  __slots__ = ('duration', 'number')
+
+  def __cmp__(self, other):
+    """Comparator for use with sorting.
+
+    All DVD objects are compared with the index number for that particular type.
+
+    Args:
+      other: DVD object or Integer to be compared to.
+
+    Returns:
+      Integer 1 this object is greater, 0 objects are equal, -1 other object is
+      greater.
+    """
+    if isinstance(other, BaseDvdObject):
+      return cmp(self.number, other.number)
+    else:
+      return cmp(self.number, other)
 
   def CreateDuration(self, duration):
-    """Creates a valid datetime.datetime object from a duration representation.
+    """Creates a duration in seconds from a duration representation.
 
-    A duration repsentation is a String in the format HH:MM:SS or a
-    datetime.datetime object.
+    A duration repsentation is an Integer number of seconds, a String in the
+    format HH:MM:SS or a datetime.datetime object anchored at 0001-01-01.
 
     Args:
-      duration: Datetime/String objects duration.
+      duration: Integer/String/Datetime objects duration.
 
     Raises:
       InvalidDuration: If duration is not valid.
 
     Returns:
-      datetime.datetime object containing the duration of the chapter.
+      Integer duration in seconds.
     """
-    if isinstance(duration, datetime.datetime):
-      results = duration
+    if isinstance(duration, (int, long)):
+      results = int(duration)
     elif isinstance(duration, str):
       try:
-        hours, minutes, seconds = map(lambda x: int(x), duration.split(':'))
-        results = datetime.datetime(1, 1, 1, hours, minutes, seconds)
+        hours, minutes, seconds = [int(x) for x in duration.split(':')]
       except (TypeError, ValueError):
         raise InvalidDuration('Duration String format incorrect expected: '
                               'HH:MM:SS, received: %s' % duration)
+      if hours < 0 or not 0 <= minutes < 60 or not 0 <= seconds < 60:
+        raise InvalidDuration('Duration String out of range: %s' % duration)
+      results = hours * 3600 + minutes * 60 + seconds
+    elif isinstance(duration, datetime.datetime):
+      results = duration.hour * 3600 + duration.minute * 60 + duration.second
     else:
-      raise InvalidDuration('Duration must be String or datetime.time object.')
+      raise InvalidDuration('Duration must be Integer, String or '
+                            'datetime.datetime object.')
+    if results < 0:
+      raise InvalidDuration('Duration must be positive or 0: %s' % duration)
     return results
 
   def GetDuration(self):
     """Returns the duration of the object as a String, or a default duration."""
-    duration = getattr(self, 'duration', datetime.datetime(1, 1, 1, 0, 0, 0))
-    return str(duration.time())
+    return FormatDuration(getattr(self, 'duration', 0))
 
 
 class Chapter(BaseDvdObject):
@@ -95,12 +310,13 @@ class Chapter(BaseDvdObject):
     cell_start: Integer cell start for title.  Default 0.
     cell_end: Integer cell end for title.  Default 0.
     cell_blocks: Integer number of DVD data blocks cells' use for this title.
-    duration: Datetime.time object that contains the total playback duration for
-      this title.  Duration is specified in 24-hour format: HH:MM:SS.
+    duration: Integer total playback duration for this chapter in seconds.
     number: Integer chapter number for this chapter.  Default 0.
     strict: Boolean True to enforce strict value checking.  Default False.
   """
 
+  __slots__ = ('start', 'end', 'blocks', 'strict')
+
   def __init__(self, start=0, end=0, blocks=0,
                duration='00:00:00', number=1, strict=False):
     """Initalize chapter data.
@@ -109,8 +325,8 @@ class Chapter(BaseDvdObject):
       start: Integer cell start number.  Default 0.
       end: Integer cell end number.  Default 0.
       blocks: Integer number of data blocks used on DVD.  Default 0.
-      duration: Datetime/String duration of chapter length in HH:MM:SS format.
-        Default 00:00:00.
+      duration: Integer seconds, or String duration of chapter length in
+        HH:MM:SS format.  Default 00:00:00.
       number: Integer this chapter's number.  Default 1.
       strict: Boolean True to enforce strict value checking.  Default False.
 
@@ -126,23 +342,6 @@ class Chapter(BaseDvdObject):
     self.number = number
     self.strict = strict
 
-  def __cmp__(self, other):
-    """Comparator for use with sorting.
-
-    All DVD objects are compared with the index number for that particular type.
-
-    Args:
-      other: Chapter object or Integer to be compared to.
-
-    Returns:
-      Integer 1 this object is greater, 0 objects are equal, -1 other object is
-      greater.
-    """
-    if isinstance(other, Chapter):
-      return cmp(self.number, other.number)
-    else:
-      return cmp(self.number, other)
-
   def __str__(self):
     """Returns the String of this object."""
     return (
@@ -163,8 +362,8 @@ class Chapter(BaseDvdObject):
       start: Integer cell start number.  Default 0.
       end: Integer cell end number.  Default 0.
       blocks: Integer number of data blocks used on DVD.  Default 0.
-      duration: Datetime/String duration of chapter length in HH:MM:SS format.
-        Default 00:00:00.
+      duration: Integer seconds, or String duration of chapter length in
+        HH:MM:SS format.  Default 00:00:00.
       number: Integer this chapter's number.  Default 1.
       strict: Boolean True to enforce strict value checking.  Default False.
 
@@ -179,9 +378,24 @@ class Chapter(BaseDvdObject):
       raise TypeError('Expected Integer arguements: start(%s), end(%s),'
                       'blocks(%s), number(%s)' %
                       (start, end, blocks, number))
+    self.CreateDuration(duration)
+    self._ValidateValues(start, end, blocks, number, strict)
+
+  def _ValidateValues(self, start, end, blocks, number, strict):
+    """Validates Chapter values, once their types are known to be correct.
+
+    Args:
+      start: Integer cell start number.
+      end: Integer cell end number.
+      blocks: Integer number of data blocks used on DVD.
+      number: Integer this chapter's number.
+      strict: Boolean True to enforce strict value checking.
+
+    Raises:
+      ValueError: If argument values are not valid.
+    """
     if start < 0 or end < 0 or number < 0:
       raise ValueError('Integer arguements must be positive or 0.')
-    self.CreateDuration(duration)
     if strict and start > end:
       raise ValueError('Cell start must start before cell end.')
     if strict and blocks < 0:
@@ -203,17 +417,12 @@ class Chapter(BaseDvdObject):
       Tuple containing (<int> start, <int> end, <int> blocks, <str> duration,
       <int> number).
     """
-    try:
-      cells, blocks, duration = line.split(',')
-      number, cells = cells.split(':')
-      blocks = int(blocks.split()[0])
-      duration = duration.split()[-1]
-      number = int(number.split('+')[-1])
-      start, end = map(lambda x: int(x), cells.split()[-1].split('->'))
-    except ValueError, error:
-      raise InvalidHandbrakeLogLine('ProcessLine failure: %s, %s' %
-                                    (error, line))
-    return (start, end, blocks, duration, number)
+    match = _CHAPTER_LINE.match(line)
+    if match is None:
+      raise InvalidHandbrakeLogLine('ProcessLine failure: %s' % line)
+    start, end, blocks, duration, number = match.group(
+        'start', 'end', 'blocks', 'duration', 'number')
+    return (int(start), int(end), int(blocks), duration, int(number))
 
   def ParseHandbrakeLine(self, line):
     """Parses a title's chapter line from Handbrake, and sets attributes.
@@ -232,18 +441,18 @@ class Chapter(BaseDvdObject):
     """
     start, end, blocks, duration, number = self._ProcessLine(line)
     try:
-      self._ValidateOptions(start, end, blocks, duration, number, self.strict)
-    except (TypeError, ValueError), error:
+      self._ValidateValues(start, end, blocks, number, self.strict)
+      self.duration = self.CreateDuration(duration)
+    except (ValueError, InvalidDuration), error:
       raise InvalidHandbrakeLogLine(
           'Chapter log line not parsed correctly: %s, line: %s' % (error, line))
     self.start = start
     self.end = end
     self.blocks = blocks
-    self.duration = self.CreateDuration(duration)
     self.number = number
 
 
-class Audio(object):
+class Audio(BaseDvdObject):
   """Information for an Audio track on a DVD.
 
   Attributes:
@@ -257,6 +466,9 @@ class Audio(object):
     strict: Boolean True to enforce strict checking.  Default False.
   """
 
+  __slots__ = ('encoder', 'format', 'sample_rate', 'bit_rate', 'language',
+               'strict')
+
   def __init__(self, encoder='AC3', format='2.0 ch', sample_rate=48000,
                bit_rate=192000, language='English', number=1, strict=False):
     """Initalize audio data.
@@ -276,31 +488,14 @@ class Audio(object):
     """
     self._ValidateOptions(encoder, format, sample_rate,
                           bit_rate, language, number, strict)
-    self.encoder = encoder.strip()
-    self.format = format.strip()
+    self.encoder = intern(encoder.strip())
+    self.format = intern(format.strip())
     self.sample_rate = sample_rate
     self.bit_rate = bit_rate
-    self.language = language.strip()
+    self.language = intern(language.strip())
     self.number = number
     self.strict = strict
 
-  def __cmp__(self, other):
-    """Comparator for use with sorting.
-
-    All DVD objects are compared with the index number for that particular type.
-
-    Args:
-      other: Audio object or Integer to be compared to.
-
-    Returns:
-      Integer 1 this object is greater, 0 objects are equal, -1 other object is
-      greater.
-    """
-    if isinstance(other, Audio):
-      return cmp(self.number, other.number)
-    else:
-      return cmp(self.number, other)
-
   def __str__(self):
     """Returns the String of this object."""
     return (
@@ -347,6 +542,20 @@ class Audio(object):
       raise TypeError('Expected Integer arguements: sample_rate(%s), '
                       'bit_rate(%s), number(%s)' %
                       (sample_rate, bit_rate, number))
+    self._ValidateValues(sample_rate, bit_rate, number, strict)
+
+  def _ValidateValues(self, sample_rate, bit_rate, number, strict):
+    """Validates Audio values, once their types are known to be correct.
+
+    Args:
+      sample_rate: Integer number of samples per second (Hz).
+      bit_rate: Integer number of bits used to encode stream (bps).
+      number: Integer audio track number.
+      strict: Boolean True to enforce strict value checking.
+
+    Raises:
+      ValueError: If argument values are not valid.
+    """
     if strict and number < 0:
       raise ValueError('Number must be positive or 0.')
     if strict and sample_rate < 0:
@@ -371,19 +580,13 @@ class Audio(object):
       Tuple containing (<str> encoder, <str> format, <int> sample_rate,
       <int> bit_rate, <int> number).
     """
-    try:
-      number, encoder, sample_rate, bit_rate = line.split(',')
-      number = int(number.split('+')[-1])
-      sample_rate = int(sample_rate.split('Hz')[0])
-      bit_rate = int(bit_rate.split('bps')[0])
-      language, encoder, format = encoder.split('(', 2)
-      language = language.strip()
-      encoder = encoder.split(')')[0].strip()
-      format = format[format.rfind('(')+1:format.rindex(')')].strip()
-    except ValueError, error:
-      raise InvalidHandbrakeLogLine('ProcessLine failure: %s, %s' %
-                                    (error, line))
-    return (encoder, format, sample_rate, bit_rate, language, number)
+    match = _AUDIO_LINE.match(line)
+    if match is None:
+      raise InvalidHandbrakeLogLine('ProcessLine failure: %s' % line)
+    return (match.group('encoder').strip(),
+            (match.group('format') or '').strip(),
+            int(match.group('sample_rate')), int(match.group('bit_rate')),
+            match.group('language'), int(match.group('number')))
 
   def ParseHandbrakeLine(self, line):
     """Parses a title's audio line from Handbrake, and sets attributes.
@@ -404,20 +607,19 @@ class Audio(object):
     encoder, format, sample_rate, bit_rate, language, number = (
         self._ProcessLine(line))
     try:
-      self._ValidateOptions(encoder, format, sample_rate, bit_rate,
-                            language, number, self.strict)
-    except (TypeError, ValueError), error:
+      self._ValidateValues(sample_rate, bit_rate, number, self.strict)
+    except ValueError, error:
       raise InvalidHandbrakeLogLine(
           'Audio log line not parsed correctly: %s, line: %s' % (error, line))
-    self.encoder = encoder.strip()
-    self.format = format.strip()
+    self.encoder = intern(encoder.strip())
+    self.format = intern(format.strip())
     self.sample_rate = sample_rate
     self.bit_rate = bit_rate
-    self.language = language.strip()
+    self.language = intern(language.strip())
     self.number = number
 
 
-class Subtitle(object):
+class Subtitle(BaseDvdObject):
   """Information for a subtitle track on a DVD.
 
   Attributes:
@@ -430,6 +632,8 @@ class Subtitle(object):
     strict: Boolean True to enforce strict value checking.  Default False.
   """
 
+  __slots__ = ('language', 'iso_code', 'iso_language', 'strict')
+
   def __init__(self, language='English', iso_code='iso639-2',
                iso_language='eng', number=1, strict=False):
     """Initalize subtitle data.
@@ -447,29 +651,12 @@ class Subtitle(object):
       TypeError: If arguments passed to Chapter are not valid.
     """
     self._ValidateOptions(language, iso_code, iso_language, number, strict)
-    self.language = language.strip()
-    self.iso_code = iso_code.strip()
-    self.iso_language = iso_language.strip()
+    self.language = intern(language.strip())
+    self.iso_code = intern(iso_code.strip())
+    self.iso_language = intern(iso_language.strip())
     self.number = number
     self.strict = strict
 
-  def __cmp__(self, other):
-    """Comparator for use with sorting.
-
-    All DVD objects are compared with the index number for that particular type.
-
-    Args:
-      other: Subtitle object or Integer to be compared to.
-
-    Returns:
-      Integer 1 this object is greater, 0 objects are equal, -1 other object is
-      greater.
-    """
-    if isinstance(other, Subtitle):
-      return cmp(self.number, other.number)
-    else:
-      return cmp(self.number, other)
-
   def __str__(self):
     """Returns the String of this object."""
     return (
@@ -508,6 +695,18 @@ class Subtitle(object):
                       (language, iso_code, iso_language))
     if not isinstance(number, int):
       raise TypeError('Expected String arguements: number(%s)' % number)
+    self._ValidateValues(number, strict)
+
+  def _ValidateValues(self, number, strict):
+    """Validates Subtitle values, once their types are known to be correct.
+
+    Args:
+      number: Integer subtitle track number.
+      strict: Boolean True to enforce strict value checking.
+
+    Raises:
+      ValueError: If argument values are not valid.
+    """
     if strict and number < 0:
       raise ValueError('Number must be positive or 0.')
 
@@ -528,19 +727,11 @@ class Subtitle(object):
       Tuple containing (<str> language, <str> iso_code, <str> iso_language,
       <int> number).
     """
-    try:
-      number, language = line.split(',')
-      language, iso = language.strip().split(' ', 1)
-      iso = iso[iso.rfind('(')+1:iso.rindex(')')].strip()
-      iso_code, iso_language = iso.split(':')
-      language = language.strip()
-      iso_code = iso_code.strip()
-      iso_language = iso_language.strip()
-      number = int(number.split()[-1])
-    except ValueError, error:
-      raise InvalidHandbrakeLogLine('ProcessLine failure: %s, %s' %
-                                    (error, line))
-    return (language, iso_code, iso_language, number)
+    match = _SUBTITLE_LINE.match(line)
+    if match is None:
+      raise InvalidHandbrakeLogLine('ProcessLine failure: %s' % line)
+    return (match.group('language'), match.group('iso_code').strip(),
+            match.group('iso_language'), int(match.group('number')))
 
   def ParseHandbrakeLine(self, line):
     """Parses a title's audio line from Handbrake, and sets attributes.
@@ -560,19 +751,18 @@ class Subtitle(object):
     """
     language, iso_code, iso_language, number = self._ProcessLine(line)
     try:
-      self._ValidateOptions(language, iso_code, iso_language,
-                            number, self.strict)
-    except (TypeError, ValueError), error:
+      self._ValidateValues(number, self.strict)
+    except ValueError, error:
       raise InvalidHandbrakeLogLine(
           'Subtitle log line not parsed correctly: %s, line: %s' %
           (error, line))
-    self.language = language
-    self.iso_code = iso_code
-    self.iso_language = iso_language
+    self.language = intern(language)
+    self.iso_code = intern(iso_code)
+    self.iso_language = intern(iso_language)
     self.number = number
 
 
-class Title(object):
+class Title(BaseDvdObject):
   """Contains information for a given title on a DVD.
 
   Attributes:
@@ -586,8 +776,8 @@ class Title(object):
       playback of real-time data and is uniquely identified by a set of numbers.
     cell_blocks: Integer number of DVD data blocks that the cells use for this
       title.  Default 0.
-    duration: Datetime.datetime object that contains the total playback duration
-      for this title.  Default 00:00:00.
+    duration: Integer total playback duration for this title in seconds.
+      Default 0.
     horizontal_size: Integer horizontal size of video.  Default 720.
     vertical_size: Integer vertical size of video.  Default 480.
     aspect_ratio: Float calculated aspect ratio for video.  Default 1.33.
@@ -596,14 +786,28 @@ class Title(object):
     autocrop_bottom: Integer recommended bottom cropping for title.  Default 0.
     autocrop_left: Integer recommended left cropping for title.  Default 0.
     autocrop_right: Integer recommended right cropping for title.  Default 0.
-    chapters: List of Chapter objects for this title.
+    chapters: List of Chapter objects for this title, sorted by number.  Add
+      chapters with AddChapter, or assign a new List, to keep the chapter
+      index current.
     audio: List of Audio objects for this title.
     subtitles: List of Subtitle objects for this title.
     combining: Boolean True if interlacing or telecined video is detected.
       Default False.
     strict: Boolean True to enforce strict value checking.  Default False.
+    _chapters: List of Chapter objects, see chapters.
+    _chapter_index: Dictionary mapping Integer chapter numbers to Chapters.
+    _audio: List of Audio objects, see audio.
+    _subtitles: List of Subtitle objects, see subtitles.
+    _sections: Dictionary mapping section classes (Chapter, Audio, Subtitle)
+      to Lists of HandBrake lines not yet parsed, or None.
   """
 
+  __slots__ = ('video_tile_set', 'cell_start', 'cell_end', 'cell_blocks',
+               'horizontal_size', 'vertical_size', 'aspect_ratio', 'frame_rate',
+               'autocrop_top', 'autocrop_bottom', 'autocrop_left',
+               'autocrop_right', '_chapters', '_chapter_index', '_audio',
+               '_subtitles', '_sections', 'combining', 'strict')
+
   def __init__(self, video_tile_set=1, number=1, cell_start=0, cell_end=0,
                cell_blocks=0, duration='00:00:00', horizontal_size=720,
                vertical_size=480, aspect_ratio=1.33, frame_rate=29.970,
@@ -619,8 +823,8 @@ class Title(object):
       cell_end: Integer cell end for title.  Default 0.
       cell_blocks: Integer number of DVD data blocks that the cells use for this
       	title.  Default 0.
-      duration: Datetime.datetime object that contains the total playback
-        duration for this title.  Default 00:00:00.
+      duration: Integer seconds, or String total playback duration for this
+        title in HH:MM:SS format.  Default 00:00:00.
       horizontal_size: Integer horizontal size of video.  Default 720.
       vertical_size: Integer vertical size of video.  Default 480.
       aspect_ratio: Float calculated aspect ratio for video.  Default 1.33.
@@ -660,35 +864,15 @@ class Title(object):
           (video_tile_set, number, cell_start, cell_end, cell_blocks,
            horizontal_size, vertical_size, autocrop_top, autocrop_bottom,
            autocrop_left, autocrop_right))
-    if (video_tile_set < 0 or horizontal_size < 0 or vertical_size < 0 or
-        autocrop_top < 0 or autocrop_bottom < 0 or autocrop_left < 0 or
-        autocrop_right < 0):
-      raise ValueError('Integer arguments must be positive or 0.')
     if (not isinstance(aspect_ratio, float) or
         not isinstance(frame_rate, float)):
       raise TypeError(
           'Expected Float arguements: aspect_ratio(%s), frame_rate(%s)' %
           (aspect_ratio, frame_rate))
-    if isinstance(duration, datetime.datetime):
-      self.duration = duration
-    elif isinstance(duration, str):
-      try:
-        hours, minutes, seconds = map(lambda x: int(x), duration.split(':'))
-        self.duration = datetime.datetime(1, 1, 1, hours, minutes, seconds)
-      except (TypeError, ValueError):
-        raise TypeError('Duration format incorrect.')
-    else:
-      raise TypeError('Duration must be a String or datetime.datetime object.')
-    if strict and cell_start > cell_end:
-      raise ValueError('cell start should be equal to, or less than cell end.')
-    if strict and cell_start < 0:
-      raise ValueError('Cell start must be positive or 0.')
-    if strict and cell_end < 0:
-      raise ValueError('Cell end must be positive or 0.')
-    if strict and cell_blocks < 0:
-      raise ValueError('Cell blocks must be positive or 0.')
-    if strict and number < 0:
-      raise ValueError('Number must be positive or 0.')
+    try:
+      self.duration = self.CreateDuration(duration)
+    except InvalidDuration, error:
+      raise TypeError('Duration format incorrect: %s' % error)
     self.video_tile_set = video_tile_set
     self.number = number
     self.cell_start = cell_start
@@ -703,6 +887,8 @@ class Title(object):
     self.aspect_ratio = aspect_ratio
     self.frame_rate = frame_rate
     self.combining = combining
+    self._ValidateValues()
+    self._sections = None
     self.chapters = []
     self.audio = []
     self.subtitles = []
@@ -714,9 +900,129 @@ class Title(object):
     if subtitles:
       self.subtitles = subtitles
 
-  def GetDuration(self):
-    """Returns the duration of the chapter as a String."""
-    return str(self.duration.time())
+  def _ValidateValues(self):
+    """Validates the values of this title, once their types are known.
+
+    Raises:
+      ValueError: If a value is not valid.
+    """
+    if (self.video_tile_set < 0 or self.horizontal_size < 0 or
+        self.vertical_size < 0 or self.autocrop_top < 0 or
+        self.autocrop_bottom < 0 or self.autocrop_left < 0 or
+        self.autocrop_right < 0):
+      raise ValueError('Integer arguments must be positive or 0.')
+    if not self.strict:
+      return
+    if self.cell_start > self.cell_end:
+      raise ValueError('cell start should be equal to, or less than cell end.')
+    if self.cell_start < 0:
+      raise ValueError('Cell start must be positive or 0.')
+    if self.cell_end < 0:
+      raise ValueError('Cell end must be positive or 0.')
+    if self.cell_blocks < 0:
+      raise ValueError('Cell blocks must be positive or 0.')
+    if self.number < 0:
+      raise ValueError('Number must be positive or 0.')
+
+  def AddHandbrakeSections(self, sections):
+    """Records HandBrake section lines, to be parsed when first accessed.
+
+    Chapters, audio and subtitles are only parsed from the lines when the
+    title's chapters, audio or subtitles are first used, so titles that are
+    only checked for their duration or size never parse their sections.
+
+    Args:
+      sections: Dictionary mapping section classes (Chapter, Audio, Subtitle)
+        to Lists of String section lines from HandBrake.
+    """
+    if self._sections:
+      self.ParseHandbrakeSections()
+    self._sections = dict([(section, lines)
+                           for section, lines in sections.items() if lines])
+
+  def ParseHandbrakeSections(self):
+    """Parses any HandBrake section lines recorded with AddHandbrakeSections.
+
+    Raises:
+      InvalidHandbrakeLogLine: If a section line is not in the expected format.
+    """
+    if not self._sections:
+      return
+    parsed = []
+    for section, objects in ((Chapter, self._chapters), (Audio, self._audio),
+                             (Subtitle, self._subtitles)):
+      added = []
+      for line in self._sections.get(section, ()):
+        added.append(_NewFromHandbrakeLine(section, line, self.strict))
+      parsed.append((objects, added))
+    self._sections = None
+    for objects, added in parsed:
+      _AddSorted(objects, added)
+    _IndexByNumber(parsed[0][1], self._chapter_index)
+
+  def _ReplaceSection(self, section):
+    """Discards the unparsed lines of a section that is being replaced."""
+    if self._sections:
+      self._sections.pop(section, None)
+
+  def _GetChapters(self):
+    """Returns the List of Chapter objects for this title."""
+    if self._sections:
+      self.ParseHandbrakeSections()
+    return self._chapters
+
+  def _SetChapters(self, chapters):
+    """Replaces the Chapter objects for this title, re-indexing them."""
+    self._ReplaceSection(Chapter)
+    self._chapters = chapters
+    self._chapter_index = _IndexByNumber(chapters)
+
+  def _GetAudio(self):
+    """Returns the List of Audio objects for this title."""
+    if self._sections:
+      self.ParseHandbrakeSections()
+    return self._audio
+
+  def _SetAudio(self, audio):
+    """Replaces the Audio objects for this title."""
+    self._ReplaceSection(Audio)
+    self._audio = audio
+
+  def _GetSubtitles(self):
+    """Returns the List of Subtitle objects for this title."""
+    if self._sections:
+      self.ParseHandbrakeSections()
+    return self._subtitles
+
+  def _SetSubtitles(self, subtitles):
+    """Replaces the Subtitle objects for this title."""
+    self._ReplaceSection(Subtitle)
+    self._subtitles = subtitles
+
+  chapters = property(_GetChapters, _SetChapters)
+  audio = property(_GetAudio, _SetAudio)
+  subtitles = property(_GetSubtitles, _SetSubtitles)
+
+  def HasChapter(self, chapter_number):
+    """Returns Boolean True if the title has a chapter with the given number."""
+    if self._sections:
+      self.ParseHandbrakeSections()
+    return chapter_number in self._chapter_index
+
+  def ContentBlocks(self):
+    """Returns the content of this title, for comparing it to other titles.
+
+    Chapter cell numbers are relative to each title's program chain, so two
+    titles playing the same video can number their cells differently, and two
+    titles playing different video can share a cell range.  The DVD block
+    count of each chapter identifies the video played instead.
+
+    Returns:
+      Tuple of Integer DVD blocks of each chapter, excluding spacer chapters of
+      SPACER_BLOCKS or fewer.
+    """
+    return tuple([chapter.blocks for chapter in self.chapters
+                  if chapter.blocks > SPACER_BLOCKS])
 
   def AddChapter(self, *args):
     """Adds a chapter to the title.
@@ -734,11 +1040,12 @@ class Title(object):
       Boolean True if successful, False otherwise.
     """
     results = True
+    added = []
     if len(args) < 1:
       results = False
     if len(args) == 1:
       if isinstance(args[0], Chapter):
-        self.chapters.append(args[0])
+        added.append(args[0])
       else:
         results = False
     # The number of arguments used to create a Chapter object, exlcuding strict
@@ -747,17 +1054,18 @@ class Title(object):
       try:
         args = list(args)
         args.append(self.strict)
-        self.chapters.append(Chapter(*args))
+        added.append(Chapter(*args))
       except (TypeError, ValueError):
         results = False
     else:
       for chapter in args:
         if isinstance(chapter, Chapter):
-          self.chapters.append(chapter)
+          added.append(chapter)
         else:
           results = False
           break
-    self.chapters.sort()
+    _AddSorted(self.chapters, added)
+    _IndexByNumber(added, self._chapter_index)
     return results
 
   def AddAudio(self, *args):
@@ -776,11 +1084,12 @@ class Title(object):
       Boolean True if successful, False otherwise.
     """
     results = True
+    added = []
     if len(args) < 1:
       results = False
     if len(args) == 1:
       if isinstance(args[0], Audio):
-        self.audio.append(args[0])
+        added.append(args[0])
       else:
         results = False
     # The number of arguments used to create an Audio object, exluding strict
@@ -789,17 +1098,17 @@ class Title(object):
       try:
         args = list(args)
         args.append(self.strict)
-        self.audio.append(Audio(*args))
+        added.append(Audio(*args))
       except TypeError:
         results = False
     else:
       for audio in args:
         if isinstance(audio, Audio):
-          self.audio.append(audio)
+          added.append(audio)
         else:
           results = False
           break
-    self.audio.sort()
+    _AddSorted(self.audio, added)
     return results
 
   def AddSubtitle(self, *args):
@@ -818,11 +1127,12 @@ class Title(object):
       Boolean True if successful, False otherwise.
     """
     results = True
+    added = []
     if len(args) < 1:
       results = False
     if len(args) == 1:
       if isinstance(args[0], Subtitle):
-        self.subtitles.append(args[0])
+        added.append(args[0])
       else:
         results = False
     # The number of arguments used to create a Subtitle object, excluding strict
@@ -831,33 +1141,18 @@ class Title(object):
       try:
         args = list(args)
         args.append(self.strict)
-        self.subtitles.append(Subtitle(*args))
+        added.append(Subtitle(*args))
       except TypeError:
         results = False
     else:
       for subtitle in args:
         if isinstance(subtitle, Subtitle):
-          self.subtitles.append(subtitle)
+          added.append(subtitle)
         else:
           results = False
-    self.subtitles.sort()
+    _AddSorted(self.subtitles, added)
     return results
 
-  def __cmp__(self, other):
-    """Comparator for use with sorting.
-
-    Args:
-      other: Title object or Integer to be compared to.
-
-    Returns:
-      Integer 1 this object is greater, 0 objects are equal, -1 other object is
-      greater.
-    """
-    if isinstance(other, Title):
-      return cmp(self.number, other.number)
-    else:
-      return cmp(self.number, other)
-
   def __str__(self):
     """Returns the String of this object."""
     return (
@@ -889,24 +1184,79 @@ class Title(object):
          self.subtitles, self.strict))
 
 
+class ScanDiagnostics(object):
+  """Records the lines of a HandBrake title scan that could not be used.
+
+  Attributes:
+    lines: Integer number of lines processed in the scan.
+    unrecognized: Integer number of lines in the title sections of the scan
+      that were not recognized, and were ignored.
+    skipped: List of (<int line number>, <str line>, <str reason>) tuples for
+      each line skipped by a tolerant scan, in scan order.  Line numbers start
+      at 1.
+  """
+
+  def __init__(self):
+    """Initializes ScanDiagnostics for a new scan."""
+    self.lines = 0
+    self.unrecognized = 0
+    self.skipped = []
+
+  def Skip(self, line_number, line, reason):
+    """Records a skipped scan line.
+
+    Args:
+      line_number: Integer number of the line in the scan.
+      line: String line that was skipped.
+      reason: String or Exception describing why the line was skipped.
+    """
+    self.skipped.append((line_number, line, str(reason)))
+
+  def __str__(self):
+    """Returns the String of this object."""
+    return ('%s lines, %s skipped, %s unrecognized' %
+            (self.lines, len(self.skipped), self.unrecognized))
+
+
 class Dvd(object):
   """Contains all information that can be obtained from a DVD via Handbrake.
 
   Attributes:
     name: String name of the DVD.
-    titles: List containing Titles on the DVD.
+    titles: List containing Titles on the DVD, sorted by number.  Add titles
+      with AddTitle, or assign a new List, to keep the title index current.
     strict: Boolean True to enforce strict value checking.  Default False.
+    lazy: Boolean True to parse the chapters, audio and subtitles of scanned
+      titles only when they are first used.  Default True.
+    tolerant: Boolean True to skip scan lines and titles that can not be
+      parsed, recording them in diagnostics, instead of raising
+      InvalidHandbrakeLogLine.  Tolerant scans parse title sections as they are
+      read, so lazy has no effect.  Default False.
+    diagnostics: ScanDiagnostics for the last HandBrake scan.
+    _titles: List of Title objects, see titles.
+    _title_index: Dictionary mapping Integer title numbers to Titles.
   """
 
-  def __init__(self, name=None, titles=None, strict=False):
+  # Section classes of the scan line kinds that start a title section.
+  _SCAN_SECTIONS = {'chapters': Chapter, 'audio': Audio, 'subtitles': Subtitle}
+
+  def __init__(self, name=None, titles=None, strict=False, lazy=True,
+               tolerant=False):
     """Intalize Dvd data.
 
     Args:
       name: String name of the DVD.  Default: Current datetime.
       titles: List of Title objects for this DVD.  Default None.
       strict: Boolean True to enforce strict value checking.  Default False.
+      lazy: Boolean True to parse title sections when first used.  Default
+        True.
+      tolerant: Boolean True to skip scan lines that can not be parsed.
+        Default False.
     """
     self.strict = strict
+    self.lazy = lazy
+    self.tolerant = tolerant
+    self.StartHandbrakeAnalysis()
     if not name:
       time = datetime.datetime.now()
       self.name = time.strftime('%Y-%m-%d_%H-%M-%S')
@@ -929,18 +1279,31 @@ class Dvd(object):
       Boolean True if successful, False otherwise.
     """
     results = True
+    added = []
     if len(args) < 1:
       results = False
     else:
       for title in args:
         if isinstance(title, Title):
-          self.titles.append(title)
+          added.append(title)
         else:
           results = False
           break
-    self.titles.sort()
+    _AddSorted(self._titles, added)
+    _IndexByNumber(added, self._title_index)
     return results
 
+  def _GetTitles(self):
+    """Returns the List of Title objects on the DVD."""
+    return self._titles
+
+  def _SetTitles(self, titles):
+    """Replaces the Title objects on the DVD, re-indexing them."""
+    self._titles = titles
+    self._title_index = _IndexByNumber(titles)
+
+  titles = property(_GetTitles, _SetTitles)
+
   def GetTitle(self, title_number):
     """Returns a Title object with the given title number.
 
@@ -953,223 +1316,242 @@ class Dvd(object):
     Returns:
       Title object for the given title number.
     """
-    for title in self.titles:
-      if title.number == title_number:
-        return title
-    raise TitleNotFoundError('Title %s not in DVD.')
-
-  def ProcessHandbrakeAnalysis(self, analysis):
-    """Processes output (--title 0) from handbrake, creating a full DVD object.
-
-    Args:
-      analysis: List containing all of the lines from a HandBrake full title
-        scan (--title 0), including new lines.
-    """
-    self.titles = []
-    log = ''.join(analysis).splitlines()
-    titles, dvd_name = self._IndexHandbrakeLog(log)
-    for title_index in xrange(len(titles)):
-      if title_index == len(titles)-1:
-        self._ProcessTitle(log[titles[title_index]:])
-      else:
-        self._ProcessTitle(log[titles[title_index]:titles[title_index+1]])
-    if dvd_name:
-      self.name = dvd_name
-
-  def _ProcessTitle(self, title_log):
-    """Processes title information for a given title section in Handbrake log.
+    try:
+      return self._title_index[title_number]
+    except KeyError:
+      raise TitleNotFoundError('Title %s not in DVD.' % title_number)
 
-    Parses all the log information for a particular title, creating and adding a
-    corresponding title object to this DVD object.
+  def FindDuplicates(self):
+    """Finds titles that only play content found in other titles.
 
-    Args:
-      title_log: List containing Strings of the Handbrake log specific to an
-        individual title.
-    """
-    title, chapter_index, audio_index, subtitle_index = (
-        self._ExtractTitleFromLog(title_log))
-    if chapter_index:
-      title.AddChapter(*self._ProcessTitleSection(
-          title_log[chapter_index:], Chapter))
-    if audio_index:
-      title.AddAudio(*self._ProcessTitleSection(
-          title_log[audio_index:], Audio))
-    if subtitle_index:
-      title.AddSubtitle(*self._ProcessTitleSection(
-          title_log[subtitle_index:], Subtitle))
-    self.AddTitle(title)
-
-  def _ProcessTitleSection(self, log, line_object):
-    """Processes a given title section, using the provided callback method.
-
-    A title section in the Handbrake log is any line starting at an indentation
-    of at least 4 spaces and a '+'.  New sections start at an indentation of two
-    spaces and a '+'.  A new title also starts if a new line does not start
-    with a space.  This assumes that the log starts with a valid section.
-
-        + valid section (this is processed)
-      + New section
-        + valid section
-    + New title
+    A title is a duplicate if its content (Title.ContentBlocks) is the same as
+    a lower numbered title in the same video title set (an alias), or is made
+    up entirely of the content of shorter titles in the same video title set,
+    played one after another (a play all title).
 
-    Args:
-      log: List of Strings containing title log section to process.
-      line_object: Class that can be instantiated and a ParseHandbrakeLine
-        method called.
+    Titles are indexed by video title set and their first content chapter, so
+    each title is only compared to titles that could start a run of its
+    content.  Shorter titles are preferred when covering a play all title, so
+    it is reported as a duplicate of the individual episodes.
 
     Returns:
-      List containing processed objects for each line using the line_object
-      class or an empty list.
+      Dictionary mapping Integer duplicate title numbers to a List of the
+      Integer title numbers that play the same content, in playback order.
     """
-    results = []
-    for line in log:
-      if line.startswith('  +') or not line.startswith(' '):
-        break
-      else:
-        section_object = line_object(strict=self.strict)
-        section_object.ParseHandbrakeLine(line)
-        results.append(section_object)
-    return results
+    contents = {}
+    index = {}
+    for title in self.titles:
+      content = title.ContentBlocks()
+      if content:
+        contents[title.number] = content
+        index.setdefault((title.video_tile_set, content[0]), []).append(title)
+    duplicates = {}
+    for title in self.titles:
+      content = contents.get(title.number)
+      if not content:
+        continue
+      originals = []
+      position = 0
+      while position < len(content):
+        piece = None
+        for candidate in index.get((title.video_tile_set, content[position]),
+                                   []):
+          candidate_content = contents[candidate.number]
+          if candidate is title or (
+              len(candidate_content) == len(content) and
+              candidate.number > title.number):
+            continue
+          if (content[position:position + len(candidate_content)] ==
+              candidate_content and (piece is None or len(candidate_content) <
+                                     len(contents[piece.number]))):
+            piece = candidate
+        if piece is None:
+          break
+        originals.append(piece.number)
+        position += len(contents[piece.number])
+      if position == len(content):
+        duplicates[title.number] = originals
+    return duplicates
 
-  def _ExtractTitleFromLog(self, log):
-    """Extracts title information from Handbrake title log section.
+  def ProcessHandbrakeAnalysis(self, analysis):
+    """Processes output (--title 0) from handbrake, creating a full DVD object.
 
-    Calculated chapter, audio and subtitle indexes are automatically adjusted by
-    1.
+    The analysis is consumed in a single pass, building titles, chapters, audio
+    and subtitles as each line is read.  Any iterable of lines may be used: a
+    List, an open file, a pipe or a generator.
 
     Args:
-      log: List of Strings making up a 'title' section of a Handbrake log.  A
-        title section is all data between the '+ title #:' lines.
-
-    Returns:
-      Tuple  (<Title> title, <int> chapter, <int> audio, <int> subtitle),
-      containing a title object and indexes for chapter, audio and subtitle.  If
-      an index is not found, None is returned for that index.
+      analysis: Iterable containing the lines from a HandBrake full title scan
+        (--title 0), with or without new lines.
     """
-    combining = False
-    chapter_index, audio_index, subtitle_index = None, None, None
-
-    for index in xrange(len(log)):
-      if log[index].startswith('+ title '):
-        title_number = int(log[index].split(':')[0].split(' ')[2])
-      if log[index].startswith('  + vts'):
-        video_tile, cell_start, cell_end, cell_blocks = (
-            self._ParseVideoTileSetLine(log[index]))
-
-      if log[index].startswith('  + duration'):
-        duration = self._ParseDurationLine(log[index])
-
-      if log[index].startswith('  + size'):
-        horizontal_size, vertical_size, aspect_ratio, frame_rate = (
-            self._ParseSizeLine(log[index]))
-
-      if log[index].startswith('  + autocrop'):
-        top, bottom, left, right = self._ParseAutoCropLine(log[index])
-      if log[index].startswith('  + chapters'):
-        chapter_index = index + 1
-      if log[index].startswith('  + audio tracks'):
-        audio_index = index + 1
-      if log[index].startswith('  + subtitle tracks'):
-        subtitle_index = index + 1
-      if log[index].startswith('  + combining detected'):
-        combining = True
-
-    title = Title(video_tile, title_number, cell_start, cell_end, cell_blocks,
-                  duration, horizontal_size, vertical_size, aspect_ratio,
-                  frame_rate, top, bottom, left, right, combining, self.strict)
-    return (title, chapter_index, audio_index, subtitle_index)
-
-  def _ParseVideoTileSetLine(self, line):
-    """Parses a title's vts line from Handbrake.
-
-    A vts line from Handbrake is in the following format:
-      + vts 1, ttn 1, cells 0->24 (1939167 blocks)
+    self.StartHandbrakeAnalysis()
+    for lines in analysis:
+      for line in lines.splitlines():
+        self.ProcessHandbrakeLine(line)
+    self.FinishHandbrakeAnalysis()
 
-    Args:
-      line: String containing the '+ vts' line from Handbrake.
+  def StartHandbrakeAnalysis(self):
+    """Resets the DVD object to start processing a new HandBrake title scan.
 
-    Returns:
-      Tuple (<str video_tile_set>, <int cell_start>, <int cell_stop>,
-      <int cell_blocks>), ready for use in Title classes.
+    Use with ProcessHandbrakeLine and FinishHandbrakeAnalysis when lines are
+    delivered one at a time, instead of ProcessHandbrakeAnalysis.
     """
-    video_tile, unused_title, cells = line.split(',')
-    video_tile = int(video_tile.split()[-1])
-    cells = cells.split()
-    cell_start, cell_end = map(lambda x: int(x), cells[1].split('->'))
-    cell_blocks = int(cells[2][1:])
-    return (video_tile, cell_start, cell_end, cell_blocks)
-
-  def _ParseDurationLine(self, line):
-    """Parses a title's duration line from Handbrake.
-
-    A duration line from Handbrake is in the following format:
-      + duration: 01:26:38
+    self.titles = []
+    self._scan_name = None
+    self._scan_title = None
+    self._scan_section = None
+    self._scan_titles = []
+    self._scan_line = 0
+    self._scan_title_line = 0
+    self.diagnostics = ScanDiagnostics()
+
+  def ProcessHandbrakeLine(self, line):
+    """Processes a single line of a HandBrake title scan.
+
+    The scan is parsed as a state machine.  A line starting with '+ title'
+    starts a new title, title information is indented two spaces, and section
+    lines (chapters, audio and subtitles) are indented four spaces.  Any other
+    line that does not start with a space ends the current title section.
+    Section lines are kept with their title, and parsed when first used if
+    lazy is set; otherwise when the title is finished.
+
+        + title 1:
+          + chapters:
+            + section line
+        HandBrake has exited.
+
+    Lines of a title that are not recognized are counted in diagnostics.  A
+    title information line (vts, duration, size or autocrop) that can not be
+    parsed is not counted, but raises, or is skipped by a tolerant scan.
+
+    A tolerant scan parses section lines as they are read, skipping lines that
+    can not be parsed.  Messages from the DVD libraries (libdvdread) are also
+    skipped, instead of ending the current section.
 
     Args:
-      line: String containing the '+ duration' line from Handbrake.
+      line: String containing a HandBrake log line, without new lines.
 
-    Returns:
-      String duration of the title.
+    Raises:
+      InvalidHandbrakeLogLine: If a line can not be parsed, and tolerant is not
+        set.
     """
-    return line.split()[-1]
-
-  def _ParseSizeLine(self, line):
-    """Parses a title's size line from Handbrake.
-
-    A size line from Handbrake is in the following format:
+    self._scan_line += 1
+    kind, values = self._ClassifyLine(line)
+    if kind == 'section':
+      if self._scan_section is None:
+        if self._scan_title is not None:
+          self.diagnostics.unrecognized += 1
+      elif not self.tolerant:
+        self._scan_title[self._scan_section].append(line)
+      else:
+        try:
+          self._scan_title[self._scan_section].append(
+              _NewFromHandbrakeLine(self._scan_section, line, self.strict))
+        except InvalidHandbrakeLogLine, error:
+          self.diagnostics.Skip(self._scan_line, line, error)
+    elif kind == 'title':
+      self._FinishTitle()
+      self._scan_title = {Chapter: [], Audio: [], Subtitle: []}
+      self._scan_title.update(values)
+      self._scan_title_line = self._scan_line
+    elif kind == 'library' and self.tolerant:
+      self.diagnostics.Skip(self._scan_line, line, 'Library message')
+    elif kind in ('other', 'opening', 'library'):
+      self._scan_section = None
+      if kind == 'opening':
+        self._scan_name = self._DetermineDvdName(line)
+    elif kind == 'title_invalid' and self._scan_title is not None:
+      self._scan_section = None
+      if not self.tolerant:
+        raise InvalidHandbrakeLogLine(
+            'Title log line not parsed correctly: %s' % line)
+      self.diagnostics.Skip(self._scan_line, line, 'Title line not parsed')
+    elif kind is not None:
+      self._scan_section = None
+      if self._scan_title is not None:
+        self._scan_title.update(values)
+        self._scan_section = self._SCAN_SECTIONS.get(kind)
+        if kind == 'combing':
+          self._scan_title['combining'] = True
+        elif kind == 'title_other':
+          self.diagnostics.unrecognized += 1
+    elif self._scan_title is not None:
+      self.diagnostics.unrecognized += 1
+
+  def FinishHandbrakeAnalysis(self):
+    """Finishes processing a HandBrake title scan, adding the parsed titles."""
+    self._FinishTitle()
+    if self._scan_titles:
+      self.AddTitle(*self._scan_titles)
+    if self._scan_name:
+      self.name = self._scan_name
+    self.diagnostics.lines = self._scan_line
+    self._scan_title = None
+    self._scan_section = None
+    self._scan_titles = []
+
+  def _ClassifyLine(self, line):
+    """Classifies a HandBrake scan line, extracting the title values it reports.
+
+    A title information line from Handbrake is in one of the following formats:
+      + vts 1, ttn 1, cells 0->24 (1939167 blocks)
+      + duration: 01:26:38
       + size: 720x480, aspect: 1.78, 23.976 fps
-
-    Args:
-      line: String containing the '+ size' line from Handbrake.
-
-    Returns:
-      Tuple (<int horizontal_size>, <int vertical_size>, <float aspect_ratio>,
-      <float frame_rate>), ready for use in Title classes.
-    """
-    size, aspect, frame_rate = line.split(',')
-    size = size.split(': ')[-1].split('x')
-    horizontal_size, vertical_size = map(lambda x: int(x), size)
-    aspect = float(aspect.split()[-1])
-    frame_rate = float(frame_rate.split()[0])
-    return (horizontal_size, vertical_size, aspect, frame_rate)
-
-  def _ParseAutoCropLine(self, line):
-    """Parses a title's autocrop line from Handbrake.
-
-    An autocrop line from Handbrake is in the following format:
       + autocrop: 0/0/0/0
 
     Args:
-      line: String containing the '+ autocrop' line from Handbrake.
+      line: String containing a HandBrake log line, without new lines.
 
     Returns:
-      Tuple (<int top>, <int bottom>, <int left>, <int right>) croppings, ready
-      for use in Title classes.
+      Tuple (<str kind>, <dict values>), where kind is a kind from
+      _SCAN_LINE_KINDS, or None if the line is an indented line of no known
+      kind; and values maps Title attribute names to the values on the line.
     """
-    crops = line.split()[-1].split('/')
-    return map(lambda x: int(x), crops)
+    match = _SCAN_LINE.match(line)
+    if match is None:
+      return (None, {})
+    kind = match.lastgroup[5:]
+    values = {}
+    for name in _SCAN_LINE_VALUES[kind]:
+      values[name] = _SCAN_VALUE_TYPES[name](match.group(name))
+    return (kind, values)
 
-  def _IndexHandbrakeLog(self, log):
-    """Indexes the HandBrake log for key positions and values.
+  def _FinishTitle(self):
+    """Creates a Title object from the title currently being processed.
 
-    Args:
-      log: List of Strings containing the HandBrake full title scan.
+    A tolerant scan skips a title that can not be created, recording its title
+    line in diagnostics.
 
-    Returns:
-      Tuple containing (<list titles>, <str dvd_name>), where titles is a list
-      of Integers containing the start of each title in the log.  dvd_name is
-      the parsed name of the DVD disc or None.
+    Raises:
+      InvalidHandbrakeLogLine: If the title is not valid, and tolerant is not
+        set.
     """
-    dvd_name = None
-    titles = []
-    for index in xrange(len(log)):
-      if log[index].startswith('Scanning title '):
-        continue
-      if log[index].startswith('Opening'):
-        dvd_name = self._DetermineDvdName(log[index])
-      if log[index].startswith('+ title'):
-        titles.append(index)
-    return (titles, dvd_name)
+    if self._scan_title is None:
+      return
+    sections = {}
+    for section in (Chapter, Audio, Subtitle):
+      sections[section] = self._scan_title.pop(section)
+    values = self._scan_title
+    self._scan_title = None
+    self._scan_section = None
+    try:
+      title = _NewScannedTitle(values, self.strict)
+    except InvalidHandbrakeLogLine, error:
+      if not self.tolerant:
+        raise
+      self.diagnostics.Skip(self._scan_title_line,
+                            '+ title %s:' % values['number'], error)
+      return
+    if self.tolerant:
+      for add, section in ((title.AddChapter, Chapter), (title.AddAudio, Audio),
+                           (title.AddSubtitle, Subtitle)):
+        if sections[section]:
+          add(*sections[section])
+    else:
+      title.AddHandbrakeSections(sections)
+      if not self.lazy:
+        title.ParseHandbrakeSections()
+    self._scan_titles.append(title)
 
   def _DetermineDvdName(self, name_line):
     """Determines the DVD's title from HandBrake Source file line.
@@ -29,6 +29,7 @@
 
 __author__ = 'Robert M. Pufky (robert.pufky@gmail.com)'
 
+import cPickle
 import datetime
 import unittest
 import dvd
@@ -52,18 +53,30 @@ class TestBaseDvdObject(unittest.TestCase):
 
   def testCreateDuration(self):
     """Verifies CreateDuration method works properly."""
-    date = datetime.datetime(1, 1, 1, 0, 0, 0)
-    self.assertEqual(date, self.dvd.CreateDuration('00:00:00'))
-    self.assertEqual(date, self.dvd.CreateDuration(date))
+    self.assertEqual(0, self.dvd.CreateDuration('00:00:00'))
+    self.assertEqual(3723, self.dvd.CreateDuration('01:02:03'))
+    self.assertEqual(90000, self.dvd.CreateDuration('25:00:00'))
+    self.assertEqual(3723, self.dvd.CreateDuration(3723))
+    self.assertEqual(
+        3723, self.dvd.CreateDuration(datetime.datetime(1, 1, 1, 1, 2, 3)))
     self.assertRaises(dvd.InvalidDuration, self.dvd.CreateDuration, '00 00 00')
+    self.assertRaises(dvd.InvalidDuration, self.dvd.CreateDuration, '00:60:00')
+    self.assertRaises(dvd.InvalidDuration, self.dvd.CreateDuration, -1)
     self.assertRaises(dvd.InvalidDuration, self.dvd.CreateDuration, object())
 
   def testGetDuration(self):
     """Verifies GetDuration method works properly."""
     self.assertEqual('00:00:00', self.dvd.GetDuration())
-    self.dvd.duration = datetime.datetime(1, 1, 1, 1, 0, 0)
+    self.dvd.duration = 3600
     self.assertEqual('01:00:00', self.dvd.GetDuration())
 
+  def testFormatDuration(self):
+    """Verifies durations over a day are formatted without wrapping."""
+    self.assertEqual('00:00:00', dvd.FormatDuration(0))
+    self.assertEqual('01:02:03', dvd.FormatDuration(3723))
+    self.assertEqual('01:23:45', dvd.FormatDuration(5025))
+    self.assertEqual('100:00:05', dvd.FormatDuration(360005.9))
+
 
 class TestChapter(unittest.TestCase):
   """Verifies Chapter class works correctly."""
@@ -177,6 +190,18 @@ class TestAudio(unittest.TestCase):
     self.assertEqual(self.log.LANGUAGE, results[4])
     self.assertEqual(self.log.NUMBER, results[5])
 
+  def testProcessLineVariants(self):
+    """Verifies _ProcessLine handles audio line format variations."""
+    self.assertEqual(
+        self.audio._ProcessLine(
+            "    + 2, English (AC3) (Director's Commentary, 2009) (5.1 ch), "
+            '48000Hz, 448000bps'),
+        ('AC3', '5.1 ch', 48000, 448000, 'English', 2))
+    self.assertEqual(
+        self.audio._ProcessLine('    + 3, Simplified Chinese (DTS), '
+                                '48000Hz, 768000bps'),
+        ('DTS', '', 48000, 768000, 'Simplified Chinese', 3))
+
   def testParseHandbrakeLine(self):
     """Verifies ParseHandbrakeLine works correctly."""
     self.audio.ParseHandbrakeLine(self.log.LINE)
@@ -190,6 +215,14 @@ class TestAudio(unittest.TestCase):
                       self.audio.ParseHandbrakeLine,
                       self.log.BAD_LINE)
 
+  def testInternedStrings(self):
+    """Verifies repeated audio Strings are only stored once."""
+    other = dvd.Audio(encoder=''.join(['A', 'C3']),
+                      language=''.join(['Eng', 'lish']))
+    self.assertTrue(other.encoder is self.audio.encoder)
+    self.assertTrue(other.language is self.audio.language)
+    self.assertTrue(other.format is self.audio.format)
+
 
 class TestSubtitle(unittest.TestCase):
   """Verifies Subtitle class works correctly."""
@@ -238,6 +271,13 @@ class TestSubtitle(unittest.TestCase):
     self.assertEqual(self.log.ISO_LANGUAGE, results[2])
     self.assertEqual(self.log.NUMBER, results[3])
 
+  def testProcessLineVariants(self):
+    """Verifies _ProcessLine handles subtitle line format variations."""
+    self.assertEqual(
+        self.subtitle._ProcessLine(
+            '    + 12, Simplified Chinese (Wide Screen) (iso639-2: chi)'),
+        ('Simplified Chinese', 'iso639-2', 'chi', 12))
+
   def testParseHandbrakeLine(self):
     """Verifies ParseHandbrakeLine works correctly."""
     self.subtitle.ParseHandbrakeLine(self.log.LINE)
@@ -284,10 +324,11 @@ class TestTitle(unittest.TestCase):
 
   def testDuration(self):
     """Verifies Duration arguements are handled properly."""
-    title_datetime = dvd.Title(duration=datetime.datetime(1, 1, 1, 0, 0, 0))
-    self.assertEqual(datetime.datetime(1, 1, 1, 0, 0, 0), self.title.duration)
-    self.assertEqual(datetime.datetime(1, 1, 1, 0, 0, 0),
-                     title_datetime.duration)
+    title_datetime = dvd.Title(duration=datetime.datetime(1, 1, 1, 0, 2, 0))
+    self.assertEqual(0, self.title.duration)
+    self.assertEqual(120, title_datetime.duration)
+    self.assertEqual(5400, dvd.Title(duration='01:30:00').duration)
+    self.assertEqual(5400, dvd.Title(duration=5400).duration)
     self.assertRaises(TypeError, dvd.Title, duration='00 00:00:00')
     self.assertRaises(TypeError, dvd.Title, duration=None)
 
@@ -347,6 +388,18 @@ class TestTitle(unittest.TestCase):
     self.assertEqual(len(self.title.chapters), 2)
     self.assertEqual(self.title.chapters[1].number, 2)
 
+  def testAddChapterSorted(self):
+    """Verifies chapters added one at a time are kept sorted and indexed."""
+    for number in (3, 1, 4, 2):
+      self.assertTrue(self.title.AddChapter(dvd.Chapter(number=number)))
+    self.assertEqual([chapter.number for chapter in self.title.chapters],
+                     [1, 2, 3, 4])
+    self.assertTrue(self.title.HasChapter(4))
+    self.assertFalse(self.title.HasChapter(5))
+    self.title.chapters = [dvd.Chapter(number=5)]
+    self.assertTrue(self.title.HasChapter(5))
+    self.assertFalse(self.title.HasChapter(4))
+
   def testAddAudioByObject(self):
     """Verifies adding a single Audio object to a Title object works."""
     audio = dvd.Audio(number=3)
@@ -431,6 +484,16 @@ class TestTitle(unittest.TestCase):
     self.assertEqual(len(self.title.subtitles), 2)
     self.assertEqual(self.title.subtitles[1].number, 2)
 
+  def testContentBlocks(self):
+    """Verifies spacer chapters are left out of a title's content."""
+    self.assertEqual(self.title.ContentBlocks(), ())
+    self.title.AddChapter(dvd.Chapter(0, 0, 5, '00:00:00', 1),
+                          dvd.Chapter(1, 2, 12166, '00:00:41', 2),
+                          dvd.Chapter(3, 3, dvd.SPACER_BLOCKS + 1,
+                                      '00:00:00', 3))
+    self.assertEqual(self.title.ContentBlocks(),
+                     (12166, dvd.SPACER_BLOCKS + 1))
+
   def testCompare(self):
     """Verifies two audio objects can be compared correctly."""
     title_one = dvd.Title(number=1)
@@ -492,80 +555,211 @@ class TestDvd(unittest.TestCase):
     title = self.dvd.GetTitle(1)
     self.assertEqual(title.number, 1)
 
-  def testProcessTitleSection(self):
-    """Verifies _ProcessTitleSection works correctly."""
-    log = handbrake_log.TitleSectionTestData()
-
-    self.assertEqual(
-        self.dvd._ProcessTitleSection(log.CHAPTER_LOG, dvd.Chapter),
-        [dvd.Chapter(*log.CHAPTER_ARGS)])
-
-    self.assertEqual(
-        self.dvd._ProcessTitleSection(log.AUDIO_LOG, dvd.Audio),
-        [dvd.Audio(*log.AUDIO_ARGS)])
-
-    self.assertEqual(
-        self.dvd._ProcessTitleSection(log.SUBTITLE_LOG, dvd.Subtitle),
-        [dvd.Subtitle(*log.SUBTITLE_ARGS)])
-
-    self.assertEqual(
-        self.dvd._ProcessTitleSection(['+  '], dvd.Chapter),
-        [])
+  def testGetTitleIndex(self):
+    """Verifies GetTitle finds titles however they were added."""
+    first = dvd.Title(number=2, cell_blocks=1)
+    self.assertTrue(self.dvd.AddTitle(dvd.Title(number=3), first))
+    self.assertTrue(self.dvd.AddTitle(dvd.Title(number=1)))
+    self.assertTrue(self.dvd.AddTitle(dvd.Title(number=2, cell_blocks=2)))
+    self.assertEqual([title.number for title in self.dvd.titles], [1, 2, 2, 3])
+    self.assertTrue(self.dvd.GetTitle(2) is first)
+    self.dvd.titles = [dvd.Title(number=7)]
+    self.assertEqual(self.dvd.GetTitle(7).number, 7)
+    self.assertRaises(dvd.TitleNotFoundError, self.dvd.GetTitle, 1)
 
-  def testParseVideoTileSetLine(self):
-    """Verifies _ParseVideoTileSetLine works correctly."""
+  def testFindDuplicates(self):
+    """Verifies alias and play all titles are found in the same vts only."""
+    def MakeTitle(video_tile_set, number, *blocks):
+      chapters = [dvd.Chapter(index, index, block, '00:00:00', index + 1)
+                  for index, block in enumerate(blocks)]
+      return dvd.Title(video_tile_set, number, chapters=chapters)
+    self.assertEqual(self.dvd.FindDuplicates(), {})
+    self.dvd.AddTitle(MakeTitle(1, 1, 500, 600, 5),
+                      MakeTitle(1, 2, 700, 5),
+                      MakeTitle(1, 3, 500, 600, 700, 5),
+                      MakeTitle(1, 4, 5, 700),
+                      MakeTitle(1, 5, 500, 600, 800),
+                      MakeTitle(2, 6, 500, 600),
+                      MakeTitle(2, 7, 5),
+                      MakeTitle(2, 8, 5))
+    self.assertEqual(self.dvd.FindDuplicates(), {3: [1, 2], 4: [2]})
+
+  def testClassifyVideoTileSetLine(self):
+    """Verifies _ClassifyLine extracts vts lines correctly."""
     log = handbrake_log.ParseVideoTileSetLineTestData()
-    results = self.dvd._ParseVideoTileSetLine(log.LINE)
-    self.assertEqual(log.TILE, results[0])
-    self.assertEqual(log.START, results[1])
-    self.assertEqual(log.END, results[2])
-    self.assertEqual(log.BLOCKS, results[3])
-
-  def testParseDurationLine(self):
-    """Verifies _ParseDurationLine works correctly."""
+    self.assertEqual(self.dvd._ClassifyLine(log.LINE),
+                     ('vts', {'video_tile_set': log.TILE,
+                              'cell_start': log.START, 'cell_end': log.END,
+                              'cell_blocks': log.BLOCKS}))
+
+  def testClassifyDurationLine(self):
+    """Verifies _ClassifyLine extracts duration lines correctly."""
     log = handbrake_log.ParseDurationLineTestData()
-    self.assertEqual(log.DURATION, self.dvd._ParseDurationLine(log.LINE))
+    self.assertEqual(self.dvd._ClassifyLine(log.LINE),
+                     ('duration', {'duration': log.DURATION}))
 
-  def testParseSizeLine(self):
-    """Verifies _ParseSizeLine works correctly."""
+  def testClassifySizeLine(self):
+    """Verifies _ClassifyLine extracts size lines correctly."""
     log = handbrake_log.ParseSizeLineTestData()
-    results = self.dvd._ParseSizeLine(log.LINE)
-    self.assertEqual(log.HORIZONTAL_SIZE, results[0])
-    self.assertEqual(log.VERTICAL_SIZE, results[1])
-    self.assertEqual(log.ASPECT, results[2])
-    self.assertEqual(log.FRAME_RATE, results[3])
-
-  def testParseAutoCropLine(self):
-    """Verifies _ParseAutoCropLine works correctly."""
+    expected = ('size', {'horizontal_size': log.HORIZONTAL_SIZE,
+                         'vertical_size': log.VERTICAL_SIZE,
+                         'aspect_ratio': log.ASPECT,
+                         'frame_rate': log.FRAME_RATE})
+    self.assertEqual(self.dvd._ClassifyLine(log.LINE), expected)
+    self.assertEqual(self.dvd._ClassifyLine(
+        '  + size: 720x480, pixel aspect: 32/27, display aspect: 1.78, '
+        '23.976 fps'), expected)
+
+  def testClassifyAutoCropLine(self):
+    """Verifies _ClassifyLine extracts autocrop lines correctly."""
     log = handbrake_log.ParseAutocropLineTestData()
-    results = self.dvd._ParseAutoCropLine(log.LINE)
-    self.assertEqual(log.TOP, results[0])
-    self.assertEqual(log.BOTTOM, results[1])
-    self.assertEqual(log.LEFT, results[2])
-    self.assertEqual(log.RIGHT, results[3])
-
-  def testExtractTitleFromLog(self):
-    """Verifies _ExtractLog works correctly."""
-    log = handbrake_log.ExtractTitleFromLogTestData()
-
-    title, chapter, audio, subtitle = self.dvd._ExtractTitleFromLog(log.log)
-    self.assertEqual(log.INDEXES, [chapter, audio, subtitle])
-    self.assertEqual(dvd.Title(*log.TITLE_ARGS), title)
-
-  def testProcessTitle(self):
-    """Verifies ProcessHandbrakeAnalysis works correctly."""
+    self.assertEqual(self.dvd._ClassifyLine(log.LINE),
+                     ('autocrop', {'autocrop_top': log.TOP,
+                                   'autocrop_bottom': log.BOTTOM,
+                                   'autocrop_left': log.LEFT,
+                                   'autocrop_right': log.RIGHT}))
+
+  def testClassifyLine(self):
+    """Verifies _ClassifyLine classifies lines without values correctly."""
+    for line, kind in [('+ title 12:', 'title'), ('  + chapters:', 'chapters'),
+                       ('  + audio tracks:', 'audio'),
+                       ('  + subtitle tracks:', 'subtitles'),
+                       ('  + combing detected, may be interlaced', 'combing'),
+                       ('  + angles: 2', 'title_other'),
+                       ('    + 1: anything', 'section'),
+                       ('Opening /tmp/dvd...', 'opening'),
+                       ('libdvdread: CHECK_VALUE failed', 'library'),
+                       ('HandBrake has exited.', 'other'), ('', 'other'),
+                       ('  + vts 1, unknown format', 'title_invalid'),
+                       ('  + duration: 0x:10:00', 'title_invalid'),
+                       ('   indented text', None)]:
+      self.assertEqual(self.dvd._ClassifyLine(line)[0], kind)
+    self.assertEqual(self.dvd._ClassifyLine('+ title 12:')[1], {'number': 12})
+
+  def testProcessHandbrakeLineUnrecognized(self):
+    """Verifies unrecognized title lines are counted and ignored."""
+    self.dvd.ProcessHandbrakeAnalysis([
+        '  + angles: 2', '+ title 1:', '  + angles: 2', '    + 1: angle one',
+        '  + duration: 00:00:05', '   indented text', 'HandBrake has exited.'])
+    self.assertEqual(self.dvd.diagnostics.unrecognized, 3)
+    self.assertEqual(self.dvd.diagnostics.lines, 7)
+    self.assertEqual(self.dvd.titles[0].duration, 5)
+    self.dvd.ProcessHandbrakeAnalysis([])
+    self.assertEqual(self.dvd.diagnostics.unrecognized, 0)
+    self.assertEqual(str(self.dvd.diagnostics),
+                     '0 lines, 0 skipped, 0 unrecognized')
+
+  def testProcessHandbrakeLineInvalidTitleLine(self):
+    """Verifies title information lines that can not be parsed are skipped."""
+    scan = ['+ title 1:', '  + duration: 0x:10:00', '  + size: 720x480',
+            '  + autocrop: 0/0/0/0', 'HandBrake has exited.']
+    self.assertRaises(dvd.InvalidHandbrakeLogLine,
+                      self.dvd.ProcessHandbrakeAnalysis, scan)
+    self.dvd.tolerant = True
+    self.dvd.ProcessHandbrakeAnalysis(scan)
+    self.assertEqual(self.dvd.titles[0].duration, 0)
+    self.assertEqual([(number, line) for number, line, reason in
+                      self.dvd.diagnostics.skipped],
+                     [(2, scan[1]), (3, scan[2])])
+    self.assertEqual(self.dvd.diagnostics.unrecognized, 0)
+
+  def testProcessHandbrakeLineTolerant(self):
+    """Verifies a tolerant scan skips bad lines and titles, recording them."""
+    scan = ['+ title 1:', '  + duration: 00:00:05', '  + chapters:',
+            '    + 1: cells 0->0, 10 blocks, duration 00:00:02',
+            'libdvdread: CHECK_VALUE failed in nav_read.c:268',
+            '    + 2: cells 1->1, blocks, duration 00:00:03',
+            '    + 3: cells 2->2, 30 blocks, duration 00:00:03',
+            '  + audio tracks:', '    + 1, English (AC3), 48000Hz',
+            '+ title 2:', '  + duration: 00:99:00',
+            '+ title 3:', '  + duration: 00:00:07', 'HandBrake has exited.']
+    self.assertRaises(dvd.InvalidHandbrakeLogLine,
+                      self.dvd.ProcessHandbrakeAnalysis, scan)
+    self.dvd.tolerant = True
+    self.dvd.ProcessHandbrakeAnalysis(scan)
+    self.assertEqual([title.number for title in self.dvd.titles], [1, 3])
+    title = self.dvd.GetTitle(1)
+    self.assertEqual([chapter.number for chapter in title.chapters], [1, 3])
+    self.assertEqual(title.audio, [])
+    skipped = self.dvd.diagnostics.skipped
+    self.assertEqual([(number, line) for number, line, reason in skipped],
+                     [(5, scan[4]), (6, scan[5]), (9, scan[8]),
+                      (10, '+ title 2:')])
+    self.assertEqual(skipped[0][2], 'Library message')
+    self.assertEqual(str(self.dvd.diagnostics),
+                     '14 lines, 4 skipped, 0 unrecognized')
+
+  def testProcessHandbrakeLine(self):
+    """Verifies ProcessHandbrakeLine builds a title from a title section."""
     log = handbrake_log.ExtractTitleFromLogTestData()
-    self.dvd._ProcessTitle(log.log)
-    self.assertEqual(len(self.dvd.titles[0].chapters), 21)
-    self.assertEqual(len(self.dvd.titles[0].audio), 4)
-    self.assertEqual(len(self.dvd.titles[0].subtitles), 4)
-
-  def testIndexHandbrakeLog(self):
-    """Verifies _IndexHandbrakeLog works correctly."""
-    log = handbrake_log.IndexHandbrakeLogTestData()
-    titles, dvd_name = self.dvd._IndexHandbrakeLog(log.log)
-    self.assertEqual(titles, log.TITLES)
-    self.assertEqual(dvd_name, log.NAME)
+    self.dvd.StartHandbrakeAnalysis()
+    for line in log.log:
+      self.dvd.ProcessHandbrakeLine(line)
+    self.assertEqual(len(self.dvd.titles), 0)
+    self.dvd.FinishHandbrakeAnalysis()
+    self.assertEqual(len(self.dvd.titles), 1)
+    title = self.dvd.titles[0]
+    expected = dvd.Title(*log.TITLE_ARGS)
+    for attribute in log.TITLE_ATTRIBUTES:
+      self.assertEqual(getattr(expected, attribute), getattr(title, attribute))
+    self.assertEqual(len(title.chapters), 21)
+    self.assertEqual(len(title.audio), 4)
+    self.assertEqual(len(title.subtitles), 4)
+    self.assertEqual(title.chapters[20].number, 21)
+    self.assertEqual(title.audio[3].format, '2.0 ch')
+    self.assertEqual(title.subtitles[2].iso_language, 'fra')
+
+  def testProcessHandbrakeLineSectionEnd(self):
+    """Verifies section lines outside of a section are ignored."""
+    self.dvd.StartHandbrakeAnalysis()
+    for line in ['+ title 2:', '  + chapters:',
+                 '    + 1: cells 0->0, 5 blocks, duration 00:00:01',
+                 'HandBrake has exited.',
+                 '    + 2: cells 1->1, 5 blocks, duration 00:00:01',
+                 '  + combing detected, may be interlaced or telecined']:
+      self.dvd.ProcessHandbrakeLine(line)
+    self.dvd.FinishHandbrakeAnalysis()
+    self.assertEqual(len(self.dvd.titles[0].chapters), 1)
+    self.assertTrue(self.dvd.titles[0].combining)
+
+  def testProcessHandbrakeLineLazy(self):
+    """Verifies title sections are only parsed when first used."""
+    lines = ['+ title 1:', '  + duration: 00:00:02', '  + chapters:',
+             '    + 2: cells 1->1, 5 blocks, duration 00:00:01',
+             '    + 1: cells 0->0, 5 blocks, duration 00:00:01',
+             '  + audio tracks:', '    + 1, bad audio line']
+    self.dvd.ProcessHandbrakeAnalysis(lines)
+    title = self.dvd.titles[0]
+    self.assertEqual(title.duration, 2)
+    self.assertRaises(dvd.InvalidHandbrakeLogLine, getattr, title, 'audio')
+    title.audio = []
+    self.assertTrue(title.HasChapter(2))
+    self.assertEqual([chapter.number for chapter in title.chapters], [1, 2])
+    self.assertEqual(title.audio, [])
+    eager = dvd.Dvd(lazy=False)
+    self.assertRaises(dvd.InvalidHandbrakeLogLine,
+                      eager.ProcessHandbrakeAnalysis, lines)
+
+  def testProcessHandbrakeLineTrusted(self):
+    """Verifies parsed objects match objects built by their constructors."""
+    lines = ['+ title 3:', '  + vts 2, ttn 1, cells 0->4 (1000 blocks)',
+             '  + duration: 00:01:40', '  + chapters:',
+             '    + 1: cells 0->4, 1000 blocks, duration 00:01:40',
+             '  + audio tracks:',
+             '    + 1, English (AC3) (2.0 ch), 48000Hz, 192000bps',
+             '  + subtitle tracks:', '    + 1, English (iso639-2: eng)']
+    self.dvd.ProcessHandbrakeAnalysis(lines)
+    title = self.dvd.titles[0]
+    expected = dvd.Title(video_tile_set=2, number=3, cell_end=4,
+                         cell_blocks=1000, duration='00:01:40')
+    expected.AddChapter(dvd.Chapter(0, 4, 1000, '00:01:40', 1))
+    expected.AddAudio(dvd.Audio())
+    expected.AddSubtitle(dvd.Subtitle())
+    self.assertEqual(repr(title), repr(expected))
+    strict = dvd.Dvd(strict=True)
+    self.assertRaises(dvd.InvalidHandbrakeLogLine,
+                      strict.ProcessHandbrakeAnalysis,
+                      ['+ title 1:', '  + vts 1, ttn 1, cells 4->0 (0 blocks)'])
 
   def testProcessHandbrakeAnalysis(self):
     """Verifies ProcessHandbrakeAnalysis works correctly."""
@@ -580,6 +774,15 @@ class TestDvd(unittest.TestCase):
       self.assertEqual(len(self.dvd.titles[x].subtitles),
                        log.DVD_SIGNATURE[x][2])
 
+  def testProcessHandbrakeAnalysisIterator(self):
+    """Verifies ProcessHandbrakeAnalysis consumes any iterator of lines."""
+    log = handbrake_log.IndexHandbrakeLogTestData()
+    self.dvd.ProcessHandbrakeAnalysis(line for line in log.log)
+    self.assertEqual(self.dvd.name, log.NAME)
+    self.assertEqual([title.number for title in self.dvd.titles], [1, 2, 3, 6])
+    self.dvd.ProcessHandbrakeAnalysis(['HandBrake has exited.\n'])
+    self.assertEqual(self.dvd.titles, [])
+
   def testDetermineDvdName(self):
     """Verifies _DetermineDvdName works correctly."""
     self.assertEqual(self.dvd._DetermineDvdName('Opening /tmp/ghosts/...'),
@@ -614,6 +817,38 @@ class TestIntegration(unittest.TestCase):
       file_handle.close()
       dvd_disc.ProcessHandbrakeAnalysis(log)
 
+  def testCompactObjects(self):
+    """Verifies parsed DVD objects have no __dict__, and can be pickled."""
+    dvd_disc = dvd.Dvd()
+    file_handle = open('./testdata/handbrake_dvd_logs/FIREFLY_D4_handbrake.log')
+    try:
+      dvd_disc.ProcessHandbrakeAnalysis(file_handle)
+    finally:
+      file_handle.close()
+    title = dvd_disc.titles[0]
+    for dvd_object in (title, title.chapters[0], title.audio[0],
+                       title.subtitles[0]):
+      self.assertFalse(hasattr(dvd_object, '__dict__'))
+      self.assertRaises(AttributeError, setattr, dvd_object, 'unknown', 1)
+    copy = cPickle.loads(cPickle.dumps(dvd_disc, cPickle.HIGHEST_PROTOCOL))
+    self.assertEqual(repr(copy), repr(dvd_disc))
+
+  def testFindDuplicates(self):
+    """Verifies duplicate titles are found on real DVD's."""
+    expected = {'ROAD_TO_GUANTANAMO': {12: [11], 14: [13]},
+                'SIMPSONS_SEASON5_DISC1': {14: [9, 10, 11, 12], 15: [13]},
+                'SIMPSONS_S11_D4': {},
+                'FIREFLY_D4': {}}
+    for name, duplicates in expected.items():
+      dvd_disc = dvd.Dvd()
+      file_handle = open('./testdata/handbrake_dvd_logs/%s_handbrake.log' %
+                         name)
+      try:
+        dvd_disc.ProcessHandbrakeAnalysis(file_handle)
+      finally:
+        file_handle.close()
+      self.assertEqual(dvd_disc.FindDuplicates(), duplicates)
+
 
 if __name__ == '__main__':
   unittest.main()
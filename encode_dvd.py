@@ -39,10 +39,22 @@ import datetime
 import logging
 import optparse
 import os
+import Queue
 import smtplib
 import sys
+import threading
+import time
 import abs_path
+import completion_store
+import episode_segmenter
 import handbrake
+import ifo_reader
+import job_queue
+import manifest
+import progress
+import scan_cache
+import source_walker
+import source_watcher
 
 
 class Error(Exception):
@@ -105,22 +117,27 @@ class EncodeDvdOptions(object):
         based on encoding settings.
 
   Logging (default: /var/log/encode-dvd):
-    full_encodes.log:
-      Contains a list of all the DVD directories automatically encoded
-      sucessfully.  This DOES NOT contain DVD's that were encoded specifically
-      with the --title option.  If you want to re-encode, delete DVD the line
-      from this file.
+    full_encodes.db:
+      SQLite database recording each title encoded, with the encoding options,
+      output file and encode time.  A DVD directory is only skipped once all of
+      its titles have been recorded; titles that fail are retried on the next
+      run.  Titles encoded with the --title option are recorded, but DO NOT
+      complete the DVD.  An existing full_encodes.log is imported when the
+      database is first created.
+      Scan and encode jobs in progress are also kept here, so an interrupted
+      run resumes where it stopped, without encoding finished titles again.
     encode_dvd.log:
       Log file containing detailed information on what encode DVD is doing.
       Generally used for tracking cronjob progress, or debugging encodes (Good
       for tracking down those DVD's that write all episodes as a single title.
-      See --title, --chapter-start, --chapter-end options).
+      See --title, --chapter-start, --chapter-end, --segment and --ranges
+      options).
 
   E-mail Notification:
     - Encode DVD will run slient with e-mail notification (cronjob safe) unless:
       1) Bad options are passed to it when run
       2) --list option is used
-      3) --title option is used
+      3) --title or --ranges option is used
 
   Watching a directory for new DVD rips to encode:
     - /home/user/bin/encode_job:
@@ -137,6 +154,10 @@ class EncodeDvdOptions(object):
         fi
      - Crontab:
          0 * * * * /home/user/bin/encode_job
+    - Or run Encode DVD as a daemon, watching the source directory (Linux):
+        ${ENCODE} --source "${SOURCE}" --destination "${OUTPUT}" \\
+          --email "${EMAIL}" --time ${MIN_TIME} --watch &
+      New rips are encoded once they have stopped changing for a minute.
   """ % (__version__, __author__)
 
   def __init__(self):
@@ -211,6 +232,40 @@ class EncodeDvdOptions(object):
         '--chapter-end.  This will force encoding, possibly causing unexpected '
         'handbrake failures.  Use if DVD is mis-reporting title and chapter '
         'indexes, but you know they exist.')
+    self.parser.add_option(
+        '-w', '--watch', action='store_true', dest='watch', default=False,
+        help='Run as a daemon, encoding DVD rips already in the source '
+        'directory, then watching it and encoding new rips once they have '
+        'finished copying.  Requires Linux inotify.  Cannot be used with '
+        '--list or --title.')
+    self.parser.add_option(
+        '-p', '--prescan', action='store_true', dest='prescan', default=False,
+        help='Read title information for --list from the DVD IFO files, '
+        'instead of scanning with handbrake.  Much faster, but autocrop, '
+        'combing and audio bit rates are not detected.  DVD images are still '
+        'scanned with handbrake.')
+    self.parser.add_option(
+        '-u', '--segment', action='store_true', dest='segment', default=False,
+        help='Split the --title into episodes, and encode each episode as its '
+        'own chapter range.  Episodes are found from chapters repeated in each '
+        'episode, such as title sequences or credits.  Useful for series DVDs '
+        'which hold all episodes in a single title.  --chapter-start and '
+        '--chapter-end are ignored.')
+    self.parser.add_option(
+        '-r', '--ranges', action='store', type='string', dest='ranges',
+        default=None, help='Encode a comma separated list of title chapter '
+        'ranges, each as title:start-end (for example 1:1-6,1:7-12,2:1-5), '
+        'instead of all titles for rip.  The ranges are checked against a '
+        'single scan of each DVD, and encoded at once.  Cannot be used with '
+        '--title.  --time option will be ignored.')
+    self.parser.add_option(
+        '-m', '--manifest', metavar='FILE', dest='manifest', default=None,
+        help='Encode the title encodes listed in a CSV or JSON manifest file, '
+        'with columns source, title, chapters (start-end), output and profile '
+        '(an alternative --config to encode with).  Only source and title are '
+        'required.  Each DVD is scanned once, and a single report is sent '
+        'when all jobs finish.  --source, --time, --title and --ranges are '
+        'ignored.')
 
 
 class EncodeDvdConfigParser(object):
@@ -248,7 +303,105 @@ class EncodeDvdConfigParser(object):
     if not self.parser.has_section('logging'):
       raise ConfigError('No logging options specified in config!')
 
-    return (self._GetHandbrakeObject(), self._InitializeLogging())
+    hb = self._GetHandbrakeObject()
+    self._InitializeCache(hb)
+    self._InitializeEncoding(hb)
+    return (hb, self._InitializeLogging())
+
+  def GetProfile(self, config):
+    """Loads the handbrake encoding options of another configuration file.
+
+    Only the handbrake section of the configuration file is used.
+
+    Args:
+      config: String location of config file to load, found as in
+        FindConfigFile.
+
+    Raises:
+      ConfigError: If there is an error processing the configuration file.
+
+    Returns:
+      handbrake_options.Options object with the configuration options set.
+    """
+    profile = EncodeDvdConfigParser()
+    try:
+      config_file = open(profile.FindConfigFile(config))
+      profile.parser.readfp(config_file)
+      config_file.close()
+    except (ConfigParser.Error, IOError), error:
+      raise ConfigError('Could not read configuration file: %s' % error)
+    if not profile.parser.has_section('handbrake'):
+      raise ConfigError('No handbrake encoding options specified in %s!' %
+                        config)
+    return profile._GetHandbrakeObject().options
+
+  def GetCacheDirectory(self):
+    """Determines the cache directory from a processed configuration file.
+
+    Raises:
+      ConfigError: If there is an error processing the configuration file.
+
+    Returns:
+      String full path to the cache directory, or None if caching between runs
+      is disabled.
+    """
+    if not self.parser.has_section('cache'):
+      return None
+    try:
+      directory = self.parser.get('cache', 'CACHE_DIRECTORY')
+    except ConfigParser.Error, error:
+      raise ConfigError('Failed to load config file: %s' % error)
+    return abs_path.AbsPath(directory)
+
+  def _InitializeCache(self, hb):
+    """Sets up the persistent caches used by a handbrake object.
+
+    Caching is optional, and is only enabled if the configuration file contains
+    a cache section.
+
+    Args:
+      hb: handbrake.HandBrake object to set up caches for.
+
+    Raises:
+      ConfigError: If there is an error processing the configuration file.
+    """
+    directory = self.GetCacheDirectory()
+    if not directory:
+      return
+    hb.scan_cache = scan_cache.ScanCache(os.path.join(directory, 'scans'))
+    hb.version_cache = scan_cache.VersionCache(
+        os.path.join(directory, 'versions'))
+
+  def _InitializeEncoding(self, hb):
+    """Sets up how a handbrake object schedules its encodes.
+
+    The encoding section is optional; without it titles are encoded one at a
+    time.
+
+    Args:
+      hb: handbrake.HandBrake object to set up encoding for.
+
+    Raises:
+      ConfigError: If there is an error processing the configuration file.
+    """
+    if not self.parser.has_section('encoding'):
+      return
+    try:
+      if self.parser.has_option('encoding', 'WORKERS'):
+        hb.workers = self.parser.getint('encoding', 'WORKERS')
+      if self.parser.has_option('encoding', 'SCAN_AHEAD'):
+        hb.scan_ahead = self.parser.getint('encoding', 'SCAN_AHEAD')
+      if self.parser.has_option('encoding', 'SKIP_DUPLICATES'):
+        hb.skip_duplicates = self.parser.getboolean('encoding',
+                                                    'SKIP_DUPLICATES')
+      if self.parser.has_option('encoding', 'TOLERANT_SCANS'):
+        hb.tolerant = self.parser.getboolean('encoding', 'TOLERANT_SCANS')
+    except (ConfigParser.Error, ValueError), error:
+      raise ConfigError('Failed to load config file: %s' % error)
+    if hb.workers < 1:
+      raise ConfigError('Encoding workers must be at least 1!')
+    if hb.scan_ahead < 0:
+      raise ConfigError('Encoding scan ahead must not be negative!')
 
   def _InitializeLogging(self):
     """Sets up logging for encode_dvd and determines full encodes log.
@@ -349,37 +502,29 @@ class DvdContainerGenerator(object):
 
   Attributes:
     sources: List containing valid DVD Containers found.
+    threads: Integer number of directories to search at once.
+    index: source_walker.DirectoryIndex of directories searched on earlier
+      runs, or None to search every directory.
   """
 
-  def __init__(self):
-    """Initialize DvdContainerGenerator."""
-    self.sources = []
-
-  def _DvdFilter(self, arg, dirname, fnames):
-    """Determines if a directory is a valid DVD container.
-
-    A directory is a valid DVD container, if a file exists in a given
-    directory called 'VIDEO_TS'.
-
-    Arguments are specified by os.path.walk.
+  def __init__(self, threads=source_walker.WALK_THREADS):
+    """Initialize DvdContainerGenerator.
 
     Args:
-      arg: List containing validated directories (This can be anything).
-      dirname: String the current directory.
-      fnames: List containing all current files in current directory.
+      threads: Integer number of directories to search at once.  Default
+        source_walker.WALK_THREADS.
     """
-    if 'VIDEO_TS' == os.path.basename(dirname).upper():
-      arg.append(abs_path.AbsPath(os.path.dirname(dirname)))
+    self.sources = []
+    self.threads = threads
+    self.index = None
 
   def GenerateDvdContainers(self, path):
     """Generates a list containing all valid source directories for encoding.
 
     A valid source directory is specified as a directory whose direct children
-    contain a VIDEO_TS directory.  Any directories that are skipped are logged
-    with an explanation as to why.
-
-    If logging is used, it will automatically remove DVD containers that have
-    already been processed.
+    contain a VIDEO_TS directory.  Valid source directories are not searched
+    further, and symlinked directories are only searched once.  With an index,
+    only directories that changed since the last search are listed.
 
     A list containing full paths of source directories to use for encoding is
     stored in self.sources.
@@ -387,8 +532,8 @@ class DvdContainerGenerator(object):
     Args:
       path: String path to the source directory to find containers.
     """
-    self.sources = []
-    os.path.walk(path, self._DvdFilter, self.sources)
+    self.sources = source_walker.SourceWalker(
+        self.threads, self.index).Walk(path)
 
 
 class Mail(object):
@@ -432,35 +577,50 @@ class EncodeDvd(object):
 
   Attributes:
     _log: An instantiated file object for logging.
-    _log_full: An instantiated file object for full file encodes.
-    _log_full_index: Dictionary containing in-memory list of full file encodes.
+    completions: completion_store.CompletionStore recording encoded titles.
+    jobs: job_queue.JobQueue recording scan and encode jobs in progress.
     parser: An instantiated EncodeDvdOptions parser object.
     config: An instantiated EncodeDvdConfigParser object.
     handbrake: handbrake.HandBrake object used for encoding.
     dvd_containers: An instantiated DvdContainerGenerator object to generate
       valid DVD Containers for a given source path.
     sources: List containing valid non-processed sources to process.
+    profiles: Dictionary mapping manifest profile names to the
+      handbrake_options.Options objects to encode their jobs with.
     mail: An instantiated Mail object to send notification e-mails.
     silent: Boolean True to repress printing to screen.
+    _progress_logged: Dictionary mapping (source, title) tuples to the Integer
+      percent of the encode last logged.
+    _stalled: Set of (source, title) tuples of encodes reported as stalled,
+      until they report progress again.
   """
+  PROGRESS_INTERVAL = 10
+  STALL_SECONDS = 900
+  STALL_POLL_SECONDS = 60
+  WATCH_POLL_SECONDS = 5
 
   def __init__(self):
     """Initalizes EncodeDvd."""
     self._log = None
-    self._log_full = None
-    self._log_full_index = {}
+    self.completions = None
+    self.jobs = None
     self.parser = EncodeDvdOptions().parser
     self.config = EncodeDvdConfigParser()
     self.handbrake = None
     self.dvd_containers = DvdContainerGenerator()
     self.sources = []
+    self.profiles = {}
     self.mail = None
     self.silent = False
+    self._progress_logged = {}
+    self._stalled = set()
 
   def __del__(self):
-    """Closes open file handles when EncodeDvd is stopped."""
-    if self._log_full:
-      self._log_full.close()
+    """Closes the completion store and job queue when EncodeDvd is stopped."""
+    if self.completions:
+      self.completions.Close()
+    if self.jobs:
+      self.jobs.Close()
 
   def _Log(self, message, critical=False):
     """Writes a log message to the log file as well as the screen.
@@ -490,27 +650,74 @@ class EncodeDvd(object):
       else:
         self._log.info(message)
 
-  def _InitializeFullLogging(self, full_log_file):
-    """Initializes full encodes log and internal list.
+  def _LogProgress(self, source, title, event):
+    """Logs encode progress every PROGRESS_INTERVAL percent of a title.
 
-    This should only be called in the _ProcessArguments method.
+    Args:
+      source: String source the title is encoded from.
+      title: Integer/String title being encoded.
+      event: progress.ProgressEvent for the title.
+    """
+    key = (source, title)
+    self._stalled.discard(key)
+    percent = int(event.TotalPercent()) // self.PROGRESS_INTERVAL
+    percent *= self.PROGRESS_INTERVAL
+    if percent != self._progress_logged.get(key):
+      self._progress_logged[key] = percent
+      self._Log('Title %s of %s: %s' % (title, source, event))
+    if self.jobs:
+      try:
+        self.jobs.Renew()
+      except job_queue.Error, error:
+        self._log.error(error)
+
+  def _CheckStalls(self, now=None):
+    """Logs running encodes that have stopped reporting progress.
+
+    Each stalled encode is logged once, until it reports progress again.
 
     Args:
-      full_log_file: String log to open.
+      now: Float current time.time().  Default now.
+    """
+    for tracker in self.handbrake.StalledEncodes(self.STALL_SECONDS, now):
+      key = (tracker.source, tracker.title)
+      if key not in self._stalled:
+        self._stalled.add(key)
+        self._Log('Title %s of %s has not reported progress in %s.' %
+                  (tracker.title, tracker.source,
+                   handbrake.dvd.FormatDuration(self.STALL_SECONDS)), True)
+
+  def _MonitorStalls(self):
+    """Checks for stalled encodes every STALL_POLL_SECONDS.
+
+    Runs on a background thread for the life of encode_dvd.
+    """
+    while True:
+      time.sleep(self.STALL_POLL_SECONDS)
+      self._CheckStalls()
+
+  def _InitializeCompletionStore(self, full_log_file):
+    """Initializes the store of encoded titles, and the job queue.
+
+    The store is kept next to the full encodes log, which is imported into the
+    store when the store is created.  The job queue shares the store's
+    database.  This should only be called in the _ProcessArguments method.
+
+    Args:
+      full_log_file: String full encodes log.
 
     Raises:
-      OptionProcessError: If the log file specified is incorrect.
+      OptionProcessError: If the store could not be opened.
     """
+    filename = '%s.db' % os.path.splitext(full_log_file)[0]
+    self.completions = completion_store.CompletionStore(filename, full_log_file)
+    self.jobs = job_queue.JobQueue(filename)
     try:
-      self._log_full = file(full_log_file, 'a+')
-    except IOError, error:
-      message = 'Could not open %s! %s' % (full_log_file, error)
-      self._log.error(message)
-      raise OptionProcessError(message)
-    self._log_full.seek(0)
-    for encoded_dvd in self._log_full.readlines():
-      encoded_dvd = encoded_dvd.strip()
-      self._log_full_index.setdefault(encoded_dvd, True)
+      self.completions.Open()
+      self.jobs.Open()
+    except (completion_store.Error, job_queue.Error), error:
+      self._log.error(error)
+      raise OptionProcessError(error)
 
   def _ProcessArguements(self):
     """Processes command line arguments and sets up internal variables.
@@ -518,10 +725,6 @@ class EncodeDvd(object):
     The configuration file is automatically scanned first, to pickup logging and
     handbrake configurations for encode_dvd.
 
-    file() is used in lue of open() for opening the full encodes log file, as a
-    bug exists in mox where open() is used internally in mox.  This causes mox
-    to fail horribly if open is mocked out for testing.
-
     Raises:
       OptionProcessError: If there is an error processing arguments.
 
@@ -531,29 +734,44 @@ class EncodeDvd(object):
     options = self.parser.parse_args()[0]
     self.handbrake, full = self.config.ProcessConfig(options.config)
     self._log = logging.getLogger('EncodeDvd')
-    self._InitializeFullLogging(full)
-
-    if not options.source:
+    self._InitializeCompletionStore(full)
+    cache_directory = self.config.GetCacheDirectory()
+    if cache_directory:
+      self.dvd_containers.index = source_walker.DirectoryIndex(
+          os.path.join(cache_directory, 'directories.index'))
+    self.handbrake.AddProgressCallback(self._LogProgress)
+
+    if not options.source and not options.manifest:
       self._log.critical('Source (%s) is None.' % options.source)
       raise OptionProcessError('Must specify source!')
-    options.source = abs_path.AbsPath(options.source)
+    if options.source:
+      options.source = abs_path.AbsPath(options.source)
     if not options.destination and not options.list:
       self._log.critical('Destination (%s) is None, list option not used.' %
                          options.destination)
       raise OptionProcessError('Must specify a destination if not using list!')
     if options.destination:
       options.destination = abs_path.AbsPath(options.destination)
+    if options.watch and (options.list or options.title or options.ranges):
+      self._log.critical('Watch option used with list, title or ranges option.')
+      raise OptionProcessError('Cannot watch with --list, --title or --ranges!')
+    if options.ranges and options.title:
+      self._log.critical('Ranges option used with title option.')
+      raise OptionProcessError('Cannot use --ranges with --title!')
+    if options.manifest and (options.list or options.watch):
+      self._log.critical('Manifest option used with list or watch option.')
+      raise OptionProcessError('Cannot use --manifest with --list or --watch!')
+    if options.segment and not options.title:
+      self._log.critical('Segment option used without title option.')
+      raise OptionProcessError('Must specify a title to segment!')
     self.mail = Mail(options.email)
     self.silent = options.quiet
-    if options.hard_subtitles:
-      self.handbrake.options.subtitles.SetValue(options.hard_subtitles)
-      self.handbrake.options.subtitles_if_forced.SetValue(False)
-      self.handbrake.options.subtitles_scan.SetValue(False)
-    else:
-      self.handbrake.options.subtitles.SetValue(None)
-      self.handbrake.options.subtitles_if_forced.SetValue(True)
-      self.handbrake.options.subtitles_scan.SetValue(True)
-    if options.title:
+    self._SetSubtitles(self.handbrake.options, options)
+    if options.manifest:
+      options.manifest = self._ReadManifest(options.manifest, options)
+    if options.ranges:
+      options.ranges = self._ParseRanges(options.ranges)
+    if options.title or options.ranges:
       options.time = 0
     else:
       options.chapter_start = None
@@ -563,30 +781,129 @@ class EncodeDvd(object):
         options.time = 120
     return options
 
+  def _SetSubtitles(self, handbrake_options, options):
+    """Sets the subtitle encoding options from the command line options.
+
+    Args:
+      handbrake_options: handbrake_options.Options object to set.
+      options: optparse.Values object containing options to use.
+    """
+    if options.hard_subtitles:
+      handbrake_options.subtitles.SetValue(options.hard_subtitles)
+      handbrake_options.subtitles_if_forced.SetValue(False)
+      handbrake_options.subtitles_scan.SetValue(False)
+    else:
+      handbrake_options.subtitles.SetValue(None)
+      handbrake_options.subtitles_if_forced.SetValue(True)
+      handbrake_options.subtitles_scan.SetValue(True)
+
+  def _ReadManifest(self, path, options):
+    """Reads the jobs of a manifest, and loads the profiles they encode with.
+
+    Profiles are stored in self.profiles, with the command line subtitle
+    options applied.
+
+    Args:
+      path: String path to the manifest file.
+      options: optparse.Values object containing options to use.
+
+    Raises:
+      OptionProcessError: If the manifest or a profile could not be read.
+
+    Returns:
+      List of manifest.ManifestJob objects.
+    """
+    try:
+      jobs = manifest.ReadManifest(abs_path.AbsPath(path))
+      for job in jobs:
+        if job.profile and job.profile not in self.profiles:
+          self.profiles[job.profile] = self.config.GetProfile(job.profile)
+          self._SetSubtitles(self.profiles[job.profile], options)
+    except (manifest.Error, ConfigError), error:
+      self._log.critical(error)
+      raise OptionProcessError(error)
+    if not jobs:
+      self._log.critical('Manifest %s contains no jobs.' % path)
+      raise OptionProcessError('Manifest contains no jobs!')
+    return jobs
+
+  def _ParseRanges(self, ranges):
+    """Parses a list of title chapter ranges.
+
+    Args:
+      ranges: String comma separated list of title:start-end ranges.
+
+    Raises:
+      OptionProcessError: If a range is not valid.
+
+    Returns:
+      List of (<int title>, <int start>, <int end>) tuples, in the order given.
+    """
+    parsed = []
+    for title_range in ranges.split(','):
+      try:
+        title, chapters = title_range.strip().split(':')
+        start, end = chapters.split('-')
+        parsed.append((int(title), int(start), int(end)))
+      except ValueError:
+        self._log.critical('Invalid title chapter range: %s' % title_range)
+        raise OptionProcessError(
+            'Ranges must be title:start-end, not %s!' % title_range)
+    return parsed
+
   def _GenerateValidSources(self, source_path):
     """Generates a list of valid sources found, and logs it.
 
     A valid source is any non-processed full path to a DVD container.  Valid
-    sources are stored in self.sources.
+    sources are stored in self.sources.  Sources with unfinished jobs from an
+    earlier run are resumed first, in the order they were queued.
 
     Args:
       source_path: String path to search for DVD containers.
+
+    Raises:
+      HandbrakeError: If the completion store or job queue could not be read.
     """
     self.sources = []
     self._log.info('Searching source directory %s (this may take a while) ...' %
                    source_path)
     self.dvd_containers.GenerateDvdContainers(source_path)
     self._log.info('VALID NON-PROCESSED SOURCES FOUND:')
-    for source in self.dvd_containers.sources:
-      if not self._log_full_index.get(source, False):
-        self._log.info(source)
-        self.sources.append(source)
+    try:
+      resumed = self.jobs.Sources()
+      for source in self.dvd_containers.sources:
+        if not self.completions.IsComplete(source):
+          self._log.info(source)
+          self.sources.append(source)
+    except (completion_store.Error, job_queue.Error), error:
+      self._log.critical(error)
+      raise HandbrakeError(error)
+    order = dict([(source, index) for index, source in enumerate(resumed)])
+    self.sources.sort(key=lambda source: order.get(source, len(order)))
+
+  def _PreScan(self, dvd):
+    """Reads a DVD's titles from its IFO files, without using handbrake.
 
-  def _GenerateDvdTitleList(self, source_path):
+    Args:
+      dvd: String full path to the DVD source.
+
+    Returns:
+      dvd.Dvd object for the source, or None if its IFO files could not be
+      read (DVD images have none).
+    """
+    try:
+      return ifo_reader.IfoReader(dvd).Read()
+    except ifo_reader.Error, error:
+      self._log.debug(error)
+      return None
+
+  def _GenerateDvdTitleList(self, source_path, prescan=False):
     """Generates a formatted list of all the title information for given Dvd's.
 
     Args:
       source_path: String path to search for DVD containers.
+      prescan: Boolean True to read title information from IFO files where
+        possible, instead of scanning with handbrake.  Default False.
 
     Raises:
       HandbrakeError: If error ocurred while using handbrake binary.
@@ -594,45 +911,133 @@ class EncodeDvd(object):
     self._Log('Generating DVD list from %s (this may take a while) ...' %
               source_path)
     self.dvd_containers.GenerateDvdContainers(source_path)
+    sources = self.dvd_containers.sources
+    if prescan:
+      sources = []
+      for dvd in self.dvd_containers.sources:
+        scanned = self._PreScan(dvd)
+        if scanned:
+          self._LogDvdTitles(dvd, scanned)
+        else:
+          sources.append(dvd)
+      if not sources:
+        return
     try:
       self.handbrake.Connect()
     except handbrake.Error, error:
       self._log.critical(error)
       raise HandbrakeError(error)
-    for dvd in self.dvd_containers.sources:
+    for dvd in handbrake.ScanPrefetcher(self.handbrake, sources,
+                                        self.handbrake.scan_ahead):
       try:
         self.handbrake.GetDvdInformation(dvd)
       except handbrake.Error, error:
         self._log.critical(error)
         raise HandbrakeError(error)
-      self._Log(['-'*80, dvd, '-'*80])
-      self._Log('DVD Name: %s' % self.handbrake.dvd.name)
-      for title in self.handbrake.dvd.titles:
-        self._Log('%s Title %s:' % (self.handbrake.dvd.name, title.number))
-        self._Log('  Video Tile Set: %s' % title.video_tile_set)
-        self._Log('  Title cell start: %s' % title.cell_start)
-        self._Log('  Title cell end: %s' % title.cell_end)
-        self._Log('  Title cell blocks: %s' % title.cell_blocks)
-        self._Log('  Horizontal Size: %s' % title.horizontal_size)
-        self._Log('  Vertical Size: %s' % title.vertical_size)
-        self._Log(
-            '  Autocrop estimate (Top, Bottom, Left, Right): %s:%s:%s:%s' %
-            (title.autocrop_top, title.autocrop_bottom,
-             title.autocrop_left, title.autocrop_right))
-        self._Log('  Aspect Ratio: %s' % title.aspect_ratio)
-        self._Log('  Frame Rate: %s' % title.frame_rate)
-        self._Log('  Chapters:')
-        for chapter in title.chapters:
-          self._Log('    %s' % chapter)
-        self._Log('  Audio Tracks:')
-        for audio in title.audio:
-          self._Log('    %s' % audio)
-        self._Log('  Subtitles:')
-        for subtitle in title.subtitles:
-          self._Log('    %s' % subtitle)
+      self._LogScanDiagnostics(dvd)
+      self._LogDvdTitles(dvd, self.handbrake.dvd)
+
+  def _LogScanDiagnostics(self, source):
+    """Logs the lines skipped by a tolerant scan of the current DVD.
+
+    Args:
+      source: String full path to the DVD source.
+    """
+    diagnostics = self.handbrake.dvd.diagnostics
+    if not diagnostics.skipped:
+      return
+    self._log.warning('Scan of %s skipped lines (%s):' % (source, diagnostics))
+    for line_number, line, reason in diagnostics.skipped:
+      self._log.warning('  line %s: %s (%s)' % (line_number, line, reason))
+
+  def _LogDvdTitles(self, source, scanned):
+    """Logs the title information for a DVD.
+
+    Args:
+      source: String full path to the DVD source.
+      scanned: dvd.Dvd object for the source.
+    """
+    self._Log(['-'*80, source, '-'*80])
+    self._Log('DVD Name: %s' % scanned.name)
+    for title in scanned.titles:
+      self._Log('%s Title %s:' % (scanned.name, title.number))
+      self._Log('  Video Tile Set: %s' % title.video_tile_set)
+      self._Log('  Title cell start: %s' % title.cell_start)
+      self._Log('  Title cell end: %s' % title.cell_end)
+      self._Log('  Title cell blocks: %s' % title.cell_blocks)
+      self._Log('  Horizontal Size: %s' % title.horizontal_size)
+      self._Log('  Vertical Size: %s' % title.vertical_size)
+      self._Log(
+          '  Autocrop estimate (Top, Bottom, Left, Right): %s:%s:%s:%s' %
+          (title.autocrop_top, title.autocrop_bottom,
+           title.autocrop_left, title.autocrop_right))
+      self._Log('  Aspect Ratio: %s' % title.aspect_ratio)
+      self._Log('  Frame Rate: %s' % title.frame_rate)
+      try:
+        title.ParseHandbrakeSections()
+      except handbrake.dvd.Error, error:
+        self._Log('  Sections not parsed: %s' % error, True)
+        continue
+      self._Log('  Chapters:')
+      for chapter in title.chapters:
+        self._Log('    %s' % chapter)
+      self._Log('  Audio Tracks:')
+      for audio in title.audio:
+        self._Log('    %s' % audio)
+      self._Log('  Subtitles:')
+      for subtitle in title.subtitles:
+        self._Log('    %s' % subtitle)
+
+  def _CustomRanges(self, options):
+    """Determines the title chapter ranges to encode for the scanned DVD.
+
+    Every range is checked against the scan before any range is encoded.
+
+    Args:
+      options: optparse.Values object containing options to use.
+
+    Returns:
+      List of (<int title>, <int start>, <int end>) tuples to encode, or None
+      if a title or chapter was not found in the DVD, or could not be parsed.
+    """
+    dvd_name = self.handbrake.dvd.name
+    requested = options.ranges or [
+        (options.title, options.chapter_start, options.chapter_end)]
+    ranges = []
+    for title_number, start, end in requested:
+      try:
+        title = self.handbrake.dvd.GetTitle(title_number)
+        title.ParseHandbrakeSections()
+      except handbrake.dvd.TitleNotFoundError, error:
+        self._Log('Title %s not found in %s' % (title_number, dvd_name), True)
+        return None
+      except handbrake.dvd.Error, error:
+        self._Log('Title %s of %s not parsed: %s' %
+                  (title_number, dvd_name, error), True)
+        return None
+      if options.segment:
+        episodes = episode_segmenter.EpisodeSegmenter().Segment(title)
+        self._Log('Found %s episodes in %s Title %s.' %
+                  (len(episodes), dvd_name, title.number))
+        ranges.extend([(title.number, start, end) for start, end in episodes])
+        continue
+      if not title.HasChapter(start) and not options.ignore:
+        self._Log('Chapter start %s not found in %s - Title %s' %
+                  (start, dvd_name, title.number), True)
+        return None
+      if not title.HasChapter(end) and not options.ignore:
+        self._Log('Chapter end %s not found in %s - Title %s' %
+                  (end, dvd_name, title.number), True)
+        return None
+      ranges.append((title.number, start, end))
+    return ranges
 
   def _ProcessCustomTitles(self, options):
-    """Processes DVDs using custom title start/end options.
+    """Processes DVDs using custom title start/end or ranges options.
+
+    With the segment option, the title is split into episodes instead, and
+    each episode is encoded as its own chapter range.  Chapter ranges are
+    encoded on an encode pool, so all ranges from a single scan encode at once.
 
     Args:
       options: optparse.Values object containing options to use.
@@ -646,50 +1051,409 @@ class EncodeDvd(object):
     except handbrake.Error, error:
       self._log.critical(error)
       raise HandbrakeError(error)
-    for dvd in self.dvd_containers.sources:
+    pool = handbrake.EncodePool(self.handbrake, self.handbrake.workers)
+    submitted = []
+    for dvd in handbrake.ScanPrefetcher(self.handbrake,
+                                        self.dvd_containers.sources,
+                                        self.handbrake.scan_ahead):
       try:
         self.handbrake.GetDvdInformation(dvd)
       except handbrake.Error, error:
         self._log.critical(error)
-        raise HandbrakeError(error)
+        self._AbortPool(pool, error)
+      self._LogScanDiagnostics(dvd)
       dvd_name = self.handbrake.dvd.name
-      start = options.chapter_start
-      end = options.chapter_end
-      try:
-        title = self.handbrake.dvd.GetTitle(options.title)
-      except handbrake.dvd.TitleNotFoundError, error:
-        self._Log('Title %s not found in %s' % (options.title, dvd_name), True)
-        break
-      if start not in title.chapters and not options.ignore:
-        self._Log('Chapter start %s not found in %s - Title %s' %
-                  (start, dvd_name, title.number), True)
+      ranges = self._CustomRanges(options)
+      if ranges is None:
         break
-      if end not in title.chapters and not options.ignore:
-        self._Log('Chapter end %s not found in %s - Title %s' %
-                  (end, dvd_name, title.number), True)
-        break
-      self._Log('Processing %s Title %s from Chapters %s to %s ...' %
-                (dvd_name, title.number, start, end))
-      output_file = ('%s%s [Title %s] [Chapters %s-%s].%s' %
-                     (options.destination, dvd_name, title.number, start, end,
-                      self.handbrake.options.file_format.value))
-      try:
-        success, execution_time, title, log = (
-            self.handbrake.Encode(dvd, output_file, title.number, start, end))
-      except handbrake.Error, error:
-        raise HandbrakeError(error)
+      for title, start, end in ranges:
+        self._Log('Processing %s Title %s from Chapters %s to %s ...' %
+                  (dvd_name, title, start, end))
+        output_file = ('%s%s [Title %s] [Chapters %s-%s].%s' %
+                       (options.destination, dvd_name, title, start, end,
+                        self.handbrake.options.file_format.value))
+        try:
+          position = pool.Submit(dvd, output_file, title, start, end)
+        except handbrake.Error, error:
+          self._AbortPool(pool, error)
+        submitted.append((position, (dvd, output_file, title, start, end)))
+    try:
+      results = pool.Join()
+    except handbrake.Error, error:
+      raise HandbrakeError(error)
+    for position, job in submitted:
+      result = results[position]
+      self._RecordTitle(job[0], result, job, '%s-%s' % job[3:])
+      self.completions.Commit()
+      success, execution_time, title, log = result
       if not success:
         log.insert(0, 'Encoding Failed:')
         self._Log(log, True)
       else:
         message = [
             'Processed successfully in %s.' % str(execution_time).split('.')[0],
-            'Encoded to: %s' % output_file]
+            'Encoded to: %s' % job[1]]
         self._Log(message)
 
+  def _CheckManifestJob(self, job, options):
+    """Checks a manifest job against the scan of its DVD.
+
+    Args:
+      job: manifest.ManifestJob to check.
+      options: optparse.Values object containing options to use.
+
+    Returns:
+      String describing why the job cannot be encoded, or None if it can.
+    """
+    try:
+      title = self.handbrake.dvd.GetTitle(job.title)
+      title.ParseHandbrakeSections()
+    except handbrake.dvd.TitleNotFoundError:
+      return 'Title %s not found in %s' % (job.title, self.handbrake.dvd.name)
+    except handbrake.dvd.Error, error:
+      return 'Title %s of %s not parsed: %s' % (
+          job.title, self.handbrake.dvd.name, error)
+    if job.start is None or options.ignore:
+      return None
+    for chapter in (job.start, job.end):
+      if not title.HasChapter(chapter):
+        return 'Chapter %s not found in %s - Title %s' % (
+            chapter, self.handbrake.dvd.name, title.number)
+    return None
+
+  def _SubmitManifestJob(self, pool, job, destination):
+    """Submits a manifest job to an encode pool with the job's profile.
+
+    Args:
+      pool: handbrake.EncodePool to submit the job to.
+      job: manifest.ManifestJob to submit.
+      destination: String full path to the output directory.
+
+    Raises:
+      handbrake.Error: If the job could not be encoded.
+
+    Returns:
+      Tuple (<Integer position>, <tuple pool job>, <String fingerprint>).
+    """
+    default = self.handbrake.options
+    if job.profile:
+      self.handbrake.options = self.profiles[job.profile]
+    try:
+      extension = self.handbrake.options.file_format.value
+      if job.output:
+        output_file = os.path.join(destination, job.output)
+        if not os.path.splitext(job.output)[1]:
+          output_file = '%s.%s' % (output_file, extension)
+      elif job.start is None:
+        output_file = '%s%s [Title %s].%s' % (
+            destination, self.handbrake.dvd.name, job.title, extension)
+      else:
+        output_file = '%s%s [Title %s] [Chapters %s-%s].%s' % (
+            destination, self.handbrake.dvd.name, job.title, job.start,
+            job.end, extension)
+      pool_job = (job.source, output_file, job.title)
+      if job.start is not None:
+        pool_job += (job.start, job.end)
+      fingerprint = self.handbrake.OptionsFingerprint()
+      position = pool.Submit(*pool_job)
+    finally:
+      self.handbrake.options = default
+    return (position, pool_job, fingerprint)
+
+  def _ProcessManifest(self, options):
+    """Processes the title encodes listed in a manifest.
+
+    Jobs are grouped by DVD source, so each DVD is scanned once, and all jobs
+    are encoded on a single encode pool.  Jobs that cannot be encoded (their
+    DVD could not be scanned, their title or chapters were not found, or their
+    encode could not be started) are reported as failed without stopping the
+    other jobs.  A single report of
+    every job is logged and mailed once all jobs have finished.
+
+    Args:
+      options: optparse.Values object containing options to use.
+
+    Raises:
+      HandbrakeError: If error ocurred while using handbrake binary.
+    """
+    self.silent = True
+    jobs = options.manifest
+    groups = manifest.GroupBySource(jobs)
+    self._Log('Processing %s manifest jobs from %s DVDs ...' %
+              (len(jobs), len(groups)))
+    try:
+      self.handbrake.Connect()
+    except handbrake.Error, error:
+      self._log.critical(error)
+      raise HandbrakeError(error)
+    pool = handbrake.EncodePool(self.handbrake, self.handbrake.workers)
+    grouped = dict(groups)
+    submitted = {}
+    failures = {}
+    for dvd in handbrake.ScanPrefetcher(self.handbrake,
+                                        [source for source, ignored in groups],
+                                        self.handbrake.scan_ahead):
+      try:
+        self.handbrake.GetDvdInformation(dvd)
+      except handbrake.Error, error:
+        self._log.critical(error)
+        for job in grouped[dvd]:
+          failures[job] = 'Scan failed: %s' % error
+        continue
+      self._LogScanDiagnostics(dvd)
+      for job in grouped[dvd]:
+        failure = self._CheckManifestJob(job, options)
+        if failure:
+          failures[job] = failure
+          continue
+        try:
+          submitted[job] = self._SubmitManifestJob(pool, job,
+                                                   options.destination)
+        except handbrake.Error, error:
+          self._log.critical(error)
+          failures[job] = 'Encode failed: %s' % error
+    try:
+      results = pool.Join()
+    except handbrake.Error, error:
+      raise HandbrakeError(error)
+    report = []
+    failed = 0
+    total_time = 0
+    for job in jobs:
+      if job in failures:
+        failed += 1
+        report.append('Job %s: %s Title %s failed: %s' %
+                      (job.line, job.source, job.title, failures[job]))
+        continue
+      position, pool_job, fingerprint = submitted[job]
+      result = results[position]
+      chapters = ''
+      if job.start is not None:
+        chapters = '%s-%s' % (job.start, job.end)
+      self._RecordTitle(job.source, result, pool_job, chapters, fingerprint)
+      success, execution_time, title, log = result
+      if success:
+        total_time += self._Seconds(execution_time)
+        report.append('Job %s: Encoded to %s in %s.' %
+                      (job.line, pool_job[1],
+                       str(execution_time).split('.')[0]))
+      else:
+        failed += 1
+        report.append('Job %s: %s Title %s failed to encode:' %
+                      (job.line, job.source, job.title))
+        report.extend(log)
+    try:
+      self.completions.Commit()
+    except completion_store.Error, error:
+      self._log.critical(error)
+      raise HandbrakeError(error)
+    report.insert(0, 'Manifest results for %s jobs, %s failed. (Total time: %s)'
+                  % (len(jobs), failed,
+                     handbrake.dvd.FormatDuration(total_time)))
+    self._Log(report)
+    self.mail.SendMail('Manifest of %s jobs finished.' % len(jobs),
+                       '\n'.join(report))
+
+  def _Seconds(self, execution_time):
+    """Returns a datetime.timedelta as a Float number of seconds."""
+    return (execution_time.days * 86400 + execution_time.seconds +
+            execution_time.microseconds / 1000000.0)
+
+  def _RecordTitle(self, dvd, result, job, chapters='', fingerprint=None):
+    """Records the result of a title encode in the completion store.
+
+    Args:
+      dvd: String full path to the DVD source.
+      result: Tuple encode result, in the form returned by
+        handbrake.HandBrake.Encode.
+      job: Tuple (source, output, title[, start, end]) the title was encoded
+        with, or None if the title was not submitted for encoding.
+      chapters: String chapter range encoded.  Default '' (all chapters).
+      fingerprint: String fingerprint of the options the title was encoded
+        with.  Default None (the current handbrake options).
+
+    Raises:
+      HandbrakeError: If the title could not be recorded.
+
+    Returns:
+      String state the title was recorded with.
+    """
+    success, execution_time, title, log = result
+    state = completion_store.STATE_SKIPPED
+    seconds = None
+    output = None
+    if job:
+      state = completion_store.STATE_FAILED
+      output = job[1]
+    if success:
+      state = completion_store.STATE_DONE
+      seconds = self._Seconds(execution_time)
+    if fingerprint is None:
+      fingerprint = self.handbrake.OptionsFingerprint()
+    try:
+      self.completions.RecordTitle(
+          dvd, title, state, chapters, fingerprint, output, seconds)
+    except completion_store.Error, error:
+      self._log.critical(error)
+      raise HandbrakeError(error)
+    return state
+
+  def _ReportDvd(self, dvd, results, overall_results, jobs=None):
+    """Records, logs and mails the encode results for a DVD.
+
+    The DVD is marked complete in the completion store once all of its title
+    results are recorded, unless a title failed to encode.  The jobs of a
+    complete DVD are removed from the job queue.
+
+    Args:
+      dvd: String full path to the DVD source.
+      results: List of encode results for the DVD's titles, in the form
+        returned by handbrake.HandBrake.Encode.
+      overall_results: List of Strings to add a summary of the DVD to.
+      jobs: List of job tuples each result was encoded with, as returned by
+        handbrake.EncodePool.GetJob.  Default None (unknown).
+
+    Raises:
+      HandbrakeError: If the results could not be recorded.
+    """
+    email_results = ['\n']
+    total_time = 0
+    failed = False
+    if jobs is None:
+      jobs = [None] * len(results)
+    for result, job in zip(results, jobs):
+      success, execution_time, title, log = result
+      if self._RecordTitle(dvd, result, job) == completion_store.STATE_FAILED:
+        failed = True
+      if success:
+        total_time += self._Seconds(execution_time)
+        email_results.append('Processed title %s successfully in %s.' %
+                             (title, str(execution_time).split('.')[0]))
+      else:
+        email_results.append('Title %s failed to encode:' % title)
+        email_results.extend(log)
+      email_results.append('---')
+    try:
+      if failed:
+        self.completions.Commit()
+      else:
+        self.completions.MarkComplete(dvd)
+        self.jobs.Remove(dvd)
+    except (completion_store.Error, job_queue.Error), error:
+      self._log.critical(error)
+      raise HandbrakeError(error)
+    email_results.insert(0, 'Encode results for %s. (Total time: %s)' %
+                         (dvd, handbrake.dvd.FormatDuration(total_time)))
+    overall_results.append('Process time: %s, Source: %s' %
+                           (handbrake.dvd.FormatDuration(total_time), dvd))
+    self._Log(email_results)
+    self.mail.SendMail('Encode finished for %s' % dvd,
+                       '\n'.join(email_results))
+
+  def _ReportFinishedDvds(self, pool, queued, overall_results):
+    """Reports the results of each queued DVD that has finished encoding.
+
+    Args:
+      pool: handbrake.EncodePool the DVD's titles were submitted to.
+      queued: List of (<String dvd>, <list positions>) tuples for DVD's that
+        have not been reported, in the order they were queued.
+      overall_results: List of Strings to add a summary of each DVD to.
+
+    Returns:
+      List of (<String dvd>, <list positions>) tuples still encoding.
+    """
+    remaining = []
+    for dvd, positions in queued:
+      results = pool.Collect(positions)
+      if results is None:
+        remaining.append((dvd, positions))
+      else:
+        self._ReportDvd(dvd, results, overall_results,
+                        [pool.GetJob(position) for position in positions])
+    return remaining
+
+  def _ResumeTitle(self, dvd, title, output_file):
+    """Resumes a title encoded by an earlier run, or queues it for encoding.
+
+    Args:
+      dvd: String full path to the DVD source.
+      title: Integer title number.
+      output_file: String full path to the title's output file.
+
+    Raises:
+      handbrake.Error: If the job queue could not be used.
+
+    Returns:
+      Tuple encode result, in the form returned by handbrake.HandBrake.Encode,
+      if the title was already encoded to output_file; otherwise None.
+    """
+    try:
+      job = self.jobs.GetJob(job_queue.KIND_ENCODE, dvd, title)
+      if (job and job[0] == job_queue.STATE_DONE and job[1] == output_file and
+          os.path.exists(output_file)):
+        self._Log('Resuming %s title %s, already encoded to %s.' %
+                  (dvd, title, output_file))
+        return (True, datetime.timedelta(seconds=job[2] or 0), title,
+                ['Resumed: already encoded to %s' % output_file])
+      self.jobs.Add(job_queue.KIND_ENCODE, dvd, title, output=output_file)
+    except job_queue.Error, error:
+      raise handbrake.Error(error)
+    return None
+
+  def _TrackJob(self, job, result):
+    """Records encode jobs starting and finishing in the job queue.
+
+    Called by the encode pool from the thread encoding the job.
+
+    Args:
+      job: Tuple (source, output, title[, start, end]) of the job.
+      result: Tuple encode result of the job, or None if it is starting.
+
+    Raises:
+      handbrake.Error: If the job queue could not be updated.
+    """
+    source, output, title = job[:3]
+    try:
+      if result is None:
+        self.jobs.Start(job_queue.KIND_ENCODE, source, title, output=output)
+      else:
+        success, execution_time, title, log = result
+        self.jobs.Finish(job_queue.KIND_ENCODE, source, title, success=success,
+                         seconds=self._Seconds(execution_time))
+    except job_queue.Error, error:
+      raise handbrake.Error(error)
+
+  def _AbortPool(self, pool, error):
+    """Stops queued encodes, and waits for running encodes to finish.
+
+    Args:
+      pool: handbrake.EncodePool to abort.
+      error: Error that caused the abort.
+
+    Raises:
+      HandbrakeError: Always, with the given error.
+    """
+    pool.Cancel()
+    try:
+      pool.Join()
+    except handbrake.Error:
+      pass
+    raise HandbrakeError(error)
+
   def _ProcessTitles(self, options):
     """Processes DVD Titles in given directory, according to time limit.
 
+    Titles from every DVD are queued on a single encode pool, which encodes the
+    most expensive titles first.  Each DVD is reported once all of its titles
+    have been encoded.
+
+    DVD's whose IFO files show no title as long as the time limit are reported
+    without being scanned by handbrake.
+
+    Scans and encodes are recorded in the job queue as they start and finish.
+    Jobs left running by a run that died are recovered first, and titles it
+    finished encoding are resumed instead of being encoded again.
+
     Args:
       options: optparse.Values object containing options to use.
 
@@ -698,51 +1462,147 @@ class EncodeDvd(object):
     """
     self.silent = True
     overall_results = []
-    limit = datetime.datetime(1, 1, 1)+datetime.timedelta(seconds=options.time)
+    queued = []
+    limit = options.time
     self._Log('Processing titles (this will take a while) ...')
     try:
       self.handbrake.Connect()
     except handbrake.Error, error:
       self._log.critical(error)
       raise HandbrakeError(error)
+    try:
+      recovered = self.jobs.Recover()
+      for dvd in self.sources:
+        self.jobs.Add(job_queue.KIND_SCAN, dvd)
+    except job_queue.Error, error:
+      self._log.critical(error)
+      raise HandbrakeError(error)
+    if recovered:
+      self._Log('Recovered %s jobs from an earlier run.' % recovered)
+    pool = handbrake.EncodePool(self.handbrake, self.handbrake.workers)
+    pool.AddCallback(self._TrackJob)
+    sources = []
     for dvd in self.sources:
-      email_results = ['\n']
+      scanned = self._PreScan(dvd)
+      if scanned and not [title for title in scanned.titles
+                          if title.duration >= limit]:
+        self._Log('Skipping %s, no titles as long as %s.' %
+                  (scanned.name, handbrake.dvd.FormatDuration(limit)))
+        queued.append((dvd, [
+            pool.AddResult(self.handbrake.SkipResult(title, limit))
+            for title in scanned.titles]))
+      else:
+        sources.append(dvd)
+    queued = self._ReportFinishedDvds(pool, queued, overall_results)
+    for dvd in handbrake.ScanPrefetcher(self.handbrake, sources,
+                                        self.handbrake.scan_ahead):
       try:
-        self.handbrake.GetDvdInformation(dvd)
-      except handbrake.Error, error:
+        self.jobs.Start(job_queue.KIND_SCAN, dvd)
+        try:
+          self.handbrake.GetDvdInformation(dvd)
+        except handbrake.Error:
+          self.jobs.Finish(job_queue.KIND_SCAN, dvd, success=False)
+          raise
+        self.jobs.Finish(job_queue.KIND_SCAN, dvd)
+        self._LogScanDiagnostics(dvd)
+      except (handbrake.Error, job_queue.Error), error:
         self._log.critical(error)
-        raise HandbrakeError(error)
+        self._AbortPool(pool, error)
       self._Log('Encoding %s ...' % self.handbrake.dvd.name)
       try:
-        results = self.handbrake.EncodeAll(dvd, options.destination, limit)
+        queued.append((dvd, self.handbrake.SubmitAll(
+            pool, dvd, options.destination, limit, self._ResumeTitle)))
       except handbrake.Error, error:
-        raise HandbrakeError(error)
-      total_time = datetime.datetime(1, 1, 1)
-      for success, execution_time, title, log in results:
-        if success:
-          total_time += execution_time
-          email_results.append('Processed title %s successfully in %s.' %
-                               (title, str(execution_time).split('.')[0]))
-          if dvd not in self._log_full_index:
-            self._log_full.write('%s\n' % dvd)
-            self._log_full_index.setdefault(dvd, True)
-        else:
-          email_results.append('Title %s failed to encode:' % title)
-          email_results.extend(log)
-        email_results.append('---')
-      email_results.insert(0, 'Encode results for %s. (Total time: %s)' %
-                           (dvd, str(total_time.time()).split('.')[0]))
-      overall_results.append('Process time: %s, Source: %s' %
-                             (str(total_time.time()).split('.')[0], dvd))
-      self._Log(email_results)
-      self.mail.SendMail('Encode finished for %s' % dvd,
-                         '\n'.join(email_results))
+        self._AbortPool(pool, error)
+      queued = self._ReportFinishedDvds(pool, queued, overall_results)
+    try:
+      pool.Join()
+    except handbrake.Error, error:
+      raise HandbrakeError(error)
+    self._ReportFinishedDvds(pool, queued, overall_results)
     self._Log('Processing %s jobs Completed.' % len(overall_results))
     if overall_results:
       self.mail.SendMail(
           'Encoding %s jobs finished.' % len(self.sources),
           '\n'.join(overall_results))
 
+  def _Watch(self, watcher, arrived):
+    """Queues DVD containers as they finish changing in the watched source.
+
+    Runs on a background thread until watching fails.  Each ready source is
+    added to the job queue, so it is resumed if encode_dvd is restarted.
+
+    Args:
+      watcher: source_watcher.SourceWatcher watching the source directory.
+      arrived: Queue.Queue to put String ready sources on.  None is put once
+        watching stops.
+    """
+    try:
+      try:
+        while True:
+          watcher.Poll(self.WATCH_POLL_SECONDS)
+          for source in watcher.Ready():
+            self.jobs.Add(job_queue.KIND_SCAN, source)
+            self._log.info('New source ready: %s' % source)
+            arrived.put(source)
+      except (source_watcher.Error, job_queue.Error, OSError), error:
+        self._log.critical('Stopped watching %s: %s' % (watcher.root, error))
+    finally:
+      arrived.put(None)
+
+  def _WatchSources(self, options):
+    """Encodes DVD containers in the source directory as they arrive.
+
+    Existing sources are encoded first.  New sources are then encoded in
+    batches, as they finish changing.  Encoding and completion store errors
+    are logged, and do not stop watching.
+
+    Args:
+      options: optparse.Values object containing options to use.
+
+    Raises:
+      OptionProcessError: If the source directory could not be watched.
+    """
+    watcher = source_watcher.SourceWatcher(options.source)
+    try:
+      watcher.Start()
+    except source_watcher.Error, error:
+      self._log.critical(error)
+      raise OptionProcessError(error)
+    arrived = Queue.Queue()
+    thread = threading.Thread(target=self._Watch, args=(watcher, arrived))
+    thread.setDaemon(True)
+    thread.start()
+    try:
+      try:
+        self._GenerateValidSources(options.source)
+      except HandbrakeError, error:
+        self._log.critical('Searching stopped, still watching: %s' % error)
+      while True:
+        if self.sources:
+          try:
+            self._ProcessTitles(options)
+          except HandbrakeError, error:
+            self._log.critical('Encoding stopped, still watching: %s' % error)
+        sources = [arrived.get()]
+        while not arrived.empty():
+          sources.append(arrived.get())
+        if None in sources:
+          return
+        self.sources = []
+        for source in sources:
+          if source in self.sources:
+            continue
+          try:
+            if self.completions.IsComplete(source):
+              continue
+          except completion_store.Error, error:
+            self._log.critical('Could not check %s, encoding it: %s' %
+                               (source, error))
+          self.sources.append(source)
+    finally:
+      watcher.Close()
+
   def Execute(self):
     """Excutes encode_dvd.
 
@@ -752,11 +1612,18 @@ class EncodeDvd(object):
     options = self._ProcessArguements()
     self._log.info('Encode DVD version %s by %s started.' %
                    (__version__, __author__))
+    thread = threading.Thread(target=self._MonitorStalls)
+    thread.setDaemon(True)
+    thread.start()
     if options.list:
-      self._GenerateDvdTitleList(options.source)
+      self._GenerateDvdTitleList(options.source, options.prescan)
+    elif options.watch:
+      self._WatchSources(options)
+    elif options.manifest:
+      self._ProcessManifest(options)
     else:
       self._GenerateValidSources(options.source)
-      if options.title:
+      if options.title or options.ranges:
         self._ProcessCustomTitles(options)
       else:
         self._ProcessTitles(options)
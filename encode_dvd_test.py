@@ -36,8 +36,12 @@ __author__ = 'Robert M. Pufky (robert.pufky@gmail.com)'
 import datetime
 import optparse
 import os
+import shutil
 import smtplib
 import sys
+import tempfile
+import threading
+import time
 import unittest
 import abs_path
 import dvd
@@ -83,6 +87,9 @@ class MockLogger(object):
   def info(self, message):
     pass
 
+  def warning(self, message):
+    pass
+
 
 class MockOptions(object):
   """Mock options class for testing.
@@ -227,6 +234,68 @@ class TestEncodeDvdConfigProcessConfig(BaseEncodeDvdHelperTest):
     self.assertEqual(hb.options.subtitles_if_forced.value, True)
     self.assertEqual(hb.options.subtitles_native_language.value, 'eng')
     self.assertEqual(log, '/var/log/encode-dvd/full_encodes.log')
+    self.assertEqual(hb.scan_cache.directory, '/var/cache/encode-dvd/scans')
+    self.assertEqual(hb.version_cache.directory,
+                     '/var/cache/encode-dvd/versions')
+    self.assertEqual(hb.scan_ahead, 1)
+    self.assertEqual(hb.workers, 1)
+    self.assertEqual(hb.tolerant, True)
+
+  def testNoCacheSection(self):
+    """Verifies scans are only cached in memory without a cache section."""
+    hb = encode_dvd.handbrake.HandBrake()
+    self.config._InitializeCache(hb)
+    self.assertEqual(hb.scan_cache.directory, None)
+    self.assertEqual(hb.version_cache.directory, None)
+    self.assertEqual(self.config.GetCacheDirectory(), None)
+
+  def testEncodingSection(self):
+    """Verifies the number of encode workers is read from the config."""
+    hb = encode_dvd.handbrake.HandBrake()
+    self.config._InitializeEncoding(hb)
+    self.assertEqual(hb.workers, 1)
+    self.assertEqual(hb.scan_ahead, 1)
+    self.config.parser.add_section('encoding')
+    self.config.parser.set('encoding', 'WORKERS', '3')
+    self.config._InitializeEncoding(hb)
+    self.assertEqual(hb.workers, 3)
+    self.config.parser.set('encoding', 'WORKERS', '0')
+    self.assertRaises(encode_dvd.ConfigError,
+                      self.config._InitializeEncoding, hb)
+    self.config.parser.set('encoding', 'WORKERS', 'many')
+    self.assertRaises(encode_dvd.ConfigError,
+                      self.config._InitializeEncoding, hb)
+    self.config.parser.set('encoding', 'WORKERS', '1')
+    self.config.parser.set('encoding', 'SCAN_AHEAD', '2')
+    self.config._InitializeEncoding(hb)
+    self.assertEqual(hb.scan_ahead, 2)
+    self.config.parser.set('encoding', 'SCAN_AHEAD', '-1')
+    self.assertRaises(encode_dvd.ConfigError,
+                      self.config._InitializeEncoding, hb)
+    self.config.parser.set('encoding', 'SCAN_AHEAD', '1')
+    self.assertEqual(hb.skip_duplicates, False)
+    self.config.parser.set('encoding', 'SKIP_DUPLICATES', 'True')
+    self.config._InitializeEncoding(hb)
+    self.assertEqual(hb.skip_duplicates, True)
+    self.config.parser.set('encoding', 'SKIP_DUPLICATES', 'sometimes')
+    self.assertRaises(encode_dvd.ConfigError,
+                      self.config._InitializeEncoding, hb)
+    self.config.parser.set('encoding', 'SKIP_DUPLICATES', 'False')
+    self.assertEqual(hb.tolerant, False)
+    self.config.parser.set('encoding', 'TOLERANT_SCANS', 'True')
+    self.config._InitializeEncoding(hb)
+    self.assertEqual(hb.tolerant, True)
+
+  def testGetProfile(self):
+    """Verifies a profile loads only the handbrake options of a config."""
+    options = self.config.GetProfile(
+        './testdata/config_test_data/encode_dvd.config')
+    self.assertEqual(options.file_format.value, 'mp4')
+    self.assertEqual(options.video_bitrate.value, 1800)
+    self.assertFalse(self.config.parser.has_section('handbrake'))
+    self.assertRaises(
+        encode_dvd.ConfigError, self.config.GetProfile,
+        './testdata/config_test_data/encode_dvd_bad_handbrake_section.config')
 
   def testBadFile(self):
     """Verifies a file read error fails properly."""
@@ -264,33 +333,17 @@ class TestDvdContainerGenerator(BaseEncodeDvdHelperTest):
     BaseEncodeDvdHelperTest.setUp(self)
     self.generator = encode_dvd.DvdContainerGenerator()
 
-  def testDvdFilterNoMatch(self):
-    """Verifies the DVD filter with no match works properly."""
-    encode_dvd.os.path.basename('video_ts').AndReturn('')
-    self.mox.ReplayAll()
-    self.generator._DvdFilter([], 'video_ts', '')
-    self.mox.VerifyAll()
-
-  def testDvdFilterMatch(self):
-    """Verifies the DVD filter with match works properly."""
-    test_arg = []
-    encode_dvd.os.path.basename('/tmp/video_ts').AndReturn('video_ts')
-    encode_dvd.os.path.dirname('/tmp/video_ts').AndReturn('/tmp/')
-    encode_dvd.abs_path.AbsPath('/tmp/').AndReturn('/tmp/')
-    self.mox.ReplayAll()
-    self.generator._DvdFilter(test_arg, '/tmp/video_ts', '')
-    self.assertEqual(test_arg, ['/tmp/'])
-    self.mox.VerifyAll()
-
   def testGenerateDvdContainers(self):
     """Verifies GenerateDvdContainers works properly."""
-    encode_dvd.os.path.walk(
-        '/tmp/',
-        mox.IsA(encode_dvd.DvdContainerGenerator._DvdFilter),
-        mox.IsA(list))
+    self.mox.StubOutWithMock(encode_dvd.source_walker, 'SourceWalker')
+    walker = self.mox.CreateMock(encode_dvd.source_walker.SourceWalker)
+    encode_dvd.source_walker.SourceWalker(
+        encode_dvd.source_walker.WALK_THREADS, None).AndReturn(walker)
+    walker.Walk('/tmp/').AndReturn(['/tmp/dvd/'])
     self.mox.ReplayAll()
     self.generator.GenerateDvdContainers('/tmp/')
     self.mox.VerifyAll()
+    self.assertEqual(self.generator.sources, ['/tmp/dvd/'])
 
 
 class TestMail(BaseEncodeDvdHelperTest):
@@ -347,6 +400,11 @@ class BaseEncodeDvdTest(unittest.TestCase):
     setattr(self.options, 'quiet', False)
     setattr(self.options, 'config', 'encode_dvd.config')
     setattr(self.options, 'list', False)
+    setattr(self.options, 'watch', False)
+    setattr(self.options, 'prescan', False)
+    setattr(self.options, 'segment', False)
+    setattr(self.options, 'ranges', None)
+    setattr(self.options, 'manifest', None)
     self.real_logging = encode_dvd.logging
     self.real_abs_path = encode_dvd.abs_path
     encode_dvd.logging = self.mox.CreateMock(encode_dvd.logging)
@@ -360,6 +418,7 @@ class BaseEncodeDvdTest(unittest.TestCase):
     self.encode.config = self.mox.CreateMock(encode_dvd.EncodeDvdConfigParser)
     self.encode.dvd_containers = self.mox.CreateMock(
         encode_dvd.DvdContainerGenerator)
+    self.encode.profiles = {}
     self.mox.StubOutWithMock(self.encode, '__del__')
 
   def tearDown(self):
@@ -368,60 +427,45 @@ class BaseEncodeDvdTest(unittest.TestCase):
     encode_dvd.abs_path = self.real_abs_path
 
 
-class EncodeDvdInitalizeFullLoggingTest(BaseEncodeDvdTest):
-  """Verifies _InitializeFullLogging works properly."""
+class EncodeDvdInitializeCompletionStoreTest(BaseEncodeDvdTest):
+  """Verifies _InitializeCompletionStore works properly."""
 
   def setUp(self):
     BaseEncodeDvdTest.setUp(self)
-    self.mock_log_file = self.mox.CreateMockAnything()
-    self.real_modules = sys.modules['__builtin__'].file
-    sys.modules['__builtin__'].file = self.mox.CreateMockAnything()
-    self.encode._log_full_index = {}
+    self.directory = tempfile.mkdtemp()
+    self.full_log = os.path.join(self.directory, 'full_encodes.log')
     self.encode._log = self.mox.CreateMockAnything()
 
   def tearDown(self):
     BaseEncodeDvdTest.tearDown(self)
-    sys.modules['__builtin__'].file = self.real_modules
-
-  def GenericFileSetup(self, error_file=False):
-    """Generic file handle test setup.
-
-    Args:
-      error_file: Boolean True to raise a IOError when opening full log.
-    """
-    if error_file:
-      sys.modules['__builtin__'].file('file', 'a+').AndRaise(IOError)
-    else:
-      sys.modules['__builtin__'].file('file', 'a+').AndReturn(
-          self.mock_log_file)
-
-  def testInitializeFullLoggingValid(self):
-    """Verifies a InitializeFullLogging works properly."""
-    self.GenericFileSetup(error_file=False)
-    self.mock_log_file.seek(0)
-    self.mock_log_file.readlines().AndReturn(['ac\n', 'ab\n'])
+    if self.encode.completions:
+      self.encode.completions.Close()
+      self.encode.jobs.Close()
+    shutil.rmtree(self.directory)
+
+  def testInitializeCompletionStore(self):
+    """Verifies the store is created, importing the full encodes log."""
+    full_log = open(self.full_log, 'w')
+    full_log.write('ac\nab\nab\n')
+    full_log.close()
     self.mox.ReplayAll()
-    self.encode._InitializeFullLogging('file')
-    self.assertEqual(self.encode._log_full_index, {'ac': True, 'ab': True})
+    self.encode._InitializeCompletionStore(self.full_log)
     self.mox.VerifyAll()
-
-  def testInitializeFullLoggingRemoveDuplicates(self):
-    """Verifies duplicate DVD sources are removed properly."""
-    self.GenericFileSetup(error_file=False)
-    self.mock_log_file.seek(0)
-    self.mock_log_file.readlines().AndReturn(['ac\n', 'ab\n', 'ab\n'])
-    self.mox.ReplayAll()
-    self.encode._InitializeFullLogging('file')
-    self.assertEqual(self.encode._log_full_index, {'ac': True, 'ab': True})
-    self.mox.VerifyAll()
-
-  def testInitializeFullLoggingError(self):
-    """Verifies IOError is handled properly."""
-    self.GenericFileSetup(error_file=True)
-    self.encode._log.error('Could not open file! ')
+    self.assertEqual(self.encode.completions.filename,
+                     os.path.join(self.directory, 'full_encodes.db'))
+    self.assertTrue(self.encode.completions.IsComplete('ab'))
+    self.assertTrue(self.encode.completions.IsComplete('ac'))
+    self.assertFalse(self.encode.completions.IsComplete('ad'))
+    self.assertEqual(self.encode.jobs.filename,
+                     self.encode.completions.filename)
+
+  def testInitializeCompletionStoreError(self):
+    """Verifies a store that cannot be opened is handled properly."""
+    self.full_log = os.path.join(self.directory, 'missing', 'full.log')
+    self.encode._log.error(mox.IsA(encode_dvd.completion_store.Error))
     self.mox.ReplayAll()
     self.assertRaises(encode_dvd.OptionProcessError,
-                      self.encode._InitializeFullLogging, 'file')
+                      self.encode._InitializeCompletionStore, self.full_log)
     self.mox.VerifyAll()
 
 
@@ -433,8 +477,9 @@ class EncodeDvdProcessArguementsTest(BaseEncodeDvdTest):
     self.encode.config.ProcessConfig('encode_dvd.config').AndReturn(
         (encode_dvd.handbrake.HandBrake(), 'file'))
     encode_dvd.logging.getLogger('EncodeDvd').AndReturn(MockLogger())
-    self.mox.StubOutWithMock(self.encode, '_InitializeFullLogging')
-    self.encode._InitializeFullLogging('file')
+    self.mox.StubOutWithMock(self.encode, '_InitializeCompletionStore')
+    self.encode._InitializeCompletionStore('file')
+    self.encode.config.GetCacheDirectory().AndReturn(None)
 
   def GenericProcessArguementsSetup(self, error_file=False, source=True,
                                     destination=True):
@@ -477,6 +522,28 @@ class EncodeDvdProcessArguementsTest(BaseEncodeDvdTest):
     self.encode._ProcessArguements()
     self.mox.VerifyAll()
 
+  def testWatchWithList(self):
+    """Verifies watching cannot be combined with listing."""
+    setattr(self.options, 'source', True)
+    setattr(self.options, 'list', True)
+    setattr(self.options, 'watch', True)
+    self.GenericProcessArguementsSetup(source=True, destination=False)
+    self.mox.ReplayAll()
+    self.assertRaises(encode_dvd.OptionProcessError,
+                      self.encode._ProcessArguements)
+    self.mox.VerifyAll()
+
+  def testSegmentWithoutTitle(self):
+    """Verifies segmenting requires a title."""
+    setattr(self.options, 'source', True)
+    setattr(self.options, 'destination', True)
+    setattr(self.options, 'segment', True)
+    self.GenericProcessArguementsSetup()
+    self.mox.ReplayAll()
+    self.assertRaises(encode_dvd.OptionProcessError,
+                      self.encode._ProcessArguements)
+    self.mox.VerifyAll()
+
   def testMailOptions(self):
     """Verifies a mail option is set correctly."""
     setattr(self.options, 'source', True)
@@ -530,6 +597,73 @@ class EncodeDvdProcessArguementsTest(BaseEncodeDvdTest):
     self.assertEqual(options.time, 0)
     self.mox.VerifyAll()
 
+  def testRanges(self):
+    """Verifies a ranges option is parsed into title chapter ranges."""
+    setattr(self.options, 'source', True)
+    setattr(self.options, 'destination', True)
+    setattr(self.options, 'ranges', '1:1-6, 1:7-12,2:1-5')
+    self.GenericProcessArguementsSetup()
+    self.mox.ReplayAll()
+    options = self.encode._ProcessArguements()
+    self.assertEqual(options.ranges, [(1, 1, 6), (1, 7, 12), (2, 1, 5)])
+    self.assertEqual(options.time, 0)
+    self.mox.VerifyAll()
+
+  def testBadRanges(self):
+    """Verifies invalid ranges are handled properly."""
+    self.encode._log = MockLogger()
+    for ranges in ['1:1-6,2', '1:1-a', '1-6', '1:1-2-3']:
+      self.assertRaises(encode_dvd.OptionProcessError,
+                        self.encode._ParseRanges, ranges)
+
+  def testRangesWithTitle(self):
+    """Verifies ranges cannot be combined with a title."""
+    setattr(self.options, 'source', True)
+    setattr(self.options, 'destination', True)
+    setattr(self.options, 'title', 3)
+    setattr(self.options, 'ranges', '1:1-6')
+    self.GenericProcessArguementsSetup()
+    self.mox.ReplayAll()
+    self.assertRaises(encode_dvd.OptionProcessError,
+                      self.encode._ProcessArguements)
+    self.mox.VerifyAll()
+
+  def testManifest(self):
+    """Verifies a manifest is read, loading each profile once."""
+    setattr(self.options, 'destination', True)
+    setattr(self.options, 'hard_subtitles', 2)
+    path = os.path.join(tempfile.mkdtemp(), 'jobs.csv')
+    manifest_file = open(path, 'w')
+    manifest_file.write('source,title,profile\n/a,1,ipod\n/b,2,ipod\n/a,3,\n')
+    manifest_file.close()
+    setattr(self.options, 'manifest', path)
+    self.GenericProcessArguementsSetup(source=False)
+    encode_dvd.abs_path.AbsPath(path).AndReturn(path)
+    profile = encode_dvd.handbrake.handbrake_options.Options()
+    self.encode.config.GetProfile('ipod').AndReturn(profile)
+    self.mox.ReplayAll()
+    try:
+      options = self.encode._ProcessArguements()
+    finally:
+      shutil.rmtree(os.path.dirname(path))
+    self.mox.VerifyAll()
+    self.assertEqual([(job.title, job.profile) for job in options.manifest],
+                     [(1, 'ipod'), (2, 'ipod'), (3, None)])
+    self.assertEqual(self.encode.profiles, {'ipod': profile})
+    self.assertEqual(profile.subtitles.value, 2)
+
+  def testBadManifest(self):
+    """Verifies a manifest that cannot be read is handled properly."""
+    setattr(self.options, 'destination', True)
+    setattr(self.options, 'manifest', '/does/not/exist.csv')
+    self.GenericProcessArguementsSetup(source=False)
+    encode_dvd.abs_path.AbsPath('/does/not/exist.csv').AndReturn(
+        '/does/not/exist.csv')
+    self.mox.ReplayAll()
+    self.assertRaises(encode_dvd.OptionProcessError,
+                      self.encode._ProcessArguements)
+    self.mox.VerifyAll()
+
   def testNoTitle(self):
     """Verifies no title option specified sets options properly."""
     setattr(self.options, 'source', True)
@@ -557,23 +691,34 @@ class EncodeDvdTest(unittest.TestCase):
     setattr(self.options, 'destination', '/tmp/')
     setattr(self.options, 'time', 120)
     setattr(self.options, 'ignore', False)
+    setattr(self.options, 'segment', False)
+    setattr(self.options, 'ranges', None)
+    setattr(self.options, 'manifest', None)
     self.encode = encode_dvd.EncodeDvd()
     self.encode.silent = True
     self.encode._log = MockLogger()
-    self.encode._log_full = self.mox.CreateMockAnything()
+    self.encode.completions = encode_dvd.completion_store.CompletionStore(
+        ':memory:')
+    self.encode.jobs = encode_dvd.job_queue.JobQueue(':memory:')
     self.encode.parser = MockParser()
     self.encode.config = self.mox.CreateMock(encode_dvd.EncodeDvdConfigParser)
     self.mox.StubOutWithMock(self.encode, 'dvd_containers')
     self.mox.StubOutWithMock(self.encode, '__del__')
     self.mox.StubOutWithMock(self.encode, 'handbrake')
+    self.encode.handbrake.scan_ahead = 0
+    self.encode.handbrake.workers = 1
+    self.encode.handbrake.OptionsFingerprint = lambda: 'options'
     self.encode.mail = encode_dvd.Mail()
 
   def tearDown(self):
     self.mox.UnsetStubs()
+    self.encode.completions.Close()
+    self.encode.jobs.Close()
 
   def testGenerateValidSources(self):
     """Verifies a source list is generated properly."""
-    self.encode._log_full_index = {'ab': True, 'ac': True}
+    self.encode.completions.MarkComplete('ab')
+    self.encode.completions.MarkComplete('ac')
     self.encode.dvd_containers.sources = ['af']
     self.encode.dvd_containers.GenerateDvdContainers('path')
     self.mox.ReplayAll()
@@ -582,7 +727,8 @@ class EncodeDvdTest(unittest.TestCase):
 
   def testGenerateValidSourcesWithDeletes(self):
     """Verifies source list is generated with pre-processed titles removed."""
-    self.encode._log_full_index = {'ab': True, 'ac': True}
+    self.encode.completions.MarkComplete('ab')
+    self.encode.completions.MarkComplete('ac')
     self.encode.dvd_containers.sources = ['af', 'ac']
     self.encode.dvd_containers.GenerateDvdContainers('path')
     self.mox.ReplayAll()
@@ -590,12 +736,211 @@ class EncodeDvdTest(unittest.TestCase):
     self.assertEqual(self.encode.sources, ['af'])
     self.mox.VerifyAll()
 
+  def testGenerateValidSourcesResumed(self):
+    """Verifies sources with unfinished jobs are resumed first."""
+    self.encode.jobs.Add(encode_dvd.job_queue.KIND_SCAN, 'ag')
+    self.encode.jobs.Add(encode_dvd.job_queue.KIND_SCAN, 'ae')
+    self.encode.dvd_containers.sources = ['ad', 'ae', 'af', 'ag']
+    self.encode.dvd_containers.GenerateDvdContainers('path')
+    self.mox.ReplayAll()
+    self.encode._GenerateValidSources('path')
+    self.assertEqual(self.encode.sources, ['ag', 'ae', 'ad', 'af'])
+    self.mox.VerifyAll()
+
+  def testResumeTitle(self):
+    """Verifies only titles encoded to an existing output are resumed."""
+    output = os.path.abspath(__file__)
+    self.assertEqual(self.encode._ResumeTitle('/my', 1, output), None)
+    self.assertEqual(
+        self.encode.jobs.GetJob(encode_dvd.job_queue.KIND_ENCODE, '/my', 1),
+        ('pending', output, None))
+    self.encode._TrackJob(('/my', output, 1), None)
+    self.assertEqual(self.encode._ResumeTitle('/my', 1, output), None)
+    self.encode._TrackJob(('/my', output, 1),
+                          (True, datetime.timedelta(0, 7), 1, []))
+    self.assertEqual(self.encode._ResumeTitle('/my', 1, output),
+                     (True, datetime.timedelta(0, 7), 1,
+                      ['Resumed: already encoded to %s' % output]))
+    self.assertEqual(self.encode._ResumeTitle('/my', 1, '/missing.mp4'), None)
+
+  def testResumeCrashedTitle(self):
+    """Verifies a title cut off by a crash is queued to be encoded again."""
+    output = os.path.join(tempfile.gettempdir(), 'crashed-1.mp4')
+    self.encode._ResumeTitle('/my', 1, output)
+    self.encode._TrackJob(('/my', output, 1), None)
+    self.assertEqual(self.encode.jobs.Recover(time.time() + 3600), 1)
+    self.assertEqual(self.encode._ResumeTitle('/my', 1, output), None)
+    self.assertEqual(
+        self.encode.jobs.GetJob(encode_dvd.job_queue.KIND_ENCODE, '/my', 1),
+        ('pending', output, None))
+
+  def testTrackJob(self):
+    """Verifies failed encodes are recorded in the job queue."""
+    self.encode._TrackJob(('/my', '/out.mp4', 2, 1, 3), None)
+    self.assertEqual(
+        self.encode.jobs.GetJob(encode_dvd.job_queue.KIND_ENCODE, '/my', 2),
+        ('running', '/out.mp4', None))
+    self.encode._TrackJob(('/my', '/out.mp4', 2, 1, 3),
+                          (False, datetime.timedelta(0, 1), 2, ['error']))
+    self.assertEqual(
+        self.encode.jobs.GetJob(encode_dvd.job_queue.KIND_ENCODE, '/my', 2),
+        ('failed', '/out.mp4', 1.0))
+
+  def testTrackJobExistingOutput(self):
+    """Verifies an existing output file is recorded as already encoded."""
+    source = tempfile.gettempdir()
+    output = tempfile.NamedTemporaryFile(suffix='.mp4')
+    pool = encode_dvd.handbrake.EncodePool(encode_dvd.handbrake.HandBrake())
+    pool.AddCallback(self.encode._TrackJob)
+    position = pool.Submit(source, output.name, 1)
+    self.assertEqual(
+        self.encode.jobs.GetJob(encode_dvd.job_queue.KIND_ENCODE, source, 1),
+        ('done', output.name, 0.0))
+    self.encode.mail.SendMail = lambda subject, body: None
+    self.encode._ReportDvd(source, pool.Join(), [], [pool.GetJob(position)])
+    self.assertTrue(self.encode.completions.IsComplete(source))
+
+  def testWatch(self):
+    """Verifies ready sources are queued until watching fails."""
+    class FakeWatcher(object):
+      root = '/src'
+      def __init__(watcher):
+        watcher.polls = 0
+      def Poll(watcher, timeout):
+        watcher.polls += 1
+        if watcher.polls > 2:
+          raise encode_dvd.source_watcher.Error('gone')
+      def Ready(watcher):
+        return ['/src/dvd%s/' % watcher.polls]
+    arrived = encode_dvd.Queue.Queue()
+    self.encode._Watch(FakeWatcher(), arrived)
+    self.assertEqual([arrived.get() for unused in range(3)],
+                     ['/src/dvd1/', '/src/dvd2/', None])
+    self.assertEqual(self.encode.jobs.Sources(), ['/src/dvd1/', '/src/dvd2/'])
+
+  def testWatchSources(self):
+    """Verifies existing and arriving sources are encoded in batches."""
+    class FakeWatcher(object):
+      def __init__(watcher, root):
+        watcher.root = root
+      def Start(watcher):
+        pass
+      def Close(watcher):
+        watcher.root = None
+    self.mox.StubOutWithMock(encode_dvd.source_watcher, 'SourceWatcher')
+    encode_dvd.source_watcher.SourceWatcher('/src').AndReturn(
+        FakeWatcher('/src'))
+    arrived = encode_dvd.Queue.Queue()
+    for source in ['/src/new/', '/src/done/', '/src/new/']:
+      arrived.put(source)
+    self.mox.stubs.Set(encode_dvd.Queue, 'Queue', lambda: arrived)
+    encoded = threading.Event()
+    def Watch(watcher, queue):
+      encoded.wait(5)
+      queue.put(None)
+    self.encode._Watch = Watch
+    self.encode.completions.MarkComplete('/src/done/')
+    self.encode.dvd_containers.sources = ['/src/old/']
+    self.encode.dvd_containers.GenerateDvdContainers('/src')
+    batches = []
+    def ProcessTitles(options):
+      batches.append(list(self.encode.sources))
+      if len(batches) == 1:
+        raise encode_dvd.HandbrakeError('bad dvd')
+      encoded.set()
+    self.encode._ProcessTitles = ProcessTitles
+    self.options.source = '/src'
+    self.mox.ReplayAll()
+    self.encode._WatchSources(self.options)
+    self.mox.VerifyAll()
+    self.assertEqual(batches, [['/src/old/'], ['/src/new/']])
+
+  def testWatchSourcesStoreError(self):
+    """Verifies completion store errors are logged without stopping."""
+    class FakeWatcher(object):
+      root = '/src'
+      def Start(watcher):
+        pass
+      def Close(watcher):
+        pass
+    self.mox.StubOutWithMock(encode_dvd.source_watcher, 'SourceWatcher')
+    encode_dvd.source_watcher.SourceWatcher('/src').AndReturn(FakeWatcher())
+    encoded = threading.Event()
+    def Watch(watcher, queue):
+      queue.put('/src/new/')
+      encoded.wait(5)
+      queue.put(None)
+    self.encode._Watch = Watch
+    self.encode._GenerateValidSources = lambda source: None
+    def IsComplete(source):
+      raise encode_dvd.completion_store.Error('database is locked')
+    self.encode.completions.IsComplete = IsComplete
+    batches = []
+    def ProcessTitles(options):
+      batches.append(list(self.encode.sources))
+      encoded.set()
+    self.encode._ProcessTitles = ProcessTitles
+    self.encode.sources = []
+    self.options.source = '/src'
+    self.mox.ReplayAll()
+    self.encode._WatchSources(self.options)
+    self.mox.VerifyAll()
+    self.assertEqual(batches, [['/src/new/']])
+
+  def testWatchSourcesError(self):
+    """Verifies a source that cannot be watched is handled properly."""
+    self.options.source = '/missing/source'
+    self.mox.ReplayAll()
+    self.assertRaises(encode_dvd.OptionProcessError,
+                      self.encode._WatchSources, self.options)
+    self.mox.VerifyAll()
+
   def testLog(self):
     """Verifies the _Log method works properly."""
     self.encode.silent = True
     self.encode._Log('you should not see this', True)
     self.encode._Log('you should not see this')
 
+  def testLogProgress(self):
+    """Verifies encode progress is logged at intervals."""
+    messages = []
+    self.encode._Log = lambda message: messages.append(message)
+    for percent in [1.0, 5.0, 12.5, 19.0, 100.0]:
+      self.encode._LogProgress('/a', 1, encode_dvd.progress.ProgressEvent(
+          1, 1, percent))
+    self.encode._LogProgress('/a', 2, encode_dvd.progress.ProgressEvent(
+        2, 2, 0.0))
+    self.encode._LogProgress('/b', 1, encode_dvd.progress.ProgressEvent(
+        1, 1, 5.0))
+    self.assertEqual(messages, ['Title 1 of /a: task 1 of 1, 1.00 %',
+                                'Title 1 of /a: task 1 of 1, 12.50 %',
+                                'Title 1 of /a: task 1 of 1, 100.00 %',
+                                'Title 2 of /a: task 2 of 2, 0.00 %',
+                                'Title 1 of /b: task 1 of 1, 5.00 %'])
+
+  def testCheckStalls(self):
+    """Verifies stalled encodes are logged once until they progress."""
+    messages = []
+    self.encode._Log = lambda message, critical=False: messages.append(
+        message)
+    tracker = encode_dvd.progress.ProgressTracker(1, source='/a')
+    tracker.started = 100.0
+    self.encode.handbrake = encode_dvd.handbrake.HandBrake()
+    self.encode.handbrake._encodes.append(tracker)
+    self.encode._CheckStalls(500.0)
+    self.assertEqual(messages, [])
+    self.encode._CheckStalls(1100.0)
+    self.encode._CheckStalls(1200.0)
+    self.assertEqual(messages, [
+        'Title 1 of /a has not reported progress in 00:15:00.'])
+    event = encode_dvd.progress.ProgressEvent(1, 1, 1.0, event_time=1250.0)
+    tracker.AddEvent(event)
+    self.encode._LogProgress('/a', 1, event)
+    self.encode._CheckStalls(1300.0)
+    self.encode._CheckStalls(2200.0)
+    self.assertEqual(messages[2:], [
+        'Title 1 of /a has not reported progress in 00:15:00.'])
+
   def testGenerateDvdTitleList(self):
     """Verifies _GenerateDvdTitleList works properly."""
     self.encode.dvd_containers.sources = ['dvd_path']
@@ -607,6 +952,51 @@ class EncodeDvdTest(unittest.TestCase):
     self.encode._GenerateDvdTitleList('path')
     self.mox.VerifyAll()
 
+  def testLogScanDiagnostics(self):
+    """Verifies lines skipped by a tolerant scan are logged as warnings."""
+    warnings = []
+    self.encode._log.warning = warnings.append
+    self.encode.handbrake.dvd = dvd.Dvd('test')
+    self.encode._LogScanDiagnostics('/dvd')
+    self.assertEqual(warnings, [])
+    self.encode.handbrake.dvd.diagnostics.lines = 12
+    self.encode.handbrake.dvd.diagnostics.Skip(7, 'libdvdread: error',
+                                               'Library message')
+    self.encode._LogScanDiagnostics('/dvd')
+    self.assertEqual(warnings, [
+        'Scan of /dvd skipped lines (12 lines, 1 skipped, 0 unrecognized):',
+        '  line 7: libdvdread: error (Library message)'])
+
+  def testGenerateDvdTitleListPrescan(self):
+    """Verifies only DVD's without readable IFO files are scanned."""
+    self.encode.dvd_containers.sources = ['/ifo', '/image.iso']
+    self.encode.handbrake.dvd = dvd.Dvd('image', [dvd.Title()])
+    self.encode._PreScan = lambda source: (
+        source == '/ifo' and dvd.Dvd('ifo', [dvd.Title()]) or None)
+    logged = []
+    self.encode._LogDvdTitles = lambda source, scanned: logged.append(
+        (source, scanned.name))
+    self.encode.dvd_containers.GenerateDvdContainers('path')
+    self.encode.handbrake.Connect()
+    self.encode.handbrake.GetDvdInformation('/image.iso')
+    self.mox.ReplayAll()
+    self.encode._GenerateDvdTitleList('path', True)
+    self.mox.VerifyAll()
+    self.assertEqual(logged, [('/ifo', 'ifo'), ('/image.iso', 'image')])
+
+  def testGenerateDvdTitleListPrescanOnly(self):
+    """Verifies handbrake is not used when all IFO files are readable."""
+    self.encode.dvd_containers.sources = ['/ifo']
+    self.encode._PreScan = lambda source: dvd.Dvd('ifo', [dvd.Title()])
+    self.encode.dvd_containers.GenerateDvdContainers('path')
+    self.mox.ReplayAll()
+    self.encode._GenerateDvdTitleList('path', True)
+    self.mox.VerifyAll()
+
+  def testPreScan(self):
+    """Verifies unreadable IFO files are handled properly."""
+    self.assertEqual(self.encode._PreScan('/does/not/exist'), None)
+
   def testGenerateDvdTitleListBadConnect(self):
     """Verifies _GenerateDvdTitleList fails properly on bad connect."""
     self.encode.dvd_containers.GenerateDvdContainers('path')
@@ -669,6 +1059,182 @@ class EncodeDvdTest(unittest.TestCase):
     self.encode._ProcessCustomTitles(self.options)
     self.mox.VerifyAll()
 
+  def testProcessCustomTitlesSegment(self):
+    """Verifies each episode of a segmented title is encoded."""
+    self.options.segment = True
+    title = dvd.Title()
+    for number in xrange(1, 10, 3):
+      title.AddChapter(dvd.Chapter(0, 0, 80000, '00:08:00', number),
+                       dvd.Chapter(1, 1, 120000, '00:12:00', number + 1),
+                       dvd.Chapter(2, 2, 1528, '00:00:05', number + 2))
+    self.encode.dvd_containers.sources = ['/my']
+    self.encode.handbrake.dvd = dvd.Dvd('DVD', [title])
+    self.encode.handbrake.options = (
+        encode_dvd.handbrake.handbrake_options.Options())
+    self.encode.handbrake.options.file_format.value = 'mp4'
+    self.encode.handbrake.Connect()
+    self.encode.handbrake.GetDvdInformation('/my')
+    for start, end in [(1, 3), (4, 6), (7, 9)]:
+      self.encode.handbrake.Encode(
+          '/my', '/tmp/DVD [Title 1] [Chapters %s-%s].mp4' % (start, end), 1,
+          start, end).AndReturn(
+              (True, datetime.timedelta(0, 10, 464765), 1, []))
+    self.mox.ReplayAll()
+    self.encode._ProcessCustomTitles(self.options)
+    self.mox.VerifyAll()
+    self.assertEqual(self.encode.completions.GetTitle('/my', 1, '7-9'),
+                     ('done', 'options',
+                      '/tmp/DVD [Title 1] [Chapters 7-9].mp4', 10.464765))
+
+  def testProcessCustomTitlesRanges(self):
+    """Verifies every range is encoded from a single scan."""
+    self.options.ranges = [(1, 1, 2), (2, 2, 2), (1, 2, 2)]
+    title = dvd.Title()
+    title.AddChapter(dvd.Chapter(number=1), dvd.Chapter(number=2))
+    title2 = dvd.Title(number=2)
+    title2.AddChapter(dvd.Chapter(number=1), dvd.Chapter(number=2))
+    self.encode.dvd_containers.sources = ['/my']
+    self.encode.handbrake.dvd = dvd.Dvd('DVD', [title, title2])
+    self.encode.handbrake.options = (
+        encode_dvd.handbrake.handbrake_options.Options())
+    self.encode.handbrake.options.file_format.value = 'mp4'
+    self.encode.handbrake.Connect()
+    self.encode.handbrake.GetDvdInformation('/my')
+    for title_number, start, end in self.options.ranges:
+      self.encode.handbrake.Encode(
+          '/my', '/tmp/DVD [Title %s] [Chapters %s-%s].mp4' %
+          (title_number, start, end), title_number, start, end).AndReturn(
+              (True, datetime.timedelta(0, 10), title_number, []))
+    self.mox.ReplayAll()
+    self.encode._ProcessCustomTitles(self.options)
+    self.mox.VerifyAll()
+    self.assertEqual(self.encode.completions.GetTitle('/my', 2, '2-2')[0],
+                     'done')
+
+  def testProcessCustomTitlesBadRange(self):
+    """Verifies no range is encoded if any range is not in the DVD."""
+    self.options.ranges = [(1, 1, 2), (1, 2, 3)]
+    title = dvd.Title()
+    title.AddChapter(dvd.Chapter(number=1), dvd.Chapter(number=2))
+    self.encode.dvd_containers.sources = ['/my']
+    self.encode.handbrake.dvd = dvd.Dvd('DVD', [title])
+    self.encode.handbrake.Connect()
+    self.encode.handbrake.GetDvdInformation('/my')
+    self.mox.ReplayAll()
+    self.encode._ProcessCustomTitles(self.options)
+    self.mox.VerifyAll()
+
+  def testProcessManifest(self):
+    """Verifies manifest jobs are scanned once per DVD and reported once."""
+    title = dvd.Title()
+    title.AddChapter(dvd.Chapter(number=1), dvd.Chapter(number=2))
+    profile = encode_dvd.handbrake.handbrake_options.Options()
+    profile.file_format.value = 'm4v'
+    self.encode.profiles = {'ipod': profile}
+    self.options.manifest = [
+        encode_dvd.manifest.ManifestJob('/a', 1, line=1),
+        encode_dvd.manifest.ManifestJob('/b', 1, line=2),
+        encode_dvd.manifest.ManifestJob('/a', 1, 1, 2, 'Pilot', 'ipod', 3),
+        encode_dvd.manifest.ManifestJob('/a', 2, line=4),
+        encode_dvd.manifest.ManifestJob('/a', 1, 1, 3, line=5)]
+    self.encode.handbrake.dvd = dvd.Dvd('DVD', [title])
+    self.encode.handbrake.options = (
+        encode_dvd.handbrake.handbrake_options.Options())
+    self.encode.handbrake.options.file_format.value = 'mp4'
+    self.encode.handbrake.Connect()
+    self.encode.handbrake.GetDvdInformation('/a')
+    self.encode.handbrake.GetDvdInformation('/b').AndRaise(
+        encode_dvd.handbrake.Error('unreadable'))
+    encoded = []
+    def Encode(*job):
+      encoded.append(job + (self.encode.handbrake.options.file_format.value,))
+      return (True, datetime.timedelta(0, 10), job[2], [])
+    self.encode.handbrake.Encode = Encode
+    mailed = []
+    self.encode.mail.SendMail = lambda subject, body: mailed.append(subject)
+    self.mox.ReplayAll()
+    self.encode._ProcessManifest(self.options)
+    self.mox.VerifyAll()
+    self.assertEqual(encoded, [
+        ('/a', '/tmp/DVD [Title 1].mp4', 1, 'mp4'),
+        ('/a', '/tmp/Pilot.m4v', 1, 1, 2, 'm4v')])
+    self.assertEqual(self.encode.handbrake.options.file_format.value, 'mp4')
+    self.assertEqual(self.encode.completions.GetTitle('/a', 1, '1-2'),
+                     ('done', 'options', '/tmp/Pilot.m4v', 10.0))
+    self.assertEqual(mailed, ['Manifest of 5 jobs finished.'])
+
+  def testProcessManifestEncodeError(self):
+    """Verifies a job that fails to encode does not stop the other jobs."""
+    title = dvd.Title()
+    self.options.manifest = [
+        encode_dvd.manifest.ManifestJob('/a', 1, output='One', line=1),
+        encode_dvd.manifest.ManifestJob('/a', 1, output='Two', line=2)]
+    self.encode.handbrake.dvd = dvd.Dvd('DVD', [title])
+    self.encode.handbrake.options = (
+        encode_dvd.handbrake.handbrake_options.Options())
+    self.encode.handbrake.options.file_format.value = 'mp4'
+    self.encode.handbrake.Connect()
+    self.encode.handbrake.GetDvdInformation('/a')
+    def Encode(*job):
+      if job[1] == '/tmp/One.mp4':
+        raise encode_dvd.handbrake.EncodeError('no space left')
+      return (True, datetime.timedelta(0, 10), job[2], [])
+    self.encode.handbrake.Encode = Encode
+    mailed = []
+    self.encode.mail.SendMail = lambda subject, body: mailed.append(body)
+    self.mox.ReplayAll()
+    self.encode._ProcessManifest(self.options)
+    self.mox.VerifyAll()
+    report = mailed[0].split('\n')
+    self.assertEqual(report[0], 'Manifest results for 2 jobs, 1 failed. '
+                     '(Total time: 00:00:10)')
+    self.assertEqual(report[1],
+                     'Job 1: /a Title 1 failed: Encode failed: no space left')
+
+  def testProcessManifestMixedRanges(self):
+    """Verifies a whole title job after a ranged job encodes every chapter."""
+    directory = tempfile.mkdtemp()
+    title = dvd.Title()
+    title.AddChapter(dvd.Chapter(number=1), dvd.Chapter(number=2))
+    interface = encode_dvd.handbrake.HandBrake()
+    interface.dvd = dvd.Dvd('DVD', [title])
+    interface.scan_ahead = 0
+    interface.Connect = lambda: None
+    interface.GetDvdInformation = lambda source: None
+    chapters = []
+    interface._Execute = lambda options, callback: chapters.append(
+        interface.options.file_chapters.value)
+    self.encode.handbrake = interface
+    self.options.destination = os.path.join(directory, '')
+    self.options.manifest = [
+        encode_dvd.manifest.ManifestJob(directory, 1, 1, 2, line=1),
+        encode_dvd.manifest.ManifestJob(directory, 1, line=2)]
+    self.encode.mail.SendMail = lambda subject, body: None
+    try:
+      self.encode._ProcessManifest(self.options)
+    finally:
+      shutil.rmtree(directory)
+    self.assertEqual(chapters,
+                     ['1-2', interface.options.file_chapters.default])
+
+  def testProcessManifestBadChapters(self):
+    """Verifies a job whose chapters can not be parsed fails properly."""
+    title = dvd.Title()
+    title.AddHandbrakeSections(
+        {dvd.Chapter: ['    + 1: cells 0->0, abc blocks, duration 00:00:01']})
+    self.options.manifest = [
+        encode_dvd.manifest.ManifestJob('/a', 1, 1, 1, line=1)]
+    self.encode.handbrake.dvd = dvd.Dvd('DVD', [title])
+    self.encode.handbrake.Connect()
+    self.encode.handbrake.GetDvdInformation('/a')
+    mailed = []
+    self.encode.mail.SendMail = lambda subject, body: mailed.append(body)
+    self.mox.ReplayAll()
+    self.encode._ProcessManifest(self.options)
+    self.mox.VerifyAll()
+    self.assertTrue(mailed[0].split('\n')[1].startswith(
+        'Job 1: /a Title 1 failed: Title 1 of DVD not parsed: '))
+
   def testProcessCustomTitlesBadConnect(self):
     """Verifies _ProcessCustomTitles fails properly on bad connect."""
     self.encode.handbrake.Connect().AndRaise(encode_dvd.handbrake.Error)
@@ -724,6 +1290,19 @@ class EncodeDvdTest(unittest.TestCase):
     self.encode._ProcessCustomTitles(self.options)
     self.mox.VerifyAll()
 
+  def testProcessCustomTitlesBadChapters(self):
+    """Verifies chapters that can not be parsed fail properly."""
+    title = dvd.Title()
+    title.AddHandbrakeSections(
+        {dvd.Chapter: ['    + 1: cells 0->0, abc blocks, duration 00:00:01']})
+    self.encode.dvd_containers.sources = ['/my']
+    self.encode.handbrake.dvd = dvd.Dvd('DVD', [title])
+    self.encode.handbrake.Connect()
+    self.encode.handbrake.GetDvdInformation('/my')
+    self.mox.ReplayAll()
+    self.encode._ProcessCustomTitles(self.options)
+    self.mox.VerifyAll()
+
   def testProcessCustomTitlesBadEncode(self):
     """Verifies a bad title encode fails properly."""
     title = dvd.Title()
@@ -754,14 +1333,94 @@ class EncodeDvdTest(unittest.TestCase):
         encode_dvd.handbrake.handbrake_options.Options())
     self.encode.handbrake.Connect()
     self.encode.handbrake.GetDvdInformation('/my')
-    self.encode.handbrake.EncodeAll(
-        '/my', '/tmp/', datetime.datetime(1, 1, 1, 0, 2, 0)).AndReturn(
-            [(True, datetime.timedelta(0, 10, 464765), 'DVD', [])])
-    self.encode._log_full.write('/my\n')
+    self.encode.handbrake.SubmitAll(
+        mox.IsA(encode_dvd.handbrake.EncodePool), '/my', '/tmp/', 120,
+        self.encode._ResumeTitle).AndReturn([])
     self.mox.ReplayAll()
     self.encode._ProcessTitles(self.options)
     self.mox.VerifyAll()
 
+  def testProcessTitlesReports(self):
+    """Verifies each DVD is reported once its titles have encoded."""
+    self.encode.sources = ['/my', '/other']
+    self.encode.handbrake.dvd = dvd.Dvd('DVD', [dvd.Title()])
+    self.encode.handbrake.Connect()
+    submitted = []
+    def SubmitAll(pool, source, output_dir, time_limit, resume):
+      submitted.append(source)
+      return [pool.AddResult(
+          (True, datetime.timedelta(0, 10, 464765), len(submitted), []))]
+    self.encode.handbrake.SubmitAll = SubmitAll
+    self.encode.handbrake.GetDvdInformation('/my')
+    self.encode.handbrake.GetDvdInformation('/other')
+    self.mox.ReplayAll()
+    self.encode._ProcessTitles(self.options)
+    self.mox.VerifyAll()
+    self.assertEqual(submitted, ['/my', '/other'])
+    self.assertTrue(self.encode.completions.IsComplete('/my'))
+    self.assertTrue(self.encode.completions.IsComplete('/other'))
+    self.assertEqual(self.encode.completions.GetTitle('/my', 1),
+                     ('done', 'options', None, 10.464765))
+    self.assertEqual(self.encode.jobs.Sources(), [])
+
+  def testProcessTitlesPrescan(self):
+    """Verifies DVD's with only short titles are not scanned by handbrake."""
+    self.encode.sources = ['/short', '/long']
+    short = dvd.Dvd('short', [dvd.Title(duration='00:01:00'),
+                              dvd.Title(number=2, duration='00:01:59')])
+    self.encode._PreScan = lambda source: (
+        source == '/short' and short or None)
+    self.encode.handbrake.SkipResult = (
+        encode_dvd.handbrake.HandBrake().SkipResult)
+    self.encode.handbrake.SubmitAll = (
+        lambda pool, source, output_dir, time_limit, resume: [])
+    self.encode.handbrake.dvd = dvd.Dvd('long')
+    self.encode.handbrake.Connect()
+    self.encode.handbrake.GetDvdInformation('/long')
+    self.mox.ReplayAll()
+    self.encode._ProcessTitles(self.options)
+    self.mox.VerifyAll()
+    self.assertTrue(self.encode.completions.IsComplete('/short'))
+    self.assertEqual(self.encode.completions.GetTitle('/short', 2)[0],
+                     'skipped')
+
+  def testReportFinishedDvds(self):
+    """Verifies only DVDs with all titles encoded are reported."""
+    reported = []
+    self.encode._ReportDvd = (
+        lambda dvd, results, overall, jobs: reported.append((dvd, results)))
+    pool = encode_dvd.handbrake.EncodePool(None)
+    done = pool.AddResult((True, datetime.timedelta(0), 1, []))
+    queued = [('/done', [done]), ('/encoding', [done, 5])]
+    self.assertEqual(self.encode._ReportFinishedDvds(pool, queued, []),
+                     [('/encoding', [done, 5])])
+    self.assertEqual(reported,
+                     [('/done', [(True, datetime.timedelta(0), 1, [])])])
+
+  def testReportDvdFailedTitle(self):
+    """Verifies a DVD with a failed title is not marked complete."""
+    results = [(True, datetime.timedelta(0, 5), 1, []),
+               (False, datetime.timedelta(0), 2, ['too short']),
+               (False, datetime.timedelta(0), 3, ['error'])]
+    jobs = [('/my', '/out/1.mp4', 1), None, ('/my', '/out/3.mp4', 3)]
+    self.encode._ReportDvd('/my', results, [], jobs)
+    self.assertFalse(self.encode.completions.IsComplete('/my'))
+    self.assertEqual(self.encode.completions.GetTitle('/my', 1),
+                     ('done', 'options', '/out/1.mp4', 5.0))
+    self.assertEqual(self.encode.completions.GetTitle('/my', 2)[0], 'skipped')
+    self.assertEqual(self.encode.completions.GetTitle('/my', 3)[0], 'failed')
+    self.encode._ReportDvd('/my', results[:2], [], jobs[:2])
+    self.assertTrue(self.encode.completions.IsComplete('/my'))
+
+  def testReportDvdTotalTime(self):
+    """Verifies total encode times over a day are reported in full."""
+    results = [(True, datetime.timedelta(0, 50000), 1, []),
+               (True, datetime.timedelta(0, 50000, 500000), 2, [])]
+    jobs = [('/my', '/out/1.mp4', 1), ('/my', '/out/2.mp4', 2)]
+    overall = []
+    self.encode._ReportDvd('/my', results, overall, jobs)
+    self.assertEqual(overall, ['Process time: 27:46:40, Source: /my'])
+
   def testProcessTitlesBadConnect(self):
     """Verifies _ProcessTitles fails properly with bad connect."""
     self.encode.handbrake.Connect().AndRaise(encode_dvd.handbrake.Error)
@@ -791,9 +1450,9 @@ class EncodeDvdTest(unittest.TestCase):
         encode_dvd.handbrake.handbrake_options.Options())
     self.encode.handbrake.Connect()
     self.encode.handbrake.GetDvdInformation('/my')
-    self.encode.handbrake.EncodeAll(
-        '/my', '/tmp/', datetime.datetime(1, 1, 1, 0, 2, 0)).AndRaise(
-            encode_dvd.handbrake.Error)
+    self.encode.handbrake.SubmitAll(
+        mox.IsA(encode_dvd.handbrake.EncodePool), '/my', '/tmp/', 120,
+        self.encode._ResumeTitle).AndRaise(encode_dvd.handbrake.Error)
     self.mox.ReplayAll()
     self.assertRaises(encode_dvd.HandbrakeError,
                       self.encode._ProcessTitles, self.options)
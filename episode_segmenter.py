@@ -0,0 +1,212 @@
+#!/usr/bin/python2.5
+#
+# Copyright 2009, Robert M. Pufky (robert.pufky@gmail.com)
+#
+# GPLv2 License:
+# --------------
+# Copyright (C) 2009 Robert M. Pufky (robert.pufky@gmail.com)
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more 
+# details.
+#
+# You should have received a copy of the GNU General Public License along with 
+# this program; if not, write to the Free Software Foundation, Inc., 59 Temple
+# Place, Suite 330, Boston, MA 02111-1307 USA
+#
+# You can also read the license at:
+#
+#  http://www.opensource.org/licenses/gpl-2.0.php
+#
+# Please contact me if you wish to use this in another product that you are 
+# building (robert.pufky@gmail.com); or building to sell.
+#
+"""Splits a DVD title holding several episodes into episode chapter ranges.
+
+Series DVD's often hold every episode in a single title.  Each episode usually
+opens or closes with the same short chapter (a title sequence, credits or a
+studio bumper), which plays for the same time and uses about the same number
+of DVD blocks each time.  Chapters are grouped by duration and blocks, and each
+group that repeats is tried as an episode marker: the title is split before
+each repeat of an opening marker, or after each repeat of a closing marker.
+
+Episodes of a series run for nearly the same time, so a split is only accepted
+if its episodes do.  Of the accepted splits, the most even split with the most
+episodes is used, preferring the marker whose chapters match most closely.
+"""
+
+__author__ = 'Robert M. Pufky (robert.pufky@gmail.com)'
+__version__ = '1.0'
+
+import dvd
+
+# Chapters are similar if their durations and blocks are within this fraction.
+SIMILARITY = 0.1
+# Episodes shorter than this are merged into the episode next to them.
+MINIMUM_EPISODE_SECONDS = 300
+# Largest standard deviation of episode durations, as a fraction of the mean.
+MAXIMUM_VARIATION = 0.02
+
+
+class EpisodeSegmenter(object):
+  """Splits DVD titles into episodes.
+
+  Attributes:
+    similarity: Float fraction chapter durations and blocks may differ by and
+      still be considered the same marker.
+    minimum: Integer seconds an episode must run for.
+    variation: Float largest standard deviation of episode durations, as a
+      fraction of the mean episode duration.
+  """
+
+  def __init__(self, similarity=SIMILARITY, minimum=MINIMUM_EPISODE_SECONDS,
+               variation=MAXIMUM_VARIATION):
+    """Initializes EpisodeSegmenter.
+
+    Args:
+      similarity: Float fraction chapter durations and blocks may differ by.
+        Default SIMILARITY.
+      minimum: Integer seconds an episode must run for.  Default
+        MINIMUM_EPISODE_SECONDS.
+      variation: Float largest standard deviation of episode durations, as a
+        fraction of the mean.  Default MAXIMUM_VARIATION.
+    """
+    self.similarity = similarity
+    self.minimum = minimum
+    self.variation = variation
+
+  def _Similar(self, chapter, other):
+    """Returns True if two dvd.Chapter objects could be the same video."""
+    seconds = chapter.duration
+    other_seconds = other.duration
+    return (abs(seconds - other_seconds) <=
+            max(1, max(seconds, other_seconds) * self.similarity) and
+            abs(chapter.blocks - other.blocks) <=
+            max(chapter.blocks, other.blocks) * self.similarity)
+
+  def _Markers(self, chapters):
+    """Finds groups of similar chapters that could mark episodes.
+
+    Args:
+      chapters: List of dvd.Chapter objects of a title.
+
+    Returns:
+      List of Lists of Integer chapter indexes, one for each group of two or
+      more similar content chapters.
+    """
+    markers = []
+    for chapter in chapters:
+      if chapter.blocks <= dvd.SPACER_BLOCKS:
+        continue
+      marker = [index for index, other in enumerate(chapters)
+                if other.blocks > dvd.SPACER_BLOCKS and
+                self._Similar(chapter, other)]
+      if len(marker) > 1 and marker not in markers:
+        markers.append(marker)
+    return markers
+
+  def _LeadIn(self, chapters, first, index):
+    """Counts the chapters before a repeated opening marker that are repeated.
+
+    Episodes may start with chapters before the opening marker (a recap or a
+    cold open).  They are part of a later episode only when they repeat the
+    chapters before the first marker.
+
+    Args:
+      chapters: List of dvd.Chapter objects of a title.
+      first: Integer index of the first chapter of the opening marker.
+      index: Integer index of a later chapter of the opening marker.
+
+    Returns:
+      Integer number of chapters before index that start its episode.
+    """
+    count = 0
+    while (count < first and
+           self._Similar(chapters[first - count - 1],
+                         chapters[index - count - 1])):
+      count += 1
+    return count
+
+  def _Split(self, chapters, starts):
+    """Splits chapters into episodes, merging episodes that are too short.
+
+    Args:
+      chapters: List of dvd.Chapter objects of a title.
+      starts: List of Integer indexes of the first chapter of each episode.
+
+    Returns:
+      List of [<int first index>, <int last index>, <int seconds>] episodes.
+    """
+    starts = sorted(set(starts))
+    episodes = []
+    for position, start in enumerate(starts):
+      if position + 1 < len(starts):
+        end = starts[position + 1] - 1
+      else:
+        end = len(chapters) - 1
+      seconds = sum([chapter.duration
+                     for chapter in chapters[start:end + 1]])
+      if episodes and seconds < self.minimum:
+        episodes[-1][1] = end
+        episodes[-1][2] += seconds
+      else:
+        episodes.append([start, end, seconds])
+    if len(episodes) > 1 and episodes[0][2] < self.minimum:
+      episodes[1][0] = episodes[0][0]
+      episodes[1][2] += episodes[0][2]
+      del episodes[0]
+    return episodes
+
+  def _Variation(self, episodes):
+    """Returns the Float standard deviation of episode durations / mean."""
+    durations = [float(episode[2]) for episode in episodes]
+    mean = sum(durations) / len(durations)
+    if not mean:
+      return 0.0
+    variance = sum([(duration - mean) ** 2
+                    for duration in durations]) / len(durations)
+    return variance ** 0.5 / mean
+
+  def Segment(self, title):
+    """Splits a title into episodes.
+
+    Args:
+      title: dvd.Title object to split.
+
+    Raises:
+      dvd.InvalidHandbrakeLogLine: If the chapters of a scanned title can not
+        be parsed.
+
+    Returns:
+      List of (<int start chapter>, <int end chapter>) tuples, one for each
+      episode in playback order.  A title that could not be split is returned
+      as a single episode, and a title without chapters as an empty List.
+    """
+    chapters = title.chapters
+    if not chapters:
+      return []
+    best = None
+    for marker in self._Markers(chapters):
+      first = marker[0]
+      opening = [0] + [index - self._LeadIn(chapters, first, index)
+                       for index in marker[1:]]
+      closing = [0] + [index + 1 for index in marker
+                       if index + 1 < len(chapters)]
+      blocks = [chapters[index].blocks for index in marker]
+      spread = float(max(blocks) - min(blocks)) / max(blocks)
+      for starts in (opening, closing):
+        episodes = self._Split(chapters, starts)
+        variation = self._Variation(episodes)
+        if len(episodes) < 2 or variation > self.variation:
+          continue
+        score = (round(variation, 2), -len(episodes), spread)
+        if best is None or score < best[0]:
+          best = (score, episodes)
+    if best is None:
+      return [(chapters[0].number, chapters[-1].number)]
+    return [(chapters[start].number, chapters[end].number)
+            for start, end, seconds in best[1]]
@@ -0,0 +1,97 @@
+#!/usr/bin/python2.5
+#
+# Copyright 2009, Robert M. Pufky (robert.pufky@gmail.com)
+#
+# GPLv2 License:
+# --------------
+# Copyright (C) 2009 Robert M. Pufky (robert.pufky@gmail.com)
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more 
+# details.
+#
+# You should have received a copy of the GNU General Public License along with 
+# this program; if not, write to the Free Software Foundation, Inc., 59 Temple
+# Place, Suite 330, Boston, MA 02111-1307 USA
+#
+# You can also read the license at:
+#
+#  http://www.opensource.org/licenses/gpl-2.0.php
+#
+# Please contact me if you wish to use this in another product that you are 
+# building (robert.pufky@gmail.com); or building to sell.
+#
+"""Test suite for episode_segmenter."""
+
+__author__ = 'Robert M. Pufky (robert.pufky@gmail.com)'
+
+import unittest
+import dvd
+import episode_segmenter
+
+
+def ReadDvd(name):
+  """Returns a dvd.Dvd parsed from one of the test handbrake logs."""
+  disc = dvd.Dvd()
+  log = open('./testdata/handbrake_dvd_logs/%s_handbrake.log' % name)
+  try:
+    disc.ProcessHandbrakeAnalysis(log)
+  finally:
+    log.close()
+  return disc
+
+
+class TestEpisodeSegmenter(unittest.TestCase):
+  """Verifies EpisodeSegmenter splits titles into episodes."""
+
+  def setUp(self):
+    self.segmenter = episode_segmenter.EpisodeSegmenter()
+
+  def testSimilar(self):
+    """Verifies chapters must match in both duration and blocks."""
+    chapter = dvd.Chapter(0, 0, 12747, '00:00:40')
+    self.assertTrue(self.segmenter._Similar(
+        chapter, dvd.Chapter(0, 0, 12520, '00:00:39')))
+    self.assertFalse(self.segmenter._Similar(
+        chapter, dvd.Chapter(0, 0, 14498, '00:00:40')))
+    self.assertFalse(self.segmenter._Similar(
+        chapter, dvd.Chapter(0, 0, 12747, '00:00:48')))
+
+  def testSplit(self):
+    """Verifies short episodes are merged into the episode next to them."""
+    chapters = [dvd.Chapter(0, 0, 10, '00:00:01'),
+                dvd.Chapter(1, 1, 10, '00:10:00'),
+                dvd.Chapter(2, 2, 10, '00:10:00'),
+                dvd.Chapter(3, 3, 10, '00:00:05'),
+                dvd.Chapter(4, 4, 10, '00:10:00')]
+    self.assertEqual(self.segmenter._Split(chapters, [0, 1, 3, 4]),
+                     [[0, 3, 1206], [4, 4, 600]])
+
+  def testSegmentClosingMarker(self):
+    """Verifies play all titles split after each closing bumper."""
+    title = ReadDvd('FraggleRock_Season2BoxSet_Disc1').GetTitle(2)
+    self.assertEqual(self.segmenter.Segment(title),
+                     [(1, 10), (11, 20), (21, 29), (30, 38), (39, 46),
+                      (47, 58)])
+
+  def testSegmentOpeningMarker(self):
+    """Verifies episodes keep the cold open before their title sequence."""
+    title = ReadDvd('GHOST_HUNTERS_S2P1D1').GetTitle(1)
+    self.assertEqual(self.segmenter.Segment(title),
+                     [(1, 11), (12, 28), (29, 43)])
+
+  def testSegmentSingleEpisode(self):
+    """Verifies titles without repeated episodes are not split."""
+    self.assertEqual(self.segmenter.Segment(ReadDvd('FIREFLY_D1').GetTitle(1)),
+                     [(1, 21)])
+    self.assertEqual(self.segmenter.Segment(
+        ReadDvd('FraggleRock_Season2BoxSet_Disc1').GetTitle(3)), [(1, 13)])
+    self.assertEqual(self.segmenter.Segment(dvd.Title()), [])
+
+
+if __name__ == '__main__':
+  unittest.main()
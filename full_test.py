@@ -33,11 +33,20 @@ import optparse
 import sys
 import unittest
 import abs_path_test
+import completion_store_test
 import dvd_test
 import encode_dvd_test
+import episode_segmenter_test
 import handbrake_options_test
 import handbrake_test
+import ifo_reader_test
+import job_queue_test
+import manifest_test
 import options_test
+import progress_test
+import scan_cache_test
+import source_walker_test
+import source_watcher_test
 
 if __name__ == '__main__':
   parser = optparse.OptionParser()
@@ -55,6 +64,15 @@ if __name__ == '__main__':
   suite.addTest(unittest.findTestCases(handbrake_test))
   suite.addTest(unittest.findTestCases(encode_dvd_test))
   suite.addTest(unittest.findTestCases(abs_path_test))
+  suite.addTest(unittest.findTestCases(scan_cache_test))
+  suite.addTest(unittest.findTestCases(progress_test))
+  suite.addTest(unittest.findTestCases(source_walker_test))
+  suite.addTest(unittest.findTestCases(completion_store_test))
+  suite.addTest(unittest.findTestCases(job_queue_test))
+  suite.addTest(unittest.findTestCases(source_watcher_test))
+  suite.addTest(unittest.findTestCases(ifo_reader_test))
+  suite.addTest(unittest.findTestCases(episode_segmenter_test))
+  suite.addTest(unittest.findTestCases(manifest_test))
   print '%s\nRunning %s tests...\n%s' % ('_' * 80,
                                          suite.countTestCases(),
                                          '=' * 80)
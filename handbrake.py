@@ -35,12 +35,19 @@ __version__ = '1.0'
 
 import copy
 import datetime
+import hashlib
+import heapq
 import os
+import re
+import signal
 import subprocess
-import tempfile
+import sys
+import threading
 import abs_path
 import dvd
 import handbrake_options
+import progress
+import scan_cache
 
 
 class Error(Exception):
@@ -67,20 +74,51 @@ class EncodeError(Error):
   """An error occurred while setting up the encoding process."""
 
 
+class ScanError(Error):
+  """A HandBrake DVD scan could not be parsed."""
+
+
 class HandBrake(object):
   """Class to interact with HandBrakeCLI.
 
   Attributes:
     __VERSION: String supported version of handbrake.
+    __BANNER: Compiled regex matching a HandBrakeCLI version banner line.
     __SEARCH_PATHS: List containing general known locations of HandBrake Binary.
     _critical_version: Boolean True if version mis-match should throw exception.
     _location: String full path to binary.
-    _log: List containing log information from executing HandBrakeCLI.
+    __LOG_TAIL: Integer number of log lines kept from executing HandBrakeCLI.
+    __READ_SIZE: Integer number of bytes read at once from HandBrakeCLI output.
+    __LINE_SEPARATORS: Compiled regex matching HandBrakeCLI line separators.
+    _log: List containing the last __LOG_TAIL log lines from executing
+      HandBrakeCLI, without progress indicators or new lines.
+    _callbacks: List of functions called with each line of HandBrakeCLI output.
+    _progress_callbacks: List of functions called with each encode progress
+      event.
+    _encodes: List of progress.ProgressTracker objects for running encodes,
+      shared with the workers encoding titles concurrently.
+    _encodes_lock: threading.Lock protecting _encodes.
     options: Options object containing handbrake_options.Options to use.
     dvd: dvd.Dvd object containing parsed DVD title information.
+    scan_cache: scan_cache.ScanCache object used to cache DVD title scans.
+    version_cache: scan_cache.VersionCache object used to cache HandBrakeCLI
+      version banners, keyed by binary location, size and mtime.
+    workers: Integer number of HandBrakeCLI encodes to run at once in
+      EncodeAll.  Default 1.
+    progress: progress.ProgressTracker for the current or last encode, or None.
+    scan_ahead: Integer number of DVD sources to scan ahead of the source being
+      encoded, see ScanPrefetcher.  Default 1.
+    skip_duplicates: Boolean True to skip titles that only play content found
+      in other titles of the DVD, see dvd.Dvd.FindDuplicates.  Default False.
+    tolerant: Boolean True to skip DVD scan lines that can not be parsed, see
+      dvd.Dvd.tolerant.  Default False.
   """
   __VERSION = 'HandBrake 0.9.3 (2008112300)'
+  __BANNER = re.compile(r'HandBrake \S+ \(\d+\)')
   __SEARCH_PATHS = ['/usr/bin', '/usr/local/bin', '/bin', '/opt/bin']
+  __LOG_TAIL = 5000
+  __READ_SIZE = 4096
+  __LINE_SEPARATORS = re.compile('[\r\n]')
 
   def __init__(self, critical_version=True):
     """Initalizes default HandBrakeCLI object.
@@ -91,8 +129,19 @@ class HandBrake(object):
     self._critical_version = critical_version
     self._location = None
     self._log = []
+    self._callbacks = []
+    self._progress_callbacks = []
+    self._encodes = []
+    self._encodes_lock = threading.Lock()
     self.options = handbrake_options.Options()
     self.dvd = dvd.Dvd()
+    self.scan_cache = scan_cache.ScanCache()
+    self.version_cache = scan_cache.VersionCache()
+    self.workers = 1
+    self.progress = None
+    self.scan_ahead = 1
+    self.skip_duplicates = False
+    self.tolerant = False
 
   def _FindBinaryLocation(self, location=None):
     """Determines the location of the HandBrake Binary.
@@ -138,29 +187,119 @@ class HandBrake(object):
       results = False
     return results
 
-  def _WriteLog(self, log):
-    """Writes a clean handbrake log, removing the percentage indicators.
+  def AddLineCallback(self, callback):
+    """Registers a function to be called with each line of HandBrakeCLI output.
 
-    This removes the percent complete indication lines, as well as stripping
-    newline characters from the end of each line; then truncates and writes to
-    the internal log.
+    Callbacks are called from the thread executing HandBrakeCLI as each line
+    is read, including progress indicator lines.
 
     Args:
-      log: List of log lines from HandBrake Execution.
+      callback: Function taking a String line, without new line characters.
     """
-    self._log = []
-    for line in log:
-      if not line.startswith('\rEncoding: task'):
-        self._log.append(line)
+    self._callbacks.append(callback)
+
+  def RemoveLineCallback(self, callback):
+    """Unregisters a function added with AddLineCallback.
+
+    Args:
+      callback: Function to remove.
+
+    Raises:
+      ValueError: If the callback was not registered.
+    """
+    self._callbacks.remove(callback)
+
+  def AddProgressCallback(self, callback):
+    """Registers a function to be called with each encode progress event.
+
+    Callbacks are shared with the workers encoding titles concurrently, so may
+    be called from several threads at once.
+
+    Args:
+      callback: Function taking (<String source>, <Integer/String title>,
+        <progress.ProgressEvent event>).
+    """
+    self._progress_callbacks.append(callback)
+
+  def StalledEncodes(self, timeout, now=None):
+    """Finds running encodes that have stopped reporting progress.
+
+    Includes the encodes of workers encoding titles concurrently.
+
+    Args:
+      timeout: Integer seconds without progress before an encode is stalled.
+      now: Float current time.time().  Default now.
+
+    Returns:
+      List of progress.ProgressTracker objects for the stalled encodes.
+    """
+    self._encodes_lock.acquire()
+    try:
+      encodes = list(self._encodes)
+    finally:
+      self._encodes_lock.release()
+    return [tracker for tracker in encodes if tracker.IsStalled(timeout, now)]
+
+  def _WriteLine(self, line):
+    """Writes a line to the clean handbrake log, removing progress indicators.
+
+    Only the last __LOG_TAIL lines are kept.
+
+    Args:
+      line: String log line from HandBrake Execution, without new lines.
+    """
+    if not line.startswith('Encoding: task'):
+      self._log.append(line)
+      if len(self._log) > self.__LOG_TAIL:
+        del self._log[:len(self._log) - self.__LOG_TAIL]
+
+  def _ProcessOutput(self, lines, callbacks):
+    """Writes HandBrakeCLI output lines to the log, and passes them on.
+
+    Args:
+      lines: List of String lines, without new lines.  Empty lines are dropped.
+      callbacks: List of functions to call with each line.
+    """
+    for line in lines:
+      if line:
+        self._WriteLine(line)
+        for callback in callbacks:
+          callback(line)
+
+  def _ReadOutput(self, output, callbacks):
+    """Reads HandBrakeCLI output as it is written, until it is closed.
+
+    Lines are split on both new lines and carriage returns, as HandBrakeCLI
+    separates progress indicators with carriage returns.
 
-  def _Execute(self, options):
+    Args:
+      output: File object to read from.
+      callbacks: List of functions to call with each line.
+    """
+    remainder = ''
+    data = os.read(output.fileno(), self.__READ_SIZE)
+    while data:
+      lines = self.__LINE_SEPARATORS.split(remainder + data)
+      remainder = lines.pop()
+      self._ProcessOutput(lines, callbacks)
+      data = os.read(output.fileno(), self.__READ_SIZE)
+    self._ProcessOutput([remainder], callbacks)
+
+  def _Execute(self, options, callback=None):
     """Excutes handbrake with given options set.
 
-    Execute will automatically clean the handbrake log of any processing
-    indicators.
+    Output is read as HandBrakeCLI runs, and each line is passed to the
+    registered line callbacks.  stderr is written to the same pipe as stdout,
+    so lines are read in the order HandBrakeCLI wrote them.  Execute will
+    automatically clean the handbrake log of any processing indicators.
+
+    If reading the output fails (a callback raises), HandBrakeCLI is
+    terminated before the error is raised.
 
     Args:
       options: List of handbrake_options.Options to use with CLI.
+      callback: Function called with each line of output for this execution
+        only, in addition to registered callbacks.  See AddLineCallback.
 
     Raises:
       ExecuteError: If there was a problem excuting the handbrakeCLI.
@@ -169,16 +308,27 @@ class HandBrake(object):
     if self._ValidateOptions(options):
       for option in options:
         command.extend(option.Command())
+      callbacks = list(self._callbacks)
+      if callback is not None:
+        callbacks.append(callback)
+      self._log = []
       try:
-        # Subprocess works at OS level, so cStringIO file objects won't work.
-        temp_file = tempfile.TemporaryFile()
-        results = subprocess.call(command, stdout=temp_file,
-                                  stderr=temp_file, shell=False)
-        temp_file.seek(0)
-        self._WriteLog(temp_file.readlines())
-        temp_file.close()
+        process = subprocess.Popen(command, stdout=subprocess.PIPE,
+                                   stderr=subprocess.STDOUT, shell=False)
       except (OSError, IOError), error:
         raise ExecuteError('CLI command failed: %s' % error)
+      finished = False
+      try:
+        self._ReadOutput(process.stdout, callbacks)
+        finished = True
+      finally:
+        if not finished:
+          try:
+            os.kill(process.pid, signal.SIGTERM)
+          except OSError:
+            pass
+        process.stdout.close()
+        results = process.wait()
       if results != 0:
         raise ExecuteError('HandBrakeCLI exited with exitcode of %s.' % results)
     else:
@@ -187,15 +337,27 @@ class HandBrake(object):
   def _CheckVersion(self):
     """Checks handbrake binary version against the supported version.
 
+    The version banner is the first line of output that looks like one.  It is
+    cached in self.version_cache, and HandBrakeCLI is only executed again if
+    the binary changes.  Output without a banner is not cached.
+
     Raises:
       VersionError: If critical_version is enabled, and there is a version
         mis-match.
       ExecuteError: If there is a problem executing the CLI.
     """
-    update_option = copy.deepcopy(self.options.general_update)
-    update_option.SetValue(True)
-    self._Execute([update_option])
-    if not self._log or not self._log[0].startswith(self.__VERSION):
+    fingerprint = self.version_cache.Fingerprint(self._location)
+    banner = self.version_cache.Get(self._location, fingerprint)
+    if banner is None:
+      update_option = copy.deepcopy(self.options.general_update)
+      update_option.SetValue(True)
+      self._Execute([update_option])
+      banners = [line for line in self._log if self.__BANNER.match(line)]
+      banner = ''
+      if banners:
+        banner = banners[0]
+        self.version_cache.Put(self._location, fingerprint, banner)
+    if not banner.startswith(self.__VERSION):
       if self._critical_version:
         raise VersionError('Version mis-match: %s is supported.' %
                            self.__VERSION)
@@ -204,8 +366,8 @@ class HandBrake(object):
     """Locates and verifies the HandBrake Binary to use.
 
     Will attempt to use the HandBrake binary specified in the arguments.  If no
-    location is specified, the binary is searched for on the default search
-    path (self.__SEARCH_PATHS).
+    location is specified, the binary already connected to is used, otherwise
+    it is searched for on the default search path (self.__SEARCH_PATHS).
 
     Args:
       location: String location of handbrake binary.  Default None.
@@ -215,28 +377,51 @@ class HandBrake(object):
       VersionError: If a version mis-match is detected, and critical version
         errors are enabled.
     """
-    self._location = self._FindBinaryLocation(location)
+    if location or not self._location:
+      self._location = self._FindBinaryLocation(location)
     self._CheckVersion()
 
   def GetDvdInformation(self, dvd_image):
     """Generates a dvd.Dvd object from a given dvd image.
 
+    The scan is skipped if the scan cache contains a scan for the dvd image,
+    made with the same tolerant setting, and the dvd image has not changed
+    since it was scanned.
+
     Args:
       dvd_image: String full path to file/dir for DVD image.
 
     Raises:
       ExecuteError: If there is a problem executing the CLI.
+      ScanError: If the scan output can not be parsed.
     """
+    source = abs_path.AbsPath(dvd_image)
+    fingerprint = self.scan_cache.Fingerprint(source)
+    if fingerprint is not None:
+      fingerprint += (('tolerant', self.tolerant),)
+    cached_dvd = self.scan_cache.Get(source, fingerprint)
+    if cached_dvd is not None:
+      self.dvd = cached_dvd
+      return
     input_file = copy.deepcopy(self.options.file_input)
     full_scan = copy.deepcopy(self.options.file_title)
-    input_file.SetValue(abs_path.AbsPath(dvd_image))
+    input_file.SetValue(source)
     full_scan.SetValue(0)
-    self._Execute([input_file, full_scan])
-    self.dvd.ProcessHandbrakeAnalysis(self._log)
+    scanned_dvd = dvd.Dvd(tolerant=self.tolerant)
+    try:
+      self._Execute([input_file, full_scan], scanned_dvd.ProcessHandbrakeLine)
+      scanned_dvd.FinishHandbrakeAnalysis()
+    except dvd.Error, error:
+      raise ScanError('Scan of %s not parsed: %s' % (source, error))
+    self.dvd = scanned_dvd
+    self.scan_cache.Put(source, fingerprint, self.dvd)
 
   def _SetChapterOptions(self, start, end):
     """Sets chapter options for Encode.  Should not be called directly.
 
+    The chapter range of an earlier encode is cleared when no range is given,
+    as encodes run one after another on the same options.
+
     Args:
       start: Integer chapter start or None.
       end: Integer chapter end or None.
@@ -250,6 +435,8 @@ class HandBrake(object):
             'start (%s) must be less than end (%s).' % (start, end))
       else:
         self.options.file_chapters.SetValue('%s-%s' % (start, end))
+    else:
+      self.options.file_chapters.SetValue(self.options.file_chapters.default)
 
   def _SetEncodeOptions(self, source, output, title):
     """Sets encoding options for Encode.  Should not be called directly.
@@ -286,6 +473,11 @@ class HandBrake(object):
     exists.  Using the 'longest' option will disable start and end options.
     Both start and end options must be specified if either is used.
 
+    HandBrakeCLI writes to a partial file beside the output file, which is
+    renamed to the output file only once the encode succeeds.  An encode cut
+    off by a crash never leaves an output file that blocks encoding it again,
+    so an existing output file is reported as already encoded.
+
     Args:
       source: String full path to input directory.
       output: String full path to output file.
@@ -294,6 +486,9 @@ class HandBrake(object):
       start: Integer chapter start, inclusive.  Default None (all chapters).
       end: Integer chapter end, inclusive.  Default None (all chapters).
 
+    Progress of the encode is tracked in self.progress, and a summary of the
+    encoding rates is added to the encode log.
+
     Returns:
       A tuple (<Boolean success>, <datetime.timedelta execution_time>,
       <Integer/String title_encoded>, <list encode_log>).
@@ -303,22 +498,108 @@ class HandBrake(object):
       ValueError: If start/end values were invalid.
       EncodeError: If the encoding failed for some reason.
     """
+    output = abs_path.AbsPath(output)
+    partial = '%s.partial%s' % os.path.splitext(output)
     self._SetChapterOptions(start, end)
-    self._SetEncodeOptions(source, output, title)
-    success = False
-    execution_time = 0
+    self._SetEncodeOptions(source, partial, title)
+    execution_time = datetime.timedelta(0)
     log = []
 
-    if not os.path.exists(abs_path.AbsPath(output)):
+    if not os.path.exists(output):
+      self.progress = progress.ProgressTracker(
+          title, self._progress_callbacks, source)
       start_time = datetime.datetime.now()
-      self._Execute(self.options.all)
+      self._encodes_lock.acquire()
+      try:
+        self._encodes.append(self.progress)
+      finally:
+        self._encodes_lock.release()
+      try:
+        self._Execute(self.options.all, self.progress.ProcessLine)
+        if os.path.exists(partial):
+          os.rename(partial, output)
+      finally:
+        self._encodes_lock.acquire()
+        try:
+          self._encodes.remove(self.progress)
+        finally:
+          self._encodes_lock.release()
+        if os.path.exists(partial):
+          os.remove(partial)
       execution_time = datetime.datetime.now() - start_time
-      success = True
       log.extend(self._log)
+      log.extend(self.progress.Summary())
     else:
       log.append('Title (%s) Will not overwrite output file: %s.' %
                  (title, output))
-    return (success, execution_time, title, log)
+    return (True, execution_time, title, log)
+
+  def _DetectCpus(self):
+    """Returns the Integer number of online CPU's, or 1 if unknown."""
+    try:
+      cpus = int(os.sysconf('SC_NPROCESSORS_ONLN'))
+    except (AttributeError, ValueError, OSError):
+      cpus = 1
+    return max(cpus, 1)
+
+  def _CpuBudget(self, workers):
+    """Determines the number of CPU's each concurrent encode may use.
+
+    The CPU's configured with general_cpu (or all online CPU's, if not
+    configured) are split evenly between the workers.
+
+    Args:
+      workers: Integer number of concurrent encodes.
+
+    Returns:
+      Integer number of CPU's for each encode, at least 1.
+    """
+    cpus = self.options.general_cpu.value or self._DetectCpus()
+    return max(cpus // max(workers, 1), 1)
+
+  def _Clone(self, options):
+    """Creates a HandBrake object to run HandBrakeCLI in another thread.
+
+    Args:
+      options: handbrake_options.Options snapshot to use.  The snapshot is owned
+        by the clone, and modified by it.
+
+    Returns:
+      HandBrake object sharing this object's binary location and caches.
+    """
+    clone = HandBrake(self._critical_version)
+    clone._location = self._location
+    clone.scan_cache = self.scan_cache
+    clone.version_cache = self.version_cache
+    clone.options = options
+    clone.tolerant = self.tolerant
+    return clone
+
+  def _CreateWorker(self, options, cpus):
+    """Creates a HandBrake object to run a single concurrent encode.
+
+    Args:
+      options: handbrake_options.Options snapshot to encode with.  The
+        snapshot is owned by the worker, and modified by it.
+      cpus: Integer number of CPU's the worker may use.
+
+    Returns:
+      HandBrake object sharing this object's binary location and caches.
+    """
+    worker = self._Clone(options)
+    worker._progress_callbacks = self._progress_callbacks
+    worker._encodes = self._encodes
+    worker._encodes_lock = self._encodes_lock
+    worker.options.general_cpu.SetValue(cpus)
+    return worker
+
+  def _CreateScanner(self):
+    """Creates a HandBrake object to scan DVD sources in the background.
+
+    Returns:
+      HandBrake object sharing this object's binary location and caches.
+    """
+    return self._Clone(copy.deepcopy(self.options))
 
   def EncodeAll(self, source, output_dir, time_limit=None):
     """Encodes all titles for a dvd.
@@ -330,32 +611,511 @@ class HandBrake(object):
     Files will be stored as: output/input-#.format.  Format is determined from
     the handbrake format option.
 
-    time_limit should only use hours, minutes, seconds.  Create an object with
-    the year, month and day set to 1.  For a 2 minute time_limit:
-    datetime.datetime(1, 1, 1, 0, 2, 0)
+    Titles are encoded concurrently when self.workers is greater than 1.
 
     Args:
       source: String full path to input directory.
       output_dir: String full path to output directory.
-      time_limit: datetime.datetime object time limit in seconds.  Any title
-        shorter than this number will be ignored.
+      time_limit: Integer time limit in seconds.  Any title shorter than this
+        number will be ignored.
 
     Returns:
       A list of tuples, (<Boolean success>, <datetime.timedelta execution_time>,
       <Integer/String title_encoded>, <list encode_log>).
     """
-    skip_string = 'Skipping Title %s (%s), shorter than %s.'
-    results = []
+    pool = EncodePool(self, self.workers)
     self.GetDvdInformation(source)
+    positions = self.SubmitAll(pool, source, output_dir, time_limit)
+    results = pool.Join()
+    return [results[position] for position in positions]
+
+  def OptionsFingerprint(self):
+    """Fingerprints the options that determine how titles are encoded.
+
+    Options naming the source, title, chapters and output file, and options
+    that do not change the encoded output, are not included.
+
+    Returns:
+      String hex digest of the encoding options.
+    """
+    excluded = [self.options.general_update, self.options.general_verbose,
+                self.options.general_cpu, self.options.file_input,
+                self.options.file_title, self.options.file_longest_title,
+                self.options.file_chapters, self.options.file_output]
+    command = []
+    for option in self.options.all:
+      if option not in excluded:
+        command.extend([str(argument) for argument in option.Command()])
+    return hashlib.sha1('\0'.join(command)).hexdigest()
+
+  def EstimateCost(self, title):
+    """Estimates the relative cost of encoding a title.
+
+    The cost is the number of kilobits encoded (duration * video bitrate *
+    passes), plus the number of DVD blocks read for the title.  With constant
+    quality encodes the default video bitrate is assumed.
+
+    Args:
+      title: dvd.Title object to estimate.
+
+    Returns:
+      Integer relative cost of encoding the title.
+    """
+    bitrate = (self.options.video_bitrate.value or
+               self.options.video_bitrate.default)
+    passes = 1
+    if self.options.video_two_pass.value:
+      passes = 2
+    return title.duration * bitrate * passes + title.cell_blocks
+
+  def SkipResult(self, title, time_limit):
+    """Returns the encode result of a title skipped for being too short.
+
+    Args:
+      title: dvd.Title object skipped.
+      time_limit: Integer time limit in seconds the title is shorter than.
+
+    Returns:
+      Tuple encode result, in the form returned by Encode.
+    """
+    return (False, datetime.timedelta(0, 0, 0), title.number,
+            ['Skipping Title %s (%s), shorter than %s.' %
+             (title.number, title.GetDuration(),
+              dvd.FormatDuration(time_limit))])
+
+  def DuplicateResult(self, title, originals):
+    """Returns the encode result of a title skipped for duplicating others.
+
+    Args:
+      title: dvd.Title object skipped.
+      originals: List of Integer title numbers playing the same content.
+
+    Returns:
+      Tuple encode result, in the form returned by Encode.
+    """
+    return (False, datetime.timedelta(0, 0, 0), title.number,
+            ['Skipping Title %s (%s), duplicates Title %s.' %
+             (title.number, title.GetDuration(),
+              ', '.join([str(original) for original in originals]))])
+
+  def SubmitAll(self, pool, source, output_dir, time_limit=None, resume=None):
+    """Submits all titles of the current dvd to an EncodePool.
+
+    Titles are named and skipped as in EncodeAll, and submitted with their
+    estimated cost, so the pool encodes the most expensive titles first.
+    When skip_duplicates is set, titles that only play content found in other
+    titles are skipped.  GetDvdInformation must be called for the source first.
+
+    Args:
+      pool: EncodePool to submit titles to.
+      source: String full path to input directory.
+      output_dir: String full path to output directory.
+      time_limit: Integer time limit in seconds.  Any title shorter than this
+        number will be ignored.
+      resume: Function taking (<String source>, <Integer title>, <String
+        output_file>) arguments, returning the encode result of a title that
+        was already encoded by an earlier run, or None to encode the title.
+        Default None (encode all titles).
+
+    Raises:
+      ScanError: If the chapters of a title can not be parsed.
+
+    Returns:
+      List of Integer positions of each title's result in the list returned by
+      the pool's Join method.
+    """
+    positions = []
+    duplicates = {}
+    if self.skip_duplicates:
+      try:
+        duplicates = self.dvd.FindDuplicates()
+      except dvd.Error, error:
+        raise ScanError('Scan of %s not parsed: %s' % (source, error))
     for title in self.dvd.titles:
       if time_limit and title.duration < time_limit:
-        limit_length = str(time_limit.time())
-        results.append(
-            (False, datetime.timedelta(0, 0, 0), title.number,
-             [skip_string % (title.number, title.GetDuration(), limit_length)]))
+        positions.append(pool.AddResult(self.SkipResult(title, time_limit)))
+        continue
+      if title.number in duplicates:
+        positions.append(pool.AddResult(
+            self.DuplicateResult(title, duplicates[title.number])))
         continue
       output_file = ('%s%s [Title %s].%s' %
                      (abs_path.AbsPath(output_dir), self.dvd.name, title.number,
                       self.options.file_format.value))
-      results.append(self.Encode(source, output_file, title.number))
-    return results
+      result = resume and resume(source, title.number, output_file)
+      if result:
+        positions.append(pool.AddResult(result))
+        continue
+      positions.append(pool.Submit(source, output_file, title.number,
+                                   cost=self.EstimateCost(title)))
+    return positions
+
+
+class EncodePool(object):
+  """Runs HandBrake encodes on a pool of worker threads.
+
+  Each job is encoded by its own HandBrake object, using a snapshot of the
+  parent HandBrake object's options taken when the job is submitted.  The
+  CPU's available to HandBrakeCLI are split evenly between the workers, so
+  concurrent encodes do not oversubscribe the machine.
+
+  Pending jobs are encoded most expensive first (longest processing time
+  first), so a long title is not left encoding alone at the end of a run while
+  the other workers are idle.  With a single worker, jobs are encoded
+  immediately by the parent HandBrake object when submitted.
+
+  Attributes:
+    workers: Integer number of encodes to run at once.
+    _handbrake: HandBrake object that jobs are encoded for.
+    _callbacks: List of functions called when jobs start and finish encoding.
+    _cpus: Integer number of CPU's each worker may use.
+    _jobs: List heap of pending (<int negative cost>, <int sequence>,
+      <tuple job>) entries.
+    _results: List of encode results, in the order jobs were submitted.
+    _finished: Set of Integer positions of results that are complete.
+    _submitted: Dictionary mapping Integer positions to submitted job tuples,
+      (source, output, title[, start, end]).
+    _errors: List of (<int sequence>, <tuple exc_info>) for failed jobs.
+    _threads: List of worker threading.Thread objects.
+    _condition: threading.Condition protecting the pool state.
+    _closed: Boolean True once no more jobs will be submitted.
+  """
+
+  def __init__(self, handbrake, workers=1):
+    """Initializes EncodePool.
+
+    Args:
+      handbrake: HandBrake object to encode jobs for.  Must be connected.
+      workers: Integer number of encodes to run at once.  Default 1.
+    """
+    self.workers = max(workers, 1)
+    self._handbrake = handbrake
+    self._callbacks = []
+    self._cpus = None
+    self._jobs = []
+    self._results = []
+    self._finished = set()
+    self._submitted = {}
+    self._errors = []
+    self._threads = []
+    self._condition = threading.Condition()
+    self._closed = False
+
+  def AddCallback(self, callback):
+    """Adds a function to call when a job starts and finishes encoding.
+
+    Callbacks are called from the thread encoding the job, with the job tuple
+    (source, output, title[, start, end]) and the job's encode result, which is
+    None when the job starts.  An exception raised by a callback fails the job.
+
+    Args:
+      callback: Function taking (<tuple job>, <tuple result>) arguments.
+    """
+    self._callbacks.append(callback)
+
+  def _Notify(self, job, result):
+    """Calls the job callbacks.
+
+    Args:
+      job: Tuple (source, output, title[, start, end]) of the job.
+      result: Tuple encode result of the job, or None if it is starting.
+    """
+    for callback in self._callbacks:
+      callback(job, result)
+
+  def Submit(self, source, output, title, start=None, end=None, cost=0):
+    """Submits a title to be encoded.
+
+    Arguments are the same as HandBrake.Encode, with the job's cost.
+
+    Args:
+      source: String full path to input directory.
+      output: String full path to output file.
+      title: Integer/String title number to encode.
+      start: Integer chapter start, inclusive.  Default None (all chapters).
+      end: Integer chapter end, inclusive.  Default None (all chapters).
+      cost: Integer estimated cost of the job, see HandBrake.EstimateCost.
+        Default 0.
+
+    Returns:
+      Integer position of this job's result in the list returned by Join.
+    """
+    job = (source, output, title)
+    if start is not None or end is not None:
+      job += (start, end)
+    if self.workers == 1:
+      self._Notify(job, None)
+      result = self._handbrake.Encode(*job)
+      self._Notify(job, result)
+      position = self.AddResult(result)
+      self._submitted[position] = job
+      return position
+    if self._cpus is None:
+      self._cpus = self._handbrake._CpuBudget(self.workers)
+    options = copy.deepcopy(self._handbrake.options)
+    self._condition.acquire()
+    try:
+      sequence = len(self._results)
+      self._results.append(None)
+      self._submitted[sequence] = job
+      heapq.heappush(self._jobs, (-cost, sequence, (options, job)))
+      if len(self._threads) < self.workers:
+        thread = threading.Thread(target=self._Work)
+        thread.setDaemon(True)
+        self._threads.append(thread)
+        thread.start()
+      self._condition.notify()
+    finally:
+      self._condition.release()
+    return sequence
+
+  def AddResult(self, result):
+    """Adds the result of a job that did not need encoding.
+
+    Args:
+      result: Tuple encode result, in the form returned by HandBrake.Encode.
+
+    Returns:
+      Integer position of the result in the list returned by Join.
+    """
+    self._condition.acquire()
+    try:
+      self._results.append(result)
+      self._finished.add(len(self._results) - 1)
+      return len(self._results) - 1
+    finally:
+      self._condition.release()
+
+  def GetJob(self, position):
+    """Returns the job submitted at a position.
+
+    Args:
+      position: Integer job position, as returned by Submit or AddResult.
+
+    Returns:
+      Tuple (source, output, title[, start, end]) of the arguments the job was
+      submitted with, or None if the position was added with AddResult.
+    """
+    return self._submitted.get(position)
+
+  def Collect(self, positions):
+    """Returns the results of a group of jobs, if they have all finished.
+
+    Args:
+      positions: List of Integer job positions, as returned by Submit.
+
+    Returns:
+      List of encode results for the positions, or None if any of the jobs have
+      not finished encoding.
+    """
+    self._condition.acquire()
+    try:
+      for position in positions:
+        if position not in self._finished:
+          return None
+      return [self._results[position] for position in positions]
+    finally:
+      self._condition.release()
+
+  def Cancel(self):
+    """Discards all jobs that have not started encoding.
+
+    Discarded jobs have a result of None.
+    """
+    self._condition.acquire()
+    try:
+      self._jobs = []
+      self._condition.notifyAll()
+    finally:
+      self._condition.release()
+
+  def Join(self):
+    """Waits for all submitted jobs to finish encoding.
+
+    Raises:
+      Error: The first error raised while encoding a job.  Jobs that had not
+        started when the error occurred are not encoded.
+
+    Returns:
+      A list of tuples, (<Boolean success>, <datetime.timedelta execution_time>,
+      <Integer/String title_encoded>, <list encode_log>), in the order jobs were
+      submitted.
+    """
+    self._condition.acquire()
+    try:
+      self._closed = True
+      self._condition.notifyAll()
+    finally:
+      self._condition.release()
+    for thread in self._threads:
+      thread.join()
+    if self._errors:
+      self._errors.sort()
+      error = self._errors[0][1]
+      raise error[0], error[1], error[2]
+    return self._results
+
+  def _Work(self):
+    """Encodes jobs from the pool until it is closed and empty."""
+    while True:
+      self._condition.acquire()
+      try:
+        while not self._jobs and not self._closed:
+          self._condition.wait()
+        if not self._jobs or self._errors:
+          return
+        cost, sequence, (options, job) = heapq.heappop(self._jobs)
+      finally:
+        self._condition.release()
+      try:
+        self._Notify(job, None)
+        result = self._handbrake._CreateWorker(options, self._cpus).Encode(*job)
+        self._Notify(job, result)
+      except Exception:
+        self._condition.acquire()
+        try:
+          self._errors.append((sequence, sys.exc_info()))
+        finally:
+          self._condition.release()
+        continue
+      self._condition.acquire()
+      try:
+        self._results[sequence] = result
+        self._finished.add(sequence)
+      finally:
+        self._condition.release()
+
+
+class ScanPrefetcher(object):
+  """Scans DVD sources in the background, ahead of the source being processed.
+
+  Scans are mostly I/O bound, and encodes CPU bound.  Iterating over a
+  ScanPrefetcher yields each source in turn, while a background thread scans
+  up to depth of the following sources into the shared scan cache.  A
+  HandBrake.GetDvdInformation call for a yielded source is then answered from
+  the scan cache, instead of waiting for HandBrakeCLI.
+
+  A source is not yielded while it is being scanned in the background.
+  Background scan errors are ignored; the source is scanned again, and the
+  error raised, when GetDvdInformation is called for it.  Any other exception
+  raised by a background scan is raised when its source is reached.
+
+  Attributes:
+    depth: Integer number of sources to scan ahead.
+    _handbrake: HandBrake object that sources are processed with.
+    _sources: List of String full paths to DVD sources.
+    _position: Integer index of the source being processed.
+    _next: Integer index of the next source to scan in the background.
+    _scanning: String source being scanned in the background, or None.
+    _errors: Dictionary mapping String sources to the sys.exc_info() of
+      exceptions raised scanning them in the background.
+    _stopped: Boolean True once the background thread should exit.
+    _condition: threading.Condition protecting the prefetch state.
+  """
+
+  def __init__(self, handbrake, sources, depth=1):
+    """Initializes ScanPrefetcher.
+
+    Args:
+      handbrake: HandBrake object the sources are processed with.  Must be
+        connected.
+      sources: List of String full paths to DVD sources.
+      depth: Integer number of sources to scan ahead.  Default 1.
+    """
+    self.depth = depth
+    self._handbrake = handbrake
+    self._sources = list(sources)
+    self._position = 0
+    self._next = 1
+    self._scanning = None
+    self._errors = {}
+    self._stopped = False
+    self._condition = threading.Condition()
+
+  def __iter__(self):
+    """Yields each source, scanning ahead while it is processed."""
+    self.Start()
+    try:
+      for position, source in enumerate(self._sources):
+        self._Advance(position, source)
+        yield source
+    finally:
+      self.Stop()
+
+  def Start(self):
+    """Starts scanning ahead in the background, if there is anything to scan."""
+    if self.depth > 0 and len(self._sources) > 1:
+      thread = threading.Thread(target=self._Work,
+                                args=(self._handbrake._CreateScanner(),))
+      thread.setDaemon(True)
+      thread.start()
+
+  def Stop(self):
+    """Stops scanning ahead once the current background scan finishes."""
+    self._condition.acquire()
+    try:
+      self._stopped = True
+      self._condition.notifyAll()
+    finally:
+      self._condition.release()
+
+  def _Advance(self, position, source):
+    """Moves the scan window, and waits for a source's background scan.
+
+    Args:
+      position: Integer index of the source about to be processed.
+      source: String source about to be processed.
+
+    Raises:
+      Exception: The exception raised scanning the source in the background,
+        other than a HandBrake Error.
+    """
+    self._condition.acquire()
+    try:
+      self._position = position
+      self._next = max(self._next, position + 1)
+      self._condition.notifyAll()
+      while self._scanning == source:
+        self._condition.wait()
+      error = self._errors.pop(source, None)
+    finally:
+      self._condition.release()
+    if error:
+      error_type, error, error_traceback = error
+      raise error_type, error, error_traceback
+
+  def _Work(self, scanner):
+    """Scans sources ahead of the current position until stopped.
+
+    Args:
+      scanner: HandBrake object to scan sources with.
+    """
+    while True:
+      self._condition.acquire()
+      try:
+        while (not self._stopped and self._next < len(self._sources) and
+               self._next > self._position + self.depth):
+          self._condition.wait()
+        if self._stopped or self._next >= len(self._sources):
+          return
+        self._scanning = self._sources[self._next]
+        self._next += 1
+      finally:
+        self._condition.release()
+      error = None
+      try:
+        try:
+          scanner.GetDvdInformation(self._scanning)
+        except Error:
+          pass
+        except Exception:
+          error = sys.exc_info()
+      finally:
+        self._condition.acquire()
+        try:
+          if error:
+            self._errors[self._scanning] = error
+          self._scanning = None
+          self._condition.notifyAll()
+        finally:
+          self._condition.release()
@@ -34,9 +34,12 @@ here: http://code.google.com/p/pymox/wiki/MoxDocumentation.
 __author__ = 'Robert M. Pufky (robert.pufky@gmail.com)'
 
 import datetime
+import heapq
 import os
+import shutil
 import subprocess
 import tempfile
+import threading
 import unittest
 import abs_path
 import dvd
@@ -58,14 +61,12 @@ class BaseHandBrakeTest(unittest.TestCase):
     self.mox = mox.Mox()
     self.real_os_path = handbrake.os.path
     self.real_subprocess = handbrake.subprocess
-    self.real_tempfile = handbrake.tempfile
     self.real_abs_path = handbrake.abs_path
 
   def tearDown(self):
     self.mox.UnsetStubs()
     handbrake.os.path = self.real_os_path
     handbrake.subprocess = self.real_subprocess
-    handbrake.tempfile = self.real_tempfile
     handbrake.abs_path = self.real_abs_path
 
 
@@ -89,6 +90,17 @@ class TestHandBrakeBasic(BaseHandBrakeTest):
     self.mox.VerifyAll()
     self.assertEquals(self.interface._location, binary)
 
+  def testConnectAgain(self):
+    """Verifies Connect re-uses the connected binary location."""
+    self.interface._location = 'HandBrakeCLI'
+    self.mox.StubOutWithMock(self.interface, '_FindBinaryLocation')
+    self.mox.StubOutWithMock(self.interface, '_CheckVersion')
+    self.interface._CheckVersion()
+    self.mox.ReplayAll()
+    self.interface.Connect()
+    self.mox.VerifyAll()
+    self.assertEquals(self.interface._location, 'HandBrakeCLI')
+
   def testValidateOptions(self):
     """Verifies options are validated properly."""
     self.assertFalse(self.interface._ValidateOptions([1, 2, 3]))
@@ -96,13 +108,28 @@ class TestHandBrakeBasic(BaseHandBrakeTest):
     self.assertTrue(
         self.interface._ValidateOptions(self.interface.options.all))
 
-  def testWriteLog(self):
-    """Verifies a log file is written correctly."""
-    log = ['log\n',
-           '\rEncoding: task 2 of 3, 99.74 %\rEncoding: task 2 of 3 ...\n',
-           'log\n']
-    self.interface._WriteLog(log)
-    self.assertEqual(self.interface._log, ['log\n', 'log\n'])
+  def testWriteLine(self):
+    """Verifies log lines are written correctly."""
+    for line in ['log', 'Encoding: task 2 of 3, 99.74 %', 'log']:
+      self.interface._WriteLine(line)
+    self.assertEqual(self.interface._log, ['log', 'log'])
+
+  def testWriteLineTail(self):
+    """Verifies only the tail of the log is kept."""
+    for line in xrange(5010):
+      self.interface._WriteLine(str(line))
+    self.assertEqual(len(self.interface._log), 5000)
+    self.assertEqual(self.interface._log[0], '10')
+    self.assertEqual(self.interface._log[-1], '5009')
+
+  def testLineCallbacks(self):
+    """Verifies line callbacks are registered and removed."""
+    callback = lambda line: None
+    self.interface.AddLineCallback(callback)
+    self.assertEqual(self.interface._callbacks, [callback])
+    self.interface.RemoveLineCallback(callback)
+    self.assertEqual(self.interface._callbacks, [])
+    self.assertRaises(ValueError, self.interface.RemoveLineCallback, callback)
 
   def testSetChapterOptions(self):
     """Verifies valid chapter options are set correctly."""
@@ -113,6 +140,9 @@ class TestHandBrakeBasic(BaseHandBrakeTest):
     self.assertEqual(self.interface.options.file_chapters.value, '0-1')
     self.interface._SetChapterOptions(1, 1)
     self.assertEqual(self.interface.options.file_chapters.value, '1-1')
+    self.interface._SetChapterOptions(None, None)
+    self.assertEqual(self.interface.options.file_chapters.value,
+                     self.interface.options.file_chapters.default)
 
   def testSetChapterOptionsBad(self):
     """Verifies invalid options are handled properly."""
@@ -182,6 +212,45 @@ class TestHandBrakeCheckVersion(BaseHandBrakeTest):
     self.interface._CheckVersion()
     self.mox.VerifyAll()
 
+  def testCheckVersionCached(self):
+    """Verifies the version banner is cached until the binary changes."""
+    binary = tempfile.NamedTemporaryFile()
+    self.interface._location = binary.name
+    self.interface._log = [
+        'HandBrake 0.9.3 (2008112300) - http://handbrake.fr/']
+    self.mox.ReplayAll()
+    self.interface._CheckVersion()
+    self.interface._log = []
+    self.interface._CheckVersion()
+    self.mox.VerifyAll()
+    binary.write('changed')
+    binary.flush()
+    self.mox.ResetAll()
+    self.interface._Execute(mox.IsA(list))
+    self.mox.ReplayAll()
+    self.assertRaises(handbrake.VersionError, self.interface._CheckVersion)
+    self.mox.VerifyAll()
+    binary.close()
+
+  def testCheckVersionBanner(self):
+    """Verifies the banner is found among other output before it is cached."""
+    self.mox.StubOutWithMock(self.interface, 'version_cache')
+    self.interface.version_cache.Fingerprint(None).AndReturn((1, 2))
+    self.interface.version_cache.Get(None, (1, 2)).AndReturn(None)
+    self.interface.version_cache.Put(
+        None, (1, 2), 'HandBrake 0.9.3 (2008112300) - http://handbrake.fr/')
+    self.interface.version_cache.Fingerprint(None).AndReturn((1, 2))
+    self.interface.version_cache.Get(None, (1, 2)).AndReturn(None)
+    self.interface._Execute(mox.IsA(list))
+    self.mox.ReplayAll()
+    self.interface._log = [
+        'Checking for updates...',
+        'HandBrake 0.9.3 (2008112300) - http://handbrake.fr/']
+    self.interface._CheckVersion()
+    self.interface._log = ['Checking for updates...']
+    self.assertRaises(handbrake.VersionError, self.interface._CheckVersion)
+    self.mox.VerifyAll()
+
   def testInvalidCheckVersion(self):
     """Verifies an invalid version for _CheckVersion is caught correctly."""
     self.interface._Execute(mox.IsA(list))
@@ -198,73 +267,113 @@ class TestHandBrakeCheckVersion(BaseHandBrakeTest):
     self.mox.VerifyAll()
 
 
+class FakeProcess(object):
+  """Stand-in for subprocess.Popen, with a real pipe for output."""
+
+  def __init__(self, stdout='', results=0):
+    read_fd, write_fd = os.pipe()
+    os.write(write_fd, stdout)
+    os.close(write_fd)
+    self.stdout = os.fdopen(read_fd, 'rb')
+    self.pid = -1
+    self.results = results
+
+  def wait(self):
+    return self.results
+
+
 class TestHandBrakeExecute(BaseHandBrakeTest):
   """Verifies the HandBrake._Execute method works properly."""
 
   def setUp(self):
     BaseHandBrakeTest.setUp(self)
-    self.subprocess = self.mox.CreateMock(subprocess)
-    self.tempfile = self.mox.CreateMockAnything()
+    handbrake.subprocess = self.mox.CreateMock(subprocess)
+    handbrake.subprocess.PIPE = subprocess.PIPE
+    handbrake.subprocess.STDOUT = subprocess.STDOUT
     self.interface = handbrake.HandBrake()
+    self.interface._location = '/usr/bin/HandBrakeCLI'
+    self.lines = []
+    self.interface.AddLineCallback(self.lines.append)
 
-  def GenericExecuteTestSetup(self, results=0, raise_exception=False):
+  def GenericExecuteTestSetup(self, process=None, raise_exception=False):
     """Generic test setup for _Execute.
 
     Args:
-      results: Integer subprocess execute results.
+      process: FakeProcess to return from subprocess.Popen.
       raise_exception: Boolean True to raise a subprocess exception.  Overrides
-        results values.
+        process.
     """
+    popen = handbrake.subprocess.Popen(mox.IsA(list),
+                                       stdout=subprocess.PIPE,
+                                       stderr=subprocess.STDOUT,
+                                       shell=False)
     if raise_exception:
-      self.subprocess.call(mox.IsA(list),
-                           stdout=mox.IgnoreArg(),
-                           stderr=mox.IgnoreArg(),
-                           shell=False).AndRaise(OSError)
+      popen.AndRaise(OSError)
     else:
-      self.subprocess.call(mox.IsA(list),
-                           stdout=mox.IgnoreArg(),
-                           stderr=mox.IgnoreArg(),
-                           shell=False).AndReturn(results)
-    handbrake.subprocess = self.subprocess
-    handbrake.tempfile = self.mox.CreateMock(tempfile)
-    self.interface = handbrake.HandBrake()
-    self.mox.StubOutWithMock(self.interface, '_CheckVersion')
-    self.interface._CheckVersion()
-    handbrake.tempfile.TemporaryFile().AndReturn(self.tempfile)
-
-  def GenericTempFileSetup(self):
-    """Generic test setup for faking tempfile usage."""
-    self.tempfile.seek(0)
-    self.tempfile.readlines().AndReturn('')
-    self.tempfile.close()
+      popen.AndReturn(process)
 
   def testExecute(self):
     """Verifies the _Execute method works properly."""
-    self.GenericExecuteTestSetup(results=0)
-    self.GenericTempFileSetup()
+    self.GenericExecuteTestSetup(FakeProcess(
+        'HandBrake 0.9.3\n\nEncoding: task 1 of 1, 1.00 %\r'
+        'Scanning title 1...\nEncoding: task 1 of 1, 2.0\rlast'))
     self.mox.ReplayAll()
-    self.interface.Connect()
     self.interface._Execute(self.interface.options.all)
     self.mox.VerifyAll()
+    self.assertEqual(self.interface._log,
+                     ['HandBrake 0.9.3', 'Scanning title 1...', 'last'])
+    self.assertEqual(self.lines, [
+        'HandBrake 0.9.3', 'Encoding: task 1 of 1, 1.00 %',
+        'Scanning title 1...', 'Encoding: task 1 of 1, 2.0', 'last'])
+
+  def testExecuteCallback(self):
+    """Verifies a per execution callback receives output."""
+    lines = []
+    self.GenericExecuteTestSetup(FakeProcess('one\r\ntwo\n'))
+    self.mox.ReplayAll()
+    self.interface._Execute(self.interface.options.all, lines.append)
+    self.mox.VerifyAll()
+    self.assertEqual(lines, ['one', 'two'])
+    self.assertEqual(len(self.lines), 2)
+
+  def testExecuteCallbackError(self):
+    """Verifies HandBrakeCLI is terminated if a callback raises."""
+    def Callback(line):
+      raise ValueError(line)
+    self.GenericExecuteTestSetup(FakeProcess('one\ntwo\n'))
+    self.mox.StubOutWithMock(handbrake.os, 'kill')
+    handbrake.os.kill(-1, handbrake.signal.SIGTERM)
+    self.mox.ReplayAll()
+    self.assertRaises(ValueError, self.interface._Execute,
+                      self.interface.options.all, Callback)
+    self.mox.VerifyAll()
+
+  def testExecuteLargeOutput(self):
+    """Verifies output larger than a pipe buffer is read while running."""
+    self.GenericExecuteTestSetup(FakeProcess(
+        ''.join(['line %s\n' % line for line in xrange(1000)])))
+    self.mox.ReplayAll()
+    self.interface._Execute(self.interface.options.all)
+    self.mox.VerifyAll()
+    self.assertEqual(len(self.interface._log), 1000)
+    self.assertEqual(self.interface._log[-1], 'line 999')
 
   def testExecuteException(self):
     """Verifies the _Execute method catches OSError correctly."""
     self.GenericExecuteTestSetup(raise_exception=True)
     self.mox.ReplayAll()
-    self.interface.Connect()
     self.assertRaises(handbrake.ExecuteError, self.interface._Execute,
                       self.interface.options.all)
     self.mox.VerifyAll()
 
   def testExecuteFailure(self):
     """Verifies the _Execute method fails correctly."""
-    self.GenericExecuteTestSetup(results=1)
-    self.GenericTempFileSetup()
+    self.GenericExecuteTestSetup(FakeProcess('failed\n', results=1))
     self.mox.ReplayAll()
-    self.interface.Connect()
     self.assertRaises(handbrake.ExecuteError, self.interface._Execute,
                       self.interface.options.all)
     self.mox.VerifyAll()
+    self.assertEqual(self.interface._log, ['failed'])
 
   def testExecuteNoOptions(self):
     """Verifies no options passed to _Execute fails properly."""
@@ -279,19 +388,98 @@ class TestHandBrakeGetDvdInformation(BaseHandBrakeTest):
     handbrake.abs_path = self.mox.CreateMock(abs_path)
     self.interface = handbrake.HandBrake()
     self.file = '/my/file'
+    self.fingerprint = (('VIDEO_TS.IFO', 12288, 1275177600),)
+    self.scanned = self.fingerprint + (('tolerant', False),)
     self.executeoptions = [mox.IsA(options.StringOption),
                            mox.IsA(options.RangeOption)]
 
   def testGetDvdInformation(self):
     """Verifies GetDvdInformation works properly."""
+    scanned_dvd = self.mox.CreateMock(dvd.Dvd)
+    self.mox.StubOutWithMock(self.interface, '_Execute')
+    self.mox.StubOutWithMock(self.interface, 'scan_cache')
+    self.mox.StubOutWithMock(handbrake.dvd, 'Dvd')
+    handbrake.abs_path.AbsPath(self.file).AndReturn(self.file)
+    self.interface.scan_cache.Fingerprint(self.file).AndReturn(self.fingerprint)
+    self.interface.scan_cache.Get(self.file, self.scanned).AndReturn(None)
+    handbrake.dvd.Dvd(tolerant=False).AndReturn(scanned_dvd)
+    self.interface._Execute(self.executeoptions, mox.IgnoreArg())
+    scanned_dvd.FinishHandbrakeAnalysis()
+    self.interface.scan_cache.Put(self.file, self.scanned, scanned_dvd)
+    self.mox.ReplayAll()
+    self.interface.GetDvdInformation(self.file)
+    self.mox.VerifyAll()
+    self.assertEqual(self.interface.dvd, scanned_dvd)
+
+  def testGetDvdInformationStreaming(self):
+    """Verifies the scan is parsed as HandBrakeCLI output is read."""
+    def Execute(options, callback):
+      for line in ['Opening /my/file/VIDEO_TS...', '+ title 1:',
+                   '  + duration: 01:02:03', 'HandBrake has exited.']:
+        callback(line)
+    self.interface._Execute = Execute
+    self.mox.StubOutWithMock(self.interface, 'scan_cache')
+    handbrake.abs_path.AbsPath(self.file).AndReturn(self.file)
+    self.interface.scan_cache.Fingerprint(self.file).AndReturn(self.fingerprint)
+    self.interface.scan_cache.Get(self.file, self.scanned).AndReturn(None)
+    self.interface.scan_cache.Put(self.file, self.scanned, mox.IsA(dvd.Dvd))
+    self.mox.ReplayAll()
+    self.interface.GetDvdInformation(self.file)
+    self.mox.VerifyAll()
+    self.assertEqual([title.number for title in self.interface.dvd.titles], [1])
+    self.assertEqual(self.interface.dvd.titles[0].GetDuration(), '01:02:03')
+
+  def testGetDvdInformationTolerant(self):
+    """Verifies a tolerant scan skips lines that can not be parsed."""
+    def Execute(options, callback):
+      for line in ['+ title 1:', '  + duration: 01:02:03', '  + chapters:',
+                   '    + 1: cells 0->0, blocks, duration 00:00:01',
+                   'HandBrake has exited.']:
+        callback(line)
+    self.interface._Execute = Execute
+    self.interface.tolerant = True
+    self.mox.StubOutWithMock(self.interface, 'scan_cache')
+    handbrake.abs_path.AbsPath(self.file).AndReturn(self.file)
+    self.interface.scan_cache.Fingerprint(self.file).AndReturn(self.fingerprint)
+    tolerant = self.fingerprint + (('tolerant', True),)
+    self.interface.scan_cache.Get(self.file, tolerant).AndReturn(None)
+    self.interface.scan_cache.Put(self.file, tolerant, mox.IsA(dvd.Dvd))
+    self.mox.ReplayAll()
+    self.interface.GetDvdInformation(self.file)
+    self.mox.VerifyAll()
+    self.assertEqual(self.interface.dvd.titles[0].chapters, [])
+    self.assertEqual([number for number, line, reason in
+                      self.interface.dvd.diagnostics.skipped], [4])
+
+  def testGetDvdInformationInvalid(self):
+    """Verifies a scan that can not be parsed raises a ScanError."""
+    def Execute(options, callback):
+      for line in ['+ title 1:', '  + duration: 00:99:00',
+                   'HandBrake has exited.']:
+        callback(line)
+    self.interface._Execute = Execute
+    self.mox.StubOutWithMock(self.interface, 'scan_cache')
+    handbrake.abs_path.AbsPath(self.file).AndReturn(self.file)
+    self.interface.scan_cache.Fingerprint(self.file).AndReturn(self.fingerprint)
+    self.interface.scan_cache.Get(self.file, self.scanned).AndReturn(None)
+    self.mox.ReplayAll()
+    self.assertRaises(handbrake.ScanError, self.interface.GetDvdInformation,
+                      self.file)
+    self.mox.VerifyAll()
+
+  def testGetDvdInformationCached(self):
+    """Verifies a cached scan is used instead of scanning the DVD."""
+    cached_dvd = dvd.Dvd('cached')
     self.mox.StubOutWithMock(self.interface, '_Execute')
-    self.mox.StubOutWithMock(self.interface, 'dvd')
+    self.mox.StubOutWithMock(self.interface, 'scan_cache')
     handbrake.abs_path.AbsPath(self.file).AndReturn(self.file)
-    self.interface._Execute(self.executeoptions)
-    self.interface.dvd.ProcessHandbrakeAnalysis([])
+    self.interface.scan_cache.Fingerprint(self.file).AndReturn(self.fingerprint)
+    self.interface.scan_cache.Get(self.file, self.scanned).AndReturn(
+        cached_dvd)
     self.mox.ReplayAll()
     self.interface.GetDvdInformation(self.file)
     self.mox.VerifyAll()
+    self.assertEqual(self.interface.dvd, cached_dvd)
 
 
 class TestHandBrakeSetEncodeOptions(BaseHandBrakeTest):
@@ -365,17 +553,21 @@ class TestHandBrakeEncode(BaseHandBrakeTest):
     self.mox.StubOutWithMock(self.interface, '_SetEncodeOptions')
     self.mox.StubOutWithMock(self.interface, '_Execute')
     self.file = 'file'
+    self.partial = 'file.partial'
 
   def testEncode(self):
     """Verifies Encode works properly."""
     success = True
     title = 1
     log = []
-    self.interface._SetChapterOptions(None, None)
-    self.interface._SetEncodeOptions(self.file, self.file, 1)
     handbrake.abs_path.AbsPath(self.file).AndReturn(self.file)
+    handbrake.os.path.splitext(self.file).AndReturn((self.file, ''))
+    self.interface._SetChapterOptions(None, None)
+    self.interface._SetEncodeOptions(self.file, self.partial, 1)
     handbrake.os.path.exists(self.file).AndReturn(False)
-    self.interface._Execute(mox.IgnoreArg())
+    self.interface._Execute(mox.IgnoreArg(), mox.IgnoreArg())
+    handbrake.os.path.exists(self.partial).AndReturn(False)
+    handbrake.os.path.exists(self.partial).AndReturn(False)
     self.mox.ReplayAll()
     test_result = self.interface.Encode(self.file, self.file, 1)
     self.assertEqual(test_result[0], success)
@@ -383,13 +575,45 @@ class TestHandBrakeEncode(BaseHandBrakeTest):
     self.assertEqual(test_result[3], log)
     self.mox.VerifyAll()
 
+  def testEncodeProgress(self):
+    """Verifies Encode tracks progress and summarizes encoding rates."""
+    events = []
+    def Execute(options, callback):
+      callback('Encoding: task 1 of 1, 1.00 %')
+      callback('Encoding: task 1 of 1, 2.00 % (20.00 fps, avg 30.00 '
+               'fps, ETA 00h01m40s)')
+      callback('Encoding: task 1 of 1, 3.00 % (40.00 fps, avg 30.00 '
+               'fps, ETA 00h01m20s)')
+    self.interface._Execute = Execute
+    self.interface.AddProgressCallback(
+        lambda source, title, event: events.append(
+            (source, title, event.percent)))
+    handbrake.abs_path.AbsPath(self.file).AndReturn(self.file)
+    handbrake.os.path.splitext(self.file).AndReturn((self.file, ''))
+    self.interface._SetChapterOptions(None, None)
+    self.interface._SetEncodeOptions(self.file, self.partial, 1)
+    handbrake.os.path.exists(self.file).AndReturn(False)
+    handbrake.os.path.exists(self.partial).AndReturn(False)
+    handbrake.os.path.exists(self.partial).AndReturn(False)
+    self.mox.ReplayAll()
+    test_result = self.interface.Encode(self.file, self.file, 1)
+    self.mox.VerifyAll()
+    self.assertEqual(events, [(self.file, 1, 1.0), (self.file, 1, 2.0),
+                              (self.file, 1, 3.0)])
+    self.assertEqual(self.interface._encodes, [])
+    self.assertEqual(self.interface.progress.last.eta, 80)
+    self.assertEqual(test_result[3], [
+        'Task 1 encoding rate: 30.00 fps average, 20.00 fps minimum, '
+        '40.00 fps maximum.'])
+
   def testEncodeExistingFile(self):
-    """Verifies Encode fails if there is an existing output file."""
-    results = (False, 0, 'longest',
+    """Verifies Encode skips an existing output file as already encoded."""
+    results = (True, datetime.timedelta(0), 'longest',
                ['Title (longest) Will not overwrite output file: file.'])
-    self.interface._SetChapterOptions(None, None)
-    self.interface._SetEncodeOptions(self.file, self.file, 'longest')
     handbrake.abs_path.AbsPath(self.file).AndReturn(self.file)
+    handbrake.os.path.splitext(self.file).AndReturn((self.file, ''))
+    self.interface._SetChapterOptions(None, None)
+    self.interface._SetEncodeOptions(self.file, self.partial, 'longest')
     handbrake.os.path.exists(self.file).AndReturn(True)
     self.mox.ReplayAll()
     self.assertEqual(self.interface.Encode(self.file, self.file, 'longest'),
@@ -397,6 +621,77 @@ class TestHandBrakeEncode(BaseHandBrakeTest):
     self.mox.VerifyAll()
 
 
+class TestHandBrakeEncodeResume(unittest.TestCase):
+  """Verifies an encode cut off by a crash is encoded again on resume."""
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.source = os.path.join(self.directory, 'DVD')
+    os.mkdir(self.source)
+    self.output = os.path.join(self.directory, 'DVD-1.mp4')
+    self.partial = os.path.join(self.directory, 'DVD-1.partial.mp4')
+    self.interface = handbrake.HandBrake()
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def Execute(self, crash):
+    """Returns a fake _Execute writing the output option, crashing if set."""
+    def Execute(options, callback):
+      output = open(self.interface.options.file_output.value, 'w')
+      output.write('partial video')
+      output.close()
+      if crash:
+        raise KeyboardInterrupt
+      output = open(self.interface.options.file_output.value, 'w')
+      output.write('video')
+      output.close()
+    return Execute
+
+  def testResume(self):
+    """Verifies interrupted encodes leave no output file behind."""
+    self.interface._Execute = self.Execute(True)
+    self.assertRaises(KeyboardInterrupt, self.interface.Encode, self.source,
+                      self.output, 1)
+    self.assertEqual(os.listdir(self.directory), ['DVD'])
+    open(self.partial, 'w').close()
+    self.interface._Execute = self.Execute(False)
+    self.assertEqual(self.interface.Encode(self.source, self.output, 1)[0],
+                     True)
+    self.assertEqual(sorted(os.listdir(self.directory)), ['DVD', 'DVD-1.mp4'])
+    self.assertEqual(open(self.output).read(), 'video')
+
+
+class TestHandBrakeEstimateCost(BaseHandBrakeTest):
+  """Verifies the HandBrake.EstimateCost method works properly."""
+
+  def testEstimateCost(self):
+    """Verifies costs scale with duration, bitrate, passes and blocks."""
+    interface = handbrake.HandBrake()
+    title = dvd.Title(duration='01:00:00', cell_blocks=500)
+    self.assertEqual(interface.EstimateCost(title), 3600 * 1000 + 500)
+    interface.options.video_bitrate.SetValue(1800)
+    interface.options.video_two_pass.SetValue(True)
+    self.assertEqual(interface.EstimateCost(title), 3600 * 1800 * 2 + 500)
+
+
+class TestHandBrakeOptionsFingerprint(BaseHandBrakeTest):
+  """Verifies the HandBrake.OptionsFingerprint method works properly."""
+
+  def testOptionsFingerprint(self):
+    """Verifies only options changing the encoded output are fingerprinted."""
+    interface = handbrake.HandBrake()
+    interface.options.video_bitrate.SetValue(1800)
+    fingerprint = interface.OptionsFingerprint()
+    interface.options.file_input.SetValue('/my/movie')
+    interface.options.file_title.SetValue(2)
+    interface.options.file_output.SetValue('/my/output.mp4')
+    interface.options.general_cpu.SetValue(4)
+    self.assertEqual(interface.OptionsFingerprint(), fingerprint)
+    interface.options.video_bitrate.SetValue(2000)
+    self.assertNotEqual(interface.OptionsFingerprint(), fingerprint)
+
+
 class TestHandBrakeEncodeAll(BaseHandBrakeTest):
   """Verifies the HandBrake.EncodeAll method works properly."""
 
@@ -420,8 +715,7 @@ class TestHandBrakeEncodeAll(BaseHandBrakeTest):
     self.interface.dvd = dvd.Dvd('test', [self.title1])
     self.interface.GetDvdInformation(self.input)
     self.mox.ReplayAll()
-    test_result = self.interface.EncodeAll(self.input, self.output,
-                                           datetime.datetime(1, 1, 1, 0, 2, 0))
+    test_result = self.interface.EncodeAll(self.input, self.output, 120)
     self.assertEqual(test_result, results)
     self.mox.VerifyAll()
 
@@ -434,8 +728,7 @@ class TestHandBrakeEncodeAll(BaseHandBrakeTest):
     self.interface.Encode(
         self.input, output, self.title2.number).AndReturn(True)
     self.mox.ReplayAll()
-    test_result = self.interface.EncodeAll(self.input, self.output,
-                                           datetime.datetime(1, 1, 1, 0, 2, 0))
+    test_result = self.interface.EncodeAll(self.input, self.output, 120)
     self.assertEqual(test_result[0], True)
     self.mox.VerifyAll()
 
@@ -456,5 +749,350 @@ class TestHandBrakeEncodeAll(BaseHandBrakeTest):
     self.assertEqual(test_result, [True, True])
     self.mox.VerifyAll()
 
+  def testEncodeAllWorkers(self):
+    """Verifies EncodeAll returns concurrent results in title order."""
+    title3 = dvd.Title(duration='00:45:00', number=3)
+    self.interface.dvd = dvd.Dvd('test', [self.title1, self.title2, title3])
+    self.interface.workers = 2
+    self.interface.GetDvdInformation(self.input)
+    handbrake.abs_path.AbsPath(self.output).MultipleTimes().AndReturn(
+        self.output)
+    self.mox.ReplayAll()
+    self.interface._CreateWorker = lambda options, cpus: FakeWorker(cpus)
+    self.interface.options.general_cpu.SetValue(4)
+    test_result = self.interface.EncodeAll(self.input, self.output, 120)
+    self.assertEqual(test_result[0][0], False)
+    self.assertEqual(test_result[1:], [(True, 2, 2, []), (True, 2, 3, [])])
+    self.mox.VerifyAll()
+
+  def testSkipResult(self):
+    """Verifies skipped titles are reported with the time limit."""
+    self.assertEqual(
+        self.interface.SkipResult(self.title2, 7200),
+        (False, datetime.timedelta(0), 2,
+         ['Skipping Title 2 (01:53:27), shorter than 02:00:00.']))
+
+  def testSubmitAllResume(self):
+    """Verifies titles already encoded are resumed instead of submitted."""
+    output1 = '%stest [Title 1].mp4' % self.output
+    output2 = '%stest [Title 2].mp4' % self.output
+    resumed = (True, datetime.timedelta(0, 5), 1, ['Resumed'])
+    self.interface.dvd = dvd.Dvd('test', [self.title1, self.title2])
+    handbrake.abs_path.AbsPath(self.output).MultipleTimes().AndReturn(
+        self.output)
+    self.interface.Encode(self.input, output2, 2).AndReturn(True)
+    self.mox.ReplayAll()
+    checked = []
+    def Resume(source, title, output_file):
+      checked.append((source, title, output_file))
+      if title == 1:
+        return resumed
+      return None
+    pool = handbrake.EncodePool(self.interface)
+    positions = self.interface.SubmitAll(pool, self.input, self.output,
+                                         resume=Resume)
+    self.assertEqual(pool.Collect(positions), [resumed, True])
+    self.assertEqual(checked, [(self.input, 1, output1),
+                               (self.input, 2, output2)])
+    self.assertEqual(pool.GetJob(positions[0]), None)
+    self.mox.VerifyAll()
+
+  def testSubmitAllDuplicates(self):
+    """Verifies titles duplicating other titles are skipped when enabled."""
+    output1 = '%stest [Title 1].mp4' % self.output
+    chapters = [dvd.Chapter(0, 0, 43208, '00:02:17', 1),
+                dvd.Chapter(1, 1, 187, '00:00:00', 2)]
+    self.title1.chapters = chapters
+    self.title2.chapters = chapters
+    self.interface.dvd = dvd.Dvd('test', [self.title1, self.title2])
+    self.interface.skip_duplicates = True
+    handbrake.abs_path.AbsPath(self.output).AndReturn(self.output)
+    self.interface.Encode(self.input, output1, 1).AndReturn(True)
+    self.mox.ReplayAll()
+    pool = handbrake.EncodePool(self.interface)
+    positions = self.interface.SubmitAll(pool, self.input, self.output)
+    self.assertEqual(pool.Collect(positions), [
+        True, (False, datetime.timedelta(0), 2,
+               ['Skipping Title 2 (01:53:27), duplicates Title 1.'])])
+    self.mox.VerifyAll()
+
+
+  def testSubmitAllDuplicatesInvalid(self):
+    """Verifies chapters that can not be parsed raise a ScanError."""
+    self.title1.AddHandbrakeSections(
+        {dvd.Chapter: ['    + 1: cells 0->0, abc blocks, duration 00:00:01']})
+    self.interface.dvd = dvd.Dvd('test', [self.title1, self.title2])
+    self.interface.skip_duplicates = True
+    self.mox.ReplayAll()
+    pool = handbrake.EncodePool(self.interface)
+    self.assertRaises(handbrake.ScanError, self.interface.SubmitAll, pool,
+                      self.input, self.output)
+    self.mox.VerifyAll()
+
+
+class FakeWorker(object):
+  """Stand-in for a worker HandBrake object, returning its CPU budget."""
+
+  def __init__(self, cpus):
+    self.cpus = cpus
+
+  def Encode(self, source, output, title, start=None, end=None):
+    if title == 'bad':
+      raise handbrake.EncodeError('bad title')
+    return (True, self.cpus, title, [])
+
+
+class TestEncodePool(BaseHandBrakeTest):
+  """Verifies the EncodePool class works properly."""
+
+  def setUp(self):
+    BaseHandBrakeTest.setUp(self)
+    self.interface = handbrake.HandBrake()
+    self.interface.options.general_cpu.SetValue(8)
+    self.snapshots = []
+    def CreateWorker(options, cpus):
+      self.snapshots.append(options)
+      return FakeWorker(cpus)
+    self.interface._CreateWorker = CreateWorker
+
+  def testCpuBudget(self):
+    """Verifies CPU's are split between workers."""
+    self.assertEqual(self.interface._CpuBudget(3), 2)
+    self.assertEqual(self.interface._CpuBudget(16), 1)
+    self.interface.options.general_cpu.SetValue(None)
+    self.assertTrue(self.interface._CpuBudget(1) >= 1)
+
+  def testCreateWorker(self):
+    """Verifies workers share the binary location and own their options."""
+    interface = handbrake.HandBrake()
+    interface._location = '/usr/bin/HandBrakeCLI'
+    snapshot = handbrake.handbrake_options.Options()
+    interface.tolerant = True
+    worker = interface._CreateWorker(snapshot, 2)
+    self.assertEqual(worker._location, interface._location)
+    self.assertEqual(worker.tolerant, True)
+    self.assertEqual(worker.scan_cache, interface.scan_cache)
+    self.assertEqual(worker.options.general_cpu.value, 2)
+    self.assertEqual(interface.options.general_cpu.value, None)
+
+  def testStalledEncodes(self):
+    """Verifies stalled encodes of the object and its workers are found."""
+    interface = handbrake.HandBrake()
+    worker = interface._CreateWorker(handbrake.handbrake_options.Options(), 1)
+    stalled = handbrake.progress.ProgressTracker(1, source='/a')
+    stalled.started = 100.0
+    running = handbrake.progress.ProgressTracker(2, source='/b')
+    running.started = 150.0
+    worker._encodes.append(stalled)
+    interface._encodes.append(running)
+    self.assertEqual(interface.StalledEncodes(60, 200.0), [stalled])
+    self.assertEqual(interface.StalledEncodes(60, 120.0), [])
+
+  def testSubmitOrder(self):
+    """Verifies results are returned in submission order."""
+    pool = handbrake.EncodePool(self.interface, 4)
+    for title in range(10):
+      self.assertEqual(pool.Submit('/in', '/out', title), title)
+    results = pool.Join()
+    self.assertEqual([result[2] for result in results], range(10))
+    self.assertEqual([result[1] for result in results], [2] * 10)
+    self.assertEqual(len(self.snapshots), 10)
+    self.assertFalse(self.snapshots[0] is self.interface.options)
+
+  def testSubmitCost(self):
+    """Verifies the most expensive pending jobs are encoded first."""
+    started = []
+    release = threading.Event()
+    class BlockingWorker(FakeWorker):
+      def Encode(worker, source, output, title, start=None, end=None):
+        started.append(title)
+        release.wait(5)
+        return FakeWorker.Encode(worker, source, output, title)
+    self.interface._CreateWorker = lambda options, cpus: BlockingWorker(cpus)
+    pool = handbrake.EncodePool(self.interface, 2)
+    pool.Submit('/in', '/out', 'first', cost=100)
+    pool.Submit('/in', '/out', 'second', cost=100)
+    while len(started) < 2:
+      release.wait(0.01)
+    for title, cost in [('cheap', 1), ('expensive', 50), ('medium', 10)]:
+      pool.Submit('/in', '/out', title, cost=cost)
+    pending = []
+    while pool._jobs:
+      pending.append(heapq.heappop(pool._jobs)[2][1][2])
+    self.assertEqual(pending, ['expensive', 'medium', 'cheap'])
+    release.set()
+    self.assertEqual([result and result[2] for result in pool.Join()],
+                     ['first', 'second', None, None, None])
+
+  def testCallbacks(self):
+    """Verifies callbacks are called as jobs start and finish."""
+    for workers in (1, 3):
+      events = []
+      pool = handbrake.EncodePool(self.interface, workers)
+      pool._handbrake.Encode = lambda *job: FakeWorker(1).Encode(*job)
+      pool.AddCallback(lambda job, result: events.append((job, result)))
+      pool.Submit('/in', '/out', 2)
+      pool.Join()
+      self.assertEqual(events[0], (('/in', '/out', 2), None))
+      self.assertEqual(events[1][0], ('/in', '/out', 2))
+      self.assertEqual(events[1][1][2], 2)
+
+  def testCallbackError(self):
+    """Verifies a callback error fails the job."""
+    def Callback(job, result):
+      raise handbrake.Error('queue failed')
+    pool = handbrake.EncodePool(self.interface, 2)
+    pool.AddCallback(Callback)
+    pool.Submit('/in', '/out', 2)
+    self.assertRaises(handbrake.Error, pool.Join)
+
+  def testGetJob(self):
+    """Verifies submitted jobs are recorded by position."""
+    pool = handbrake.EncodePool(self.interface, 2)
+    skipped = pool.AddResult((False, 0, 1, []))
+    encoded = pool.Submit('/in', '/out', 2, 1, 3)
+    pool.Join()
+    self.assertEqual(pool.GetJob(skipped), None)
+    self.assertEqual(pool.GetJob(encoded), ('/in', '/out', 2, 1, 3))
+
+  def testCollect(self):
+    """Verifies results are collected once all jobs of a group finish."""
+    pool = handbrake.EncodePool(self.interface, 2)
+    skipped = pool.AddResult((False, 0, 1, []))
+    self.assertEqual(pool.Collect([skipped]), [(False, 0, 1, [])])
+    self.assertEqual(pool.Collect([skipped, 5]), None)
+    encoded = pool.Submit('/in', '/out', 2)
+    pool.Join()
+    self.assertEqual(pool.Collect([encoded, skipped]),
+                     [(True, 4, 2, []), (False, 0, 1, [])])
+
+  def testCancel(self):
+    """Verifies cancelled jobs are not encoded."""
+    pool = handbrake.EncodePool(self.interface, 2)
+    pool.Cancel()
+    self.assertEqual(pool.Join(), [])
+
+  def testSubmitError(self):
+    """Verifies errors in workers are raised from Join."""
+    pool = handbrake.EncodePool(self.interface, 2)
+    pool.Submit('/in', '/out', 1)
+    pool.Submit('/in', '/out', 'bad')
+    self.assertRaises(handbrake.EncodeError, pool.Join)
+
+  def testSingleWorker(self):
+    """Verifies a single worker encodes with the parent object."""
+    self.mox.StubOutWithMock(self.interface, 'Encode')
+    self.interface.Encode('/in', '/out', 1).AndReturn((True, 0, 1, []))
+    self.interface.Encode('/in', '/out', 2, 1, 3).AndReturn((True, 0, 2, []))
+    self.mox.ReplayAll()
+    pool = handbrake.EncodePool(self.interface)
+    pool.Submit('/in', '/out', 1)
+    pool.Submit('/in', '/out', 2, 1, 3)
+    self.assertEqual(pool.Join(), [(True, 0, 1, []), (True, 0, 2, [])])
+    self.assertEqual(self.snapshots, [])
+    self.mox.VerifyAll()
+
+
+class FakeScanner(object):
+  """Stand-in for a background scanning HandBrake object."""
+
+  def __init__(self, block=None):
+    self.scanned = []
+    self.finished = []
+    self.started = threading.Event()
+    self.release = threading.Event()
+    self.block = block
+
+  def GetDvdInformation(self, source):
+    self.scanned.append(source)
+    self.started.set()
+    if source == self.block:
+      self.release.wait(5)
+    self.finished.append(source)
+    if source == 'bad':
+      raise handbrake.ExecuteError('bad source')
+    if source == 'broken':
+      raise ValueError('broken source')
+
+
+class TestScanPrefetcher(BaseHandBrakeTest):
+  """Verifies the ScanPrefetcher class works properly."""
+
+  def setUp(self):
+    BaseHandBrakeTest.setUp(self)
+    self.interface = handbrake.HandBrake()
+    self.sources = ['/a', '/b', '/c']
+
+  def testCreateScanner(self):
+    """Verifies scanners share the binary location and caches."""
+    self.interface._location = '/usr/bin/HandBrakeCLI'
+    scanner = self.interface._CreateScanner()
+    self.assertEqual(scanner._location, self.interface._location)
+    self.assertEqual(scanner.scan_cache, self.interface.scan_cache)
+    self.assertEqual(scanner.version_cache, self.interface.version_cache)
+    self.assertFalse(scanner.options is self.interface.options)
+
+  def testScanAhead(self):
+    """Verifies the next source is scanned while the current is processed."""
+    scanner = FakeScanner()
+    self.interface._CreateScanner = lambda: scanner
+    processed = []
+    for source in handbrake.ScanPrefetcher(self.interface, self.sources, 1):
+      if source == '/a':
+        scanner.started.wait(5)
+        self.assertEqual(scanner.scanned, ['/b'])
+      processed.append(source)
+    self.assertEqual(processed, self.sources)
+
+  def testWaitForScan(self):
+    """Verifies a source is not processed while it is being scanned."""
+    scanner = FakeScanner(block='/b')
+    self.interface._CreateScanner = lambda: scanner
+    for source in handbrake.ScanPrefetcher(self.interface, self.sources, 1):
+      if source == '/a':
+        scanner.started.wait(5)
+        threading.Timer(0.05, scanner.release.set).start()
+      elif source == '/b':
+        self.assertEqual(scanner.finished[:1], ['/b'])
+
+  def testScanErrors(self):
+    """Verifies background scan errors are ignored."""
+    scanner = FakeScanner(block='bad')
+    self.interface._CreateScanner = lambda: scanner
+    processed = []
+    for source in handbrake.ScanPrefetcher(self.interface, ['/a', 'bad'], 1):
+      if source == '/a':
+        scanner.started.wait(5)
+        scanner.release.set()
+      processed.append(source)
+    self.assertEqual(processed, ['/a', 'bad'])
+
+  def testUnexpectedScanErrors(self):
+    """Verifies other background scan errors are raised to the caller."""
+    scanner = FakeScanner()
+    self.interface._CreateScanner = lambda: scanner
+    processed = []
+    sources = handbrake.ScanPrefetcher(
+        self.interface, ['/a', 'broken', '/c'], 1)
+    def Process():
+      for source in sources:
+        if source == '/a':
+          scanner.started.wait(5)
+        processed.append(source)
+    self.assertRaises(ValueError, Process)
+    self.assertEqual(processed, ['/a'])
+
+  def testNoScanAhead(self):
+    """Verifies nothing is scanned in the background with no depth."""
+    self.mox.StubOutWithMock(self.interface, '_CreateScanner')
+    self.mox.ReplayAll()
+    self.assertEqual(
+        list(handbrake.ScanPrefetcher(self.interface, self.sources, 0)),
+        self.sources)
+    self.assertEqual(
+        list(handbrake.ScanPrefetcher(self.interface, ['/a'], 1)), ['/a'])
+    self.mox.VerifyAll()
+
+
 if __name__ == '__main__':
   unittest.main()
@@ -0,0 +1,418 @@
+#!/usr/bin/python2.5
+#
+# Copyright 2009, Robert M. Pufky (robert.pufky@gmail.com)
+#
+# GPLv2 License:
+# --------------
+# Copyright (C) 2009 Robert M. Pufky (robert.pufky@gmail.com)
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more 
+# details.
+#
+# You should have received a copy of the GNU General Public License along with 
+# this program; if not, write to the Free Software Foundation, Inc., 59 Temple
+# Place, Suite 330, Boston, MA 02111-1307 USA
+#
+# You can also read the license at:
+#
+#  http://www.opensource.org/licenses/gpl-2.0.php
+#
+# Please contact me if you wish to use this in another product that you are 
+# building (robert.pufky@gmail.com); or building to sell.
+#
+"""Reads DVD title structure directly from VIDEO_TS IFO files.
+
+A HandBrakeCLI title scan decodes video from every title, and takes minutes per
+DVD.  The IFO files describing a DVD's titles are a few kilobytes each, and are
+read here in milliseconds.  The result is a dvd.Dvd object with titles, video
+tile sets, cells and blocks, chapter durations, and audio and subtitle streams.
+
+Information that needs the video itself (autocrop, combing, audio bit rates and
+film frame rates) is not available; those values are left at their defaults.
+A backup (.BUP) is read when an IFO file is missing or damaged.
+
+Layouts follow the DVD-Video IFO format, as documented by libdvdread:
+  VIDEO_TS.IFO: Video manager; the title search pointer table lists every title
+    with its video tile set and title number within the tile set.
+  VTS_XX_0.IFO: Video title set; chapter (part of title) table, program chains
+    with programs and cell playback times and sectors, and stream attributes.
+"""
+
+__author__ = 'Robert M. Pufky (robert.pufky@gmail.com)'
+__version__ = '1.0'
+
+import os
+import struct
+import dvd
+
+SECTOR_SIZE = 2048
+VMG_IDENTIFIER = 'DVDVIDEO-VMG'
+VTS_IDENTIFIER = 'DVDVIDEO-VTS'
+# Title search pointer table sector, in VIDEO_TS.IFO.
+VMG_TT_SRPT = 0xC4
+# Chapter table, program chain table, and title video attributes, in a VTS IFO.
+VTS_PTT_SRPT = 0xC8
+VTS_PGCI = 0xCC
+VTS_VIDEO_ATTRIBUTES = 0x200
+VTS_AUDIO_STREAMS = 0x202
+VTS_SUBTITLE_STREAMS = 0x254
+# Offsets within a program chain.
+PGC_PLAYBACK_TIME = 0x04
+PGC_AUDIO_CONTROL = 0x0C
+PGC_SUBTITLE_CONTROL = 0x1C
+PGC_PROGRAM_MAP = 0xE6
+PGC_CELL_PLAYBACK = 0xE8
+CELL_PLAYBACK_SIZE = 24
+AUDIO_ENCODERS = {0: 'AC3', 2: 'MPEG1', 3: 'MPEG2', 4: 'LPCM', 6: 'DTS'}
+AUDIO_SAMPLE_RATES = {0: 48000, 1: 96000}
+# Frame rates of the time code rate flag of playback times.
+FRAME_RATES = {1: 25.0, 3: 29.97}
+# ISO 639-1 language codes, with the names and ISO 639-2 codes HandBrake uses.
+LANGUAGES = {
+    'da': ('Dansk', 'dan'), 'de': ('Deutsch', 'deu'),
+    'en': ('English', 'eng'), 'es': ('Espanol', 'spa'),
+    'fi': ('Suomi', 'fin'), 'fr': ('Francais', 'fra'),
+    'he': ('Hebrew', 'heb'), 'it': ('Italiano', 'ita'),
+    'ja': ('Japanese', 'jpn'), 'ko': ('Korean', 'kor'),
+    'nl': ('Nederlands', 'nld'), 'no': ('Norsk', 'nor'),
+    'pl': ('Polish', 'pol'), 'pt': ('Portugues', 'por'),
+    'ru': ('Russian', 'rus'), 'sv': ('Svenska', 'swe'),
+    'zh': ('Chinese', 'zho')}
+UNKNOWN_LANGUAGE = ('Unknown', 'und')
+
+
+class Error(Exception):
+  """General IFO reading error."""
+
+
+class IfoReader(object):
+  """Reads a DVD's title structure from its IFO files.
+
+  Attributes:
+    source: String full path to a DVD container or VIDEO_TS directory.
+    strict: Boolean True to enforce strict value checking on created dvd
+      objects.
+    _files: Dictionary mapping upper case file names in VIDEO_TS to their full
+      paths.
+  """
+
+  def __init__(self, source, strict=False):
+    """Initializes IfoReader.
+
+    Args:
+      source: String full path to a DVD container or VIDEO_TS directory.
+      strict: Boolean True to enforce strict value checking.  Default False.
+    """
+    self.source = source
+    self.strict = strict
+    self._files = {}
+
+  def _FindFiles(self):
+    """Finds the files in the source's VIDEO_TS directory.
+
+    Raises:
+      Error: If there is no VIDEO_TS directory.
+    """
+    video_ts = os.path.normpath(self.source)
+    try:
+      if os.path.basename(video_ts).upper() != 'VIDEO_TS':
+        for name in os.listdir(video_ts):
+          if name.upper() == 'VIDEO_TS':
+            video_ts = os.path.join(video_ts, name)
+            break
+        else:
+          raise Error('No VIDEO_TS directory in %s.' % self.source)
+      self._files = dict([(name.upper(), os.path.join(video_ts, name))
+                          for name in os.listdir(video_ts)])
+    except OSError, error:
+      raise Error('Could not read %s: %s' % (self.source, error))
+
+  def _ReadIfo(self, name, identifier):
+    """Reads an IFO file, or its backup if the IFO is missing or damaged.
+
+    Args:
+      name: String upper case IFO file name, 'VIDEO_TS.IFO' or 'VTS_XX_0.IFO'.
+      identifier: String identifier the file must start with.
+
+    Raises:
+      Error: If neither the IFO file or its backup could be read.
+
+    Returns:
+      String contents of the IFO file.
+    """
+    for candidate in (name, name[:-4] + '.BUP'):
+      path = self._files.get(candidate)
+      if not path:
+        continue
+      try:
+        ifo = open(path, 'rb')
+        try:
+          data = ifo.read()
+        finally:
+          ifo.close()
+      except IOError:
+        continue
+      if data.startswith(identifier):
+        return data
+    raise Error('Could not read %s from %s.' % (name, self.source))
+
+  def _Unpack(self, format, data, offset):
+    """Unpacks big endian values from IFO data.
+
+    Args:
+      format: String struct format, without byte order.
+      data: String IFO data.
+      offset: Integer offset of the values in data.
+
+    Raises:
+      Error: If data is too short.
+
+    Returns:
+      Tuple of unpacked values.
+    """
+    try:
+      return struct.unpack_from('>' + format, data, offset)
+    except struct.error, error:
+      raise Error('IFO data in %s is truncated: %s' % (self.source, error))
+
+  def _ReadTime(self, data, offset):
+    """Reads a BCD playback time.
+
+    Args:
+      data: String IFO data.
+      offset: Integer offset of the playback time.
+
+    Returns:
+      Tuple (<float seconds>, <float frame_rate>).  The frame rate is None if
+      it is not set.
+    """
+    hours, minutes, seconds, frames = self._Unpack('4B', data, offset)
+    bcd = lambda value: (value >> 4) * 10 + (value & 0x0F)
+    frame_rate = FRAME_RATES.get(frames >> 6)
+    seconds = bcd(hours) * 3600 + bcd(minutes) * 60 + bcd(seconds)
+    if frame_rate:
+      seconds += bcd(frames & 0x3F) / frame_rate
+    return (seconds, frame_rate)
+
+  def _Language(self, data, offset, language_type):
+    """Reads a stream's language.
+
+    Args:
+      data: String IFO data.
+      offset: Integer offset of the 2 character ISO 639-1 language code.
+      language_type: Integer language type of the stream; 1 if the language
+        code is set.
+
+    Returns:
+      Tuple (<str language>, <str iso_language>).
+    """
+    if language_type != 1:
+      return UNKNOWN_LANGUAGE
+    code = data[offset:offset + 2].lower()
+    return LANGUAGES.get(code, (code, code))
+
+  def _ReadProgramChain(self, data, offset):
+    """Reads a program chain: its programs, cells and available streams.
+
+    Args:
+      data: String VTS IFO data.
+      offset: Integer offset of the program chain.
+
+    Returns:
+      Dictionary with keys:
+        seconds: Float playback time.
+        frame_rate: Float frame rate, or None.
+        programs: List of Integer entry cell numbers (1 based) per program.
+        cells: List of (<float seconds>, <int blocks>) tuples per cell.
+        audio: List of Boolean True per audio stream available.
+        subtitles: List of Boolean True per subtitle stream available.
+    """
+    programs, cells = self._Unpack('2B', data, offset + 2)
+    seconds, frame_rate = self._ReadTime(data, offset + PGC_PLAYBACK_TIME)
+    audio = self._Unpack('8H', data, offset + PGC_AUDIO_CONTROL)
+    subtitles = self._Unpack('32I', data, offset + PGC_SUBTITLE_CONTROL)
+    program_map, cell_playback = self._Unpack('2H', data,
+                                              offset + PGC_PROGRAM_MAP)
+    chain = {
+        'seconds': seconds, 'frame_rate': frame_rate,
+        'programs': list(self._Unpack('%sB' % programs, data,
+                                      offset + program_map)),
+        'cells': [],
+        'audio': [bool(control & 0x8000) for control in audio],
+        'subtitles': [bool(control & 0x80000000) for control in subtitles]}
+    for cell in range(cells):
+      position = offset + cell_playback + cell * CELL_PLAYBACK_SIZE
+      cell_seconds = self._ReadTime(data, position + 4)[0]
+      first, last = self._Unpack('I8xI', data, position + 8)
+      chain['cells'].append((cell_seconds, max(last - first + 1, 0)))
+    return chain
+
+  def _ReadTitleSet(self, number):
+    """Reads a video title set.
+
+    Args:
+      number: Integer video title set number.
+
+    Raises:
+      Error: If the title set could not be read.
+
+    Returns:
+      Dictionary with keys:
+        chapters: List of title chapter lists, per title in the set.  Each
+          chapter is a (<int program chain>, <int program>) tuple, 1 based.
+        chains: List of program chain dictionaries, see _ReadProgramChain.
+        video: Tuple (<int horizontal_size>, <int vertical_size>,
+          <float aspect_ratio>).
+        audio: List of (<str encoder>, <str format>, <int sample_rate>,
+          <str language>) tuples per audio stream.
+        subtitles: List of (<str language>, <str iso_language>) tuples per
+          subtitle stream.
+    """
+    data = self._ReadIfo('VTS_%02d_0.IFO' % number, VTS_IDENTIFIER)
+    ptt_sector, pgci_sector = self._Unpack('2I', data, VTS_PTT_SRPT)
+    title_set = {'chapters': [], 'chains': [], 'audio': [], 'subtitles': []}
+    table = ptt_sector * SECTOR_SIZE
+    titles, end = self._Unpack('H2xI', data, table)
+    offsets = list(self._Unpack('%sI' % titles, data, table + 8))
+    offsets.append(end + 1)
+    for title in range(titles):
+      chapters = (offsets[title + 1] - offsets[title]) // 4
+      entries = self._Unpack('%sH' % (chapters * 2), data,
+                             table + offsets[title])
+      title_set['chapters'].append(zip(entries[::2], entries[1::2]))
+    table = pgci_sector * SECTOR_SIZE
+    chains = self._Unpack('H', data, table)[0]
+    for chain in range(chains):
+      offset = self._Unpack('I', data, table + 8 + chain * 8 + 4)[0]
+      title_set['chains'].append(self._ReadProgramChain(data, table + offset))
+    first, second = self._Unpack('2B', data, VTS_VIDEO_ATTRIBUTES)
+    vertical_size = ((first >> 4) & 0x03) and 576 or 480
+    horizontal_size = {0: 720, 1: 704, 2: 352, 3: 352}[(second >> 2) & 0x03]
+    if (second >> 2) & 0x03 == 3:
+      vertical_size //= 2
+    aspect_ratio = ((first >> 2) & 0x03) == 3 and 1.78 or 1.33
+    title_set['video'] = (horizontal_size, vertical_size, aspect_ratio)
+    streams = min(self._Unpack('H', data, VTS_AUDIO_STREAMS)[0], 8)
+    for stream in range(streams):
+      offset = VTS_AUDIO_STREAMS + 2 + stream * 8
+      coding, quantization = self._Unpack('2B', data, offset)
+      channels = (quantization & 0x07) + 1
+      title_set['audio'].append((
+          AUDIO_ENCODERS.get(coding >> 5, 'Unknown'),
+          channels == 6 and '5.1 ch' or '%s.0 ch' % channels,
+          AUDIO_SAMPLE_RATES.get((quantization >> 4) & 0x03, 48000),
+          self._Language(data, offset + 2, (coding >> 2) & 0x03)[0]))
+    streams = min(self._Unpack('H', data, VTS_SUBTITLE_STREAMS)[0], 32)
+    for stream in range(streams):
+      offset = VTS_SUBTITLE_STREAMS + 2 + stream * 6
+      coding = self._Unpack('B', data, offset)[0]
+      title_set['subtitles'].append(
+          self._Language(data, offset + 2, coding & 0x03))
+    return title_set
+
+  def _CreateTitle(self, number, title_set_number, title_set, title_number):
+    """Creates a dvd.Title from a title in a video title set.
+
+    Args:
+      number: Integer DVD title number.
+      title_set_number: Integer video title set number.
+      title_set: Dictionary video title set, see _ReadTitleSet.
+      title_number: Integer title number within the title set, 1 based.
+
+    Raises:
+      Error: If the title's chapters refer to missing program chains, programs
+        or cells.
+
+    Returns:
+      dvd.Title object for the title.
+    """
+    missing = 'Title %s in %s refers to missing program chains.' % (
+        number, self.source)
+    if not 0 < title_number <= len(title_set['chapters']):
+      raise Error(missing)
+    chapters = []
+    chains = []
+    for chapter, (chain_number, program) in enumerate(
+        title_set['chapters'][title_number - 1]):
+      if not 0 < chain_number <= len(title_set['chains']):
+        raise Error(missing)
+      chain = title_set['chains'][chain_number - 1]
+      if chain_number not in chains:
+        chains.append(chain_number)
+      if not 0 < program <= len(chain['programs']):
+        raise Error(missing)
+      first = chain['programs'][program - 1]
+      last = len(chain['cells'])
+      if program < len(chain['programs']):
+        last = chain['programs'][program] - 1
+      if not 0 < first <= last <= len(chain['cells']):
+        raise Error('Chapter %s of title %s in %s has invalid cells %s-%s.' %
+                    (chapter + 1, number, self.source, first, last))
+      cells = chain['cells'][first - 1:last]
+      chapters.append(dvd.Chapter(
+          first - 1, last - 1, sum([cell[1] for cell in cells]),
+          int(sum([cell[0] for cell in cells])), chapter + 1, self.strict))
+    if not chains:
+      raise Error('Title %s in %s has no chapters.' % (number, self.source))
+    chain = title_set['chains'][chains[0] - 1]
+    horizontal_size, vertical_size, aspect_ratio = title_set['video']
+    audio = []
+    for stream, available in enumerate(
+        chain['audio'][:len(title_set['audio'])]):
+      if available:
+        encoder, format, sample_rate, language = title_set['audio'][stream]
+        audio.append(dvd.Audio(encoder, format, sample_rate,
+                               language=language, number=len(audio) + 1,
+                               strict=self.strict))
+    subtitles = []
+    for stream, available in enumerate(
+        chain['subtitles'][:len(title_set['subtitles'])]):
+      if available:
+        language, iso_language = title_set['subtitles'][stream]
+        subtitles.append(dvd.Subtitle(language, iso_language=iso_language,
+                                      number=len(subtitles) + 1,
+                                      strict=self.strict))
+    return dvd.Title(
+        title_set_number, number, chapters and chapters[0].start or 0,
+        chapters and chapters[-1].end or 0,
+        sum([chapter.blocks for chapter in chapters]),
+        int(sum([title_set['chains'][index - 1]['seconds']
+                 for index in chains])),
+        horizontal_size, vertical_size, aspect_ratio,
+        chain['frame_rate'] or 29.97, chapters=chapters, audio=audio,
+        subtitles=subtitles, strict=self.strict)
+
+  def Read(self):
+    """Reads the DVD's titles.
+
+    Raises:
+      Error: If the IFO files could not be read, or list no titles.
+
+    Returns:
+      dvd.Dvd object for the source, named after the DVD container.
+    """
+    self._FindFiles()
+    data = self._ReadIfo('VIDEO_TS.IFO', VMG_IDENTIFIER)
+    table = self._Unpack('I', data, VMG_TT_SRPT)[0] * SECTOR_SIZE
+    count = self._Unpack('H', data, table)[0]
+    if not count:
+      raise Error('No titles listed in %s.' % self.source)
+    title_sets = {}
+    titles = []
+    for number in range(1, count + 1):
+      title_set_number, title_number = self._Unpack(
+          '2B', data, table + 8 + (number - 1) * 12 + 6)
+      if title_set_number not in title_sets:
+        title_sets[title_set_number] = self._ReadTitleSet(title_set_number)
+      titles.append(self._CreateTitle(number, title_set_number,
+                                      title_sets[title_set_number],
+                                      title_number))
+    name = os.path.normpath(self.source)
+    if os.path.basename(name).upper() == 'VIDEO_TS':
+      name = os.path.dirname(name)
+    return dvd.Dvd(os.path.basename(name), titles, self.strict)
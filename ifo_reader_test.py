@@ -0,0 +1,271 @@
+#!/usr/bin/python2.5
+#
+# Copyright 2009, Robert M. Pufky (robert.pufky@gmail.com)
+#
+# GPLv2 License:
+# --------------
+# Copyright (C) 2009 Robert M. Pufky (robert.pufky@gmail.com)
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more 
+# details.
+#
+# You should have received a copy of the GNU General Public License along with 
+# this program; if not, write to the Free Software Foundation, Inc., 59 Temple
+# Place, Suite 330, Boston, MA 02111-1307 USA
+#
+# You can also read the license at:
+#
+#  http://www.opensource.org/licenses/gpl-2.0.php
+#
+# Please contact me if you wish to use this in another product that you are 
+# building (robert.pufky@gmail.com); or building to sell.
+#
+"""Test suite for ifo_reader.
+
+IFO fixtures are built synthetically, using the same layouts ifo_reader reads.
+"""
+
+__author__ = 'Robert M. Pufky (robert.pufky@gmail.com)'
+
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+import ifo_reader
+
+SECTOR = ifo_reader.SECTOR_SIZE
+
+
+def BcdTime(seconds, rate=3, frames=0):
+  """Returns a packed BCD playback time.
+
+  Args:
+    seconds: Integer whole seconds.
+    rate: Integer time code rate flag; 3 for 29.97 fps, 1 for 25 fps.
+    frames: Integer frames past the last second.
+
+  Returns:
+    String 4 byte playback time.
+  """
+  bcd = lambda value: ((value // 10) << 4) | (value % 10)
+  return struct.pack('>4B', bcd(seconds // 3600), bcd(seconds // 60 % 60),
+                     bcd(seconds % 60), (rate << 6) | bcd(frames))
+
+
+def BuildVmg(titles):
+  """Builds VIDEO_TS.IFO data.
+
+  Args:
+    titles: List of (<int title set>, <int title number in set>) tuples.
+
+  Returns:
+    String IFO data.
+  """
+  data = bytearray(SECTOR * 2)
+  data[0:12] = ifo_reader.VMG_IDENTIFIER
+  struct.pack_into('>I', data, ifo_reader.VMG_TT_SRPT, 1)
+  struct.pack_into('>H', data, SECTOR, len(titles))
+  for index, (title_set, title_number) in enumerate(titles):
+    struct.pack_into('>BBHHBBI', data, SECTOR + 8 + index * 12, 1, 1, 1, 0,
+                     title_set, title_number, 0)
+  return str(data)
+
+
+def BuildProgramChain(programs, cells, audio=(True,), subtitles=(True,),
+                      rate=3):
+  """Builds program chain data.
+
+  Args:
+    programs: List of Integer entry cell numbers (1 based) per program.
+    cells: List of (<int seconds>, <int first sector>, <int last sector>)
+      tuples per cell.
+    audio: List of Boolean True per available audio stream.
+    subtitles: List of Boolean True per available subtitle stream.
+    rate: Integer time code rate flag.
+
+  Returns:
+    String program chain data.
+  """
+  program_map = 0xEC
+  cell_playback = program_map + len(programs) + len(programs) % 2
+  data = bytearray(cell_playback + len(cells) * 24)
+  struct.pack_into('>2B', data, 2, len(programs), len(cells))
+  data[4:8] = BcdTime(sum([cell[0] for cell in cells]), rate)
+  for index, available in enumerate(audio):
+    struct.pack_into('>H', data, 0x0C + index * 2, available and 0x8000 or 0)
+  for index, available in enumerate(subtitles):
+    struct.pack_into('>I', data, 0x1C + index * 4,
+                     available and 0x80000000 or 0)
+  struct.pack_into('>2H', data, 0xE6, program_map, cell_playback)
+  data[program_map:program_map + len(programs)] = str(bytearray(programs))
+  for index, (seconds, first, last) in enumerate(cells):
+    offset = cell_playback + index * 24
+    data[offset + 4:offset + 8] = BcdTime(seconds, rate)
+    struct.pack_into('>I8xI', data, offset + 8, first, last)
+  return str(data)
+
+
+def BuildVts(titles, chains, video=(0x0C, 0x00), audio=(), subtitles=()):
+  """Builds VTS_XX_0.IFO data.
+
+  Args:
+    titles: List of chapter lists per title; chapters are (<int program
+      chain>, <int program>) tuples.
+    chains: List of String program chain data, see BuildProgramChain.
+    video: Tuple of the 2 video attribute bytes.  Default NTSC 16:9 720x480.
+    audio: List of (<int coding byte>, <int quantization byte>, <str
+      language>) tuples per audio stream.
+    subtitles: List of String languages per subtitle stream.
+
+  Returns:
+    String IFO data.
+  """
+  data = bytearray(SECTOR)
+  data[0:12] = ifo_reader.VTS_IDENTIFIER
+  struct.pack_into('>2I', data, ifo_reader.VTS_PTT_SRPT, 1, 2)
+  struct.pack_into('>2B', data, ifo_reader.VTS_VIDEO_ATTRIBUTES, *video)
+  struct.pack_into('>H', data, ifo_reader.VTS_AUDIO_STREAMS, len(audio))
+  for index, (coding, quantization, language) in enumerate(audio):
+    offset = ifo_reader.VTS_AUDIO_STREAMS + 2 + index * 8
+    struct.pack_into('>2B2s', data, offset, coding, quantization, language)
+  struct.pack_into('>H', data, ifo_reader.VTS_SUBTITLE_STREAMS, len(subtitles))
+  for index, language in enumerate(subtitles):
+    offset = ifo_reader.VTS_SUBTITLE_STREAMS + 2 + index * 6
+    struct.pack_into('>B1x2s', data, offset, 1, language)
+  table = bytearray(SECTOR)
+  offset = 8 + len(titles) * 4
+  struct.pack_into('>H', table, 0, len(titles))
+  for index, chapters in enumerate(titles):
+    struct.pack_into('>I', table, 8 + index * 4, offset)
+    for chain, program in chapters:
+      struct.pack_into('>2H', table, offset, chain, program)
+      offset += 4
+  struct.pack_into('>I', table, 4, offset - 1)
+  pgci = bytearray(8 + len(chains) * 8)
+  struct.pack_into('>H', pgci, 0, len(chains))
+  for index, chain in enumerate(chains):
+    struct.pack_into('>2I', pgci, 8 + index * 8, 0x80000000, len(pgci))
+    pgci += bytearray(chain)
+  return str(data + table + pgci)
+
+
+class TestIfoReader(unittest.TestCase):
+  """Verifies IfoReader reads DVD structure properly."""
+
+  def setUp(self):
+    self.root = tempfile.mkdtemp()
+    self.source = os.path.join(self.root, 'Movie')
+    self.video_ts = os.path.join(self.source, 'VIDEO_TS')
+    os.makedirs(self.video_ts)
+    self.WriteIfo('VIDEO_TS.IFO', BuildVmg([(1, 1), (1, 2), (2, 1)]))
+    self.WriteIfo('VTS_01_0.IFO', BuildVts(
+        [[(1, 1), (1, 2), (1, 3)], [(2, 1)]],
+        [BuildProgramChain([1, 2, 4], [(600, 0, 99), (300, 100, 149),
+                                       (200, 150, 199), (100, 200, 209)],
+                           audio=(True, False, True), subtitles=(False, True)),
+         BuildProgramChain([1], [(45, 300, 304)])],
+        audio=[(0x04, 0x05, 'en'), (0x04, 0x01, 'fr'), (0xC0, 0x01, 'xx')],
+        subtitles=['en', 'es']))
+    self.WriteIfo('VTS_02_0.IFO', BuildVts(
+        [[(1, 1)]], [BuildProgramChain([1], [(3600, 0, 9999)], rate=1)],
+        video=(0x10, 0x0C)))
+
+  def tearDown(self):
+    shutil.rmtree(self.root)
+
+  def WriteIfo(self, name, data):
+    """Writes an IFO file into the fixture VIDEO_TS directory."""
+    ifo = open(os.path.join(self.video_ts, name), 'wb')
+    ifo.write(data)
+    ifo.close()
+
+  def testRead(self):
+    """Verifies titles, chapters and streams are read properly."""
+    read = ifo_reader.IfoReader(self.source + os.sep).Read()
+    self.assertEqual(read.name, 'Movie')
+    self.assertEqual([title.number for title in read.titles], [1, 2, 3])
+    title = read.GetTitle(1)
+    self.assertEqual((title.video_tile_set, title.cell_start, title.cell_end,
+                      title.cell_blocks), (1, 0, 3, 210))
+    self.assertEqual(title.GetDuration(), '00:20:00')
+    self.assertEqual((title.horizontal_size, title.vertical_size,
+                      title.aspect_ratio, title.frame_rate),
+                     (720, 480, 1.78, 29.97))
+    self.assertEqual([(chapter.start, chapter.end, chapter.blocks,
+                       chapter.GetDuration()) for chapter in title.chapters],
+                     [(0, 0, 100, '00:10:00'), (1, 2, 100, '00:08:20'),
+                      (3, 3, 10, '00:01:40')])
+    self.assertEqual([(audio.number, audio.language, audio.encoder,
+                       audio.format, audio.sample_rate)
+                      for audio in title.audio],
+                     [(1, 'English', 'AC3', '5.1 ch', 48000),
+                      (2, 'Unknown', 'DTS', '2.0 ch', 48000)])
+    self.assertEqual([(subtitle.number, subtitle.language,
+                       subtitle.iso_language) for subtitle in title.subtitles],
+                     [(1, 'Espanol', 'spa')])
+    title = read.GetTitle(2)
+    self.assertEqual((title.cell_start, title.cell_end, title.cell_blocks,
+                      title.GetDuration()), (0, 0, 5, '00:00:45'))
+    self.assertEqual(len(title.chapters), 1)
+
+  def testPal(self):
+    """Verifies PAL video attributes and frame rates are read properly."""
+    title = ifo_reader.IfoReader(self.video_ts).Read().GetTitle(3)
+    self.assertEqual((title.video_tile_set, title.horizontal_size,
+                      title.vertical_size, title.aspect_ratio,
+                      title.frame_rate), (2, 352, 288, 1.33, 25.0))
+    self.assertEqual(title.duration, 3600)
+    self.assertEqual(title.cell_blocks, 10000)
+
+  def testVideoTsName(self):
+    """Verifies a VIDEO_TS source is named after its container."""
+    self.assertEqual(ifo_reader.IfoReader(self.video_ts).Read().name, 'Movie')
+
+  def testBackup(self):
+    """Verifies a damaged IFO file is read from its backup."""
+    os.rename(os.path.join(self.video_ts, 'VTS_01_0.IFO'),
+              os.path.join(self.video_ts, 'VTS_01_0.BUP'))
+    self.WriteIfo('VTS_01_0.IFO', 'damaged')
+    read = ifo_reader.IfoReader(self.source).Read()
+    self.assertEqual(read.GetTitle(1).cell_blocks, 210)
+
+  def testErrors(self):
+    """Verifies unreadable DVD's raise an Error."""
+    self.assertRaises(ifo_reader.Error,
+                      ifo_reader.IfoReader(self.root).Read)
+    os.remove(os.path.join(self.video_ts, 'VTS_02_0.IFO'))
+    self.assertRaises(ifo_reader.Error,
+                      ifo_reader.IfoReader(self.source).Read)
+    self.WriteIfo('VIDEO_TS.IFO', ifo_reader.VMG_IDENTIFIER)
+    self.assertRaises(ifo_reader.Error,
+                      ifo_reader.IfoReader(self.source).Read)
+    self.WriteIfo('VIDEO_TS.IFO', BuildVmg([(1, 3)]))
+    self.assertRaises(ifo_reader.Error,
+                      ifo_reader.IfoReader(self.source).Read)
+    self.WriteIfo('VIDEO_TS.IFO', BuildVmg([]))
+    self.assertRaises(ifo_reader.Error,
+                      ifo_reader.IfoReader(self.source).Read)
+
+  def testInvalidNumbers(self):
+    """Verifies program and cell numbers out of range raise an Error."""
+    self.WriteIfo('VIDEO_TS.IFO', BuildVmg([(1, 0)]))
+    self.assertRaises(ifo_reader.Error,
+                      ifo_reader.IfoReader(self.source).Read)
+    self.WriteIfo('VIDEO_TS.IFO', BuildVmg([(1, 1)]))
+    for titles, programs in [([[(0, 1)]], [1]), ([[(1, 0)]], [1]),
+                             ([[(1, 1)]], [0]), ([[(1, 1), (1, 2)]], [2, 1]),
+                             ([[(1, 1)]], [5])]:
+      self.WriteIfo('VTS_01_0.IFO', BuildVts(
+          titles, [BuildProgramChain(programs, [(60, 0, 9), (60, 10, 19)])]))
+      self.assertRaises(ifo_reader.Error,
+                        ifo_reader.IfoReader(self.source).Read)
+
+
+if __name__ == '__main__':
+  unittest.main()
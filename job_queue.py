@@ -0,0 +1,370 @@
+#!/usr/bin/python2.5
+#
+# Copyright 2009, Robert M. Pufky (robert.pufky@gmail.com)
+#
+# GPLv2 License:
+# --------------
+# Copyright (C) 2009 Robert M. Pufky (robert.pufky@gmail.com)
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more 
+# details.
+#
+# You should have received a copy of the GNU General Public License along with 
+# this program; if not, write to the Free Software Foundation, Inc., 59 Temple
+# Place, Suite 330, Boston, MA 02111-1307 USA
+#
+# You can also read the license at:
+#
+#  http://www.opensource.org/licenses/gpl-2.0.php
+#
+# Please contact me if you wish to use this in another product that you are 
+# building (robert.pufky@gmail.com); or building to sell.
+#
+"""Crash safe persistent queue of DVD scan and encode jobs.
+
+Every scan and encode job is recorded with its state before it is worked on.
+A running job holds a lease: the host and process id working on it, and a time
+the lease expires unless renewed.  When encode_dvd is restarted, running jobs
+whose lease has expired, or whose process is no longer alive, are returned to
+pending, so work in flight when a run died is done again and finished work is
+not.
+
+The queue is a SQLite database in write ahead logging mode, and may share a
+database with the completion store.  Jobs are updated from encoding threads, so
+the connection is shared between threads and protected by a lock.
+"""
+
+__author__ = 'Robert M. Pufky (robert.pufky@gmail.com)'
+__version__ = '1.0'
+
+import errno
+import os
+import socket
+import threading
+import time
+
+try:
+  import sqlite3
+except ImportError:
+  from pysqlite2 import dbapi2 as sqlite3
+
+KIND_SCAN = 'scan'
+KIND_ENCODE = 'encode'
+STATE_PENDING = 'pending'
+STATE_RUNNING = 'running'
+STATE_DONE = 'done'
+STATE_FAILED = 'failed'
+# Seconds a lease is held for without being renewed.
+LEASE_SECONDS = 600
+# Minimum seconds between lease renewals.
+RENEW_SECONDS = 60
+SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS jobs ('
+    '  kind TEXT NOT NULL,'
+    '  source TEXT NOT NULL,'
+    '  title TEXT NOT NULL,'
+    '  chapters TEXT NOT NULL,'
+    '  state TEXT NOT NULL,'
+    '  output TEXT,'
+    '  seconds REAL,'
+    '  owner TEXT,'
+    '  lease REAL,'
+    '  attempts INTEGER NOT NULL,'
+    '  updated REAL NOT NULL,'
+    '  PRIMARY KEY (kind, source, title, chapters))']
+
+
+class Error(Exception):
+  """General job queue error."""
+
+
+class JobQueue(object):
+  """Records the state of scan and encode jobs in a SQLite database.
+
+  Jobs are identified by (kind, source, title, chapters).  Scan jobs use an
+  empty title and chapters.
+
+  Attributes:
+    filename: String full path to the database.
+    owner: String 'host:pid' identifying the leases held by this process.
+    _connection: sqlite3.Connection to the database, or None until opened.
+    _renewed: Float time leases were last renewed.
+    _lock: threading.Lock protecting the connection.
+  """
+
+  def __init__(self, filename):
+    """Initializes JobQueue.  The database is not opened until used.
+
+    Args:
+      filename: String full path to the database.
+    """
+    self.filename = filename
+    self.owner = '%s:%s' % (socket.gethostname(), os.getpid())
+    self._connection = None
+    self._renewed = 0
+    self._lock = threading.Lock()
+
+  def _Open(self):
+    """Opens the database, creating it if needed.  The lock must be held.
+
+    Raises:
+      sqlite3.Error: If the database could not be opened.
+
+    Returns:
+      sqlite3.Connection to the database.
+    """
+    if self._connection is None:
+      connection = sqlite3.connect(self.filename, check_same_thread=False)
+      connection.execute('PRAGMA journal_mode=WAL')
+      connection.execute('PRAGMA synchronous=FULL')
+      for statement in SCHEMA:
+        connection.execute(statement)
+      connection.commit()
+      self._connection = connection
+    return self._connection
+
+  def _Execute(self, statement, parameters=(), commit=True):
+    """Executes a statement on the database.
+
+    Args:
+      statement: String SQL statement.
+      parameters: Tuple of statement parameters.
+      commit: Boolean True to commit the statement.  Default True.
+
+    Raises:
+      Error: If the statement failed.
+
+    Returns:
+      List of result rows for the statement.
+    """
+    self._lock.acquire()
+    try:
+      try:
+        connection = self._Open()
+        cursor = connection.execute(statement, parameters)
+        rows = cursor.fetchall()
+        if commit:
+          connection.commit()
+        return rows
+      except sqlite3.Error, error:
+        raise Error('Job queue %s failed: %s' % (self.filename, error))
+    finally:
+      self._lock.release()
+
+  def Open(self):
+    """Opens the database, creating it if needed.
+
+    Raises:
+      Error: If the database could not be opened.
+    """
+    self._lock.acquire()
+    try:
+      try:
+        self._Open()
+      except sqlite3.Error, error:
+        raise Error('Could not open %s! %s' % (self.filename, error))
+    finally:
+      self._lock.release()
+
+  def _IsAlive(self, owner):
+    """Determines if the process holding a lease is alive.
+
+    Args:
+      owner: String 'host:pid' of the lease holder.
+
+    Returns:
+      Boolean True if the owner is alive, or runs on another host.
+    """
+    host, pid = owner.rsplit(':', 1)
+    if host != socket.gethostname():
+      return True
+    if int(pid) == os.getpid():
+      return True
+    try:
+      os.kill(int(pid), 0)
+    except OSError, error:
+      return error.errno == errno.EPERM
+    return True
+
+  def Recover(self, now=None):
+    """Returns running jobs with lost leases to pending.
+
+    A lease is lost once it has expired, or when the process holding it is no
+    longer running on this host.
+
+    Args:
+      now: Float time to recover at.  Default None (current time).
+
+    Raises:
+      Error: If the jobs could not be recovered.
+
+    Returns:
+      Integer number of jobs recovered.
+    """
+    if now is None:
+      now = time.time()
+    recovered = 0
+    for kind, source, title, chapters, owner, lease in self._Execute(
+        'SELECT kind, source, title, chapters, owner, lease FROM jobs '
+        'WHERE state = ?', (STATE_RUNNING,), False):
+      if lease >= now and self._IsAlive(owner):
+        continue
+      self._Execute(
+          'UPDATE jobs SET state = ?, owner = NULL, lease = NULL, '
+          'updated = ? WHERE kind = ? AND source = ? AND title = ? AND '
+          'chapters = ? AND state = ?',
+          (STATE_PENDING, now, kind, source, title, chapters, STATE_RUNNING))
+      recovered += 1
+    return recovered
+
+  def Add(self, kind, source, title='', chapters='', output=None):
+    """Adds a pending job, unless it is already queued.
+
+    Args:
+      kind: String job kind, KIND_SCAN or KIND_ENCODE.
+      source: String full path to the DVD source.
+      title: Integer/String title number.  Default '' (scan jobs).
+      chapters: String chapter range, 'start-end'.  Default '' (all chapters).
+      output: String full path to the output file.  Default None.
+
+    Raises:
+      Error: If the job could not be added.
+    """
+    self._Execute(
+        'INSERT OR IGNORE INTO jobs (kind, source, title, chapters, state, '
+        'output, attempts, updated) VALUES (?, ?, ?, ?, ?, ?, 0, ?)',
+        (kind, source, str(title), chapters, STATE_PENDING, output,
+         time.time()))
+
+  def Start(self, kind, source, title='', chapters='', output=None):
+    """Leases a job to this process, adding it if needed.
+
+    Args:
+      kind: String job kind, KIND_SCAN or KIND_ENCODE.
+      source: String full path to the DVD source.
+      title: Integer/String title number.  Default '' (scan jobs).
+      chapters: String chapter range, 'start-end'.  Default '' (all chapters).
+      output: String full path to the output file.  Default None.
+
+    Raises:
+      Error: If the job could not be leased.
+    """
+    self.Add(kind, source, title, chapters, output)
+    now = time.time()
+    self._Execute(
+        'UPDATE jobs SET state = ?, output = COALESCE(?, output), owner = ?, '
+        'lease = ?, attempts = attempts + 1, updated = ? WHERE kind = ? AND '
+        'source = ? AND title = ? AND chapters = ?',
+        (STATE_RUNNING, output, self.owner, now + LEASE_SECONDS, now, kind,
+         source, str(title), chapters))
+
+  def Finish(self, kind, source, title='', chapters='', success=True,
+             seconds=None):
+    """Records a job as done or failed, releasing its lease.
+
+    Args:
+      kind: String job kind, KIND_SCAN or KIND_ENCODE.
+      source: String full path to the DVD source.
+      title: Integer/String title number.  Default '' (scan jobs).
+      chapters: String chapter range, 'start-end'.  Default '' (all chapters).
+      success: Boolean True if the job succeeded.  Default True.
+      seconds: Float number of seconds the job took.  Default None.
+
+    Raises:
+      Error: If the job could not be recorded.
+    """
+    state = STATE_FAILED
+    if success:
+      state = STATE_DONE
+    self._Execute(
+        'UPDATE jobs SET state = ?, seconds = ?, owner = NULL, lease = NULL, '
+        'updated = ? WHERE kind = ? AND source = ? AND title = ? AND '
+        'chapters = ?',
+        (state, seconds, time.time(), kind, source, str(title), chapters))
+
+  def GetJob(self, kind, source, title='', chapters=''):
+    """Looks up the state of a job.
+
+    Args:
+      kind: String job kind, KIND_SCAN or KIND_ENCODE.
+      source: String full path to the DVD source.
+      title: Integer/String title number.  Default '' (scan jobs).
+      chapters: String chapter range, 'start-end'.  Default '' (all chapters).
+
+    Raises:
+      Error: If the queue could not be read.
+
+    Returns:
+      Tuple (<String state>, <String output>, <Float seconds>), or None if the
+      job is not queued.
+    """
+    rows = self._Execute(
+        'SELECT state, output, seconds FROM jobs WHERE kind = ? AND '
+        'source = ? AND title = ? AND chapters = ?',
+        (kind, source, str(title), chapters), False)
+    if not rows:
+      return None
+    return tuple(rows[0])
+
+  def Sources(self):
+    """Returns the sources with unfinished jobs, in the order first queued.
+
+    Raises:
+      Error: If the queue could not be read.
+
+    Returns:
+      List of String full paths to DVD sources.
+    """
+    return [row[0] for row in self._Execute(
+        'SELECT source FROM jobs WHERE state != ? GROUP BY source '
+        'ORDER BY MIN(rowid)', (STATE_DONE,), False)]
+
+  def Remove(self, source):
+    """Removes all jobs for a source.
+
+    Args:
+      source: String full path to the DVD source.
+
+    Raises:
+      Error: If the jobs could not be removed.
+    """
+    self._Execute('DELETE FROM jobs WHERE source = ?', (source,))
+
+  def Renew(self, now=None):
+    """Renews the leases held by this process.
+
+    Leases are renewed at most once every RENEW_SECONDS, so this may be called
+    as often as progress is reported.
+
+    Args:
+      now: Float time to renew at.  Default None (current time).
+
+    Raises:
+      Error: If the leases could not be renewed.
+
+    Returns:
+      Boolean True if the leases were renewed.
+    """
+    if now is None:
+      now = time.time()
+    if now - self._renewed < RENEW_SECONDS:
+      return False
+    self._renewed = now
+    self._Execute('UPDATE jobs SET lease = ? WHERE owner = ? AND state = ?',
+                  (now + LEASE_SECONDS, self.owner, STATE_RUNNING))
+    return True
+
+  def Close(self):
+    """Closes the database."""
+    self._lock.acquire()
+    try:
+      if self._connection is not None:
+        self._connection.close()
+        self._connection = None
+    finally:
+      self._lock.release()
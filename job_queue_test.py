@@ -0,0 +1,164 @@
+#!/usr/bin/python2.5
+#
+# Copyright 2009, Robert M. Pufky (robert.pufky@gmail.com)
+#
+# GPLv2 License:
+# --------------
+# Copyright (C) 2009 Robert M. Pufky (robert.pufky@gmail.com)
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more 
+# details.
+#
+# You should have received a copy of the GNU General Public License along with 
+# this program; if not, write to the Free Software Foundation, Inc., 59 Temple
+# Place, Suite 330, Boston, MA 02111-1307 USA
+#
+# You can also read the license at:
+#
+#  http://www.opensource.org/licenses/gpl-2.0.php
+#
+# Please contact me if you wish to use this in another product that you are 
+# building (robert.pufky@gmail.com); or building to sell.
+#
+"""Test suite for job_queue."""
+
+__author__ = 'Robert M. Pufky (robert.pufky@gmail.com)'
+
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+import unittest
+import job_queue
+
+
+class TestJobQueue(unittest.TestCase):
+  """Verifies JobQueue records jobs and recovers leases properly."""
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.filename = os.path.join(self.directory, 'full_encodes.db')
+    self.queue = job_queue.JobQueue(self.filename)
+
+  def tearDown(self):
+    self.queue.Close()
+    shutil.rmtree(self.directory)
+
+  def DeadOwner(self):
+    """Returns a lease owner for a process that has exited."""
+    process = subprocess.Popen(['true'])
+    process.wait()
+    return '%s:%s' % (socket.gethostname(), process.pid)
+
+  def testLifecycle(self):
+    """Verifies jobs move from pending to running to done or failed."""
+    self.assertEqual(self.queue.GetJob(job_queue.KIND_SCAN, '/dvd'), None)
+    self.queue.Add(job_queue.KIND_SCAN, '/dvd')
+    self.assertEqual(self.queue.GetJob(job_queue.KIND_SCAN, '/dvd'),
+                     ('pending', None, None))
+    self.queue.Start(job_queue.KIND_ENCODE, '/dvd', 1, output='/out/1.mp4')
+    self.assertEqual(self.queue.GetJob(job_queue.KIND_ENCODE, '/dvd', '1'),
+                     ('running', '/out/1.mp4', None))
+    self.queue.Finish(job_queue.KIND_ENCODE, '/dvd', 1, seconds=2.5)
+    self.queue.Finish(job_queue.KIND_SCAN, '/dvd', success=False)
+    self.assertEqual(self.queue.GetJob(job_queue.KIND_ENCODE, '/dvd', 1),
+                     ('done', '/out/1.mp4', 2.5))
+    self.assertEqual(self.queue.GetJob(job_queue.KIND_SCAN, '/dvd')[0],
+                     'failed')
+    self.queue.Add(job_queue.KIND_SCAN, '/dvd')
+    self.assertEqual(self.queue.GetJob(job_queue.KIND_SCAN, '/dvd')[0],
+                     'failed')
+
+  def testPersistence(self):
+    """Verifies jobs are kept between opens."""
+    self.queue.Start(job_queue.KIND_ENCODE, '/dvd', 1, output='/out/1.mp4')
+    self.queue.Close()
+    queue = job_queue.JobQueue(self.filename)
+    try:
+      self.assertEqual(queue.GetJob(job_queue.KIND_ENCODE, '/dvd', 1)[0],
+                       'running')
+    finally:
+      queue.Close()
+
+  def testRecover(self):
+    """Verifies only lost leases are returned to pending."""
+    self.queue.Start(job_queue.KIND_ENCODE, '/dvd', 1)
+    self.queue.Start(job_queue.KIND_ENCODE, '/dvd', 2)
+    self.queue.Start(job_queue.KIND_ENCODE, '/dvd', 3)
+    self.queue.Finish(job_queue.KIND_ENCODE, '/dvd', 3)
+    self.assertEqual(self.queue.Recover(), 0)
+    self.queue._Execute('UPDATE jobs SET owner = ? WHERE title = ?',
+                        (self.DeadOwner(), '2'))
+    self.assertEqual(self.queue.Recover(), 1)
+    self.assertEqual(self.queue.GetJob(job_queue.KIND_ENCODE, '/dvd', 1)[0],
+                     'running')
+    self.assertEqual(self.queue.GetJob(job_queue.KIND_ENCODE, '/dvd', 2)[0],
+                     'pending')
+    self.assertEqual(
+        self.queue.Recover(time.time() + job_queue.LEASE_SECONDS + 1), 1)
+    self.assertEqual(self.queue.GetJob(job_queue.KIND_ENCODE, '/dvd', 1)[0],
+                     'pending')
+    self.assertEqual(self.queue.GetJob(job_queue.KIND_ENCODE, '/dvd', 3)[0],
+                     'done')
+
+  def testOtherHost(self):
+    """Verifies leases held on other hosts are kept until they expire."""
+    self.queue.Start(job_queue.KIND_SCAN, '/dvd')
+    self.queue._Execute('UPDATE jobs SET owner = ?', ('elsewhere:1',))
+    self.assertEqual(self.queue.Recover(), 0)
+    self.assertEqual(
+        self.queue.Recover(time.time() + job_queue.LEASE_SECONDS + 1), 1)
+
+  def testRenew(self):
+    """Verifies leases are renewed at most once every RENEW_SECONDS."""
+    self.queue.Start(job_queue.KIND_SCAN, '/dvd')
+    later = time.time() + job_queue.LEASE_SECONDS + 1
+    self.assertTrue(self.queue.Renew(later))
+    self.assertFalse(self.queue.Renew(later + 1))
+    self.assertEqual(self.queue.Recover(later), 0)
+    self.assertTrue(self.queue.Renew(later + job_queue.RENEW_SECONDS))
+
+  def testSources(self):
+    """Verifies sources with unfinished jobs are listed in queued order."""
+    self.queue.Add(job_queue.KIND_SCAN, '/b')
+    self.queue.Add(job_queue.KIND_SCAN, '/a')
+    self.queue.Add(job_queue.KIND_SCAN, '/c')
+    self.queue.Finish(job_queue.KIND_SCAN, '/c')
+    self.queue.Add(job_queue.KIND_ENCODE, '/b', 1)
+    self.assertEqual(self.queue.Sources(), ['/b', '/a'])
+    self.queue.Remove('/b')
+    self.assertEqual(self.queue.Sources(), ['/a'])
+    self.assertEqual(self.queue.GetJob(job_queue.KIND_ENCODE, '/b', 1), None)
+
+  def testThreads(self):
+    """Verifies jobs may be updated from other threads."""
+    def Work(title):
+      self.queue.Start(job_queue.KIND_ENCODE, '/dvd', title)
+      self.queue.Finish(job_queue.KIND_ENCODE, '/dvd', title)
+    threads = [threading.Thread(target=Work, args=(title,))
+               for title in range(8)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    for title in range(8):
+      self.assertEqual(
+          self.queue.GetJob(job_queue.KIND_ENCODE, '/dvd', title)[0], 'done')
+
+  def testOpenError(self):
+    """Verifies a database that cannot be opened raises an Error."""
+    self.queue.filename = os.path.join(self.directory, 'missing', 'a.db')
+    self.assertRaises(job_queue.Error, self.queue.Open)
+    self.assertRaises(job_queue.Error, self.queue.Sources)
+
+
+if __name__ == '__main__':
+  unittest.main()
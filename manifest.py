@@ -0,0 +1,305 @@
+#!/usr/bin/python2.5
+#
+# Copyright 2009, Robert M. Pufky (robert.pufky@gmail.com)
+#
+# GPLv2 License:
+# --------------
+# Copyright (C) 2009 Robert M. Pufky (robert.pufky@gmail.com)
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more 
+# details.
+#
+# You should have received a copy of the GNU General Public License along with 
+# this program; if not, write to the Free Software Foundation, Inc., 59 Temple
+# Place, Suite 330, Boston, MA 02111-1307 USA
+#
+# You can also read the license at:
+#
+#  http://www.opensource.org/licenses/gpl-2.0.php
+#
+# Please contact me if you wish to use this in another product that you are 
+# building (robert.pufky@gmail.com); or building to sell.
+#
+"""Reads batch encode manifests.
+
+A manifest lists title encodes to run, one job per row.  Each job names a DVD
+source, a title, and optionally a chapter range, an output file name and a
+profile (an alternative encode_dvd configuration file to encode with).
+
+Manifests are CSV files with a header row, as saved by most spreadsheets, or
+JSON files (ending in .json) containing a list of objects.  Both use the same
+field names:
+
+  source,title,chapters,output,profile
+  /Videos/DVD Images/FIREFLY_D1,2,,Firefly - The Train Job,
+  /Videos/DVD Images/FIREFLY_D1,1,1-10,,encode_ipod.config
+
+[{"source": "/Videos/DVD Images/FIREFLY_D1", "title": 2,
+  "output": "Firefly - The Train Job"}]
+
+Only source and title are required.  Output names are relative to the encode
+destination, and no two jobs may write the same output.
+"""
+
+__author__ = 'Robert M. Pufky (robert.pufky@gmail.com)'
+__version__ = '1.0'
+
+import csv
+import os
+import abs_path
+
+try:
+  import json
+except ImportError:
+  try:
+    import simplejson as json
+  except ImportError:
+    json = None
+
+FIELDS = ['source', 'title', 'chapters', 'output', 'profile']
+
+
+class Error(Exception):
+  """General manifest error."""
+
+
+class ManifestJob(object):
+  """A single title encode listed in a manifest.
+
+  Attributes:
+    source: String full path to the DVD source.
+    title: Integer title number to encode.
+    start: Integer chapter start, inclusive, or None for all chapters.
+    end: Integer chapter end, inclusive, or None for all chapters.
+    output: String output file name, or None to name the output as a title
+      encode is normally named.
+    profile: String configuration file to encode with, or None to use the
+      configuration in use.
+    line: Integer position of the job in the manifest, counting from 1.
+  """
+
+  def __init__(self, source, title, start=None, end=None, output=None,
+               profile=None, line=0):
+    """Initializes ManifestJob.
+
+    Args:
+      source: String full path to the DVD source.
+      title: Integer title number to encode.
+      start: Integer chapter start, inclusive.  Default None (all chapters).
+      end: Integer chapter end, inclusive.  Default None (all chapters).
+      output: String output file name.  Default None (default naming).
+      profile: String configuration file to encode with.  Default None (the
+        configuration in use).
+      line: Integer position of the job in the manifest.  Default 0.
+    """
+    self.source = source
+    self.title = title
+    self.start = start
+    self.end = end
+    self.output = output
+    self.profile = profile
+    self.line = line
+
+  def __repr__(self):
+    """Returns the String representation of this object."""
+    return ('manifest.ManifestJob(source=%r, title=%r, start=%r, end=%r, '
+            'output=%r, profile=%r, line=%r)' %
+            (self.source, self.title, self.start, self.end, self.output,
+             self.profile, self.line))
+
+
+def _Text(value):
+  """Returns a stripped String field value, or None if the field is empty."""
+  if value is None:
+    return None
+  if isinstance(value, unicode):
+    value = value.encode('utf-8')
+  value = str(value).strip()
+  if not value:
+    return None
+  return value
+
+
+def _CreateJob(fields, line):
+  """Creates a ManifestJob from the fields of a manifest row.
+
+  Args:
+    fields: Dictionary mapping field names to values.
+    line: Integer position of the row in the manifest.
+
+  Raises:
+    Error: If a required field is missing, or a field is not valid.
+
+  Returns:
+    ManifestJob for the row.
+  """
+  source = _Text(fields.get('source'))
+  title = _Text(fields.get('title'))
+  chapters = _Text(fields.get('chapters'))
+  output = _Text(fields.get('output'))
+  if not source or not title:
+    raise Error('Job %s: source and title are required.' % line)
+  try:
+    title = int(title)
+    start = end = None
+    if chapters:
+      start, end = [int(chapter) for chapter in chapters.split('-')]
+  except ValueError:
+    raise Error('Job %s: title must be a number, and chapters start-end.' %
+                line)
+  if start is not None and (start < 1 or end < start):
+    raise Error('Job %s: chapters %s must start at 1 or later, and not end '
+                'before they start.' % (line, chapters))
+  if output and (os.path.isabs(output) or
+                 os.pardir in output.split(os.sep)):
+    raise Error('Job %s: output %s must be inside the destination.' %
+                (line, output))
+  return ManifestJob(abs_path.AbsPath(source), title, start, end, output,
+                     _Text(fields.get('profile')), line)
+
+
+def _OutputKey(job):
+  """Returns a key identifying the output file a manifest job writes.
+
+  Default output names, and output names without an extension, are given the
+  file format of the job's profile, so they are keyed with the profile.
+
+  Args:
+    job: ManifestJob to identify the output of.
+
+  Returns:
+    String or Tuple key, equal for jobs writing the same output file.
+  """
+  if job.output is None:
+    return (job.source, job.title, job.start, job.end, job.profile)
+  output = os.path.normpath(job.output)
+  if os.path.splitext(output)[1]:
+    return output
+  return (output, job.profile)
+
+
+def _CheckOutputs(jobs):
+  """Checks that no two manifest jobs write the same output file.
+
+  Args:
+    jobs: List of ManifestJob objects, in the order listed.
+
+  Raises:
+    Error: If two jobs write the same output file.
+
+  Returns:
+    The List of ManifestJob objects.
+  """
+  written = {}
+  for job in jobs:
+    key = _OutputKey(job)
+    if key in written:
+      raise Error('Job %s: writes the same output as job %s.' %
+                  (job.line, written[key]))
+    written[key] = job.line
+  return jobs
+
+
+def ParseCsv(lines):
+  """Parses the jobs of a CSV manifest.
+
+  Args:
+    lines: Iterable of String lines of the manifest, starting with the header.
+
+  Raises:
+    Error: If the manifest is not valid.
+
+  Returns:
+    List of ManifestJob objects, in the order listed.
+  """
+  jobs = []
+  try:
+    reader = csv.reader(lines)
+    header = None
+    for row in reader:
+      if not [field for field in row if field.strip()]:
+        continue
+      if header is None:
+        header = [field.strip().lower() for field in row]
+        continue
+      jobs.append(_CreateJob(dict(zip(header, row)), len(jobs) + 1))
+  except csv.Error, error:
+    raise Error('Could not read CSV manifest: %s' % error)
+  return _CheckOutputs(jobs)
+
+
+def ParseJson(text):
+  """Parses the jobs of a JSON manifest.
+
+  Args:
+    text: String contents of the manifest.
+
+  Raises:
+    Error: If the manifest is not valid, or JSON is not available.
+
+  Returns:
+    List of ManifestJob objects, in the order listed.
+  """
+  if json is None:
+    raise Error('JSON manifests require the json or simplejson module.')
+  try:
+    rows = json.loads(text)
+  except ValueError, error:
+    raise Error('Could not read JSON manifest: %s' % error)
+  if not isinstance(rows, list):
+    raise Error('JSON manifest must contain a list of jobs.')
+  jobs = []
+  for row in rows:
+    if not isinstance(row, dict):
+      raise Error('Job %s: must be an object.' % (len(jobs) + 1))
+    jobs.append(_CreateJob(row, len(jobs) + 1))
+  return _CheckOutputs(jobs)
+
+
+def ReadManifest(path):
+  """Reads the jobs of a manifest file.
+
+  Args:
+    path: String path to a CSV manifest, or JSON manifest ending in .json.
+
+  Raises:
+    Error: If the manifest could not be read, or is not valid.
+
+  Returns:
+    List of ManifestJob objects, in the order listed.
+  """
+  try:
+    manifest = open(path, 'rU')
+    try:
+      if path.lower().endswith('.json'):
+        return ParseJson(manifest.read())
+      return ParseCsv(manifest)
+    finally:
+      manifest.close()
+  except IOError, error:
+    raise Error('Could not read manifest: %s' % error)
+
+
+def GroupBySource(jobs):
+  """Groups manifest jobs by their DVD source.
+
+  Args:
+    jobs: List of ManifestJob objects.
+
+  Returns:
+    List of (<String source>, <List ManifestJob>) tuples, with sources in the
+    order they are first listed, and jobs in the order listed.
+  """
+  groups = []
+  index = {}
+  for job in jobs:
+    if job.source not in index:
+      index[job.source] = []
+      groups.append((job.source, index[job.source]))
+    index[job.source].append(job)
+  return groups
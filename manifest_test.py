@@ -0,0 +1,141 @@
+#!/usr/bin/python2.5
+#
+# Copyright 2009, Robert M. Pufky (robert.pufky@gmail.com)
+#
+# GPLv2 License:
+# --------------
+# Copyright (C) 2009 Robert M. Pufky (robert.pufky@gmail.com)
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more 
+# details.
+#
+# You should have received a copy of the GNU General Public License along with 
+# this program; if not, write to the Free Software Foundation, Inc., 59 Temple
+# Place, Suite 330, Boston, MA 02111-1307 USA
+#
+# You can also read the license at:
+#
+#  http://www.opensource.org/licenses/gpl-2.0.php
+#
+# Please contact me if you wish to use this in another product that you are 
+# building (robert.pufky@gmail.com); or building to sell.
+#
+"""Test suite for manifest."""
+
+__author__ = 'Robert M. Pufky (robert.pufky@gmail.com)'
+
+import os
+import shutil
+import tempfile
+import unittest
+import manifest
+
+
+class TestManifest(unittest.TestCase):
+  """Verifies manifests are read properly."""
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def WriteManifest(self, name, data):
+    """Writes a manifest file, returning the String full path to it."""
+    path = os.path.join(self.directory, name)
+    manifest_file = open(path, 'w')
+    try:
+      manifest_file.write(data)
+    finally:
+      manifest_file.close()
+    return path
+
+  def testParseCsv(self):
+    """Verifies CSV jobs are parsed in order, skipping blank rows."""
+    jobs = manifest.ParseCsv([
+        'Source,Title,Chapters,Output,Profile\n',
+        '/dvd/one,2,,The Train Job,\n',
+        ',,,,\n',
+        '/dvd/two, 1 ,1-10,,ipod.config\n'])
+    self.assertEqual(len(jobs), 2)
+    self.assertEqual((jobs[0].source, jobs[0].title, jobs[0].start,
+                      jobs[0].end, jobs[0].output, jobs[0].profile,
+                      jobs[0].line),
+                     ('/dvd/one', 2, None, None, 'The Train Job', None, 1))
+    self.assertEqual((jobs[1].source, jobs[1].title, jobs[1].start,
+                      jobs[1].end, jobs[1].output, jobs[1].profile,
+                      jobs[1].line),
+                     ('/dvd/two', 1, 1, 10, None, 'ipod.config', 2))
+
+  def testParseCsvErrors(self):
+    """Verifies invalid CSV jobs raise an error."""
+    for row in [',1\n', '/dvd,\n', '/dvd,one\n', '/dvd,1,1\n',
+                '/dvd,1,1-2-3\n', '/dvd,1,7-3\n', '/dvd,1,0-2\n',
+                '/dvd,1,,/tmp/out.mp4\n', '/dvd,1,,../out.mp4\n',
+                '/dvd,1,,Season 1/../../out.mp4\n']:
+      self.assertRaises(manifest.Error, manifest.ParseCsv,
+                        ['source,title,chapters,output\n', row])
+    self.assertEqual(manifest.ParseCsv(['source,title,chapters,output\n',
+                                        '/dvd,1,3-3,Season 1/Pilot\n'])[0].end,
+                     3)
+
+  def testParseDuplicateOutputs(self):
+    """Verifies two jobs writing the same output raise an error."""
+    header = 'source,title,chapters,output,profile\n'
+    for rows in [['/a,1,,Pilot.mp4\n', '/b,2,,./Pilot.mp4\n'],
+                 ['/a,1,,Pilot\n', '/b,2,,Pilot\n'],
+                 ['/a,1,1-2,,\n', '/a,1,1-2,,\n']]:
+      self.assertRaises(manifest.Error, manifest.ParseCsv, [header] + rows)
+    for rows in [['/a,1,,Pilot,ipod\n', '/b,2,,Pilot,\n'],
+                 ['/a,1,1-2,,\n', '/a,1,1-3,,\n'],
+                 ['/a,1,,,\n', '/a,1,,,ipod\n']]:
+      self.assertEqual(len(manifest.ParseCsv([header] + rows)), 2)
+
+  def testParseJson(self):
+    """Verifies JSON jobs are parsed in order."""
+    if manifest.json is None:
+      self.assertRaises(manifest.Error, manifest.ParseJson, '[]')
+      return
+    jobs = manifest.ParseJson(
+        '[{"source": "/dvd/one", "title": 2, "output": "Train"},'
+        ' {"source": "/dvd/two", "title": "1", "chapters": "3-4"}]')
+    self.assertEqual([(job.source, job.title, job.start, job.end, job.output)
+                      for job in jobs],
+                     [('/dvd/one', 2, None, None, 'Train'),
+                      ('/dvd/two', 1, 3, 4, None)])
+    self.assertRaises(manifest.Error, manifest.ParseJson, '{"source": "/a"}')
+    self.assertRaises(manifest.Error, manifest.ParseJson, '["/a"]')
+    self.assertRaises(manifest.Error, manifest.ParseJson, '[{')
+
+  def testReadManifest(self):
+    """Verifies manifests are read by their file type."""
+    path = self.WriteManifest('jobs.csv', 'source,title\r\n/dvd/one,1\r\n')
+    self.assertEqual([(job.source, job.title)
+                      for job in manifest.ReadManifest(path)],
+                     [('/dvd/one', 1)])
+    if manifest.json is not None:
+      path = self.WriteManifest('jobs.JSON',
+                                '[{"source": "/dvd/two", "title": 3}]')
+      self.assertEqual([(job.source, job.title)
+                        for job in manifest.ReadManifest(path)],
+                       [('/dvd/two', 3)])
+    self.assertRaises(manifest.Error, manifest.ReadManifest,
+                      os.path.join(self.directory, 'missing.csv'))
+
+  def testGroupBySource(self):
+    """Verifies jobs are grouped by source in the order listed."""
+    one = manifest.ManifestJob('/dvd/one', 1)
+    two = manifest.ManifestJob('/dvd/two', 1)
+    three = manifest.ManifestJob('/dvd/one', 2)
+    self.assertEqual(manifest.GroupBySource([one, two, three]),
+                     [('/dvd/one', [one, three]), ('/dvd/two', [two])])
+    self.assertEqual(manifest.GroupBySource([]), [])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,241 @@
+#!/usr/bin/python2.5
+#
+# Copyright 2009, Robert M. Pufky (robert.pufky@gmail.com)
+#
+# GPLv2 License:
+# --------------
+# Copyright (C) 2009 Robert M. Pufky (robert.pufky@gmail.com)
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more 
+# details.
+#
+# You should have received a copy of the GNU General Public License along with 
+# this program; if not, write to the Free Software Foundation, Inc., 59 Temple
+# Place, Suite 330, Boston, MA 02111-1307 USA
+#
+# You can also read the license at:
+#
+#  http://www.opensource.org/licenses/gpl-2.0.php
+#
+# Please contact me if you wish to use this in another product that you are 
+# building (robert.pufky@gmail.com); or building to sell.
+#
+"""HandBrakeCLI encode progress tracking.
+
+While encoding, HandBrakeCLI prints progress indicators separated by carriage
+returns:
+
+  Encoding: task 1 of 2, 5.43 %
+  Encoding: task 1 of 2, 12.34 % (45.67 fps, avg 43.21 fps, ETA 01h23m45s)
+
+These are parsed into ProgressEvent objects, and collected per encode by a
+ProgressTracker, which keeps a history of encoding rates to estimate time
+remaining and to detect stalled encodes.
+"""
+
+__author__ = 'Robert M. Pufky (robert.pufky@gmail.com)'
+__version__ = '1.0'
+
+import re
+import time
+
+import dvd
+
+PROGRESS_LINE = re.compile(
+    r'^Encoding: task (\d+) of (\d+), ([\d.]+) %'
+    r'(?: \(([\d.]+) fps, avg ([\d.]+) fps, ETA (\d+)h(\d+)m(\d+)s\))?')
+
+
+class ProgressEvent(object):
+  """A single HandBrakeCLI progress indicator.
+
+  Attributes:
+    task: Integer current task (pass) number, starting at 1.
+    tasks: Integer total number of tasks.
+    percent: Float percent complete of the current task.
+    fps: Float current encoding rate, or None if not reported.
+    average_fps: Float average encoding rate of the current task, or None.
+    eta: Integer seconds remaining for the current task, or None.
+    time: Float time.time() the event was read.
+  """
+
+  def __init__(self, task, tasks, percent, fps=None, average_fps=None,
+               eta=None, event_time=None):
+    """Initializes ProgressEvent.
+
+    Args:
+      task: Integer current task number.
+      tasks: Integer total number of tasks.
+      percent: Float percent complete of the current task.
+      fps: Float current encoding rate.  Default None.
+      average_fps: Float average encoding rate.  Default None.
+      eta: Integer seconds remaining for the current task.  Default None.
+      event_time: Float time the event was read.  Default now.
+    """
+    self.task = task
+    self.tasks = tasks
+    self.percent = percent
+    self.fps = fps
+    self.average_fps = average_fps
+    self.eta = eta
+    if event_time is None:
+      event_time = time.time()
+    self.time = event_time
+
+  def TotalPercent(self):
+    """Returns Float percent complete across all tasks."""
+    return ((self.task - 1) * 100.0 + self.percent) / max(self.tasks, 1)
+
+  def __str__(self):
+    """Returns a String summary of the event, for logging."""
+    summary = 'task %s of %s, %.2f %%' % (self.task, self.tasks, self.percent)
+    if self.fps is not None:
+      eta = 'unknown'
+      if self.eta is not None:
+        eta = dvd.FormatDuration(self.eta)
+      summary = '%s (%.2f fps, avg %.2f fps, ETA %s)' % (
+          summary, self.fps, self.average_fps, eta)
+    return summary
+
+
+def ParseProgressLine(line, event_time=None):
+  """Parses a HandBrakeCLI progress indicator line.
+
+  Args:
+    line: String HandBrakeCLI output line, without carriage returns.
+    event_time: Float time the line was read.  Default now.
+
+  Returns:
+    ProgressEvent for the line, or None if it is not a progress indicator.
+  """
+  match = PROGRESS_LINE.match(line)
+  if not match:
+    return None
+  task, tasks, percent, fps, average_fps, hours, minutes, seconds = (
+      match.groups())
+  event = ProgressEvent(int(task), int(tasks), float(percent),
+                        event_time=event_time)
+  if fps is not None:
+    event.fps = float(fps)
+    event.average_fps = float(average_fps)
+    event.eta = int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+  return event
+
+
+class ProgressTracker(object):
+  """Tracks the progress of a single HandBrakeCLI encode.
+
+  ProcessLine may be registered directly as a HandBrake line callback.
+
+  Attributes:
+    HISTORY: Integer number of encoding rates kept per task.
+    title: Integer/String title being encoded.
+    source: String source the title is encoded from, or None.
+    last: Last ProgressEvent read, or None.
+    fps_history: Dictionary mapping task numbers to lists of Float encoding
+      rates, holding at most HISTORY rates.
+    started: Float time.time() tracking started.
+    _callbacks: List of functions called with (source, title, ProgressEvent).
+  """
+  HISTORY = 1000
+
+  def __init__(self, title=None, callbacks=None, source=None):
+    """Initializes ProgressTracker.
+
+    Args:
+      title: Integer/String title being encoded.  Default None.
+      callbacks: List of functions called with (source, title, ProgressEvent)
+        for each progress event.  Default None.
+      source: String source the title is encoded from.  Default None.
+    """
+    self.title = title
+    self.source = source
+    self.last = None
+    self.fps_history = {}
+    self.started = time.time()
+    self._callbacks = list(callbacks or [])
+
+  def ProcessLine(self, line):
+    """Processes a single line of HandBrakeCLI output.
+
+    Args:
+      line: String HandBrakeCLI output line.
+    """
+    event = ParseProgressLine(line)
+    if event is not None:
+      self.AddEvent(event)
+
+  def AddEvent(self, event):
+    """Records a progress event and passes it to the progress callbacks.
+
+    Args:
+      event: ProgressEvent to record.
+    """
+    self.last = event
+    if event.fps is not None:
+      history = self.fps_history.setdefault(event.task, [])
+      history.append(event.fps)
+      if len(history) > self.HISTORY:
+        del history[0]
+    for callback in self._callbacks:
+      callback(self.source, self.title, event)
+
+  def Eta(self, now=None):
+    """Estimates the number of seconds remaining for all tasks.
+
+    HandBrakeCLI's estimate is used for the current task when available.
+    Remaining tasks are assumed to take as long as the elapsed ones.
+
+    Args:
+      now: Float current time.time().  Default now.
+
+    Returns:
+      Integer seconds remaining, or None if no progress has been made.
+    """
+    if self.last is None or self.last.TotalPercent() <= 0:
+      return None
+    if now is None:
+      now = time.time()
+    total = self.last.TotalPercent()
+    elapsed = now - self.started
+    if self.last.eta is None:
+      return int(elapsed * (100.0 - total) / total)
+    task_seconds = elapsed * 100.0 / total / self.last.tasks
+    return int(self.last.eta +
+               task_seconds * (self.last.tasks - self.last.task))
+
+  def IsStalled(self, timeout, now=None):
+    """Determines if the encode has stopped reporting progress.
+
+    Args:
+      timeout: Integer seconds without progress before an encode is stalled.
+      now: Float current time.time().  Default now.
+
+    Returns:
+      Boolean True if no progress was reported in the last timeout seconds.
+    """
+    if now is None:
+      now = time.time()
+    if self.last is None:
+      return now - self.started > timeout
+    return now - self.last.time > timeout
+
+  def Summary(self):
+    """Summarizes the encoding rates of each task.
+
+    Returns:
+      List of Strings, one line per task with reported encoding rates.
+    """
+    summary = []
+    for task in sorted(self.fps_history):
+      history = self.fps_history[task]
+      summary.append(
+          'Task %s encoding rate: %.2f fps average, %.2f fps minimum, '
+          '%.2f fps maximum.' % (task, sum(history) / len(history),
+                                 min(history), max(history)))
+    return summary
@@ -0,0 +1,130 @@
+#!/usr/bin/python2.5
+#
+# Copyright 2009, Robert M. Pufky (robert.pufky@gmail.com)
+#
+# GPLv2 License:
+# --------------
+# Copyright (C) 2009 Robert M. Pufky (robert.pufky@gmail.com)
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more 
+# details.
+#
+# You should have received a copy of the GNU General Public License along with 
+# this program; if not, write to the Free Software Foundation, Inc., 59 Temple
+# Place, Suite 330, Boston, MA 02111-1307 USA
+#
+# You can also read the license at:
+#
+#  http://www.opensource.org/licenses/gpl-2.0.php
+#
+# Please contact me if you wish to use this in another product that you are 
+# building (robert.pufky@gmail.com); or building to sell.
+#
+"""Test suite for progress."""
+
+__author__ = 'Robert M. Pufky (robert.pufky@gmail.com)'
+
+import unittest
+import progress
+
+
+class TestParseProgressLine(unittest.TestCase):
+  """Verifies HandBrakeCLI progress lines are parsed properly."""
+
+  def testPercentOnly(self):
+    """Verifies a progress line without encoding rates is parsed."""
+    event = progress.ParseProgressLine('Encoding: task 1 of 2, 5.43 %', 10.0)
+    self.assertEqual((event.task, event.tasks, event.percent),
+                     (1, 2, 5.43))
+    self.assertEqual((event.fps, event.average_fps, event.eta),
+                     (None, None, None))
+    self.assertEqual(event.time, 10.0)
+    self.assertAlmostEqual(event.TotalPercent(), 2.715)
+    self.assertEqual(str(event), 'task 1 of 2, 5.43 %')
+
+  def testFullLine(self):
+    """Verifies a progress line with encoding rates is parsed."""
+    event = progress.ParseProgressLine(
+        'Encoding: task 2 of 2, 12.34 % (45.67 fps, avg 43.21 fps, '
+        'ETA 01h23m45s)')
+    self.assertEqual((event.fps, event.average_fps, event.eta),
+                     (45.67, 43.21, 5025))
+    self.assertAlmostEqual(event.TotalPercent(), 56.17)
+    self.assertEqual(str(event), 'task 2 of 2, 12.34 % (45.67 fps, avg 43.21 '
+                     'fps, ETA 01:23:45)')
+
+  def testNotProgress(self):
+    """Verifies other lines are ignored."""
+    self.assertEqual(progress.ParseProgressLine('Encoding: task'), None)
+    self.assertEqual(progress.ParseProgressLine('+ title 1:'), None)
+
+  def testUnknownEta(self):
+    """Verifies a missing ETA is summarized as unknown."""
+    event = progress.ProgressEvent(1, 1, 5.0, fps=30.0, average_fps=29.0)
+    self.assertEqual(str(event), 'task 1 of 1, 5.00 % (30.00 fps, avg 29.00 '
+                     'fps, ETA unknown)')
+
+
+class TestProgressTracker(unittest.TestCase):
+  """Verifies ProgressTracker works properly."""
+
+  def setUp(self):
+    self.events = []
+    self.tracker = progress.ProgressTracker(
+        3, [lambda source, title, event: self.events.append(
+            (source, title, event.percent))], '/dvd')
+    self.tracker.started = 100.0
+
+  def testProcessLine(self):
+    """Verifies progress lines are recorded and passed to callbacks."""
+    self.tracker.ProcessLine('Scanning title 1...')
+    self.tracker.ProcessLine('Encoding: task 1 of 1, 5.00 %')
+    self.tracker.ProcessLine('Encoding: task 1 of 1, 6.00 % '
+                             '(30.00 fps, avg 25.00 fps, ETA 00h10m00s)')
+    self.assertEqual(self.events, [('/dvd', 3, 5.0), ('/dvd', 3, 6.0)])
+    self.assertEqual(self.tracker.last.percent, 6.0)
+    self.assertEqual(self.tracker.fps_history, {1: [30.0]})
+
+  def testHistoryLimit(self):
+    """Verifies the encoding rate history is bounded."""
+    for fps in xrange(progress.ProgressTracker.HISTORY + 5):
+      self.tracker.AddEvent(progress.ProgressEvent(1, 1, 1.0, fps, fps, 1))
+    history = self.tracker.fps_history[1]
+    self.assertEqual(len(history), progress.ProgressTracker.HISTORY)
+    self.assertEqual(history[0], 5)
+
+  def testEta(self):
+    """Verifies time remaining is estimated for all tasks."""
+    self.assertEqual(self.tracker.Eta(200.0), None)
+    self.tracker.AddEvent(progress.ProgressEvent(1, 2, 25.0))
+    self.assertEqual(self.tracker.Eta(200.0), 700)
+    self.tracker.AddEvent(progress.ProgressEvent(1, 2, 50.0, 10.0, 10.0, 90))
+    self.assertEqual(self.tracker.Eta(200.0), 290)
+
+  def testIsStalled(self):
+    """Verifies stalled encodes are detected."""
+    self.assertFalse(self.tracker.IsStalled(60, 150.0))
+    self.assertTrue(self.tracker.IsStalled(60, 161.0))
+    self.tracker.AddEvent(progress.ProgressEvent(1, 1, 1.0, event_time=160.0))
+    self.assertFalse(self.tracker.IsStalled(60, 200.0))
+    self.assertTrue(self.tracker.IsStalled(60, 221.0))
+
+  def testSummary(self):
+    """Verifies encoding rates are summarized per task."""
+    self.assertEqual(self.tracker.Summary(), [])
+    for task, fps in [(1, 10.0), (1, 30.0), (2, 5.0)]:
+      self.tracker.AddEvent(progress.ProgressEvent(task, 2, 1.0, fps, fps, 1))
+    self.assertEqual(self.tracker.Summary(), [
+        'Task 1 encoding rate: 20.00 fps average, 10.00 fps minimum, '
+        '30.00 fps maximum.',
+        'Task 2 encoding rate: 5.00 fps average, 5.00 fps minimum, '
+        '5.00 fps maximum.'])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,378 @@
+#!/usr/bin/python2.5
+#
+# Copyright 2009, Robert M. Pufky (robert.pufky@gmail.com)
+#
+# GPLv2 License:
+# --------------
+# Copyright (C) 2009 Robert M. Pufky (robert.pufky@gmail.com)
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more 
+# details.
+#
+# You should have received a copy of the GNU General Public License along with 
+# this program; if not, write to the Free Software Foundation, Inc., 59 Temple
+# Place, Suite 330, Boston, MA 02111-1307 USA
+#
+# You can also read the license at:
+#
+#  http://www.opensource.org/licenses/gpl-2.0.php
+#
+# Please contact me if you wish to use this in another product that you are 
+# building (robert.pufky@gmail.com); or building to sell.
+#
+"""Caches of parsed HandBrake DVD scans and HandBrakeCLI version banners.
+
+A full HandBrakeCLI title scan (--title 0) takes minutes per DVD.  Parsed
+dvd.Dvd objects are cached by source path along with a fingerprint of the rip,
+made from the names, sizes and modification times of its IFO files.  A cached
+scan is only used while the fingerprint of the rip still matches.  Every caller
+is given its own copy of a cached scan, so scans can be shared between threads.
+
+HandBrakeCLI version banners are cached separately, by the location, size and
+modification time of the binary, so they are kept when the scan format changes.
+"""
+
+__author__ = 'Robert M. Pufky (robert.pufky@gmail.com)'
+__version__ = '1.0'
+
+import cPickle
+import hashlib
+import os
+import threading
+
+# Increment when the pickled dvd module objects change, to discard old scans.
+CACHE_VERSION = 8
+
+# Increment when the format of cached version banners changes.
+VERSION_CACHE_VERSION = 1
+
+
+class ScanCache(object):
+  """Caches parsed dvd.Dvd objects in memory, and optionally on disk.
+
+  Attributes:
+    directory: String directory to store cached scans in.  None caches scans in
+      memory only.
+    _memory: Dictionary mapping source paths to (fingerprint, <str pickled
+      dvd.Dvd>) tuples.
+    _lock: threading.Lock protecting the in-memory cache.
+  """
+
+  def __init__(self, directory=None):
+    """Initializes ScanCache.
+
+    Args:
+      directory: String directory to store cached scans in.  Default None
+        (cache in memory only).
+    """
+    self.directory = directory
+    self._memory = {}
+    self._lock = threading.Lock()
+
+  def _FindVideoTs(self, source):
+    """Finds the VIDEO_TS directory for a given DVD source.
+
+    Args:
+      source: String full path to a DVD container, or VIDEO_TS directory.
+
+    Returns:
+      String full path to the VIDEO_TS directory, or None if not found.
+    """
+    if os.path.basename(os.path.normpath(source)).upper() == 'VIDEO_TS':
+      return source
+    for name in os.listdir(source):
+      if name.upper() == 'VIDEO_TS':
+        video_ts = os.path.join(source, name)
+        if os.path.isdir(video_ts):
+          return video_ts
+    return None
+
+  def Fingerprint(self, source):
+    """Generates a cheap fingerprint for a DVD rip.
+
+    The fingerprint of a DVD container is made from the IFO files in VIDEO_TS.
+    The fingerprint of a DVD image file is made from the image file itself.
+
+    Args:
+      source: String full path to a DVD container, VIDEO_TS directory or DVD
+        image file.
+
+    Returns:
+      Tuple containing (<str name>, <int size>, <int mtime>) tuples, or None if
+      the source could not be fingerprinted.
+    """
+    entries = []
+    try:
+      if os.path.isfile(source):
+        stat = os.stat(source)
+        entries.append((os.path.basename(source), stat.st_size,
+                        int(stat.st_mtime)))
+      else:
+        video_ts = self._FindVideoTs(source)
+        if not video_ts:
+          return None
+        for name in sorted(os.listdir(video_ts)):
+          if name.upper().endswith('.IFO'):
+            stat = os.stat(os.path.join(video_ts, name))
+            entries.append((name, stat.st_size, int(stat.st_mtime)))
+    except OSError:
+      return None
+    if not entries:
+      return None
+    return tuple(entries)
+
+  def _CacheFile(self, source):
+    """Returns the String full path to the on-disk cache file for a source."""
+    if isinstance(source, unicode):
+      source = source.encode('utf-8')
+    return os.path.join(self.directory,
+                        '%s.scan' % hashlib.sha1(source).hexdigest())
+
+  def _Load(self, source):
+    """Loads a cached scan from disk.
+
+    Args:
+      source: String full path to the DVD source.
+
+    Returns:
+      Tuple (<tuple fingerprint>, <dvd.Dvd dvd>), or None if there is no valid
+      cached scan on disk.
+    """
+    try:
+      cache_file = open(self._CacheFile(source), 'rb')
+      try:
+        version, cached_source, fingerprint, dvd = cPickle.load(cache_file)
+      finally:
+        cache_file.close()
+    except (IOError, OSError, EOFError, ValueError, TypeError,
+            AttributeError, ImportError, cPickle.UnpicklingError):
+      return None
+    if version != CACHE_VERSION or cached_source != source:
+      return None
+    return (fingerprint, dvd)
+
+  def _Save(self, source, fingerprint, dvd):
+    """Saves a scan to disk, replacing the existing cache file atomically.
+
+    Args:
+      source: String full path to the DVD source.
+      fingerprint: Tuple fingerprint of the DVD source.
+      dvd: dvd.Dvd object to cache.
+
+    Returns:
+      Boolean True if the scan was saved, False otherwise.
+    """
+    cache_file = self._CacheFile(source)
+    temp_file = '%s.%s.tmp' % (cache_file, os.getpid())
+    try:
+      if not os.path.isdir(self.directory):
+        os.makedirs(self.directory)
+      output = open(temp_file, 'wb')
+      try:
+        cPickle.dump((CACHE_VERSION, source, fingerprint, dvd), output,
+                     cPickle.HIGHEST_PROTOCOL)
+      finally:
+        output.close()
+      os.rename(temp_file, cache_file)
+    except (IOError, OSError, cPickle.PicklingError):
+      if os.path.exists(temp_file):
+        os.remove(temp_file)
+      return False
+    return True
+
+  def Get(self, source, fingerprint):
+    """Returns a cached scan for a DVD source.
+
+    Args:
+      source: String full path to the DVD source.
+      fingerprint: Tuple current fingerprint of the DVD source (Fingerprint).
+
+    Returns:
+      New dvd.Dvd object for the source, or None if there is no cached scan
+      matching the fingerprint.
+    """
+    if fingerprint is None:
+      return None
+    self._lock.acquire()
+    try:
+      entry = self._memory.get(source)
+    finally:
+      self._lock.release()
+    if (entry is None or entry[0] != fingerprint) and self.directory:
+      loaded = self._Load(source)
+      if loaded is not None and loaded[0] == fingerprint:
+        entry = (fingerprint,
+                 cPickle.dumps(loaded[1], cPickle.HIGHEST_PROTOCOL))
+        self._lock.acquire()
+        try:
+          self._memory[source] = entry
+        finally:
+          self._lock.release()
+        return loaded[1]
+    if entry is None or entry[0] != fingerprint:
+      return None
+    return cPickle.loads(entry[1])
+
+  def Put(self, source, fingerprint, dvd):
+    """Caches a scan for a DVD source.
+
+    Args:
+      source: String full path to the DVD source.
+      fingerprint: Tuple fingerprint of the DVD source, taken before the scan.
+      dvd: dvd.Dvd object containing the scan of the source.
+
+    Returns:
+      Boolean True if the scan was cached, False otherwise.
+    """
+    if fingerprint is None:
+      return False
+    try:
+      pickled = cPickle.dumps(dvd, cPickle.HIGHEST_PROTOCOL)
+    except cPickle.PicklingError:
+      return False
+    self._lock.acquire()
+    try:
+      self._memory[source] = (fingerprint, pickled)
+    finally:
+      self._lock.release()
+    if self.directory:
+      return self._Save(source, fingerprint, dvd)
+    return True
+
+
+class VersionCache(object):
+  """Caches HandBrakeCLI version banners in memory, and optionally on disk.
+
+  Banners are keyed by (<str location>, <int size>, <int mtime>) of the
+  binary, so a replaced binary is checked again.  All banners are kept in a
+  single file in the cache directory.
+
+  Attributes:
+    directory: String directory to store cached banners in.  None caches
+      banners in memory only.
+    _banners: Dictionary mapping binary keys to String banners, or None until
+      the banners are loaded from disk.
+    _lock: threading.Lock protecting the cached banners.
+  """
+
+  def __init__(self, directory=None):
+    """Initializes VersionCache.
+
+    Args:
+      directory: String directory to store cached banners in.  Default None
+        (cache in memory only).
+    """
+    self.directory = directory
+    self._banners = None
+    self._lock = threading.Lock()
+
+  def Fingerprint(self, location):
+    """Generates a fingerprint for a HandBrakeCLI binary.
+
+    Args:
+      location: String full path to the binary.
+
+    Returns:
+      Tuple (<int size>, <int mtime>) of the binary, or None if the binary
+      could not be fingerprinted.
+    """
+    try:
+      stat = os.stat(location)
+    except (OSError, TypeError):
+      return None
+    return (stat.st_size, int(stat.st_mtime))
+
+  def _CacheFile(self):
+    """Returns the String full path to the on-disk banner cache file."""
+    return os.path.join(self.directory, 'banners')
+
+  def _Load(self):
+    """Returns the Dictionary of banners cached on disk, or an empty one."""
+    if not self.directory:
+      return {}
+    try:
+      cache_file = open(self._CacheFile(), 'rb')
+      try:
+        version, banners = cPickle.load(cache_file)
+      finally:
+        cache_file.close()
+    except (IOError, OSError, EOFError, ValueError, TypeError,
+            AttributeError, ImportError, cPickle.UnpicklingError):
+      return {}
+    if version != VERSION_CACHE_VERSION or not isinstance(banners, dict):
+      return {}
+    return banners
+
+  def _Save(self):
+    """Saves the banners to disk, replacing the existing cache file atomically.
+
+    Returns:
+      Boolean True if the banners were saved, False otherwise.
+    """
+    cache_file = self._CacheFile()
+    temp_file = '%s.%s.tmp' % (cache_file, os.getpid())
+    try:
+      if not os.path.isdir(self.directory):
+        os.makedirs(self.directory)
+      output = open(temp_file, 'wb')
+      try:
+        cPickle.dump((VERSION_CACHE_VERSION, self._banners), output,
+                     cPickle.HIGHEST_PROTOCOL)
+      finally:
+        output.close()
+      os.rename(temp_file, cache_file)
+    except (IOError, OSError, cPickle.PicklingError):
+      if os.path.exists(temp_file):
+        os.remove(temp_file)
+      return False
+    return True
+
+  def Get(self, location, fingerprint):
+    """Returns the cached version banner for a HandBrakeCLI binary.
+
+    Args:
+      location: String full path to the binary.
+      fingerprint: Tuple current fingerprint of the binary (Fingerprint).
+
+    Returns:
+      String version banner, or None if there is no banner cached for the
+      binary as it is now.
+    """
+    if fingerprint is None:
+      return None
+    self._lock.acquire()
+    try:
+      if self._banners is None:
+        self._banners = self._Load()
+      return self._banners.get((location,) + tuple(fingerprint))
+    finally:
+      self._lock.release()
+
+  def Put(self, location, fingerprint, banner):
+    """Caches the version banner for a HandBrakeCLI binary.
+
+    Args:
+      location: String full path to the binary.
+      fingerprint: Tuple fingerprint of the binary, taken before it was run.
+      banner: String version banner reported by the binary.
+
+    Returns:
+      Boolean True if the banner was cached, False otherwise.
+    """
+    if fingerprint is None:
+      return False
+    self._lock.acquire()
+    try:
+      if self._banners is None:
+        self._banners = self._Load()
+      self._banners[(location,) + tuple(fingerprint)] = banner
+      if self.directory:
+        return self._Save()
+      return True
+    finally:
+      self._lock.release()
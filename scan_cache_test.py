@@ -0,0 +1,257 @@
+#!/usr/bin/python2.5
+#
+# Copyright 2009, Robert M. Pufky (robert.pufky@gmail.com)
+#
+# GPLv2 License:
+# --------------
+# Copyright (C) 2009 Robert M. Pufky (robert.pufky@gmail.com)
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more 
+# details.
+#
+# You should have received a copy of the GNU General Public License along with 
+# this program; if not, write to the Free Software Foundation, Inc., 59 Temple
+# Place, Suite 330, Boston, MA 02111-1307 USA
+#
+# You can also read the license at:
+#
+#  http://www.opensource.org/licenses/gpl-2.0.php
+#
+# Please contact me if you wish to use this in another product that you are 
+# building (robert.pufky@gmail.com); or building to sell.
+#
+"""Test suite for scan_cache."""
+
+__author__ = 'Robert M. Pufky (robert.pufky@gmail.com)'
+
+import os
+import shutil
+import tempfile
+import unittest
+import dvd
+import scan_cache
+
+
+class BaseScanCacheTest(unittest.TestCase):
+  """Base setup creating a fake DVD rip for scan cache testing."""
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.source = os.path.join(self.directory, 'MOVIE') + os.sep
+    self.video_ts = os.path.join(self.source, 'VIDEO_TS')
+    self.cache_directory = os.path.join(self.directory, 'cache')
+    os.makedirs(self.video_ts)
+    self.WriteFile('VIDEO_TS.IFO', 'vmg')
+    self.WriteFile('VTS_01_0.IFO', 'vts')
+    self.WriteFile('VTS_01_1.VOB', 'video')
+    self.dvd = dvd.Dvd('MOVIE', [dvd.Title()])
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def WriteFile(self, name, data):
+    """Writes data to a file in the fake VIDEO_TS directory.
+
+    Args:
+      name: String name of the file to write.
+      data: String data to write to the file.
+    """
+    output = open(os.path.join(self.video_ts, name), 'w')
+    output.write(data)
+    output.close()
+
+
+class TestScanCacheFingerprint(BaseScanCacheTest):
+  """Verifies ScanCache.Fingerprint works properly."""
+
+  def setUp(self):
+    BaseScanCacheTest.setUp(self)
+    self.cache = scan_cache.ScanCache()
+
+  def testFingerprint(self):
+    """Verifies only IFO files are used in the fingerprint."""
+    fingerprint = self.cache.Fingerprint(self.source)
+    self.assertEqual([entry[0] for entry in fingerprint],
+                     ['VIDEO_TS.IFO', 'VTS_01_0.IFO'])
+    self.assertEqual([entry[1] for entry in fingerprint], [3, 3])
+    self.assertEqual(fingerprint, self.cache.Fingerprint(self.video_ts))
+
+  def testFingerprintChanges(self):
+    """Verifies the fingerprint changes when an IFO file changes."""
+    fingerprint = self.cache.Fingerprint(self.source)
+    self.WriteFile('VTS_01_1.VOB', 'more video')
+    self.assertEqual(fingerprint, self.cache.Fingerprint(self.source))
+    self.WriteFile('VTS_01_0.IFO', 'new vts')
+    self.assertNotEqual(fingerprint, self.cache.Fingerprint(self.source))
+
+  def testFingerprintImageFile(self):
+    """Verifies a DVD image file is fingerprinted by the file itself."""
+    image = os.path.join(self.video_ts, 'VTS_01_1.VOB')
+    self.assertEqual(self.cache.Fingerprint(image),
+                     (('VTS_01_1.VOB', 5, int(os.stat(image).st_mtime)),))
+
+  def testFingerprintInvalid(self):
+    """Verifies sources that cannot be fingerprinted return None."""
+    self.assertEqual(self.cache.Fingerprint(self.directory), None)
+    self.assertEqual(self.cache.Fingerprint('/does/not/exist'), None)
+
+
+class TestScanCache(BaseScanCacheTest):
+  """Verifies ScanCache Get and Put work properly."""
+
+  def testMemoryCache(self):
+    """Verifies scans are cached in memory without a directory."""
+    cache = scan_cache.ScanCache()
+    fingerprint = cache.Fingerprint(self.source)
+    self.assertEqual(cache.Get(self.source, fingerprint), None)
+    self.assertTrue(cache.Put(self.source, fingerprint, self.dvd))
+    self.assertEqual(cache.Get(self.source, fingerprint).name, 'MOVIE')
+    self.assertFalse(os.path.exists(self.cache_directory))
+
+  def testCopies(self):
+    """Verifies every caller is given its own copy of a cached scan."""
+    cache = scan_cache.ScanCache(self.cache_directory)
+    fingerprint = cache.Fingerprint(self.source)
+    cache.Put(self.source, fingerprint, self.dvd)
+    self.dvd.name = 'CHANGED'
+    first = cache.Get(self.source, fingerprint)
+    self.assertEqual(first.name, 'MOVIE')
+    first.titles = []
+    self.assertEqual(len(cache.Get(self.source, fingerprint).titles), 1)
+    loaded = scan_cache.ScanCache(self.cache_directory)
+    self.assertTrue(loaded.Get(self.source, fingerprint) is not
+                    loaded.Get(self.source, fingerprint))
+
+  def testUnicodeSource(self):
+    """Verifies non-ASCII unicode source paths can be cached on disk."""
+    cache = scan_cache.ScanCache(self.cache_directory)
+    source = u'/dvds/Am\xe9lie'
+    self.assertTrue(cache.Put(source, (('VIDEO_TS.IFO', 1, 1),), self.dvd))
+    self.assertEqual(
+        scan_cache.ScanCache(self.cache_directory).Get(
+            source, (('VIDEO_TS.IFO', 1, 1),)).name, 'MOVIE')
+
+  def testNoFingerprint(self):
+    """Verifies sources without a fingerprint are never cached."""
+    cache = scan_cache.ScanCache()
+    self.assertFalse(cache.Put(self.source, None, self.dvd))
+    self.assertEqual(cache.Get(self.source, None), None)
+
+  def testDiskCache(self):
+    """Verifies scans are persisted to disk between cache instances."""
+    cache = scan_cache.ScanCache(self.cache_directory)
+    fingerprint = cache.Fingerprint(self.source)
+    self.assertTrue(cache.Put(self.source, fingerprint, self.dvd))
+    cached_dvd = scan_cache.ScanCache(self.cache_directory).Get(self.source,
+                                                                fingerprint)
+    self.assertEqual(cached_dvd.name, 'MOVIE')
+    self.assertEqual(len(cached_dvd.titles), 1)
+    self.assertEqual(os.listdir(self.cache_directory),
+                     [os.path.basename(cache._CacheFile(self.source))])
+
+  def testStaleCache(self):
+    """Verifies a changed rip invalidates the cached scan."""
+    cache = scan_cache.ScanCache(self.cache_directory)
+    cache.Put(self.source, cache.Fingerprint(self.source), self.dvd)
+    self.WriteFile('VIDEO_TS.IFO', 'new vmg')
+    fingerprint = cache.Fingerprint(self.source)
+    self.assertEqual(cache.Get(self.source, fingerprint), None)
+    self.assertEqual(
+        scan_cache.ScanCache(self.cache_directory).Get(self.source,
+                                                       fingerprint),
+        None)
+
+  def testCorruptCache(self):
+    """Verifies a corrupt or old cache file is ignored."""
+    cache = scan_cache.ScanCache(self.cache_directory)
+    fingerprint = cache.Fingerprint(self.source)
+    cache.Put(self.source, fingerprint, self.dvd)
+    cache_file = open(cache._CacheFile(self.source), 'w')
+    cache_file.write('garbage')
+    cache_file.close()
+    self.assertEqual(
+        scan_cache.ScanCache(self.cache_directory).Get(self.source,
+                                                       fingerprint),
+        None)
+
+  def testUnwritableCache(self):
+    """Verifies a cache directory that cannot be created fails quietly."""
+    cache = scan_cache.ScanCache(os.path.join(self.video_ts, 'VIDEO_TS.IFO',
+                                              'cache'))
+    fingerprint = cache.Fingerprint(self.source)
+    self.assertFalse(cache.Put(self.source, fingerprint, self.dvd))
+    self.assertEqual(cache.Get(self.source, fingerprint).name, 'MOVIE')
+
+
+class TestVersionCache(unittest.TestCase):
+  """Verifies VersionCache works properly."""
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.binary = os.path.join(self.directory, 'HandBrakeCLI')
+    self.WriteBinary('binary')
+    self.cache_directory = os.path.join(self.directory, 'versions')
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def WriteBinary(self, data):
+    """Writes data to the fake HandBrakeCLI binary."""
+    output = open(self.binary, 'w')
+    output.write(data)
+    output.close()
+
+  def testFingerprint(self):
+    """Verifies binaries are fingerprinted by size and mtime."""
+    cache = scan_cache.VersionCache()
+    self.assertEqual(cache.Fingerprint(self.binary),
+                     (6, int(os.stat(self.binary).st_mtime)))
+    self.assertEqual(cache.Fingerprint('/does/not/exist'), None)
+    self.assertEqual(cache.Fingerprint(None), None)
+
+  def testMemoryCache(self):
+    """Verifies banners are cached in memory without a directory."""
+    cache = scan_cache.VersionCache()
+    fingerprint = cache.Fingerprint(self.binary)
+    self.assertEqual(cache.Get(self.binary, fingerprint), None)
+    self.assertTrue(cache.Put(self.binary, fingerprint, 'HandBrake 0.9.3'))
+    self.assertEqual(cache.Get(self.binary, fingerprint), 'HandBrake 0.9.3')
+    self.assertFalse(cache.Put(self.binary, None, 'HandBrake 0.9.3'))
+    self.assertEqual(cache.Get(self.binary, None), None)
+    self.assertFalse(os.path.exists(self.cache_directory))
+
+  def testDiskCache(self):
+    """Verifies banners persist on disk until the binary changes."""
+    cache = scan_cache.VersionCache(self.cache_directory)
+    fingerprint = cache.Fingerprint(self.binary)
+    self.assertTrue(cache.Put(self.binary, fingerprint, 'HandBrake 0.9.3'))
+    self.assertEqual(os.listdir(self.cache_directory), ['banners'])
+    loaded = scan_cache.VersionCache(self.cache_directory)
+    self.assertEqual(loaded.Get(self.binary, fingerprint), 'HandBrake 0.9.3')
+    self.WriteBinary('new binary')
+    self.assertEqual(loaded.Get(self.binary, loaded.Fingerprint(self.binary)),
+                     None)
+
+  def testScanCacheVersion(self):
+    """Verifies banners are kept when the scan cache version changes."""
+    cache = scan_cache.VersionCache(self.cache_directory)
+    fingerprint = cache.Fingerprint(self.binary)
+    cache.Put(self.binary, fingerprint, 'HandBrake 0.9.3')
+    scan_version = scan_cache.CACHE_VERSION
+    scan_cache.CACHE_VERSION += 1
+    try:
+      self.assertEqual(
+          scan_cache.VersionCache(self.cache_directory).Get(self.binary,
+                                                            fingerprint),
+          'HandBrake 0.9.3')
+    finally:
+      scan_cache.CACHE_VERSION = scan_version
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,403 @@
+#!/usr/bin/python2.5
+#
+# Copyright 2009, Robert M. Pufky (robert.pufky@gmail.com)
+#
+# GPLv2 License:
+# --------------
+# Copyright (C) 2009 Robert M. Pufky (robert.pufky@gmail.com)
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more 
+# details.
+#
+# You should have received a copy of the GNU General Public License along with 
+# this program; if not, write to the Free Software Foundation, Inc., 59 Temple
+# Place, Suite 330, Boston, MA 02111-1307 USA
+#
+# You can also read the license at:
+#
+#  http://www.opensource.org/licenses/gpl-2.0.php
+#
+# Please contact me if you wish to use this in another product that you are 
+# building (robert.pufky@gmail.com); or building to sell.
+#
+"""Fast discovery of DVD containers in a directory tree.
+
+A DVD container is a directory whose direct children include a VIDEO_TS
+directory.  The tree is walked by a pool of threads, as listing directories on
+network mounts is mostly spent waiting on I/O.  Containers are not descended
+into, and directories are identified by (st_dev, st_ino), so symlinked
+directories are only walked, and symlinked rips only found, once.
+
+Directory listings can be kept in a persistent DirectoryIndex.  A directory
+whose modification time has not changed since the last walk is not listed
+again; only a stat is needed to walk it.
+"""
+
+__author__ = 'Robert M. Pufky (robert.pufky@gmail.com)'
+__version__ = '1.0'
+
+import cPickle
+import os
+import sys
+import threading
+import time
+import abs_path
+
+try:
+  from os import scandir
+except ImportError:
+  try:
+    from scandir import scandir
+  except ImportError:
+    scandir = None
+
+WALK_THREADS = 8
+# Increment when the format of the pickled directory index changes.
+INDEX_VERSION = 1
+# Directories modified this recently are not indexed, as they may still change
+# without their modification time changing.
+INDEX_SETTLE_SECONDS = 2
+
+
+class DirectoryIndex(object):
+  """Persistent index of directory listings, keyed by modification time.
+
+  Attributes:
+    filename: String full path to the index file.  None keeps the index in
+      memory only.
+    _entries: Dictionary mapping String directory paths to (<float mtime>,
+      <list directories>) tuples.
+    _visited: Dictionary of entries for directories seen in the current walk.
+    _lock: threading.Lock protecting the index.
+  """
+
+  def __init__(self, filename=None):
+    """Initializes DirectoryIndex, loading the index file if it exists.
+
+    Args:
+      filename: String full path to the index file.  Default None (memory
+        only).
+    """
+    self.filename = filename
+    self._entries = self._Load()
+    self._visited = {}
+    self._lock = threading.Lock()
+
+  def _Load(self):
+    """Returns the index entries from the index file, or an empty index."""
+    if not self.filename:
+      return {}
+    try:
+      index_file = open(self.filename, 'rb')
+      try:
+        version, entries = cPickle.load(index_file)
+      finally:
+        index_file.close()
+    except (IOError, OSError, EOFError, ValueError, TypeError,
+            AttributeError, ImportError, cPickle.UnpicklingError):
+      return {}
+    if version != INDEX_VERSION or not isinstance(entries, dict):
+      return {}
+    return entries
+
+  def _Save(self):
+    """Saves the index, replacing the index file atomically.
+
+    Returns:
+      Boolean True if the index was saved, False otherwise.
+    """
+    temp_file = '%s.%s.tmp' % (self.filename, os.getpid())
+    try:
+      directory = os.path.dirname(self.filename)
+      if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+      output = open(temp_file, 'wb')
+      try:
+        cPickle.dump((INDEX_VERSION, self._entries), output,
+                     cPickle.HIGHEST_PROTOCOL)
+      finally:
+        output.close()
+      os.rename(temp_file, self.filename)
+    except (IOError, OSError, cPickle.PicklingError):
+      if os.path.exists(temp_file):
+        os.remove(temp_file)
+      return False
+    return True
+
+  def Get(self, path, mtime):
+    """Returns the indexed subdirectories of a directory.
+
+    Args:
+      path: String full path to the directory.
+      mtime: Float current modification time of the directory.
+
+    Returns:
+      List of String full paths to subdirectories, or None if the directory
+      is not indexed or has changed.
+    """
+    self._lock.acquire()
+    try:
+      entry = self._entries.get(path)
+    finally:
+      self._lock.release()
+    if entry is None or entry[0] != mtime:
+      return None
+    return list(entry[1])
+
+  def Put(self, path, mtime, directories):
+    """Records the subdirectories of a directory seen in the current walk.
+
+    Args:
+      path: String full path to the directory.
+      mtime: Float modification time of the directory before it was listed.
+      directories: List of String full paths to subdirectories.
+    """
+    if mtime is None or time.time() - mtime < INDEX_SETTLE_SECONDS:
+      return
+    self._lock.acquire()
+    try:
+      self._visited[path] = (mtime, list(directories))
+    finally:
+      self._lock.release()
+
+  def Commit(self, root):
+    """Replaces the index of a tree with the directories seen walking it.
+
+    Directories below root that were not seen in the walk are removed from
+    the index.
+
+    Args:
+      root: String full path to the root of the walked tree.
+
+    Returns:
+      Boolean True if the index was saved, False otherwise.
+    """
+    prefix = os.path.join(root, '')
+    self._lock.acquire()
+    try:
+      for path in self._entries.keys():
+        if path == root or path.startswith(prefix):
+          del self._entries[path]
+      self._entries.update(self._visited)
+      self._visited = {}
+      if self.filename:
+        return self._Save()
+      return True
+    finally:
+      self._lock.release()
+
+
+class SourceWalker(object):
+  """Finds DVD containers in a directory tree.
+
+  Attributes:
+    threads: Integer number of directories to list at once.
+    index: DirectoryIndex of directory listings from earlier walks, or None.
+    _pending: List of (<String directory>, <float mtime>) tuples waiting to be
+      listed.
+    _active: Integer number of directories being listed.
+    _seen: Set of (st_dev, st_ino) tuples of directories already queued.
+    _containers: List of String full paths to DVD containers found.
+    _error: Tuple (<type>, <value>, <traceback>) of the first exception raised
+      while visiting a directory, or None.
+    _condition: threading.Condition protecting the walk state.
+  """
+
+  def __init__(self, threads=WALK_THREADS, index=None):
+    """Initializes SourceWalker.
+
+    Args:
+      threads: Integer number of directories to list at once.  Default
+        WALK_THREADS.
+      index: DirectoryIndex to use and update.  Default None (list every
+        directory).
+    """
+    self.threads = max(threads, 1)
+    self.index = index
+    self._pending = []
+    self._active = 0
+    self._seen = set()
+    self._containers = []
+    self._error = None
+    self._condition = threading.Condition()
+
+  def _Stat(self, path):
+    """Stats a directory, following symlinks.
+
+    Args:
+      path: String full path to the directory.
+
+    Returns:
+      Tuple (<tuple (st_dev, st_ino)>, <String path>, <float mtime>), with
+      None for the identity and mtime if the directory could not be stat'd.
+    """
+    try:
+      stat = os.stat(path)
+    except OSError:
+      return (None, path, None)
+    return ((stat.st_dev, stat.st_ino), path, stat.st_mtime)
+
+  def _ListDirectories(self, path):
+    """Lists the subdirectories of a directory, following symlinks.
+
+    Args:
+      path: String full path to the directory to list.
+
+    Returns:
+      List of String full paths to subdirectories, or None if the directory
+      could not be listed.
+    """
+    directories = []
+    try:
+      if scandir is not None:
+        for entry in scandir(path):
+          try:
+            if entry.is_dir():
+              directories.append(entry.path)
+          except OSError:
+            continue
+      else:
+        for name in os.listdir(path):
+          child = os.path.join(path, name)
+          if os.path.isdir(child):
+            directories.append(child)
+    except OSError:
+      return None
+    return directories
+
+  def _Visit(self, path, mtime):
+    """Lists a directory, recording it if it is a DVD container.
+
+    The directory is only listed if it has changed since it was indexed.
+
+    Args:
+      path: String full path to the directory to visit.
+      mtime: Float modification time of the directory.
+
+    Returns:
+      List of String full paths to subdirectories to walk.  Empty if the
+      directory is a DVD container.
+    """
+    directories = None
+    if self.index is not None:
+      directories = self.index.Get(path, mtime)
+    if directories is None:
+      directories = self._ListDirectories(path)
+      if directories is None:
+        return []
+    if self.index is not None:
+      self.index.Put(path, mtime, directories)
+    for directory in directories:
+      if os.path.basename(directory).upper() == 'VIDEO_TS':
+        self._condition.acquire()
+        try:
+          self._containers.append(abs_path.AbsPath(path))
+        finally:
+          self._condition.release()
+        return []
+    return directories
+
+  def _Queue(self, directories):
+    """Queues directories that have not been seen to be walked.
+
+    Must be called with self._condition acquired.
+
+    Args:
+      directories: List of (<tuple identity>, <String path>, <float mtime>)
+        tuples, as returned by _Stat.
+    """
+    for identity, directory, mtime in directories:
+      if identity is not None and identity not in self._seen:
+        self._seen.add(identity)
+        self._pending.append((directory, mtime))
+
+  def _Work(self):
+    """Visits queued directories until the walk is complete.
+
+    An exception raised while visiting a directory is recorded in self._error,
+    and ends the walk.
+    """
+    while True:
+      self._condition.acquire()
+      try:
+        while not self._pending and self._active:
+          self._condition.wait()
+        if not self._pending:
+          self._condition.notifyAll()
+          return
+        path, mtime = self._pending.pop()
+        self._active += 1
+      finally:
+        self._condition.release()
+      directories = []
+      try:
+        try:
+          directories = [self._Stat(directory)
+                         for directory in self._Visit(path, mtime)]
+        except Exception:
+          self._condition.acquire()
+          try:
+            if self._error is None:
+              self._error = sys.exc_info()
+          finally:
+            self._condition.release()
+      finally:
+        self._condition.acquire()
+        try:
+          if self._error is None:
+            self._Queue(directories)
+          else:
+            self._pending = []
+          self._active -= 1
+          self._condition.notifyAll()
+        finally:
+          self._condition.release()
+
+  def Walk(self, path):
+    """Finds all DVD containers in a directory tree.
+
+    The index, if any, is updated with the directories seen and saved.
+
+    Args:
+      path: String path to the directory tree to search.  If path is a VIDEO_TS
+        directory, its parent is the only container found.
+
+    Raises:
+      Exception: The first exception raised while visiting a directory, other
+        than the OSError of a directory that could not be listed.
+
+    Returns:
+      Sorted list of String full paths to DVD containers, with trailing
+      separators.
+    """
+    path = os.path.abspath(os.path.expanduser(path))
+    if os.path.basename(path).upper() == 'VIDEO_TS':
+      if not os.path.isdir(path):
+        return []
+      return [abs_path.AbsPath(os.path.dirname(path))]
+    self._pending = []
+    self._active = 0
+    self._seen = set()
+    self._containers = []
+    self._error = None
+    self._Queue([self._Stat(path)])
+    workers = []
+    for unused_thread in range(self.threads):
+      worker = threading.Thread(target=self._Work)
+      worker.setDaemon(True)
+      worker.start()
+      workers.append(worker)
+    for worker in workers:
+      worker.join()
+    if self._error is not None:
+      error_type, error, error_traceback = self._error
+      self._error = None
+      raise error_type, error, error_traceback
+    if self.index is not None:
+      self.index.Commit(path)
+    return sorted(self._containers)
@@ -0,0 +1,210 @@
+#!/usr/bin/python2.5
+#
+# Copyright 2009, Robert M. Pufky (robert.pufky@gmail.com)
+#
+# GPLv2 License:
+# --------------
+# Copyright (C) 2009 Robert M. Pufky (robert.pufky@gmail.com)
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more 
+# details.
+#
+# You should have received a copy of the GNU General Public License along with 
+# this program; if not, write to the Free Software Foundation, Inc., 59 Temple
+# Place, Suite 330, Boston, MA 02111-1307 USA
+#
+# You can also read the license at:
+#
+#  http://www.opensource.org/licenses/gpl-2.0.php
+#
+# Please contact me if you wish to use this in another product that you are 
+# building (robert.pufky@gmail.com); or building to sell.
+#
+"""Test suite for source_walker."""
+
+__author__ = 'Robert M. Pufky (robert.pufky@gmail.com)'
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import source_walker
+
+
+class TestSourceWalker(unittest.TestCase):
+  """Verifies SourceWalker finds DVD containers properly."""
+
+  def setUp(self):
+    self.root = tempfile.mkdtemp()
+    self.walker = source_walker.SourceWalker(4)
+
+  def tearDown(self):
+    shutil.rmtree(self.root)
+
+  def MakeDirectory(self, *path):
+    """Creates a directory below the test root, returning its full path."""
+    directory = os.path.join(self.root, *path)
+    os.makedirs(directory)
+    return directory
+
+  def Container(self, *path):
+    """Returns the expected container path, with a trailing separator."""
+    return os.path.join(self.root, *path) + os.sep
+
+  def testWalk(self):
+    """Verifies containers are found throughout the tree."""
+    self.MakeDirectory('movies', 'Movie One', 'VIDEO_TS')
+    self.MakeDirectory('movies', 'Movie Two', 'video_ts')
+    self.MakeDirectory('tv', 'Show', 'Disc 1', 'VIDEO_TS')
+    self.MakeDirectory('tv', 'Show', 'Extras')
+    self.assertEqual(self.walker.Walk(self.root),
+                     [self.Container('movies', 'Movie One'),
+                      self.Container('movies', 'Movie Two'),
+                      self.Container('tv', 'Show', 'Disc 1')])
+
+  def testWalkPrunesContainers(self):
+    """Verifies containers are not searched any further."""
+    self.MakeDirectory('Movie', 'VIDEO_TS', 'Nested', 'VIDEO_TS')
+    self.MakeDirectory('Movie', 'Bonus', 'VIDEO_TS')
+    visited = []
+    real_list = self.walker._ListDirectories
+    def ListDirectories(path):
+      visited.append(path)
+      return real_list(path)
+    self.walker._ListDirectories = ListDirectories
+    self.assertEqual(self.walker.Walk(self.root), [self.Container('Movie')])
+    self.assertEqual(sorted(visited),
+                     [self.root, os.path.join(self.root, 'Movie')])
+
+  def testWalkSymlinks(self):
+    """Verifies symlinked rips are found once, and symlink loops end."""
+    self.MakeDirectory('archive', 'Movie', 'VIDEO_TS')
+    os.symlink(os.path.join(self.root, 'archive'),
+               os.path.join(self.root, 'linked'))
+    os.symlink(self.root, os.path.join(self.root, 'archive', 'loop'))
+    self.assertEqual(len(self.walker.Walk(self.root)), 1)
+
+  def testWalkVideoTs(self):
+    """Verifies a VIDEO_TS directory finds its parent container."""
+    video_ts = self.MakeDirectory('Movie', 'VIDEO_TS')
+    self.assertEqual(self.walker.Walk(video_ts), [self.Container('Movie')])
+    self.assertEqual(self.walker.Walk(os.path.join(self.root, 'VIDEO_TS')), [])
+
+  def testWalkError(self):
+    """Verifies an unexpected error ends the walk and is raised."""
+    for name in ('one', 'two', 'three', 'four', 'five'):
+      self.MakeDirectory(name, 'Extras')
+    real_list = self.walker._ListDirectories
+    def ListDirectories(path):
+      if os.path.basename(path) == 'three':
+        raise ValueError('bad listing')
+      return real_list(path)
+    self.walker._ListDirectories = ListDirectories
+    self.assertRaises(ValueError, self.walker.Walk, self.root)
+    self.walker._ListDirectories = real_list
+    self.assertEqual(self.walker.Walk(self.root), [])
+
+  def testWalkMissing(self):
+    """Verifies a missing directory finds nothing."""
+    self.assertEqual(self.walker.Walk(os.path.join(self.root, 'missing')), [])
+
+  def testListDirectoriesFallback(self):
+    """Verifies directories are listed without scandir."""
+    self.MakeDirectory('one')
+    self.MakeDirectory('two')
+    open(os.path.join(self.root, 'file'), 'w').close()
+    real_scandir = source_walker.scandir
+    source_walker.scandir = None
+    try:
+      directories = self.walker._ListDirectories(self.root)
+    finally:
+      source_walker.scandir = real_scandir
+    self.assertEqual(sorted(directories), [os.path.join(self.root, 'one'),
+                                           os.path.join(self.root, 'two')])
+
+
+class TestDirectoryIndex(unittest.TestCase):
+  """Verifies DirectoryIndex re-uses unchanged directory listings."""
+
+  def setUp(self):
+    self.root = tempfile.mkdtemp()
+    self.filename = os.path.join(self.root, 'cache', 'directories.index')
+    self.tree = os.path.join(self.root, 'tree')
+    for path in [('Movie', 'VIDEO_TS'), ('TV', 'Show', 'VIDEO_TS')]:
+      os.makedirs(os.path.join(self.tree, *path))
+    self.Settle()
+
+  def tearDown(self):
+    shutil.rmtree(self.root)
+
+  def Settle(self):
+    """Ages the modification time of every directory in the tree."""
+    settled = time.time() - 60
+    for directory, directories, unused_files in os.walk(self.tree):
+      os.utime(directory, (settled, settled))
+
+  def Walk(self, index):
+    """Walks the tree, returning (<list containers>, <list listed>)."""
+    walker = source_walker.SourceWalker(2, index)
+    listed = []
+    real_list = walker._ListDirectories
+    def ListDirectories(path):
+      listed.append(path)
+      return real_list(path)
+    walker._ListDirectories = ListDirectories
+    return walker.Walk(self.tree), sorted(listed)
+
+  def testUnchanged(self):
+    """Verifies unchanged directories are not listed again."""
+    containers, listed = self.Walk(source_walker.DirectoryIndex(self.filename))
+    self.assertEqual(len(containers), 2)
+    self.assertEqual(len(listed), 4)
+    containers_again, listed = self.Walk(
+        source_walker.DirectoryIndex(self.filename))
+    self.assertEqual(containers_again, containers)
+    self.assertEqual(listed, [])
+
+  def testChanged(self):
+    """Verifies only changed directories are listed again."""
+    self.Walk(source_walker.DirectoryIndex(self.filename))
+    os.makedirs(os.path.join(self.tree, 'TV', 'New', 'VIDEO_TS'))
+    containers, listed = self.Walk(source_walker.DirectoryIndex(self.filename))
+    self.assertEqual(listed, [os.path.join(self.tree, 'TV'),
+                              os.path.join(self.tree, 'TV', 'New')])
+    self.assertEqual(len(containers), 3)
+
+  def testRecentlyChanged(self):
+    """Verifies directories that may still be changing are not indexed."""
+    index = source_walker.DirectoryIndex()
+    os.utime(self.tree, None)
+    self.Walk(index)
+    self.assertEqual(index.Get(self.tree, os.stat(self.tree).st_mtime), None)
+    self.assertEqual(len(index._entries), 3)
+
+  def testRemoved(self):
+    """Verifies removed directories are dropped from the index."""
+    index = source_walker.DirectoryIndex()
+    self.Walk(index)
+    shutil.rmtree(os.path.join(self.tree, 'TV'))
+    self.Settle()
+    containers, listed = self.Walk(index)
+    self.assertEqual(len(containers), 1)
+    self.assertFalse(os.path.join(self.tree, 'TV') in index._entries)
+
+  def testBadIndexFile(self):
+    """Verifies an unreadable index file is ignored."""
+    os.makedirs(os.path.dirname(self.filename))
+    index_file = open(self.filename, 'w')
+    index_file.write('not a pickle')
+    index_file.close()
+    self.assertEqual(source_walker.DirectoryIndex(self.filename)._entries, {})
+
+
+if __name__ == '__main__':
+  unittest.main()
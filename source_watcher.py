@@ -0,0 +1,308 @@
+#!/usr/bin/python2.5
+#
+# Copyright 2009, Robert M. Pufky (robert.pufky@gmail.com)
+#
+# GPLv2 License:
+# --------------
+# Copyright (C) 2009 Robert M. Pufky (robert.pufky@gmail.com)
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more 
+# details.
+#
+# You should have received a copy of the GNU General Public License along with 
+# this program; if not, write to the Free Software Foundation, Inc., 59 Temple
+# Place, Suite 330, Boston, MA 02111-1307 USA
+#
+# You can also read the license at:
+#
+#  http://www.opensource.org/licenses/gpl-2.0.php
+#
+# Please contact me if you wish to use this in another product that you are 
+# building (robert.pufky@gmail.com); or building to sell.
+#
+"""Watches a source tree for new DVD rips using Linux inotify.
+
+Every directory below the source is watched.  A change marks the directory it
+happened in as changed; changes inside a VIDEO_TS directory mark the DVD
+container holding it.  Once a changed directory has seen no changes for the
+settle time, it is searched for DVD containers, which are then reported as
+ready.  A rip still being copied keeps changing, so it is not reported until
+the copy has finished.
+
+inotify is used directly through ctypes, so no extra modules are needed.  Only
+Linux is supported.
+"""
+
+__author__ = 'Robert M. Pufky (robert.pufky@gmail.com)'
+__version__ = '1.0'
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import time
+import source_walker
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM |
+              IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_ONLYDIR)
+# struct inotify_event header: wd, mask, cookie, len.
+EVENT_HEADER = 'iIII'
+EVENT_HEADER_SIZE = struct.calcsize(EVENT_HEADER)
+READ_SIZE = 65536
+# Seconds a directory must be unchanged before it is searched for DVD's.
+SETTLE_SECONDS = 60
+
+
+class Error(Exception):
+  """General source watcher error."""
+
+
+class Inotify(object):
+  """Minimal binding of the Linux inotify API.
+
+  Attributes:
+    fd: Integer inotify file descriptor.
+    _libc: ctypes.CDLL C library providing inotify.
+    _errno: Function returning the Integer errno of the last failed call.
+  """
+
+  def __init__(self):
+    """Initializes Inotify.
+
+    Raises:
+      Error: If inotify is not available.
+    """
+    library = ctypes.util.find_library('c') or 'libc.so.6'
+    try:
+      if hasattr(ctypes, 'get_errno'):
+        self._libc = ctypes.CDLL(library, use_errno=True)
+        self._errno = ctypes.get_errno
+      else:
+        # Python 2.5 ctypes does not save errno, so it is read from glibc.
+        self._libc = ctypes.CDLL(library)
+        errno_location = getattr(self._libc, '__errno_location')
+        errno_location.restype = ctypes.POINTER(ctypes.c_int)
+        self._errno = lambda: errno_location().contents.value
+      self._libc.inotify_init
+    except (OSError, AttributeError), error:
+      raise Error('inotify is not available: %s' % error)
+    self.fd = self._libc.inotify_init()
+    if self.fd < 0:
+      raise Error('inotify_init failed: %s' % os.strerror(self._errno()))
+
+  def AddWatch(self, path, mask=WATCH_MASK):
+    """Watches a directory.
+
+    Args:
+      path: String full path to the directory.
+      mask: Integer inotify event mask.  Default WATCH_MASK.
+
+    Raises:
+      Error: If the directory could not be watched.
+
+    Returns:
+      Integer watch descriptor.
+    """
+    wd = self._libc.inotify_add_watch(self.fd, path, mask)
+    if wd < 0:
+      error = self._errno()
+      raise Error('Could not watch %s: %s' % (path, os.strerror(error)))
+    return wd
+
+  def Read(self, timeout=None):
+    """Reads pending events.
+
+    Args:
+      timeout: Float seconds to wait for events.  Default None (wait forever).
+
+    Returns:
+      List of (<int wd>, <int mask>, <int cookie>, <str name>) events.
+    """
+    try:
+      readable = select.select([self.fd], [], [], timeout)[0]
+    except select.error, error:
+      if error[0] == errno.EINTR:
+        return []
+      raise
+    if not readable:
+      return []
+    data = os.read(self.fd, READ_SIZE)
+    events = []
+    offset = 0
+    while offset + EVENT_HEADER_SIZE <= len(data):
+      wd, mask, cookie, length = struct.unpack_from(EVENT_HEADER, data, offset)
+      offset += EVENT_HEADER_SIZE
+      name = data[offset:offset + length].rstrip('\0')
+      offset += length
+      events.append((wd, mask, cookie, name))
+    return events
+
+  def Close(self):
+    """Closes the inotify file descriptor, removing all watches."""
+    if self.fd >= 0:
+      os.close(self.fd)
+      self.fd = -1
+
+
+class SourceWatcher(object):
+  """Reports DVD containers once they have stopped changing.
+
+  Attributes:
+    root: String full path to the source tree watched.
+    settle: Float seconds a directory must be unchanged to be searched.
+    threads: Integer number of threads to search changed directories with.
+    _inotify: Inotify object, or None until started.
+    _watches: Dictionary mapping Integer watch descriptors to String full
+      paths of watched directories.
+    _changed: Dictionary mapping String full paths of changed directories to
+      the Float time they last changed.
+  """
+
+  def __init__(self, root, settle=SETTLE_SECONDS,
+               threads=source_walker.WALK_THREADS):
+    """Initializes SourceWatcher.
+
+    Args:
+      root: String path to the source tree to watch.
+      settle: Float seconds a directory must be unchanged to be searched.
+        Default SETTLE_SECONDS.
+      threads: Integer number of threads to search changed directories with.
+        Default source_walker.WALK_THREADS.
+    """
+    self.root = os.path.abspath(os.path.expanduser(root))
+    self.settle = settle
+    self.threads = threads
+    self._inotify = None
+    self._watches = {}
+    self._changed = {}
+
+  def Start(self):
+    """Starts watching the source tree.
+
+    Raises:
+      Error: If inotify is not available, or the source could not be watched.
+    """
+    if not os.path.isdir(self.root):
+      raise Error('%s is not a directory.' % self.root)
+    self._inotify = Inotify()
+    self._WatchTree(self.root)
+
+  def _WatchTree(self, path):
+    """Watches a directory and all directories below it.
+
+    Directories that disappear, or cannot be watched, are skipped.
+
+    Args:
+      path: String full path to the directory.
+    """
+    for directory, directories, unused_files in os.walk(path):
+      try:
+        self._watches[self._inotify.AddWatch(directory)] = directory
+      except Error:
+        directories[:] = []
+
+  def _Changed(self, path, now):
+    """Marks a directory as changed.
+
+    Changes inside a VIDEO_TS directory mark the DVD container holding it.
+
+    Args:
+      path: String full path to the changed directory.
+      now: Float time of the change.
+    """
+    parts = path.split(os.sep)
+    for index, part in enumerate(parts):
+      if part.upper() == 'VIDEO_TS':
+        path = os.sep.join(parts[:index]) or os.sep
+        break
+    self._changed[path] = now
+
+  def Poll(self, timeout=None, now=None):
+    """Waits for changes to the source tree.
+
+    Args:
+      timeout: Float seconds to wait for changes.  Default None (wait
+        forever).
+      now: Float time to record changes at.  Default None (current time).
+
+    Returns:
+      Integer number of events read.
+    """
+    events = self._inotify.Read(timeout)
+    if now is None:
+      now = time.time()
+    for wd, mask, cookie, name in events:
+      if mask & IN_Q_OVERFLOW:
+        self._WatchTree(self.root)
+        self._Changed(self.root, now)
+        continue
+      directory = self._watches.get(wd)
+      if directory is None:
+        continue
+      if mask & IN_IGNORED:
+        del self._watches[wd]
+        continue
+      path = os.path.join(directory, name)
+      if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+        self._WatchTree(path)
+        self._Changed(path, now)
+      else:
+        self._Changed(directory, now)
+    return len(events)
+
+  def Ready(self, now=None):
+    """Returns the DVD containers in directories that have settled.
+
+    A container found in a settled directory is not reported while it, or a
+    directory holding it, is still changing.  It is reported once that
+    directory settles.
+
+    Args:
+      now: Float time to check against.  Default None (current time).
+
+    Returns:
+      Sorted list of String full paths to DVD containers, with trailing
+      separators.
+    """
+    if now is None:
+      now = time.time()
+    settled = []
+    for path, changed in self._changed.items():
+      if now - changed >= self.settle:
+        settled.append(path)
+        del self._changed[path]
+    unsettled = [os.path.join(path, '') for path in self._changed]
+    containers = set()
+    for path in settled:
+      if not os.path.isdir(path):
+        continue
+      for container in source_walker.SourceWalker(self.threads).Walk(path):
+        if not [changing for changing in unsettled
+                if container.startswith(changing)]:
+          containers.add(container)
+    return sorted(containers)
+
+  def Close(self):
+    """Stops watching the source tree."""
+    if self._inotify:
+      self._inotify.Close()
+      self._inotify = None
+    self._watches = {}
@@ -0,0 +1,164 @@
+#!/usr/bin/python2.5
+#
+# Copyright 2009, Robert M. Pufky (robert.pufky@gmail.com)
+#
+# GPLv2 License:
+# --------------
+# Copyright (C) 2009 Robert M. Pufky (robert.pufky@gmail.com)
+# This program is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more 
+# details.
+#
+# You should have received a copy of the GNU General Public License along with 
+# this program; if not, write to the Free Software Foundation, Inc., 59 Temple
+# Place, Suite 330, Boston, MA 02111-1307 USA
+#
+# You can also read the license at:
+#
+#  http://www.opensource.org/licenses/gpl-2.0.php
+#
+# Please contact me if you wish to use this in another product that you are 
+# building (robert.pufky@gmail.com); or building to sell.
+#
+"""Test suite for source_watcher."""
+
+__author__ = 'Robert M. Pufky (robert.pufky@gmail.com)'
+
+import errno
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import source_watcher
+
+
+class TestSourceWatcher(unittest.TestCase):
+  """Verifies SourceWatcher reports DVD containers once settled."""
+
+  def setUp(self):
+    self.root = tempfile.mkdtemp()
+    self.watcher = source_watcher.SourceWatcher(self.root, settle=10)
+
+  def tearDown(self):
+    self.watcher.Close()
+    shutil.rmtree(self.root)
+
+  def MakeRip(self, *path):
+    """Creates a DVD rip below the test root, returning its VIDEO_TS path."""
+    video_ts = os.path.join(self.root, *(path + ('VIDEO_TS',)))
+    os.makedirs(video_ts)
+    return video_ts
+
+  def Container(self, *path):
+    """Returns the expected container path, with a trailing separator."""
+    return os.path.join(self.root, *path) + os.sep
+
+  def Poll(self, now):
+    """Reads all pending events, recording them at a given time."""
+    while self.watcher.Poll(0.1, now):
+      pass
+
+  def testNewRip(self):
+    """Verifies a new rip is reported only once it has settled."""
+    os.makedirs(os.path.join(self.root, 'Movies'))
+    self.watcher.Start()
+    now = time.time()
+    video_ts = self.MakeRip('Movies', 'Dvd')
+    self.Poll(now)
+    self.assertEqual(self.watcher.Ready(now + 5), [])
+    open(os.path.join(video_ts, 'VTS_01_0.IFO'), 'w').close()
+    self.Poll(now + 5)
+    self.assertEqual(self.watcher.Ready(now + 11), [])
+    self.assertEqual(self.watcher.Ready(now + 15),
+                     [self.Container('Movies', 'Dvd')])
+    self.assertEqual(self.watcher.Ready(now + 30), [])
+
+  def testChangedRip(self):
+    """Verifies changes inside VIDEO_TS report the DVD container."""
+    video_ts = self.MakeRip('Dvd')
+    self.watcher.Start()
+    now = time.time()
+    open(os.path.join(video_ts, 'VTS_01_1.VOB'), 'w').close()
+    self.Poll(now)
+    self.assertEqual(self.watcher._changed, {os.path.join(self.root, 'Dvd'):
+                                             now})
+    self.assertEqual(self.watcher.Ready(now + 10), [self.Container('Dvd')])
+
+  def testMovedRip(self):
+    """Verifies a rip moved into the source is reported."""
+    outside = tempfile.mkdtemp()
+    try:
+      os.makedirs(os.path.join(outside, 'Dvd', 'VIDEO_TS'))
+      self.watcher.Start()
+      now = time.time()
+      os.rename(os.path.join(outside, 'Dvd'), os.path.join(self.root, 'Dvd'))
+      self.Poll(now)
+      self.assertEqual(self.watcher.Ready(now + 10), [self.Container('Dvd')])
+    finally:
+      shutil.rmtree(outside)
+
+  def testRemovedRip(self):
+    """Verifies a rip removed before settling is not reported."""
+    self.MakeRip('Dvd')
+    self.watcher.Start()
+    now = time.time()
+    shutil.rmtree(os.path.join(self.root, 'Dvd'))
+    self.Poll(now)
+    self.assertEqual(self.watcher.Ready(now + 10), [])
+    self.assertEqual(self.watcher._watches.values(), [self.root])
+
+  def testUnsettledRip(self):
+    """Verifies a rip in a settled directory waits for the rip to settle."""
+    self.MakeRip('Show')
+    self.MakeRip('Movie')
+    now = time.time()
+    self.watcher._changed = {self.root: now,
+                             os.path.join(self.root, 'Show'): now + 8}
+    self.assertEqual(self.watcher.Ready(now + 10), [self.Container('Movie')])
+    self.assertEqual(self.watcher._changed,
+                     {os.path.join(self.root, 'Show'): now + 8})
+    self.assertEqual(self.watcher.Ready(now + 18), [self.Container('Show')])
+
+  def testStartError(self):
+    """Verifies watching a missing source raises an Error."""
+    watcher = source_watcher.SourceWatcher(os.path.join(self.root, 'missing'))
+    self.assertRaises(source_watcher.Error, watcher.Start)
+
+
+class TestInotify(unittest.TestCase):
+  """Verifies Inotify reports errors properly."""
+
+  def AddWatchError(self):
+    """Returns the String error raised watching a missing directory."""
+    inotify = source_watcher.Inotify()
+    try:
+      try:
+        inotify.AddWatch('/does/not/exist')
+      except source_watcher.Error, error:
+        return str(error)
+    finally:
+      inotify.Close()
+    self.fail('Watched a missing directory.')
+
+  def testAddWatchError(self):
+    """Verifies a failed watch reports its errno."""
+    self.assertTrue(os.strerror(errno.ENOENT) in self.AddWatchError())
+
+  def testAddWatchErrorWithoutGetErrno(self):
+    """Verifies errno is read without ctypes.get_errno, as on Python 2.5."""
+    get_errno = source_watcher.ctypes.get_errno
+    del source_watcher.ctypes.get_errno
+    try:
+      self.assertTrue(os.strerror(errno.ENOENT) in self.AddWatchError())
+    finally:
+      source_watcher.ctypes.get_errno = get_errno
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -70,16 +70,6 @@ class SubtitleLineTestData(object):
   NUMBER = 1
 
 
-class TitleSectionTestData(object):
-  """Test data for verifying dvd.Dvd._ProcessTitleSection."""
-  CHAPTER_LOG = [ChapterLineTestData.LINE]
-  CHAPTER_ARGS = (0, 2, 48235, '00:02:13', 1)
-  AUDIO_LOG = [AudioLineTestData.LINE]
-  AUDIO_ARGS = ('AC3', 'Dolby Surround', 48000, 192000, 'English', 1)
-  SUBTITLE_LOG = [SubtitleLineTestData.LINE]
-  SUBTITLE_ARGS = ('English', 'iso639-2', 'eng', 1)
-
-
 class ParseVideoTileSetLineTestData(object):
   """Test data for verifying dvd.Dvd._ParseVideoTileSetTestData."""
   LINE = '  + vts 1, ttn 1, cells 0->24 (1939167 blocks)'
@@ -115,10 +105,14 @@ class ParseAutocropLineTestData(object):
 
 
 class ExtractTitleFromLogTestData(object):
-  """Test data for verifying dvd.Dvd._ExtractTitleFromLog."""
-  INDEXES = [6, 28, 33]
+  """Test data for verifying a single title is parsed by dvd.Dvd."""
   TITLE_ARGS = (1, 1, 0, 24, 1939167, '01:26:38', 720, 480, 1.78, 23.976, 0,
                 0, 0, 0, False, [], [], [], False)
+  TITLE_ATTRIBUTES = ['video_tile_set', 'number', 'cell_start', 'cell_end',
+                      'cell_blocks', 'duration', 'horizontal_size',
+                      'vertical_size', 'aspect_ratio', 'frame_rate',
+                      'autocrop_top', 'autocrop_bottom', 'autocrop_left',
+                      'autocrop_right', 'combining']
 
   def __init__(self):
     f = open('./testdata/handbrake_dvd_logs/handbrake_title.log')
@@ -129,8 +123,7 @@ class ExtractTitleFromLogTestData(object):
 
 
 class IndexHandbrakeLogTestData(object):
-  """Test data for verifying dvd.Dvd._IndexHandbrakeLog."""
-  TITLES = [9, 46, 75, 103]
+  """Test data for verifying dvd.Dvd.ProcessHandbrakeAnalysis."""
   NAME = 'FIREFLY_D1'
   DVD_SIGNATURE = [(21, 4, 4), (13, 4, 4), (13, 3, 4), (2, 1, 0)]
 
@@ -146,7 +139,8 @@ class IntegrationTest(object):
   """Test data for integration testing mulitple DVD's."""
 
   def __init__(self):
-    self.files = os.listdir('./testdata/handbrake_dvd_logs/')
-    self.files.pop(self.files.index('.svn'))
+    self.files = [name for name in
+                  os.listdir('./testdata/handbrake_dvd_logs/')
+                  if name.endswith('.log')]
     for index in xrange(len(self.files)):
       self.files[index] = './testdata/handbrake_dvd_logs/' + self.files[index]